@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+日記の一括取り込みベンチマーク
+
+10,000件のエントリを1件ずつ書き込む場合と add_diary_entries_batch でまとめて書き込む場合で、
+取り込み時間とPythonから発行したSQL文の数（execute / executemany の呼び出し回数）を比較します。
+同じデータの再取り込み（差分なし）と、一部だけ変更した再取り込みも計測します。
+
+使い方:
+    python benchmarks/bench_bulk_import.py
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite, UPSERT_ENTRY_SQL
+
+USER_ID = 'bench_user'
+ENTRY_COUNT = 10000
+
+
+def make_entries(count, topic='健康'):
+    """関連データ付きのベンチマーク用エントリを作成"""
+    return [
+        {
+            'id': f'bench_{i}',
+            'created_at': f'2025-01-01 10:00:{i:06d}',
+            'date': f'2025-01-{i % 28 + 1:02d}',
+            'text': f'ベンチマーク用の日記 {i}',
+            'question': '今日はどうでしたか？',
+            'user_id': USER_ID,
+            'topics': ['仕事', '家族', topic],
+            'emotions': ['嬉しい', '緊張'],
+            'thoughts': ['頑張ろう'],
+            'goals': ['毎日書く'],
+            'followup_questions': ['なぜ？', 'いつから？'],
+            'qa_chain': [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}]
+        }
+        for i in range(count)
+    ]
+
+
+class CountingCursor:
+    """execute / executemany の呼び出し回数を数えるカーソルのラッパー"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.calls = 0
+
+    def execute(self, *args):
+        self.calls += 1
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        self.calls += 1
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def import_per_entry(diary_manager, entries):
+    """1件ずつメインエントリと関連データを書き込む（従来の書き込み方）"""
+    with diary_manager._pool.transaction() as raw_cursor:
+        cur = CountingCursor(raw_cursor)
+        for entry in entries:
+            cur.execute(UPSERT_ENTRY_SQL, diary_manager._entry_row(entry['id'], entry))
+            diary_manager._upsert_related_data(cur, entry['id'], entry)
+    return cur.calls
+
+
+def import_batch(diary_manager, entries):
+    """テーブルごとにまとめて書き込む"""
+    with diary_manager._pool.transaction() as raw_cursor:
+        cur = CountingCursor(raw_cursor)
+        cur.executemany(UPSERT_ENTRY_SQL, [diary_manager._entry_row(entry['id'], entry) for entry in entries])
+        diary_manager._upsert_related_data_batch(cur, [(entry['id'], entry) for entry in entries])
+    return cur.calls
+
+
+def measure(importer, diary_manager, entries):
+    """取り込みの実行時間とSQL文の数を計測"""
+    start = time.perf_counter()
+    calls = importer(diary_manager, entries)
+    return calls, time.perf_counter() - start
+
+
+def main():
+    """ベンチマークを実行"""
+    print(f"=== 一括取り込みベンチマーク（{ENTRY_COUNT:,}件） ===\n")
+    print(f"{'方式':>10} {'取り込み':>12} {'SQL文':>10} {'時間(s)':>9} {'件/秒':>10}")
+
+    scenarios = [
+        ('新規', make_entries(ENTRY_COUNT)),
+        ('再取り込み', make_entries(ENTRY_COUNT)),
+        ('一部変更', make_entries(ENTRY_COUNT, topic='趣味')),
+    ]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, importer in (('1件ずつ', import_per_entry), ('一括', import_batch)):
+            diary_manager = DiaryManagerSQLite(os.path.join(temp_dir, f'bench_{importer.__name__}.db'))
+            for scenario, entries in scenarios:
+                calls, elapsed = measure(importer, diary_manager, entries)
+                print(f"{name:>10} {scenario:>12} {calls:>10,} {elapsed:>9.2f} {len(entries) / elapsed:>10,.0f}")
+            diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+読み書き並行アクセスのベンチマーク
+
+読み取りスレッドが get_user_diary_data を繰り返す間に書き込みスレッドが日記を追加し続け、
+ストレージプロファイルごとの読み取り・書き込みスループットを計測します。
+従来のロールバックジャーナル（DELETE）では書き込み中の読み取りが待たされますが、
+WALでは読み取りが書き込みをまたいで進むため、読み取りスループットが向上します。
+
+使い方:
+    python benchmarks/bench_concurrency.py
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+
+USER_ID = 'bench_user'
+INITIAL_ENTRIES = 300
+READER_THREADS = 4
+DURATION_SECONDS = 3.0
+
+PROFILES = {
+    # 従来の設定（SQLiteの既定値相当）
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': 2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'checkpoint_interval': 0,
+    },
+    # 既定のストレージプロファイル（WAL・mmap・キャッシュ拡張）
+    'tuned': {},
+}
+
+
+def make_entry(i):
+    """関連データ付きのベンチマーク用エントリを作成"""
+    return {
+        'id': f'bench_{i}',
+        'created_at': f'2025-01-01 10:00:{i:06d}',
+        'date': f'2025-01-{i % 28 + 1:02d}',
+        'text': f'ベンチマーク用の日記 {i}',
+        'question': '今日はどうでしたか？',
+        'user_id': USER_ID,
+        'topics': ['仕事', '家族'],
+        'emotions': ['嬉しい'],
+        'thoughts': ['頑張ろう'],
+        'goals': ['毎日書く'],
+        'followup_questions': ['なぜ？'],
+        'qa_chain': [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}]
+    }
+
+
+def run(db_path, profile):
+    """読み取り・書き込みを並行実行し、それぞれの完了回数を返す"""
+    diary_manager = DiaryManagerSQLite(db_path, storage_profile=profile)
+    diary_manager.add_diary_entries_batch([make_entry(i) for i in range(INITIAL_ENTRIES)])
+
+    stop = threading.Event()
+    reads = [0] * READER_THREADS
+    writes = [0]
+
+    def reader(index):
+        while not stop.is_set():
+            diary_manager.get_user_diary_data(USER_ID)
+            reads[index] += 1
+
+    def writer():
+        i = INITIAL_ENTRIES
+        while not stop.is_set():
+            diary_manager.add_diary_entry(make_entry(i))
+            writes[0] += 1
+            i += 1
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(READER_THREADS)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    diary_manager.close()
+    return sum(reads), writes[0]
+
+
+def main():
+    """ベンチマークを実行"""
+    print("=== 読み書き並行アクセスベンチマーク ===\n")
+    print(f"読み取りスレッド: {READER_THREADS}, 書き込みスレッド: 1, 計測時間: {DURATION_SECONDS}秒\n")
+    print(f"{'プロファイル':>10} {'読み取り/秒':>12} {'書き込み/秒':>12}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, profile in PROFILES.items():
+            reads, writes = run(os.path.join(temp_dir, f'bench_{name}.db'), profile)
+            print(f"{name:>10} {reads / DURATION_SECONDS:>12.1f} {writes / DURATION_SECONDS:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
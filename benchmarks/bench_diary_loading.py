@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+日記一覧取得のベンチマーク
+
+履歴の件数を増やしながら get_user_diary_data のクエリ数と実行時間を計測します。
+関連データを一括取得しているため、クエリ数は件数に比例せずほぼ一定になります。
+あわせて get_user_diary_page で1ページ目と最後のページを取得する時間も計測します。
+ページ取得はキーセットページングのため、件数によらずほぼ一定の時間になります。
+これらはキャッシュを無効にして計測し、最後の列にキャッシュから全件を返す時間を示します。
+
+使い方:
+    python benchmarks/bench_diary_loading.py
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+
+USER_ID = 'bench_user'
+HISTORY_SIZES = [100, 500, 2000, 10000]
+PAGE_SIZE = 10
+
+
+def make_entries(count):
+    """関連データ付きのベンチマーク用エントリを作成"""
+    return [
+        {
+            'id': f'bench_{i}',
+            'created_at': f'2025-01-01 10:00:{i:06d}',
+            'date': f'2025-01-{i % 28 + 1:02d}',
+            'text': f'ベンチマーク用の日記 {i}',
+            'question': '今日はどうでしたか？',
+            'user_id': USER_ID,
+            'topics': ['仕事', '家族', '健康'],
+            'emotions': ['嬉しい', '緊張'],
+            'thoughts': ['頑張ろう'],
+            'goals': ['毎日書く'],
+            'followup_questions': ['なぜ？', 'いつから？'],
+            'qa_chain': [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}]
+        }
+        for i in range(count)
+    ]
+
+
+def measure(diary_manager):
+    """get_user_diary_dataのクエリ数と実行時間を計測"""
+    statements = []
+    with diary_manager._pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        start = time.perf_counter()
+        entries = diary_manager.get_user_diary_data(USER_ID)
+        elapsed = time.perf_counter() - start
+        conn.set_trace_callback(None)
+
+    return len(entries), len(statements), elapsed
+
+
+def measure_pages(diary_manager):
+    """get_user_diary_pageで1ページ目と最後のページを取得する時間を計測"""
+    start = time.perf_counter()
+    page = diary_manager.get_user_diary_page(USER_ID, page_size=PAGE_SIZE)
+    first_elapsed = time.perf_counter() - start
+
+    # 最後のページのカーソルまで進める（計測対象外）
+    cursor = None
+    while page['next_cursor']:
+        cursor = page['next_cursor']
+        page = diary_manager.get_user_diary_page(USER_ID, page_size=PAGE_SIZE, cursor=cursor)
+
+    start = time.perf_counter()
+    diary_manager.get_user_diary_page(USER_ID, page_size=PAGE_SIZE, cursor=cursor)
+    last_elapsed = time.perf_counter() - start
+
+    return first_elapsed, last_elapsed
+
+
+def measure_cached(db_path):
+    """キャッシュが有効な状態で2回目のget_user_diary_dataの実行時間を計測"""
+    diary_manager = DiaryManagerSQLite(db_path)
+    diary_manager.get_user_diary_data(USER_ID)
+    start = time.perf_counter()
+    diary_manager.get_user_diary_data(USER_ID)
+    elapsed = time.perf_counter() - start
+    assert diary_manager.cache_stats()['hits'] == 1
+    return elapsed
+
+
+def main():
+    """ベンチマークを実行"""
+    print("=== 日記一覧取得ベンチマーク ===\n")
+    print(f"{'件数':>8} {'クエリ数':>10} {'全件(ms)':>10} {'先頭頁(ms)':>10} {'最終頁(ms)':>10} {'キャッシュ(ms)':>12}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in HISTORY_SIZES:
+            db_path = os.path.join(temp_dir, f'bench_{size}.db')
+            diary_manager = DiaryManagerSQLite(db_path, cache_max_entries=0)
+            diary_manager.add_diary_entries_batch(make_entries(size))
+
+            count, queries, elapsed = measure(diary_manager)
+            first_elapsed, last_elapsed = measure_pages(diary_manager)
+            cached_elapsed = measure_cached(db_path)
+            print(f"{count:>8} {queries:>10} {elapsed * 1000:>10.1f} "
+                  f"{first_elapsed * 1000:>10.2f} {last_elapsed * 1000:>10.2f} {cached_elapsed * 1000:>12.2f}")
+            diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
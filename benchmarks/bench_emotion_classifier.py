@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+ローカルの感情分類器の精度と速度のベンチマーク
+
+分類ストアに保存されたLLMの分類結果を正解として交差検証し、
+LocalEmotionClassifier が確定した分類の割合（LLMに問い合わせずに済む割合）・その正解率・
+すべてを最も近いカテゴリに分類した場合の正解率と、1件あたりの分類時間を表示します。
+ストアの分類結果が少ない場合は、同梱のサンプルの分類結果を使います。
+--llm N を付けると、Geminiで N件を分類した場合の1件あたりの時間も計測します（APIキーが必要）。
+
+使い方:
+    python benchmarks/bench_emotion_classifier.py [--store data/emotion_classification.db] [--llm 20]
+"""
+
+import argparse
+import random
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.classification_store import DEFAULT_CLASSIFICATION_STORE_PATH, get_classification_store
+from utils.emotion_analyzer import categories, classify_emotion_batch
+from utils.local_emotion_classifier import LocalEmotionClassifier
+
+FOLDS = 5
+MIN_STORE_LABELS = 50
+SEED = 0
+
+# ストアの分類結果が少ない場合に使う、LLMで分類したサンプル
+SAMPLE_LABELS = {
+    "嬉しかった": "他者・環境との好意的関係", "とても嬉しい": "他者・環境との好意的関係",
+    "感謝の気持ち": "他者・環境との好意的関係", "楽しかった": "他者・環境との好意的関係",
+    "仲間への信頼": "他者・環境との好意的関係", "家族への愛情": "他者・環境との好意的関係",
+    "達成感がある": "自己成長・前進感情", "やる気満々": "自己成長・前進感情",
+    "自信がついた": "自己成長・前進感情", "成長を実感": "自己成長・前進感情",
+    "挑戦したい": "自己成長・前進感情", "ワクワク": "自己成長・前進感情",
+    "安心感": "自己受容・内的癒し", "穏やかな気持ち": "自己受容・内的癒し",
+    "ほっとした気持ち": "自己受容・内的癒し", "満足感": "自己受容・内的癒し",
+    "リラックスできた": "自己受容・内的癒し", "すっきりした": "自己受容・内的癒し",
+    "後悔の念": "自己評価の低下・葛藤", "恥ずかしさ": "自己評価の低下・葛藤",
+    "イライラした": "自己評価の低下・葛藤", "自己嫌悪感": "自己評価の低下・葛藤",
+    "悔しさ": "自己評価の低下・葛藤", "自信喪失": "自己評価の低下・葛藤",
+    "不安感": "不安・心配・迷い", "心配事": "不安・心配・迷い",
+    "緊張感": "不安・心配・迷い", "焦燥感": "不安・心配・迷い",
+    "将来への不安": "不安・心配・迷い", "迷っている": "不安・心配・迷い",
+    "寂しさ": "喪失・孤独", "孤独感": "喪失・孤独", "悲しみ": "喪失・孤独",
+    "虚無感": "喪失・孤独", "失恋": "喪失・孤独", "心細さ": "喪失・孤独",
+    "疲労感": "その他", "眠気": "その他", "驚いた": "その他",
+    "懐かしさ": "その他", "無関心": "その他", "空腹感": "その他",
+}
+
+
+def cross_validate(labels, folds):
+    """LLMの分類結果を folds 分割して交差検証し、集計した結果を返す"""
+    emotions = list(labels)
+    random.Random(SEED).shuffle(emotions)
+    total = confident = confident_correct = correct = 0
+    elapsed = 0.0
+
+    for fold in range(folds):
+        test = emotions[fold::folds]
+        train = {emotion: labels[emotion] for i, emotion in enumerate(emotions) if i % folds != fold}
+        classifier = LocalEmotionClassifier(categories).fit(train)
+
+        start = time.perf_counter()
+        predictions = classifier.predict(test)
+        elapsed += time.perf_counter() - start
+
+        for emotion, (category, _, is_confident) in zip(test, predictions):
+            total += 1
+            correct += category == labels[emotion]
+            if is_confident:
+                confident += 1
+                confident_correct += category == labels[emotion]
+
+    return {
+        'total': total,
+        'confident_rate': confident / total,
+        'confident_accuracy': confident_correct / confident if confident else 0.0,
+        'accuracy': correct / total,
+        'us_per_item': elapsed / total * 1e6
+    }
+
+
+def measure_llm(labels, count):
+    """Geminiで count件を1件ずつ分類した場合の1件あたりの時間（秒）とLLMの分類との一致率"""
+    from ai_analyzer import AIAnalyzer
+
+    try:
+        ai_analyzer = AIAnalyzer()
+    except Exception as e:
+        print(f"AIAnalyzerの初期化に失敗しました: {e}")
+        return None
+    if not (ai_analyzer.use_gemini and ai_analyzer.model):
+        return None
+    sample = random.Random(SEED).sample(list(labels), min(count, len(labels)))
+    start = time.perf_counter()
+    predictions = {}
+    for emotion in sample:
+        predictions.update(classify_emotion_batch([emotion], categories, ai_analyzer))
+    elapsed = time.perf_counter() - start
+    agreement = sum(predictions[emotion] == labels[emotion] for emotion in sample) / len(sample)
+    return elapsed / len(sample), agreement
+
+
+def main():
+    """ベンチマークを実行"""
+    parser = argparse.ArgumentParser(description='ローカルの感情分類器の精度と速度を計測します')
+    parser.add_argument('--store', default=DEFAULT_CLASSIFICATION_STORE_PATH, help='LLMの分類結果を保存した分類ストア')
+    parser.add_argument('--llm', type=int, default=0, help='Geminiで分類して時間を計測する件数')
+    args = parser.parse_args()
+
+    labels = get_classification_store(args.store, categories).get_all() if os.path.exists(args.store) else {}
+    source = args.store
+    if len(labels) < MIN_STORE_LABELS:
+        labels = SAMPLE_LABELS
+        source = '同梱のサンプル'
+
+    print("=== ローカル感情分類器ベンチマーク ===\n")
+    print(f"正解データ: {source}（{len(labels):,}件、{FOLDS}分割交差検証）\n")
+
+    result = cross_validate(labels, FOLDS)
+    print(f"{'確定率':>8} {'確定分の正解率':>14} {'全件の正解率':>12} {'分類時間(µs/件)':>16}")
+    print(f"{result['confident_rate']:>8.0%} {result['confident_accuracy']:>14.0%} "
+          f"{result['accuracy']:>12.0%} {result['us_per_item']:>16,.1f}")
+
+    if args.llm:
+        measured = measure_llm(labels, args.llm)
+        if measured is None:
+            print("\nGeminiが使えないためLLMの計測は省略しました")
+        else:
+            seconds, agreement = measured
+            print(f"\nGemini: {seconds * 1e6:,.0f} µs/件（保存済みの分類との一致率 {agreement:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+日記エントリのメモリ使用量のベンチマーク
+
+get_user_diary_data が返す DiaryEntry（__slots__ とタプルで保持）と、
+同じクエリの結果を従来どおり辞書とリストに組み立てた場合のメモリ量を tracemalloc で計測します。
+最後の2列はキャッシュに保存される pickle のエントリあたりのサイズです。
+
+使い方:
+    python benchmarks/bench_entry_memory.py
+"""
+
+import sys
+import os
+import pickle
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+
+USER_ID = 'bench_user'
+HISTORY_SIZES = [1000, 10000, 50000]
+CHUNK_SIZE = 5000
+
+
+def make_entries(start, count):
+    """関連データ付きのベンチマーク用エントリを作成"""
+    return [
+        {
+            'id': f'bench_{i}',
+            'created_at': f'2025-01-01 10:00:{i:06d}',
+            'date': f'2025-01-{i % 28 + 1:02d}',
+            'text': f'ベンチマーク用の日記 {i}',
+            'question': '今日はどうでしたか？',
+            'user_id': USER_ID,
+            'topics': ['仕事', '家族', '健康'],
+            'emotions': ['嬉しい', '緊張'],
+            'thoughts': ['頑張ろう'],
+            'goals': [] if i % 2 else ['毎日書く'],
+            'followup_questions': ['なぜ？', 'いつから？'],
+            'qa_chain': [{'question': 'Q1', 'answer': f'A{i}', 'created_at': '2025-01-01 10:05:00'}]
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def load_legacy_dicts(diary_manager):
+    """従来の形式（エントリごとの辞書と関連データのリスト）で読み込む"""
+    with diary_manager._pool.connection() as conn:
+        rows = conn.execute('''
+            SELECT id, original_id, created_at, date, text, question, user_id
+            FROM diary_entries WHERE user_id = ?
+            ORDER BY created_at DESC, id DESC
+        ''', (USER_ID,)).fetchall()
+        related = {
+            row[0]: {
+                'topics': [], 'emotions': [], 'thoughts': [], 'goals': [],
+                'followup_questions': [], 'qa_chain': []
+            }
+            for row in rows
+        }
+        id_sql = 'SELECT id FROM diary_entries WHERE user_id = ?'
+        for key, column, order_by in [('topics', 'topic', 'topic'), ('emotions', 'emotion', 'emotion'),
+                                      ('thoughts', 'thought', 'thought'), ('goals', 'goal', 'goal'),
+                                      ('followup_questions', 'question', 'order_index')]:
+            for diary_id, value in conn.execute(
+                f'SELECT diary_entry_id, {column} FROM {key} WHERE diary_entry_id IN ({id_sql}) ORDER BY {order_by}',
+                (USER_ID,)
+            ):
+                related[diary_id][key].append(value)
+        for diary_id, question, answer, created_at in conn.execute(
+            f'SELECT diary_entry_id, question, answer, created_at FROM qa_chain '
+            f'WHERE diary_entry_id IN ({id_sql}) ORDER BY order_index',
+            (USER_ID,)
+        ):
+            related[diary_id]['qa_chain'].append({'question': question, 'answer': answer, 'created_at': created_at})
+
+    return [
+        {
+            'id': row[0], 'original_id': row[1], 'created_at': row[2], 'date': row[3],
+            'text': row[4], 'question': row[5], 'user_id': row[6], **related[row[0]]
+        }
+        for row in rows
+    ]
+
+
+def traced_size(func):
+    """funcの戻り値を保持したまま、増えたメモリ量（バイト）と戻り値を返す"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main():
+    """ベンチマークを実行"""
+    print("=== 日記エントリのメモリ使用量ベンチマーク ===\n")
+    print(f"{'件数':>8} {'DiaryEntry(B/件)':>18} {'辞書(B/件)':>12} {'削減率':>8} "
+          f"{'pickle(B/件)':>14} {'辞書pickle(B/件)':>18}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        diary_manager = DiaryManagerSQLite(os.path.join(temp_dir, 'bench_memory.db'), cache_max_entries=0)
+        loaded = 0
+
+        for size in HISTORY_SIZES:
+            for offset in range(loaded, size, CHUNK_SIZE):
+                diary_manager.add_diary_entries_batch(make_entries(offset, min(CHUNK_SIZE, size - offset)))
+            loaded = size
+
+            entry_bytes, entries = traced_size(lambda: diary_manager.get_user_diary_data(USER_ID))
+            dict_bytes, legacy = traced_size(lambda: load_legacy_dicts(diary_manager))
+            pickled = len(pickle.dumps(entries, pickle.HIGHEST_PROTOCOL))
+            legacy_pickled = len(pickle.dumps(legacy, pickle.HIGHEST_PROTOCOL))
+
+            print(f"{size:>8,} {entry_bytes / size:>18,.0f} {dict_bytes / size:>12,.0f} "
+                  f"{1 - entry_bytes / dict_bytes:>8.0%} {pickled / size:>14,.0f} {legacy_pickled / size:>18,.0f}")
+            del entries, legacy
+
+        diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
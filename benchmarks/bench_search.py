@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+全文検索のベンチマーク
+
+100,000件の履歴に対して search_diary_entries の応答時間を計測し、
+メモリ上で全件を部分一致検索する従来の方法と比較します。
+
+使い方:
+    python benchmarks/bench_search.py
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+
+USER_ID = 'bench_user'
+ENTRY_COUNT = 100000
+CHUNK_SIZE = 5000
+REPEAT = 20
+
+WORDS = ['散歩', '仕事', '会議', '家族', '読書', '料理', '運動', '映画', '買い物', '勉強',
+         '友人', '旅行', '天気', '睡眠', '音楽', '掃除', '通勤', '公園', '図書館', 'カフェ']
+
+QUERIES = [
+    ('3文字以上・頻出', '図書館'),
+    ('3文字以上・希少', '北極星を見た'),
+    ('複数語', '図書館 カフェ'),
+    ('2文字（部分一致）', '散歩'),
+]
+
+
+def make_entries(start, count, rng):
+    """ランダムな本文・Q&Aを持つベンチマーク用エントリを作成"""
+    entries = []
+    for i in range(start, start + count):
+        words = rng.sample(WORDS, 4)
+        text = f"今日は{words[0]}と{words[1]}をした。{words[2]}のことを考えた。"
+        if i % 10000 == 0:
+            text += '夜に北極星を見た。'
+        entries.append({
+            'id': f'bench_{i}',
+            'created_at': f'2020-01-01 10:00:{i:06d}',
+            'date': f'2020-01-{i % 28 + 1:02d}',
+            'text': text,
+            'question': '今日はどうでしたか？',
+            'user_id': USER_ID,
+            'thoughts': [f'{words[3]}をもっと楽しみたい'],
+            'qa_chain': [{'question': 'どう感じましたか？', 'answer': f'{words[2]}が良かった', 'created_at': ''}]
+        })
+    return entries
+
+
+def measure(func):
+    """REPEAT回実行した平均時間（ミリ秒）と最後の結果を返す"""
+    result = func()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func()
+    return (time.perf_counter() - start) / REPEAT * 1000, result
+
+
+def main():
+    """ベンチマークを実行"""
+    print(f"=== 全文検索ベンチマーク（{ENTRY_COUNT:,}件） ===\n")
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        diary_manager = DiaryManagerSQLite(os.path.join(temp_dir, 'bench_search.db'))
+
+        start = time.perf_counter()
+        for offset in range(0, ENTRY_COUNT, CHUNK_SIZE):
+            diary_manager.add_diary_entries_batch(make_entries(offset, CHUNK_SIZE, rng))
+        print(f"データ作成: {time.perf_counter() - start:.1f}秒\n")
+
+        all_entries = diary_manager.get_user_diary_data(USER_ID)
+
+        print(f"{'検索語':<20} {'FTS5(ms)':>10} {'件数':>6} {'メモリ上(ms)':>12}")
+        for label, query in QUERIES:
+            fts_ms, results = measure(lambda: diary_manager.search_diary_entries(USER_ID, query))
+            scan_ms, _ = measure(lambda: [
+                entry for entry in all_entries
+                if all(term in entry['text'] for term in query.split())
+            ])
+            print(f"{label:<20} {fts_ms:>10.2f} {len(results):>6} {scan_ms:>12.2f}")
+
+        diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+ユーザーの日記をParquet / Arrow IPC形式で書き出すスクリプト
+
+使い方:
+    python export_diary_columnar.py --user-id USER_ID --out exports/USER_ID [--format parquet|arrow]
+
+エントリ表（entries）とタグ表（topics・emotions・thoughts・goals）を表ごとのファイルに書き出します。
+pandas / pyarrow などで、辞書に変換せずにそのまま集計に使えます。pyarrowが必要です。
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite, EXPORT_FORMATS, DEFAULT_EXPORT_CHUNK_SIZE
+from config.app_config import AppConfig
+
+
+def main():
+    """日記を列指向形式で書き出す"""
+    parser = argparse.ArgumentParser(description='ユーザーの日記をParquet / Arrow IPC形式で書き出します')
+    parser.add_argument('--user-id', required=True, help='書き出すユーザーのID')
+    parser.add_argument('--out', required=True, help='出力先ディレクトリ')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='parquet', help='出力形式')
+    parser.add_argument('--db', help='データベースファイル（省略時は設定のパス）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_EXPORT_CHUNK_SIZE, help='1回に読み込む行数')
+    args = parser.parse_args()
+
+    app_config = AppConfig()
+    diary_manager = DiaryManagerSQLite(
+        args.db or app_config.get_database_path(),
+        storage_profile=app_config.get_storage_profile()
+    )
+
+    print("=== 日記の列指向エクスポート ===\n")
+
+    result = diary_manager.export_user_columnar(args.user_id, args.out, args.format, args.chunk_size)
+    for name, table in result.items():
+        print(f"📄 {name}: {table['rows']:,}行 → {table['path']}")
+
+    diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+日記アーカイブ（JSON / JSONL）をデータベースに取り込むスクリプト
+
+使い方:
+    python import_diary_archive.py data/diary_2024.json data/diary_2025.jsonl --user-id USER_ID
+
+中断した場合は同じコマンドを再実行すると、最後にコミットしたチャンクの続きから再開します。
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+from services.diary_importer import DiaryImporter, DEFAULT_CHUNK_SIZE
+from config.app_config import AppConfig
+
+
+def print_progress(progress):
+    """チャンクごとの進捗を表示"""
+    print(f"   {progress['position']:,}件目まで取り込み済み（{progress['rows_per_sec']:,.0f} 行/秒）")
+
+
+def main():
+    """アーカイブを取り込む"""
+    parser = argparse.ArgumentParser(description='日記アーカイブ（JSON / JSONL）をデータベースに取り込みます')
+    parser.add_argument('paths', nargs='+', help='取り込むアーカイブファイル')
+    parser.add_argument('--db', help='データベースファイル（省略時は設定のパス）')
+    parser.add_argument('--user-id', help='取り込むエントリに設定するユーザーID')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='1トランザクションで書き込むエントリ数')
+    parser.add_argument('--no-resume', action='store_true', help='前回の進捗を無視して最初から取り込む')
+    args = parser.parse_args()
+
+    app_config = AppConfig()
+    diary_manager = DiaryManagerSQLite(
+        args.db or app_config.get_database_path(),
+        storage_profile=app_config.get_storage_profile()
+    )
+    importer = DiaryImporter(
+        diary_manager,
+        chunk_size=args.chunk_size,
+        user_id=args.user_id,
+        progress_callback=print_progress
+    )
+
+    print("=== 日記アーカイブの取り込み ===\n")
+
+    for path in args.paths:
+        print(f"📥 {path}")
+        result = importer.import_file(path, resume=not args.no_resume)
+        if result['resumed_from']:
+            print(f"   {result['resumed_from']:,}件目から再開しました")
+        print(f"✅ {result['entries']:,}件（{result['rows']:,}行）を {result['elapsed']:.2f}秒で取り込みました"
+              f"（{result['rows_per_sec']:,.0f} 行/秒）\n")
+
+    diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
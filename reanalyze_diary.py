@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+保存済みの日記をまとめてAIで再分析するスクリプト
+
+使い方:
+    python reanalyze_diary.py --user-id USER_ID [--start-date 2025-01-01] [--end-date 2025-12-31]
+
+prompts/analyze_diary_prompt.txt を変更した後などに、トピック・感情・質問などの分析結果を作り直します。
+中断した場合は同じコマンドを再実行すると、最後に書き込んだチャンクの続きから再開します。
+--stub を付けるとAPIを呼ばずに固定の分析結果で動作を確認できます。
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+from ai_analyzer import AIAnalyzer, StubModel
+from services.batch_reanalyzer import (
+    BatchReanalyzer, DEFAULT_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_MAX_RETRIES, DEFAULT_CHUNK_SIZE
+)
+from config.app_config import AppConfig
+
+
+def print_progress(progress):
+    """チャンクごとの進捗を表示"""
+    print(f"   {progress['processed']:,}件を処理（更新 {progress['updated']:,}件・失敗 {progress['failed']:,}件・"
+          f"競合 {progress['conflicts']:,}件、{progress['entries_per_sec']:,.1f} 件/秒）")
+
+
+def main():
+    """日記を再分析する"""
+    parser = argparse.ArgumentParser(description='保存済みの日記をまとめてAIで再分析します')
+    parser.add_argument('--user-id', help='再分析するユーザーのID（省略時は全ユーザー）')
+    parser.add_argument('--start-date', help='対象期間の開始日（YYYY-MM-DD）')
+    parser.add_argument('--end-date', help='対象期間の終了日（YYYY-MM-DD）')
+    parser.add_argument('--db', help='データベースファイル（省略時は設定のパス）')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='同時に分析するエントリ数')
+    parser.add_argument('--rate', type=float, default=DEFAULT_REQUESTS_PER_MINUTE, help='1分あたりのAPI呼び出し回数の上限（0で無制限）')
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES, help='失敗した呼び出しを再試行する回数')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='1回に書き込むエントリ数')
+    parser.add_argument('--checkpoint', default='data/reanalyze.checkpoint', help='進捗を保存するファイル')
+    parser.add_argument('--no-resume', action='store_true', help='チェックポイントを無視して最初から再分析する')
+    parser.add_argument('--stub', action='store_true', help='APIを呼ばずに固定の分析結果を使う（動作確認用）')
+    args = parser.parse_args()
+
+    app_config = AppConfig()
+    diary_manager = DiaryManagerSQLite(
+        args.db or app_config.get_database_path(),
+        storage_profile=app_config.get_storage_profile()
+    )
+    ai_analyzer = AIAnalyzer(model=StubModel()) if args.stub else AIAnalyzer()
+    reanalyzer = BatchReanalyzer(
+        diary_manager,
+        ai_analyzer,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rate,
+        max_retries=args.max_retries,
+        chunk_size=args.chunk_size,
+        progress_callback=print_progress
+    )
+
+    print("=== 日記の再分析 ===\n")
+
+    result = reanalyzer.reanalyze(
+        args.user_id, args.start_date, args.end_date,
+        checkpoint_path=args.checkpoint, resume=not args.no_resume
+    )
+    if result['resumed_from']:
+        print(f"   {result['resumed_from']:,}件目から再開しました")
+    print(f"✅ {result['processed']:,}件を {result['elapsed']:.2f}秒で処理し、{result['updated']:,}件を更新しました")
+    if result['conflicts']:
+        print(f"⚠️ 分析中に更新された {result['conflicts']:,}件は書き戻していません")
+    for failure in result['failed']:
+        print(f"❌ {failure['id']}: {failure['error']}")
+
+    diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+統計ロールアップテーブルを日記データから作り直すスクリプト
+
+使い方:
+    python rebuild_statistics.py [--db data/diary_normalized.db]
+
+ロールアップは書き込み時に自動で更新されるため、通常は実行不要です。
+整合性の確認や、データベースを直接編集した後の復旧に使います。
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_manager_sqlite import DiaryManagerSQLite
+from config.app_config import AppConfig
+
+
+def main():
+    """ロールアップを作り直して結果を表示"""
+    parser = argparse.ArgumentParser(description='統計ロールアップテーブルを日記データから作り直します')
+    parser.add_argument('--db', help='データベースファイル（省略時は設定のパス）')
+    args = parser.parse_args()
+
+    app_config = AppConfig()
+    diary_manager = DiaryManagerSQLite(
+        args.db or app_config.get_database_path(),
+        storage_profile=app_config.get_storage_profile()
+    )
+
+    print("=== 統計ロールアップの再構築 ===\n")
+
+    result = diary_manager.rebuild_statistics()
+    print(f"件数: {result['entry_rows']:,}行 / 出現回数: {result['item_rows']:,}行")
+    if result['mismatched']:
+        print(f"⚠️ {result['mismatched']:,}行のずれを修正しました")
+    else:
+        print("✅ ロールアップは日記データと一致していました")
+
+    diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
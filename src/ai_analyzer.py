@@ -1,17 +1,56 @@
 import datetime
-from typing import Dict, Any, List
+from collections import Counter
+from typing import Dict, Any, List, Optional
 import os
 import json
+import sqlite3
+import sys
 import streamlit as st
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils.llm_cache import LLMResponseCache
+
+# 日記分析プロンプトのバージョン（応答の解釈を変えたときに上げると、キャッシュ済みの応答を使わなくなる）
+ANALYZE_PROMPT_VERSION = "analyze_diary:1"
+
+class StubModel:
+    """APIを呼ばずに決まった分析結果を返すモデル（オフラインでの動作確認・テスト用）
+
+    generate_content の戻り値は、Geminiの応答と同じく text 属性を持つ。
+    """
+    
+    def __init__(self, result: Optional[Dict[str, Any]] = None):
+        self.result = result or {
+            "topics": ["日記"],
+            "emotions": ["平常"],
+            "thoughts": [],
+            "goals": [],
+            "question": "この出来事で一番印象に残ったことは何ですか？",
+            "followup_questions": ["なぜそう感じたのですか？", "次はどうしたいですか？"]
+        }
+        self.text = json.dumps(self.result, ensure_ascii=False)
+    
+    def generate_content(self, prompt: str) -> "StubModel":
+        return self
 
 class AIAnalyzer:
     """AI分析機能クラス"""
     
-    def __init__(self):
+    def __init__(self, response_cache: Optional[LLMResponseCache] = None, model=None):
+        """modelを渡した場合はAPIキーを読まずにそのモデル（StubModel など）で分析する"""
         self.prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'analyze_diary_prompt.txt')
         self.prompt_template = self._load_prompt()
         self.use_gemini = False
         self.model = None
+        self.model_name = "gemini-1.5-flash"
+        self.response_cache = response_cache
+        
+        if model is not None:
+            self.model = model
+            self.use_gemini = True
+            if isinstance(model, StubModel):
+                # スタブの応答がGeminiの応答としてキャッシュされないようにする
+                self.model_name = "stub"
+            return
         
         # 環境変数からAPIキー取得（st.secretsのフォールバック）
         try:
@@ -29,8 +68,10 @@ class AIAnalyzer:
             try:
                 import google.generativeai as genai
                 genai.configure(api_key=gemini_api_key)
-                self.model = genai.GenerativeModel("gemini-1.5-flash")
+                self.model = genai.GenerativeModel(self.model_name)
                 self.use_gemini = True
+                if self.response_cache is None:
+                    self.response_cache = self._create_response_cache()
             except ImportError:
                 st.error("google-generativeaiパッケージがインストールされていません。pip install google-generativeai でインストールしてください。")
                 st.stop()
@@ -38,6 +79,23 @@ class AIAnalyzer:
             st.warning("GEMINI_API_KEYが設定されていません。.envファイルまたは.streamlit/secrets.tomlファイルにGEMINI_API_KEYを追加してください。")
             # エラーで停止せず、モックモードで動作
     
+    def _create_response_cache(self) -> Optional[LLMResponseCache]:
+        """設定からLLM応答キャッシュを作成（件数の上限が0なら使わない）"""
+        from config.app_config import AppConfig
+        ai_config = AppConfig().get_ai_config()
+        if not ai_config.get('cache_max_entries'):
+            return None
+        try:
+            return LLMResponseCache(
+                ai_config['cache_path'],
+                ttl_seconds=ai_config.get('cache_ttl'),
+                max_entries=ai_config['cache_max_entries'],
+                max_bytes=ai_config.get('cache_max_bytes', 0)
+            )
+        except sqlite3.Error as e:
+            print(f"LLM応答キャッシュを開けません: {e}")
+            return None
+    
     def _load_prompt(self) -> str:
         try:
             with open(self.prompt_path, 'r', encoding='utf-8') as f:
@@ -45,8 +103,11 @@ class AIAnalyzer:
         except Exception:
             return ""
     
-    def analyze_diary(self, text: str, qa_chain: list = None) -> Dict[str, Any]:
-        """日記テキストとqa_chainをGemini APIで分析（APIキーがなければモック）"""
+    def analyze_diary(self, text: str, qa_chain: list = None, fallback: bool = True) -> Dict[str, Any]:
+        """日記テキストとqa_chainをGemini APIで分析（APIキーがなければモック）
+        
+        fallbackがFalseの場合は、応答を解釈できなかったときにモックを返さず ValueError を送出する。
+        """
         # プロンプト組み立て
         prompt = self.prompt_template.replace("{{user_input}}", text)
         if qa_chain:
@@ -54,20 +115,35 @@ class AIAnalyzer:
             for i, qa in enumerate(qa_chain):
                 prompt += f"Q{i+1}: {qa['question']}\nA{i+1}: {qa['answer']}\n"
         if self.use_gemini and self.model:
-            return self._analyze_with_gemini_prompt(prompt)
+            return self._analyze_with_gemini_prompt(prompt, fallback)
         else:
             return self._mock_analyze(text)
     
-    def _analyze_with_gemini_prompt(self, prompt: str) -> Dict[str, Any]:
-        response = self.model.generate_content(prompt)
-        print('Gemini response:', response.text)
+    def _analyze_with_gemini_prompt(self, prompt: str, fallback: bool = True) -> Dict[str, Any]:
+        # 同じモデル・プロンプトの応答が保存されていればAPIを呼ばない
+        cache_key = None
+        cached = None
+        if self.response_cache is not None:
+            cache_key = LLMResponseCache.make_key(self.model_name, ANALYZE_PROMPT_VERSION, prompt)
+            cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            response_text = cached
+        else:
+            response_text = self.model.generate_content(prompt).text
+            print('Gemini response:', response_text)
         import re
-        match = re.search(r'\{[\s\S]*\}', response.text)
+        match = re.search(r'\{[\s\S]*\}', response_text)
         if match:
             try:
-                return json.loads(match.group(0))
+                result = json.loads(match.group(0))
+                # 解釈できた応答だけを保存する
+                if cache_key is not None and cached is None:
+                    self.response_cache.put(cache_key, response_text, self.model_name)
+                return result
             except Exception as e:
                 print('JSON parse error:', e)
+        if not fallback:
+            raise ValueError("分析結果を解釈できませんでした")
         return self._mock_analyze("")
     
     def _mock_analyze(self, text: str) -> Dict[str, Any]:
@@ -87,15 +163,19 @@ class AIAnalyzer:
         }
         return analysis_result
     
-    def create_diary_entry(self, text: str) -> Dict[str, Any]:
-        llm_result = self.analyze_diary(text)
+    def new_diary_entry(self, text: str) -> Dict[str, Any]:
+        """分析結果を含まない日記エントリを作成（IDと作成日時を付ける）"""
         now = datetime.datetime.now()
-        entry = {
+        return {
             "id": f"entry_{now.strftime('%Y%m%d_%H%M%S_%f')}",
             "created_at": now.strftime("%Y-%m-%d %H:%M:%S"),
             "date": now.strftime("%Y-%m-%d"),
             "text": text,
         }
+    
+    def create_diary_entry(self, text: str) -> Dict[str, Any]:
+        llm_result = self.analyze_diary(text)
+        entry = self.new_diary_entry(text)
         # LLM出力のid, created_at, date, textは無視し、他のフィールドのみマージ
         for k, v in llm_result.items():
             if k not in ["id", "created_at", "date", "text"]:
@@ -105,15 +185,11 @@ class AIAnalyzer:
     def analyze_trends(self, diary_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         if not diary_data:
             return {}
-        topic_counts = {}
-        emotion_counts = {}
-        for entry in diary_data:
-            for topic in entry.get('topics', []):
-                topic_counts[topic] = topic_counts.get(topic, 0) + 1
-            for emotion in entry.get('emotions', []):
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        top_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-        top_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+        # データベース上のデータは DiaryManagerSQLite.get_diary_statistics で集計できる
+        topic_counts = Counter(topic for entry in diary_data for topic in entry.get('topics', []))
+        emotion_counts = Counter(emotion for entry in diary_data for emotion in entry.get('emotions', []))
+        top_topics = topic_counts.most_common(3)
+        top_emotions = emotion_counts.most_common(3)
         return {
             "total_entries": len(diary_data),
             "top_topics": top_topics,
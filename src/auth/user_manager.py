@@ -4,24 +4,25 @@
 
 import hashlib
 import os
+import sys
 import uuid
 from typing import Optional, Dict, Any
 from datetime import datetime
-import sqlite3
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection_pool import get_pool
 
 class UserManager:
     """ユーザー認証・認可機能を管理するクラス"""
     
-    def __init__(self, db_path: str = "data/diary_normalized.db"):
+    def __init__(self, db_path: str = "data/diary_normalized.db", storage_profile: Optional[Dict[str, Any]] = None):
         self.db_path = db_path
+        # 同じデータベースファイルを使うDiaryManagerSQLiteと接続プールを共有
+        self._pool = get_pool(self.db_path, storage_profile)
         self._ensure_users_table()
     
     def _ensure_users_table(self) -> None:
         """ユーザーテーブルの存在確認と作成"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.transaction() as cur:
             cur.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     id TEXT PRIMARY KEY,
@@ -31,12 +32,6 @@ class UserManager:
                     last_login TEXT
                 )
             ''')
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def _hash_password(self, password: str) -> str:
         """パスワードをハッシュ化"""
@@ -56,10 +51,7 @@ class UserManager:
     
     def create_user(self, username: str, password: str) -> bool:
         """新規ユーザーを作成"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.transaction() as cur:
             # ユーザー名の重複チェック
             cur.execute('SELECT id FROM users WHERE username = ?', (username,))
             if cur.fetchone():
@@ -74,21 +66,12 @@ class UserManager:
                 VALUES (?, ?, ?, ?)
             ''', (user_id, username, password_hash, datetime.now().isoformat()))
             
-            conn.commit()
             return True
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def authenticate_user(self, username: str, password: str) -> Optional[str]:
         """ユーザー認証"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
             cur.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
             result = cur.fetchone()
             
@@ -96,23 +79,14 @@ class UserManager:
                 # 最終ログイン時刻を更新
                 cur.execute('UPDATE users SET last_login = ? WHERE id = ?', 
                            (datetime.now().isoformat(), result[0]))
-                conn.commit()
                 return result[0]
             
             return None
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """ユーザーIDでユーザー情報を取得"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
             cur.execute('''
                 SELECT id, username, created_at, last_login
                 FROM users WHERE id = ?
@@ -128,16 +102,10 @@ class UserManager:
                 }
             
             return None
-            
-        finally:
-            conn.close()
     
     def change_password(self, user_id: str, current_password: str, new_password: str) -> bool:
         """パスワード変更"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.transaction() as cur:
             # 現在のパスワードを確認
             cur.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,))
             result = cur.fetchone()
@@ -150,37 +118,18 @@ class UserManager:
             cur.execute('UPDATE users SET password_hash = ? WHERE id = ?', 
                        (new_password_hash, user_id))
             
-            conn.commit()
             return True
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def delete_user(self, user_id: str) -> bool:
         """ユーザー削除"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.transaction() as cur:
             cur.execute('DELETE FROM users WHERE id = ?', (user_id,))
-            conn.commit()
             return cur.rowcount > 0
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def get_all_users(self) -> list[Dict[str, Any]]:
         """全ユーザー一覧を取得（管理者用）"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
             cur.execute('''
                 SELECT id, username, created_at, last_login
                 FROM users ORDER BY created_at DESC
@@ -196,6 +145,3 @@ class UserManager:
                 })
             
             return users
-            
-        finally:
-            conn.close() 
\ No newline at end of file
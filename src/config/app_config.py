@@ -4,7 +4,20 @@
 
 import os
 from typing import Dict, Any, Optional
-from constants import DEFAULT_DB_PATH, APP_NAME, APP_VERSION
+from constants import (
+    DEFAULT_DB_PATH, APP_NAME, APP_VERSION,
+    DEFAULT_JOURNAL_MODE, DEFAULT_SYNCHRONOUS, DEFAULT_CACHE_SIZE_KB, DEFAULT_MMAP_SIZE,
+    DEFAULT_TEMP_STORE, DEFAULT_BUSY_TIMEOUT_MS, DEFAULT_WAL_AUTOCHECKPOINT,
+    DEFAULT_CHECKPOINT_INTERVAL, DEFAULT_POOL_SIZE,
+    DEFAULT_LLM_CACHE_PATH, DEFAULT_LLM_CACHE_TTL, DEFAULT_LLM_CACHE_MAX_ENTRIES, DEFAULT_LLM_CACHE_MAX_BYTES,
+    DEFAULT_ANALYSIS_WORKERS, DEFAULT_PERIOD_SUMMARY_CACHE_PATH
+)
+
+# ストレージプロファイルとして接続プールに渡す database セクションのキー
+STORAGE_PROFILE_KEYS = (
+    'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store',
+    'busy_timeout', 'wal_autocheckpoint', 'checkpoint_interval', 'pool_size'
+)
 
 class AppConfig:
     """アプリケーション設定管理クラス"""
@@ -23,13 +36,28 @@ class AppConfig:
             'database': {
                 'path': os.getenv('DB_PATH', DEFAULT_DB_PATH),
                 'backup_enabled': os.getenv('BACKUP_ENABLED', 'True').lower() == 'true',
-                'backup_interval': int(os.getenv('BACKUP_INTERVAL', '24'))  # 時間
+                'backup_interval': int(os.getenv('BACKUP_INTERVAL', '24')),  # 時間
+                'journal_mode': os.getenv('DB_JOURNAL_MODE', DEFAULT_JOURNAL_MODE),
+                'synchronous': os.getenv('DB_SYNCHRONOUS', DEFAULT_SYNCHRONOUS),
+                'cache_size': int(os.getenv('DB_CACHE_SIZE_KB', str(DEFAULT_CACHE_SIZE_KB))),  # KiB
+                'mmap_size': int(os.getenv('DB_MMAP_SIZE', str(DEFAULT_MMAP_SIZE))),  # バイト
+                'temp_store': os.getenv('DB_TEMP_STORE', DEFAULT_TEMP_STORE),
+                'busy_timeout': int(os.getenv('DB_BUSY_TIMEOUT', str(DEFAULT_BUSY_TIMEOUT_MS))),  # ミリ秒
+                'wal_autocheckpoint': int(os.getenv('DB_WAL_AUTOCHECKPOINT', str(DEFAULT_WAL_AUTOCHECKPOINT))),  # ページ
+                'checkpoint_interval': int(os.getenv('DB_CHECKPOINT_INTERVAL', str(DEFAULT_CHECKPOINT_INTERVAL))),  # コミット
+                'pool_size': int(os.getenv('DB_POOL_SIZE', str(DEFAULT_POOL_SIZE)))
             },
             'ai': {
                 'provider': os.getenv('AI_PROVIDER', 'gemini'),
                 'api_key': os.getenv('GEMINI_API_KEY'),
                 'model': os.getenv('AI_MODEL', 'gemini-1.5-flash'),
-                'timeout': int(os.getenv('AI_TIMEOUT', '30'))  # 秒
+                'timeout': int(os.getenv('AI_TIMEOUT', '30')),  # 秒
+                'cache_path': os.getenv('LLM_CACHE_PATH', DEFAULT_LLM_CACHE_PATH),
+                'cache_ttl': int(os.getenv('LLM_CACHE_TTL', str(DEFAULT_LLM_CACHE_TTL))),  # 秒
+                'cache_max_entries': int(os.getenv('LLM_CACHE_MAX_ENTRIES', str(DEFAULT_LLM_CACHE_MAX_ENTRIES))),
+                'cache_max_bytes': int(os.getenv('LLM_CACHE_MAX_BYTES', str(DEFAULT_LLM_CACHE_MAX_BYTES))),  # バイト
+                'analysis_workers': int(os.getenv('ANALYSIS_WORKERS', str(DEFAULT_ANALYSIS_WORKERS))),
+                'period_cache_path': os.getenv('PERIOD_SUMMARY_CACHE_PATH', DEFAULT_PERIOD_SUMMARY_CACHE_PATH)
             },
             'security': {
                 'password_min_length': int(os.getenv('PASSWORD_MIN_LENGTH', '6')),
@@ -72,6 +100,15 @@ class AppConfig:
         """データベースパスを取得"""
         return self.get('database.path')
     
+    def get_database_config(self) -> Dict[str, Any]:
+        """データベース設定を取得"""
+        return self.get('database', {})
+    
+    def get_storage_profile(self) -> Dict[str, Any]:
+        """接続時に適用するストレージプロファイルを取得"""
+        database_config = self.get_database_config()
+        return {key: database_config[key] for key in STORAGE_PROFILE_KEYS if key in database_config}
+    
     def get_ai_config(self) -> Dict[str, Any]:
         """AI設定を取得"""
         return self.get('ai', {})
@@ -116,7 +153,8 @@ class AppConfig:
             'app': self.get_app_info(),
             'database': {
                 'path': self.get_database_path(),
-                'backup_enabled': self.get('database.backup_enabled')
+                'backup_enabled': self.get('database.backup_enabled'),
+                'journal_mode': self.get('database.journal_mode')
             },
             'ai': {
                 'provider': self.get('ai.provider'),
@@ -13,6 +13,38 @@ GUEST_USERNAME = "ゲスト"
 # データベース関連
 DEFAULT_DB_PATH = "data/diary_normalized.db"
 
+# SQLiteストレージプロファイルの既定値
+DEFAULT_JOURNAL_MODE = "WAL"          # 書き込み中も読み取りをブロックしない
+DEFAULT_SYNCHRONOUS = "NORMAL"        # WALモードではNORMALでも破損しない
+DEFAULT_CACHE_SIZE_KB = 16384         # ページキャッシュ（KiB、接続ごと）
+DEFAULT_MMAP_SIZE = 134217728         # メモリマップI/O（バイト）
+DEFAULT_TEMP_STORE = "MEMORY"         # 一時テーブル・ソートをメモリで行う
+DEFAULT_BUSY_TIMEOUT_MS = 5000        # ロック待ち時間（ミリ秒）
+DEFAULT_WAL_AUTOCHECKPOINT = 1000     # 自動チェックポイントのWALページ数
+DEFAULT_CHECKPOINT_INTERVAL = 200     # PASSIVEチェックポイントを行うコミット間隔
+DEFAULT_POOL_SIZE = 8                 # 接続プールの上限
+
+# 日記データの読み取りキャッシュ（DiaryManagerSQLite内、0で無効）
+DEFAULT_QUERY_CACHE_MAX_ENTRIES = 256             # キャッシュする結果の件数
+DEFAULT_QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 推定メモリ使用量の上限（バイト）
+
+# LLM応答キャッシュ（AIAnalyzer、同じ入力の再分析でAPIを呼ばない。件数0で無効）
+DEFAULT_LLM_CACHE_PATH = "data/llm_cache.db"
+DEFAULT_LLM_CACHE_TTL = 30 * 24 * 60 * 60              # 応答の有効期間（秒）
+DEFAULT_LLM_CACHE_MAX_ENTRIES = 5000                   # 保存する応答の件数
+DEFAULT_LLM_CACHE_MAX_BYTES = 32 * 1024 * 1024         # 保存する応答の合計サイズ（バイト）
+
+# バックグラウンド分析キュー（services/analysis_queue.py、ワーカー数0で投稿時に同期分析）
+DEFAULT_ANALYSIS_WORKERS = 2            # 分析を実行するスレッド数
+DEFAULT_ANALYSIS_POLL_INTERVAL = 5.0    # 待機中のワーカーがジョブを確認する間隔（秒）
+DEFAULT_ANALYSIS_MAX_ATTEMPTS = 3       # 失敗したジョブを再実行する上限回数
+DEFAULT_ANALYSIS_LEASE_SECONDS = 600    # 実行中のジョブを他のワーカーが引き継ぐまでの時間（秒）
+
+# 期間まとめ（PeriodAnalyzer、日記が上限を超える期間は週・日ごとに要約してからまとめる）
+DEFAULT_PERIOD_TOKEN_BUDGET = 8000      # 1回の呼び出しに入れる入力テキストの推定トークン数
+DEFAULT_PERIOD_CONCURRENCY = 4          # 週・日ごとの要約を同時に実行する数
+DEFAULT_PERIOD_SUMMARY_CACHE_PATH = "data/period_summaries.db"  # ユーザーごとの週・日の要約を保存するファイル（空で無効）
+
 # アプリケーション情報
 APP_NAME = "AI日記アプリ"
 APP_VERSION = "v2.0"
@@ -0,0 +1,297 @@
+"""
+SQLite接続プールを提供するモジュール
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from constants import (
+    DEFAULT_JOURNAL_MODE, DEFAULT_SYNCHRONOUS, DEFAULT_CACHE_SIZE_KB, DEFAULT_MMAP_SIZE,
+    DEFAULT_TEMP_STORE, DEFAULT_BUSY_TIMEOUT_MS, DEFAULT_WAL_AUTOCHECKPOINT,
+    DEFAULT_CHECKPOINT_INTERVAL, DEFAULT_POOL_SIZE
+)
+
+# ストレージプロファイルの既定値（AppConfigの database セクションと同じキー）
+DEFAULT_STORAGE_PROFILE = {
+    'journal_mode': DEFAULT_JOURNAL_MODE,
+    'synchronous': DEFAULT_SYNCHRONOUS,
+    'cache_size': DEFAULT_CACHE_SIZE_KB,
+    'mmap_size': DEFAULT_MMAP_SIZE,
+    'temp_store': DEFAULT_TEMP_STORE,
+    'busy_timeout': DEFAULT_BUSY_TIMEOUT_MS,
+    'wal_autocheckpoint': DEFAULT_WAL_AUTOCHECKPOINT,
+    'checkpoint_interval': DEFAULT_CHECKPOINT_INTERVAL,
+    'pool_size': DEFAULT_POOL_SIZE,
+}
+
+# 接続時に適用するPRAGMA（適用順）
+# busy_timeout を先に設定しておくと journal_mode の切り替えでロックを待てる
+PROFILE_PRAGMAS = (
+    'busy_timeout',
+    'journal_mode',
+    'synchronous',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+    'wal_autocheckpoint',
+)
+
+
+def profile_to_pragmas(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """ストレージプロファイルを接続時に適用するPRAGMAに変換（Noneの項目は適用しない）"""
+    pragmas = {}
+    for name in PROFILE_PRAGMAS:
+        value = profile.get(name)
+        if value is None:
+            continue
+        if name == 'cache_size':
+            # プロファイルはKiB指定、PRAGMAでは負の値がKiB扱いになる
+            value = -abs(int(value))
+        pragmas[name] = value
+    return pragmas
+
+
+class ConnectionPool:
+    """SQLite接続を使い回すための上限付き接続プール
+
+    接続はチェックアウト方式で貸し出し、返却後は次の利用者に再利用される。
+    同じスレッド内で入れ子に借りた場合は同じ接続を共有するため、
+    トランザクション中に別のメソッドを呼んでも同じトランザクションに参加できる。
+    Streamlitはセッションごとに別スレッドでスクリプトを実行するので、
+    接続はスレッドをまたいで受け渡せるよう check_same_thread=False で作成する。
+    """
+
+    def __init__(self, db_path: str, max_size: int = DEFAULT_POOL_SIZE,
+                 pragmas: Optional[Dict[str, Any]] = None, timeout: float = 30.0,
+                 checkpoint_interval: int = 0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = dict(pragmas) if pragmas is not None else profile_to_pragmas(DEFAULT_STORAGE_PROFILE)
+        self.timeout = timeout
+        self.checkpoint_interval = checkpoint_interval
+        self.closed = False
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._commits = 0
+        self._local = threading.local()
+
+    @classmethod
+    def from_profile(cls, db_path: str, profile: Optional[Dict[str, Any]] = None) -> 'ConnectionPool':
+        """ストレージプロファイルからプールを作成（不足しているキーは既定値で補う）"""
+        merged = dict(DEFAULT_STORAGE_PROFILE)
+        merged.update(profile or {})
+        return cls(
+            db_path,
+            max_size=int(merged['pool_size']),
+            pragmas=profile_to_pragmas(merged),
+            checkpoint_interval=int(merged['checkpoint_interval'] or 0)
+        )
+
+    @property
+    def wal_enabled(self) -> bool:
+        """WALモードで運用しているかどうか"""
+        return str(self.pragmas.get('journal_mode', '')).lower() == 'wal'
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """新しい接続を作成してPRAGMAを適用"""
+        # isolation_level=None: トランザクションは transaction() で明示的に開始する
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        try:
+            for name, value in self.pragmas.items():
+                conn.execute(f'PRAGMA {name} = {value}')
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        """空き接続を取り出す（なければ上限まで作成し、上限に達していれば返却を待つ）"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"データベース接続の取得がタイムアウトしました: {self.db_path}")
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        """接続をプールに返却"""
+        if conn.in_transaction:
+            conn.rollback()
+
+        if self.closed:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """接続を借りる（同じスレッド内の入れ子の呼び出しでは同じ接続を返す）"""
+        current = getattr(self._local, 'conn', None)
+        if current is not None:
+            yield current
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """トランザクション内のカーソルを返す（正常終了でコミット、例外時はロールバック）
+
+        既にトランザクション中の接続で呼ばれた場合は外側のトランザクションに参加する。
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn.cursor()
+                return
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn.cursor()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            self._after_commit(conn)
+
+    @contextmanager
+    def snapshot(self) -> Iterator[sqlite3.Cursor]:
+        """読み取り専用トランザクション内のカーソルを返す
+
+        複数のSELECTにまたがって同じ時点のデータを読むために使う。
+        WALモードでは書き込みをブロックせずに一貫したスナップショットが得られる。
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn.cursor()
+                return
+
+            conn.execute('BEGIN')
+            try:
+                yield conn.cursor()
+            finally:
+                if conn.in_transaction:
+                    conn.execute('COMMIT')
+
+    @contextmanager
+    def dedicated_snapshot(self) -> Iterator[sqlite3.Cursor]:
+        """同じスレッドの他の処理と共有しない接続で、読み取り専用トランザクション内のカーソルを返す
+
+        ジェネレーターのyieldをまたいでスナップショットを保つ場合に使う。
+        接続をスレッドに登録しないため、読み込みの途中で同じスレッドから書き込んでも
+        その書き込みは別の接続のトランザクションとしてすぐにコミットされる。
+        """
+        conn = self._acquire()
+        try:
+            conn.execute('BEGIN')
+            try:
+                yield conn.cursor()
+            finally:
+                if conn.in_transaction:
+                    conn.execute('COMMIT')
+        finally:
+            self._release(conn)
+
+    def _after_commit(self, conn: sqlite3.Connection) -> None:
+        """一定回数のコミットごとにPASSIVEチェックポイントを実行
+
+        自動チェックポイントは書き込み中のコミットで行われるため、
+        読み取りが続くとWALが伸び続けることがある。
+        PASSIVEは読み書きをブロックしない範囲でWALをデータベースに書き戻す。
+        """
+        if not self.wal_enabled or self.checkpoint_interval <= 0:
+            return
+
+        with self._lock:
+            self._commits += 1
+            due = self._commits % self.checkpoint_interval == 0
+
+        if due:
+            self.checkpoint('PASSIVE', conn)
+
+    def checkpoint(self, mode: str = 'PASSIVE', conn: Optional[sqlite3.Connection] = None) -> Optional[tuple]:
+        """WALチェックポイントを実行（結果は (busy, WALのページ数, 書き戻したページ数)）"""
+        if not self.wal_enabled:
+            return None
+        if conn is not None:
+            return conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        with self.connection() as pooled:
+            return pooled.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+
+    def close_all(self) -> None:
+        """プール内の接続をすべて閉じる（貸出中の接続は返却時に閉じる）
+
+        閉じる前にTRUNCATEチェックポイントでWALを書き戻して空にする。
+        """
+        if not self.closed and self._created:
+            try:
+                self.checkpoint('TRUNCATE')
+            except sqlite3.Error as e:
+                print(f"チェックポイントエラー: {e}")
+        self.closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# データベースファイルごとに共有するプール
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, storage_profile: Optional[Dict[str, Any]] = None) -> ConnectionPool:
+    """データベースファイルに対応する共有プールを取得（なければ作成）
+
+    同じファイルを使うクラス（DiaryManagerSQLite, UserManager）は同じプールを共有する。
+    storage_profileはプールを新規作成するときだけ使われる。
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = ConnectionPool.from_profile(db_path, storage_profile)
+            _pools[key] = pool
+        return pool
+
+
+def close_pool(db_path: str) -> None:
+    """データベースファイルに対応する共有プールを閉じる"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.pop(key, None)
+    if pool is not None:
+        pool.close_all()
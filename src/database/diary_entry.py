@@ -0,0 +1,195 @@
+"""
+日記エントリの読み取り結果を表すレコード型
+"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# 辞書として参照できる項目（keys() の順序もこの順。original_id と version は持たないエントリもある）
+ENTRY_FIELDS = (
+    'id', 'original_id', 'created_at', 'date', 'text', 'question', 'user_id',
+    'topics', 'emotions', 'thoughts', 'goals', 'followup_questions', 'qa_chain', 'version'
+)
+QA_FIELDS = ('question', 'answer', 'created_at')
+
+_ENTRY_FIELD_SET = frozenset(ENTRY_FIELDS)
+_QA_FIELD_SET = frozenset(QA_FIELDS)
+
+
+class _Absent:
+    """original_id を持たない形式のエントリや version を読み込まなかったエントリで、項目がないことを表す"""
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        # pickleしても同じオブジェクトに戻す
+        return '_ABSENT'
+
+    def __repr__(self) -> str:
+        return '_ABSENT'
+
+
+_ABSENT = _Absent()
+
+
+class TagTuple(tuple):
+    """タグ類・Q&A履歴を保持するタプル
+
+    読み取り専用のリストとして扱えるよう、同じ要素を持つリストとも等しいと判定する。
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, list):
+            other = tuple(other)
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other: Any) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = tuple.__hash__
+
+    def __reduce__(self):
+        return (make_tags, (tuple(self),))
+
+
+EMPTY_TAGS = TagTuple()
+
+
+def make_tags(values) -> TagTuple:
+    """値の並びから TagTuple を作成（空の場合は共有の EMPTY_TAGS を返す）"""
+    return TagTuple(values) if values else EMPTY_TAGS
+
+
+class QAItem(Mapping):
+    """Q&A履歴の1件（'question'・'answer'・'created_at' を辞書と同じように参照できる）"""
+
+    __slots__ = QA_FIELDS
+
+    def __init__(self, question: str, answer: str, created_at: str):
+        self.question = question
+        self.answer = answer
+        self.created_at = created_at
+
+    def __getitem__(self, key: str) -> str:
+        if key not in _QA_FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(QA_FIELDS)
+
+    def __len__(self) -> int:
+        return len(QA_FIELDS)
+
+    def __reduce__(self):
+        return (QAItem, (self.question, self.answer, self.created_at))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class DiaryEntry(Mapping):
+    """読み込んだ日記エントリ
+
+    項目を __slots__ に持ち、タグ類（topics など）と qa_chain は TagTuple で保持するため、
+    12個のキーを持つ辞書と6個のリストで表すよりエントリあたりのメモリが大幅に少ない。
+    entry['text']・entry.get('topics', [])・dict(entry) のように読み取り専用の辞書として扱える。
+    'version' には読み込んだ時点の行バージョン（patch_diary_entry の expected_version に渡す値）を持つ。
+    検索の 'snippet' など、決まった項目以外の値は entry[key] = value で追加できる。
+    読み取りキャッシュが保持するエントリは freeze() で変更できなくなるため、変更したい場合は copy() を使う。
+    """
+
+    __slots__ = ENTRY_FIELDS + ('_extra', '_frozen')
+
+    def __init__(self, id: str, created_at: str, date: str, text: str, question: str, user_id: str,
+                 topics: Tuple[str, ...] = EMPTY_TAGS, emotions: Tuple[str, ...] = EMPTY_TAGS,
+                 thoughts: Tuple[str, ...] = EMPTY_TAGS, goals: Tuple[str, ...] = EMPTY_TAGS,
+                 followup_questions: Tuple[str, ...] = EMPTY_TAGS, qa_chain: Tuple[QAItem, ...] = EMPTY_TAGS,
+                 original_id: Any = _ABSENT, version: Any = _ABSENT):
+        self.id = id
+        self.original_id = original_id
+        self.created_at = created_at
+        self.date = date
+        self.text = text
+        self.question = question
+        self.user_id = user_id
+        self.topics = topics
+        self.emotions = emotions
+        self.thoughts = thoughts
+        self.goals = goals
+        self.followup_questions = followup_questions
+        self.qa_chain = qa_chain
+        self.version = version
+        self._extra: Optional[Dict[str, Any]] = None
+        self._frozen = False
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _ENTRY_FIELD_SET:
+            value = getattr(self, key)
+            if value is not _ABSENT:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if self._frozen:
+            raise TypeError("読み取りキャッシュのエントリは変更できません（copy() したエントリを変更してください）")
+        if key in _ENTRY_FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __iter__(self) -> Iterator[str]:
+        for key in ENTRY_FIELDS:
+            if getattr(self, key) is not _ABSENT:
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        absent = (self.original_id is _ABSENT) + (self.version is _ABSENT)
+        return len(ENTRY_FIELDS) - absent + len(self._extra or ())
+
+    def __reduce__(self):
+        # スロット名を含めず、値だけをpickleする
+        return (_restore_entry, (tuple(getattr(self, key) for key in ENTRY_FIELDS), self._extra))
+
+    def __repr__(self) -> str:
+        return f'DiaryEntry({dict(self)!r})'
+
+    def freeze(self) -> 'DiaryEntry':
+        """以降の entry[key] = value を禁止する（複数の呼び出し元で共有するエントリ用）"""
+        self._frozen = True
+        return self
+
+    def copy(self) -> 'DiaryEntry':
+        """変更できる浅いコピーを作成（文字列とタグ類のタプルはコピー元と共有する）"""
+        return _restore_entry(tuple(getattr(self, key) for key in ENTRY_FIELDS),
+                              dict(self._extra) if self._extra else None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """タグ類をリスト、Q&Aを辞書にした通常の辞書に変換（JSON出力など用）"""
+        result = {}
+        for key, value in self.items():
+            if key == 'qa_chain':
+                value = [dict(qa) for qa in value]
+            elif isinstance(value, tuple):
+                value = list(value)
+            result[key] = value
+        return result
+
+
+def _restore_entry(values: tuple, extra: Optional[Dict[str, Any]]) -> DiaryEntry:
+    """pickleした DiaryEntry を復元"""
+    entry = DiaryEntry.__new__(DiaryEntry)
+    for key, value in zip(ENTRY_FIELDS, values):
+        setattr(entry, key, value)
+    entry._extra = extra
+    entry._frozen = False
+    return entry
@@ -0,0 +1,559 @@
+"""
+日記データベースのスキーママイグレーションを提供するモジュール
+
+スキーマのバージョンは PRAGMA user_version に記録し、
+現在のバージョンより新しいステップだけを順番に適用する。
+ステップを追加するときは MIGRATIONS の末尾に (バージョン, 説明, 関数) を追加する。
+既存のステップは適用済みのデータベースがあるため変更しないこと。
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+
+def _create_base_schema(cur: sqlite3.Cursor) -> None:
+    """v1: 正規化スキーマのテーブルを作成
+
+    バージョン管理の導入前に作成されたデータベース（user_version = 0）にも
+    適用されるため、すべて IF NOT EXISTS で作成する。
+    """
+    # メインテーブルを作成
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS diary_entries (
+            id TEXT PRIMARY KEY,
+            original_id TEXT,
+            created_at TEXT,
+            date TEXT,
+            text TEXT,
+            question TEXT,
+            user_id TEXT DEFAULT 'default_user'
+        )
+    ''')
+
+    # 関連テーブルを作成
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS topics (
+            id TEXT PRIMARY KEY,
+            diary_entry_id TEXT,
+            topic TEXT,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS emotions (
+            id TEXT PRIMARY KEY,
+            diary_entry_id TEXT,
+            emotion TEXT,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS thoughts (
+            id TEXT PRIMARY KEY,
+            diary_entry_id TEXT,
+            thought TEXT,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS goals (
+            id TEXT PRIMARY KEY,
+            diary_entry_id TEXT,
+            goal TEXT,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS followup_questions (
+            id TEXT PRIMARY KEY,
+            diary_entry_id TEXT,
+            question TEXT,
+            order_index INTEGER,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS qa_chain (
+            id TEXT PRIMARY KEY,
+            diary_entry_id TEXT,
+            question TEXT,
+            answer TEXT,
+            created_at TEXT,
+            order_index INTEGER,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+
+    # ユーザー管理テーブルを作成
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_login TEXT
+        )
+    ''')
+
+
+def _add_secondary_indexes(cur: sqlite3.Cursor) -> None:
+    """v2: ユーザー別・日付別の絞り込みと関連テーブルの参照にインデックスを追加"""
+    # ユーザー別の一覧（WHERE user_id = ? ORDER BY created_at）
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_diary_entries_user_created
+        ON diary_entries (user_id, created_at)
+    ''')
+    # 日付範囲の絞り込み（WHERE date BETWEEN ? AND ?）
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_diary_entries_date
+        ON diary_entries (date)
+    ''')
+
+    # 関連テーブル: diary_entry_id で引き、値または並び順まで含めてカバーする
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_topics_entry ON topics (diary_entry_id, topic)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_emotions_entry ON emotions (diary_entry_id, emotion)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_thoughts_entry ON thoughts (diary_entry_id, thought)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_goals_entry ON goals (diary_entry_id, goal)')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_followup_questions_entry
+        ON followup_questions (diary_entry_id, order_index)
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_qa_chain_entry
+        ON qa_chain (diary_entry_id, order_index)
+    ''')
+
+    # クエリプランナー用の統計情報を更新
+    cur.execute('ANALYZE')
+
+
+def _add_keyset_index(cur: sqlite3.Cursor) -> None:
+    """v3: ユーザー別のキーセットページング用に (user_id, created_at, id) のインデックスに置き換え
+
+    ORDER BY created_at DESC, id DESC と (created_at, id) < (?, ?) のカーソル条件を
+    インデックスだけで処理できるようにする。v2の (user_id, created_at) はこの先頭部分なので削除する。
+    """
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_diary_entries_user_created_id
+        ON diary_entries (user_id, created_at, id)
+    ''')
+    cur.execute('DROP INDEX IF EXISTS idx_diary_entries_user_created')
+
+
+# 全文検索ドキュメント（diary_search）を1エントリ分作成するSQL
+# {entry_id} にはトリガー内のエントリID（NEW.id など）を埋め込む。
+# diary_search の rowid は diary_entries の rowid と同じにして、更新・削除をrowidで行う
+SEARCH_DOCUMENT_INSERT_SQL = '''
+    INSERT INTO diary_search (rowid, text, qa, notes)
+    SELECT
+        e.rowid,
+        e.text,
+        (SELECT group_concat(coalesce(q.question, '') || ' ' || coalesce(q.answer, ''), ' ')
+         FROM qa_chain q WHERE q.diary_entry_id = e.id),
+        coalesce((SELECT group_concat(t.thought, ' ') FROM thoughts t WHERE t.diary_entry_id = e.id), '')
+        || ' ' ||
+        coalesce((SELECT group_concat(g.goal, ' ') FROM goals g WHERE g.diary_entry_id = e.id), '')
+    FROM diary_entries e
+    WHERE e.id = {entry_id};
+'''
+
+# 1エントリ分のドキュメントを作り直すSQL（トリガー用）
+# トリガー内では外側の文の競合解決が優先されるため INSERT OR REPLACE は使わず、削除してから挿入する
+SEARCH_DOCUMENT_REFRESH_SQL = '''
+    DELETE FROM diary_search
+    WHERE rowid IN (SELECT e.rowid FROM diary_entries e WHERE e.id = {entry_id});
+''' + SEARCH_DOCUMENT_INSERT_SQL
+
+
+def _add_full_text_search(cur: sqlite3.Cursor) -> None:
+    """v4: 本文・Q&A・思考・目標の全文検索インデックス（FTS5）を追加
+
+    日本語は単語区切りがないため trigram トークナイザーで3文字単位に索引する。
+    diary_entries と関連テーブルのトリガーで検索ドキュメントを常に同期する。
+    diary_entries の書き込みは rowid が変わらないよう ON CONFLICT DO UPDATE で行うこと
+    （INSERT OR REPLACE は削除扱いになり、rowid が変わってしまう）。
+    """
+    cur.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS diary_search USING fts5(
+            text, qa, notes,
+            tokenize = 'trigram'
+        )
+    ''')
+
+    # メインエントリ
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_search_insert
+        AFTER INSERT ON diary_entries BEGIN
+            {SEARCH_DOCUMENT_REFRESH_SQL.format(entry_id='NEW.id')}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_search_update
+        AFTER UPDATE OF text ON diary_entries
+        WHEN OLD.text IS NOT NEW.text BEGIN
+            {SEARCH_DOCUMENT_REFRESH_SQL.format(entry_id='NEW.id')}
+        END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_search_delete
+        AFTER DELETE ON diary_entries BEGIN
+            DELETE FROM diary_search WHERE rowid = OLD.rowid;
+        END
+    ''')
+
+    # 関連テーブル（Q&A・思考・目標）
+    for table in ('qa_chain', 'thoughts', 'goals'):
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_search_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    {SEARCH_DOCUMENT_REFRESH_SQL.format(entry_id=f'{row}.diary_entry_id')}
+                END
+            ''')
+
+    # 既存データを索引
+    cur.execute(SEARCH_DOCUMENT_INSERT_SQL.format(entry_id='e.id'))
+
+
+# 統計ロールアップで出現回数を集計する関連テーブル（種類, テーブル名, 値カラム）
+STATISTICS_ITEM_TABLES = {
+    'topics': ('topics', 'topic'),
+    'emotions': ('emotions', 'emotion'),
+    'thoughts': ('thoughts', 'thought'),
+    'goals': ('goals', 'goal'),
+}
+
+# ロールアップの集計単位（日・週・全期間）
+STATISTICS_PERIODS_SQL = "(SELECT 'day' AS period UNION ALL SELECT 'week' UNION ALL SELECT 'all')"
+
+
+def _period_start_sql(date_column: str) -> str:
+    """集計単位 p.period ごとの期間の開始日（週は月曜始まり、全期間は空文字）"""
+    return (
+        f"CASE p.period WHEN 'day' THEN coalesce({date_column}, '') "
+        f"WHEN 'week' THEN coalesce(date({date_column}, '-6 days', 'weekday 1'), '') "
+        f"ELSE '' END"
+    )
+
+
+def _entry_rollup_sql(row: str, sign: int) -> List[str]:
+    """エントリ1件（NEW/OLD）の件数と、その関連データの出現回数をロールアップに加減算するSQL"""
+    source = f'(SELECT {row}.id AS id, {row}.user_id AS user_id, {row}.date AS date, {row}.text AS text)'
+    statements = [f'''
+        INSERT INTO stats_entry_counts (user_id, period, period_start, entry_count, text_length)
+        SELECT coalesce(src.user_id, ''), p.period, {_period_start_sql('src.date')},
+               {sign}, {sign} * coalesce(length(src.text), 0)
+        FROM {source} src CROSS JOIN {STATISTICS_PERIODS_SQL} p
+        WHERE true
+        ON CONFLICT (user_id, period, period_start) DO UPDATE SET
+            entry_count = entry_count + excluded.entry_count,
+            text_length = text_length + excluded.text_length;
+    ''']
+    for kind, (table, column) in STATISTICS_ITEM_TABLES.items():
+        statements.append(f'''
+            INSERT INTO stats_item_counts (user_id, period, period_start, kind, item, count)
+            SELECT coalesce(src.user_id, ''), p.period, {_period_start_sql('src.date')},
+                   '{kind}', t.{column}, {sign} * COUNT(*)
+            FROM {source} src
+            JOIN {table} t ON t.diary_entry_id = src.id
+            CROSS JOIN {STATISTICS_PERIODS_SQL} p
+            WHERE t.{column} IS NOT NULL
+            GROUP BY 1, 2, 3, 5
+            ON CONFLICT (user_id, period, period_start, kind, item) DO UPDATE SET
+                count = count + excluded.count;
+        ''')
+    return statements
+
+
+def _item_rollup_sql(kind: str, row: str, sign: int) -> str:
+    """関連データ1行（NEW/OLD）の出現回数をロールアップに加減算するSQL"""
+    column = STATISTICS_ITEM_TABLES[kind][1]
+    return f'''
+        INSERT INTO stats_item_counts (user_id, period, period_start, kind, item, count)
+        SELECT coalesce(e.user_id, ''), p.period, {_period_start_sql('e.date')}, '{kind}', {row}.{column}, {sign}
+        FROM diary_entries e CROSS JOIN {STATISTICS_PERIODS_SQL} p
+        WHERE e.id = {row}.diary_entry_id AND {row}.{column} IS NOT NULL
+        ON CONFLICT (user_id, period, period_start, kind, item) DO UPDATE SET
+            count = count + excluded.count;
+    '''
+
+
+# ロールアップを元データから作り直すSQL（マイグレーションと DiaryManagerSQLite.rebuild_statistics で使う）
+STATISTICS_REBUILD_SQL = [
+    'DELETE FROM stats_entry_counts',
+    'DELETE FROM stats_item_counts',
+    f'''
+        INSERT INTO stats_entry_counts (user_id, period, period_start, entry_count, text_length)
+        SELECT coalesce(e.user_id, ''), p.period, {_period_start_sql('e.date')},
+               COUNT(*), SUM(coalesce(length(e.text), 0))
+        FROM diary_entries e CROSS JOIN {STATISTICS_PERIODS_SQL} p
+        GROUP BY 1, 2, 3
+    ''',
+] + [
+    f'''
+        INSERT INTO stats_item_counts (user_id, period, period_start, kind, item, count)
+        SELECT coalesce(e.user_id, ''), p.period, {_period_start_sql('e.date')}, '{kind}', t.{column}, COUNT(*)
+        FROM {table} t
+        JOIN diary_entries e ON e.id = t.diary_entry_id
+        CROSS JOIN {STATISTICS_PERIODS_SQL} p
+        WHERE t.{column} IS NOT NULL
+        GROUP BY 1, 2, 3, 5
+    '''
+    for kind, (table, column) in STATISTICS_ITEM_TABLES.items()
+]
+
+
+def _add_statistics_rollups(cur: sqlite3.Cursor) -> None:
+    """v5: ユーザー別の日次・週次・全期間の集計を保持するロールアップテーブルを追加
+
+    diary_entries と関連テーブルのトリガーで、書き込みと同じトランザクション内に差分を反映する。
+    削除で0件になった行は残るため、読み取り側で件数が0より大きい行だけを使うこと。
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS stats_entry_counts (
+            user_id TEXT NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            entry_count INTEGER NOT NULL DEFAULT 0,
+            text_length INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period, period_start)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS stats_item_counts (
+            user_id TEXT NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            item TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period, kind, period_start, item)
+        ) WITHOUT ROWID
+    ''')
+
+    # メインエントリ: 件数・文字数と、ユーザーや日付が変わったときの関連データの移動
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_stats_insert
+        AFTER INSERT ON diary_entries BEGIN
+            {''.join(_entry_rollup_sql('NEW', 1))}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_stats_update
+        AFTER UPDATE OF user_id, date, text ON diary_entries
+        WHEN OLD.user_id IS NOT NEW.user_id OR OLD.date IS NOT NEW.date OR OLD.text IS NOT NEW.text BEGIN
+            {''.join(_entry_rollup_sql('OLD', -1))}
+            {''.join(_entry_rollup_sql('NEW', 1))}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_stats_delete
+        AFTER DELETE ON diary_entries BEGIN
+            {''.join(_entry_rollup_sql('OLD', -1))}
+        END
+    ''')
+
+    # 関連テーブル（トピック・感情・思考・目標）
+    for kind, (table, column) in STATISTICS_ITEM_TABLES.items():
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_insert
+            AFTER INSERT ON {table} BEGIN
+                {_item_rollup_sql(kind, 'NEW', 1)}
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_update
+            AFTER UPDATE ON {table} BEGIN
+                {_item_rollup_sql(kind, 'OLD', -1)}
+                {_item_rollup_sql(kind, 'NEW', 1)}
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_stats_delete
+            AFTER DELETE ON {table} BEGIN
+                {_item_rollup_sql(kind, 'OLD', -1)}
+            END
+        ''')
+
+    # 既存データを集計
+    for statement in STATISTICS_REBUILD_SQL:
+        cur.execute(statement)
+
+
+# 全ユーザーを対象にした読み取り結果のキャッシュに使うバージョンのキー
+CACHE_ALL_USERS_KEY = '*'
+
+# 日記データを持つ関連テーブル（書き込まれたらエントリのユーザーのバージョンを上げる）
+CACHE_RELATED_TABLES = ('topics', 'emotions', 'thoughts', 'goals', 'followup_questions', 'qa_chain')
+
+
+def _add_cache_versions(cur: sqlite3.Cursor) -> None:
+    """v6: 読み取りキャッシュの無効化に使うユーザー別のデータバージョンを追加
+
+    日記データが書き込まれるたびに、トリガーで同じトランザクション内に
+    そのユーザーと全ユーザー（CACHE_ALL_USERS_KEY）のバージョンを上げる。
+    別のプロセスからの書き込みもバージョンの比較で検出できる。
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            user_key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    bump = "ON CONFLICT (user_key) DO UPDATE SET version = version + 1;"
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_cache_insert
+        AFTER INSERT ON diary_entries BEGIN
+            INSERT INTO cache_versions (user_key, version)
+            VALUES (coalesce(NEW.user_id, ''), 1), ('{CACHE_ALL_USERS_KEY}', 1)
+            {bump}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_cache_update
+        AFTER UPDATE ON diary_entries BEGIN
+            INSERT INTO cache_versions (user_key, version)
+            SELECT coalesce(OLD.user_id, ''), 1
+            UNION SELECT coalesce(NEW.user_id, ''), 1
+            UNION SELECT '{CACHE_ALL_USERS_KEY}', 1
+            {bump}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS diary_entries_cache_delete
+        AFTER DELETE ON diary_entries BEGIN
+            INSERT INTO cache_versions (user_key, version)
+            VALUES (coalesce(OLD.user_id, ''), 1), ('{CACHE_ALL_USERS_KEY}', 1)
+            {bump}
+        END
+    ''')
+
+    for table in CACHE_RELATED_TABLES:
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_cache_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    INSERT INTO cache_versions (user_key, version)
+                    SELECT coalesce(user_id, ''), 1 FROM diary_entries WHERE id = {row}.diary_entry_id
+                    UNION SELECT '{CACHE_ALL_USERS_KEY}', 1
+                    {bump}
+                END
+            ''')
+
+
+def _add_original_id_index(cur: sqlite3.Cursor) -> None:
+    """v7: 元のID（original_id）でエントリを引くためのインデックスを追加
+
+    WHERE original_id = ? OR id = ? を主キーとこのインデックスの検索の和で処理できるようにする。
+    """
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_diary_entries_original_id
+        ON diary_entries (original_id)
+    ''')
+
+
+def _add_entry_version(cur: sqlite3.Cursor) -> None:
+    """v8: 楽観的排他制御に使う行バージョン（diary_entries.version）を追加
+
+    エントリまたはその関連データを書き換えるたびにアプリケーション側で1ずつ増やす。
+    """
+    cur.execute('PRAGMA table_info(diary_entries)')
+    if 'version' not in [row[1] for row in cur.fetchall()]:
+        cur.execute('ALTER TABLE diary_entries ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+
+def _add_analysis_jobs(cur: sqlite3.Cursor) -> None:
+    """v9: 日記のAI分析をバックグラウンドで行うためのジョブテーブルを追加
+
+    statusは pending（待機中）・running（実行中）・done（完了）・failed（失敗）のいずれか。
+    実行中のジョブは updated_at を期限として、期限を過ぎたら別のワーカーが引き継げる。
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            diary_entry_id TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
+        )
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status
+        ON analysis_jobs (status, id)
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_analysis_jobs_entry
+        ON analysis_jobs (diary_entry_id, id)
+    ''')
+
+
+def _add_import_progress(cur: sqlite3.Cursor) -> None:
+    """v10: アーカイブ取り込みの進捗テーブルを追加
+
+    取り込んだチャンクと同じトランザクションで位置を記録し、中断後は続きから再開できるようにする。
+    size・mtime は進捗が同じ内容のファイルのものか判定するために使う。
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            position INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+
+# (バージョン, 説明, マイグレーション関数) を適用順に並べる
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, '基本スキーマを作成', _create_base_schema),
+    (2, 'セカンダリインデックスを追加', _add_secondary_indexes),
+    (3, 'キーセットページング用インデックスを追加', _add_keyset_index),
+    (4, '全文検索インデックスを追加', _add_full_text_search),
+    (5, '統計ロールアップテーブルを追加', _add_statistics_rollups),
+    (6, '読み取りキャッシュ用のデータバージョンを追加', _add_cache_versions),
+    (7, '元のIDのインデックスを追加', _add_original_id_index),
+    (8, 'エントリの行バージョンを追加', _add_entry_version),
+    (9, '分析ジョブテーブルを追加', _add_analysis_jobs),
+    (10, '取り込みの進捗テーブルを追加', _add_import_progress),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cur: sqlite3.Cursor) -> int:
+    """データベースに記録されているスキーマバージョンを取得"""
+    cur.execute('PRAGMA user_version')
+    return cur.fetchone()[0]
+
+
+def migrate(cur: sqlite3.Cursor) -> int:
+    """未適用のマイグレーションを順番に適用し、適用後のバージョンを返す
+
+    トランザクション内のカーソルで呼び出すこと。
+    途中で失敗した場合はトランザクションごとロールバックされ、バージョンも元に戻る。
+    """
+    version = get_schema_version(cur)
+    if version > LATEST_VERSION:
+        raise RuntimeError(
+            f"データベースのスキーマバージョン({version})がアプリケーション({LATEST_VERSION})より新しいです"
+        )
+
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        step(cur)
+        # PRAGMAはパラメータを受け付けないため整数をそのまま埋め込む
+        cur.execute(f'PRAGMA user_version = {int(step_version)}')
+        version = step_version
+
+    return version
@@ -0,0 +1,125 @@
+"""
+日記データの読み取り結果をキャッシュするモジュール
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+from .diary_entry import DiaryEntry
+
+
+def estimate_size(value: Any, seen: Optional[Set[int]] = None) -> int:
+    """値が使うメモリのおおよそのバイト数（共有している文字列・タプルは1回だけ数える）"""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, Mapping):
+        size += sum(estimate_size(item, seen) for item in value.values())
+        if isinstance(value, dict):
+            size += sum(estimate_size(key, seen) for key in value)
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item, seen) for item in value)
+    return size
+
+
+def _freeze(value: Any) -> Any:
+    """値に含まれるエントリを変更できないようにし、リスト・辞書は保存用にコピーする"""
+    if isinstance(value, DiaryEntry):
+        return value.freeze()
+    if isinstance(value, list):
+        return [_freeze(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _freeze(item) for key, item in value.items()}
+    return value
+
+
+def _detach(value: Any) -> Any:
+    """キャッシュした値のリスト・辞書だけをコピーして返す（エントリは変更できない状態で共有する）"""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return {key: _detach(item) for key, item in value.items()}
+    return value
+
+
+class QueryCache:
+    """ユーザー別のバージョン付きLRUキャッシュ
+
+    値は (ユーザーキー, クエリのキー) ごとに、読み取った時点のユーザーのデータバージョンと一緒に保存する。
+    値は読み込んだオブジェクトをそのまま持ち、取得のたびにデシリアライズやエントリのコピーはしない。
+    含まれる DiaryEntry は freeze() して共有し、リスト・辞書だけを取得ごとにコピーするため、
+    返した値を呼び出し側が並べ替え・追加してもキャッシュには影響しない。
+    メモリ使用量は保存時に estimate_size で見積もった値で数える。
+    バージョンはデータベースの cache_versions テーブルに書き込みと同じトランザクションで記録されるため、
+    取得時にバージョンを照合すれば別プロセスからの書き込みでも古い値を返さない。
+    件数とメモリ量の上限を超えたら、最も長く使われていない値から削除する。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: 'OrderedDict[Tuple[str, Hashable], Tuple[int, Any, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, user_key: str, key: Hashable, version: int) -> Optional[Any]:
+        """バージョンが一致する値を返す（なければNone。エントリは変更できない）"""
+        with self._lock:
+            item = self._items.get((user_key, key))
+            if item is None or item[0] != version:
+                self.misses += 1
+                return None
+            self._items.move_to_end((user_key, key))
+            self.hits += 1
+        return _detach(item[1])
+
+    def put(self, user_key: str, key: Hashable, version: int, value: Any) -> None:
+        """値を保存し、上限を超えた分を古い順に削除
+
+        保存した値に含まれるエントリは変更できなくなる。
+        """
+        if not self.enabled:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        value = _freeze(value)
+        with self._lock:
+            old = self._items.pop((user_key, key), None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._items[(user_key, key)] = (version, value, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, user_key: Optional[str] = None) -> None:
+        """指定ユーザー（Noneなら全ユーザー）の値を削除"""
+        with self._lock:
+            for cache_key in [k for k in self._items if user_key is None or k[0] == user_key]:
+                self._bytes -= self._items.pop(cache_key)[2]
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット・ミス数と現在の使用量"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._items),
+                'bytes': self._bytes,
+            }
@@ -6,6 +6,9 @@ from diary_manager_sqlite import DiaryManagerSQLite
 from ai_analyzer import AIAnalyzer
 from period_analyzer import PeriodAnalyzer
 from ui_components import UIComponents
+from config.app_config import AppConfig
+from services.analysis_queue import get_analysis_queue
+from utils.period_summary_cache import get_period_summary_cache
 from utils.emotion_analyzer import (
     extract_emotions_with_date,
     classify_emotions_with_llm,
@@ -188,17 +191,13 @@ def show_sidebar_menu():
         st.sidebar.markdown("---")
         st.sidebar.markdown("**📈 統計情報**")
         
-        if st.session_state.user_id == "guest":
-            diary_data = st.session_state.diary_manager.get_user_diary_data("guest")
-        else:
-            diary_data = st.session_state.diary_manager.get_user_diary_data(st.session_state.user_id)
+        summary = st.session_state.diary_manager.get_entry_summary(st.session_state.user_id)
         
-        st.sidebar.metric("総日記数", len(diary_data))
+        st.sidebar.metric("総日記数", summary['total_entries'])
         
-        if diary_data:
+        if summary['end_date']:
             # 最新の日記日付
-            latest_date = max(entry.get('date', '') for entry in diary_data)
-            st.sidebar.metric("最新日記", latest_date)
+            st.sidebar.metric("最新日記", summary['end_date'])
     
     # アプリ情報
     st.sidebar.markdown("---")
@@ -228,13 +227,26 @@ def main():
     # ===== インスタンス生成 =====
     try:
         if 'diary_manager' not in st.session_state:
-            st.session_state.diary_manager = DiaryManagerSQLite()
+            st.session_state.diary_manager = DiaryManagerSQLite(storage_profile=AppConfig().get_storage_profile())
         if 'ai_analyzer' not in st.session_state:
             st.session_state.ai_analyzer = AIAnalyzer()
         if 'period_analyzer' not in st.session_state:
-            st.session_state.period_analyzer = PeriodAnalyzer(st.session_state.ai_analyzer)
+            # 週・日ごとの要約を保存し、期間まとめのたびに変わった週・日だけを要約し直す
+            st.session_state.period_analyzer = PeriodAnalyzer(
+                st.session_state.ai_analyzer,
+                summary_cache=get_period_summary_cache(AppConfig().get('ai.period_cache_path'))
+            )
+        if 'analysis_queue' not in st.session_state:
+            # ワーカー数が0なら投稿時にその場で分析する
+            analysis_workers = AppConfig().get('ai.analysis_workers', 0)
+            st.session_state.analysis_queue = get_analysis_queue(
+                st.session_state.diary_manager, st.session_state.ai_analyzer, analysis_workers
+            ) if analysis_workers > 0 else None
         if 'ui' not in st.session_state:
-            st.session_state.ui = UIComponents(st.session_state.diary_manager, st.session_state.ai_analyzer, st.session_state.period_analyzer)
+            st.session_state.ui = UIComponents(
+                st.session_state.diary_manager, st.session_state.ai_analyzer, st.session_state.period_analyzer,
+                st.session_state.analysis_queue
+            )
         
         ui = st.session_state.ui
     except Exception as e:
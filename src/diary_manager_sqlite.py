@@ -4,12 +4,113 @@ import uuid
 import datetime
 import hashlib
 import os
-from typing import Any, Optional
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from database.connection_pool import get_pool, close_pool
+from database.migrations import migrate, STATISTICS_ITEM_TABLES, STATISTICS_REBUILD_SQL, CACHE_ALL_USERS_KEY
+from database.query_cache import QueryCache
+from database.diary_entry import DiaryEntry, QAItem, make_tags
+from constants import (
+    DEFAULT_QUERY_CACHE_MAX_ENTRIES, DEFAULT_QUERY_CACHE_MAX_BYTES,
+    DEFAULT_ANALYSIS_MAX_ATTEMPTS, DEFAULT_ANALYSIS_LEASE_SECONDS
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 一覧取得時に一括で読み込む関連テーブル（キー, テーブル名, 値カラム, 並び順）
+RELATED_LIST_TABLES = (
+    ('topics', 'topics', 'topic', 'topic'),
+    ('emotions', 'emotions', 'emotion', 'emotion'),
+    ('thoughts', 'thoughts', 'thought', 'thought'),
+    ('goals', 'goals', 'goal', 'goal'),
+    ('followup_questions', 'followup_questions', 'question', 'order_index'),
+)
+
+# 一括書き込みで差分を取る関連テーブル
+# （キー, テーブル名, 値カラム, 既存行の並び順, order_indexを持つか）
+# 既存行は並び順でi番目の新しい値と対応付け、値が変わった行だけ更新する
+RELATED_WRITE_TABLES = (
+    ('topics', 'topics', ('topic',), 'topic', False),
+    ('emotions', 'emotions', ('emotion',), 'emotion', False),
+    ('thoughts', 'thoughts', ('thought',), 'thought', False),
+    ('goals', 'goals', ('goal',), 'goal', False),
+    ('followup_questions', 'followup_questions', ('question',), 'order_index', True),
+    ('qa_chain', 'qa_chain', ('question', 'answer', 'created_at'), 'order_index', True),
+)
+
+# メインエントリのUPSERT
+# INSERT OR REPLACE は既存行を削除して挿入し直すため rowid が変わり、
+# rowid で対応付けている全文検索インデックスとずれてしまう。ON CONFLICT で更新する
+UPSERT_ENTRY_SQL = '''
+    INSERT INTO diary_entries (
+        id, original_id, created_at, date, text, question, user_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        original_id = excluded.original_id,
+        created_at = excluded.created_at,
+        date = excluded.date,
+        text = excluded.text,
+        question = excluded.question,
+        user_id = excluded.user_id,
+        version = diary_entries.version + 1
+'''
+
+# patch_diary_entry で部分更新できる diary_entries のカラムと関連データのキー
+PATCHABLE_COLUMNS = ('created_at', 'date', 'text', 'question')
+RELATED_WRITE_KEYS = tuple(key for key, *_ in RELATED_WRITE_TABLES)
+
+# 全文検索の既定の取得件数と、bm25で順位付けする直近の一致件数の上限
+DEFAULT_SEARCH_LIMIT = 20
+
+# 検索対象の文書（全文検索テーブル s の本文・Q&A・思考と目標を連結したもの）
+SEARCH_DOCUMENT_SQL = "coalesce(s.text, '') || ' ' || coalesce(s.qa, '') || ' ' || coalesce(s.notes, '')"
+
+# trigramトークナイザーで索引できる最短の文字数（これより短い語は部分一致で探す）
+TRIGRAM_MIN_LENGTH = 3
+
+# ページング取得時の既定の件数
+DEFAULT_PAGE_SIZE = 10
+
+# iter_user_entries で1回に読み込むエントリ数
+DEFAULT_STREAM_CHUNK_SIZE = 500
+
+# IN句1回あたりのパラメータ数（SQLITE_MAX_VARIABLE_NUMBERの旧デフォルト999未満に抑える）
+IN_CLAUSE_CHUNK_SIZE = 900
+
+# 列指向エクスポートで出力する表（名前, 列, 辞書エンコードする列）
+# エントリ表は1エントリ1行、タグ表は1タグ1行で、どちらも entry_id（元のIDまたはUUID）で対応付ける
+EXPORT_TABLES = (
+    ('entries', ('entry_id', 'created_at', 'date', 'text', 'question'), ()),
+    ('topics', ('entry_id', 'created_at', 'date', 'topic'), ('topic',)),
+    ('emotions', ('entry_id', 'created_at', 'date', 'emotion'), ('emotion',)),
+    ('thoughts', ('entry_id', 'created_at', 'date', 'thought'), ('thought',)),
+    ('goals', ('entry_id', 'created_at', 'date', 'goal'), ('goal',)),
+)
+EXPORT_FORMATS = ('parquet', 'arrow')
+
+# 列指向エクスポートで1回に読み込む行数
+DEFAULT_EXPORT_CHUNK_SIZE = 10000
+
+# 分析ジョブの状態（未完了のジョブは pending か running）
+ANALYSIS_JOB_STATUSES = ('pending', 'running', 'done', 'failed')
+ANALYSIS_ACTIVE_STATUSES = ('pending', 'running')
+
+class EntryConflictError(RuntimeError):
+    """更新しようとしたエントリが、読み込んだ後に別のセッションで更新されていた"""
+
 
 class DiaryManagerSQLite:
     """SQLite対応の日記データ管理クラス"""
     
-    def __init__(self, db_path: str = "data/diary_normalized.db"):
+    def __init__(self, db_path: str = "data/diary_normalized.db", storage_profile: Optional[dict[str, Any]] = None,
+                 cache_max_entries: int = DEFAULT_QUERY_CACHE_MAX_ENTRIES,
+                 cache_max_bytes: int = DEFAULT_QUERY_CACHE_MAX_BYTES):
+        # 接続時に適用するストレージプロファイル（WAL・キャッシュ等、Noneなら既定値）
+        self.storage_profile = storage_profile
+        # 日記データの読み取り結果のキャッシュ（ユーザー別、データバージョンで無効化）
+        self._cache = QueryCache(cache_max_entries, cache_max_bytes)
         # Streamlit Cloud対応: 絶対パスを使用
         if not os.path.isabs(db_path):
             import tempfile
@@ -26,7 +127,7 @@ class DiaryManagerSQLite:
         self.ensure_database()
     
     def ensure_database(self) -> None:
-        """データベースが存在しない場合は作成"""
+        """データベースが存在しない場合は作成し、スキーマを最新バージョンに更新"""
         import os
         
         # ディレクトリが存在しない場合は作成（絶対パスの場合のみ）
@@ -34,612 +135,878 @@ class DiaryManagerSQLite:
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
+            self._pool = get_pool(self.db_path, self.storage_profile)
+            with self._pool.connection():
+                pass
         except Exception as e:
             print(f"データベース接続エラー: {e}")
-            # フォールバック: メモリ内データベースを使用
+            # フォールバック: 一時ディレクトリのデータベースを使用
             import tempfile
+            close_pool(self.db_path)
             self.db_path = os.path.join(tempfile.gettempdir(), "diary_normalized.db")
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
+            self._pool = get_pool(self.db_path, self.storage_profile)
+
+        # 未適用のスキーママイグレーションを適用
+        with self._pool.transaction() as cur:
+            migrate(cur)
+
+    def close(self) -> None:
+        """このデータベースの接続プールを閉じる"""
+        self._cache.invalidate()
+        close_pool(self.db_path)
+    
+    def _cached_read(self, user_id: Optional[str], key: tuple, load: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """読み取り結果をキャッシュから返し、なければloadで読み込んでキャッシュする
         
-        try:
-            # メインテーブルを作成
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS diary_entries (
-                    id TEXT PRIMARY KEY,
-                    original_id TEXT,
-                    created_at TEXT,
-                    date TEXT,
-                    text TEXT,
-                    question TEXT,
-                    user_id TEXT DEFAULT 'default_user'
-                )
-            ''')
-            
-            # 関連テーブルを作成
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS topics (
-                    id TEXT PRIMARY KEY,
-                    diary_entry_id TEXT,
-                    topic TEXT,
-                    FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
-                )
-            ''')
-            
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS emotions (
-                    id TEXT PRIMARY KEY,
-                    diary_entry_id TEXT,
-                    emotion TEXT,
-                    FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
-                )
-            ''')
-            
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS thoughts (
-                    id TEXT PRIMARY KEY,
-                    diary_entry_id TEXT,
-                    thought TEXT,
-                    FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
-                )
-            ''')
-            
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS goals (
-                    id TEXT PRIMARY KEY,
-                    diary_entry_id TEXT,
-                    goal TEXT,
-                    FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
-                )
-            ''')
-            
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS followup_questions (
-                    id TEXT PRIMARY KEY,
-                    diary_entry_id TEXT,
-                    question TEXT,
-                    order_index INTEGER,
-                    FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
-                )
-            ''')
-            
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS qa_chain (
-                    id TEXT PRIMARY KEY,
-                    diary_entry_id TEXT,
-                    question TEXT,
-                    answer TEXT,
-                    created_at TEXT,
-                    order_index INTEGER,
-                    FOREIGN KEY (diary_entry_id) REFERENCES diary_entries (id)
-                )
-            ''')
-            
-            # ユーザー管理テーブルを作成
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id TEXT PRIMARY KEY,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    last_login TEXT
-                )
-            ''')
-            
-            conn.commit()
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        データバージョンと結果を同じスナップショットから読むため、
+        バージョンが一致するキャッシュは常にデータベースの内容と同じになる。
+        """
+        user_key = CACHE_ALL_USERS_KEY if user_id is None else user_id
+        with self._pool.snapshot() as cur:
+            cur.execute('SELECT version FROM cache_versions WHERE user_key = ?', (user_key,))
+            row = cur.fetchone()
+            version = row[0] if row else 0
+            value = self._cache.get(user_key, key, version)
+            if value is None:
+                value = load(cur)
+                self._cache.put(user_key, key, version, value)
+        return value
     
-    def add_diary_entry(self, entry: dict[str, Any]) -> str:
-        """新しい日記エントリを追加（重複しない構造）"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
-            
+    def cache_stats(self) -> dict[str, int]:
+        """読み取りキャッシュのヒット・ミス数と使用量"""
+        return self._cache.stats()
+
+    def add_diary_entry(self, entry: dict[str, Any], enqueue_analysis: bool = False) -> str:
+        """新しい日記エントリを追加（重複しない構造）
+        
+        enqueue_analysisがTrueの場合は、同じトランザクションで分析ジョブも登録する。
+        """
+        with self._pool.transaction() as cur:
             # エントリIDを決定（original_idがあれば使用、なければ生成）
             entry_id = entry.get('id') or str(uuid.uuid4())
             
             # メインエントリをUPSERT（INSERT OR UPDATE）
-            cur.execute('''
-                INSERT OR REPLACE INTO diary_entries (
-                    id, original_id, created_at, date, text, question, user_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                entry_id,
-                entry.get('id', ''),
-                entry.get('created_at', ''),
-                entry.get('date', ''),
-                entry.get('text', ''),
-                entry.get('question', ''),
-                entry.get('user_id', 'default_user')
-            ))
+            cur.execute(UPSERT_ENTRY_SQL, self._entry_row(entry_id, entry))
             
-            # 関連データを挿入（既存データは削除して再挿入）
+            # 関連データを差分で更新
             self._upsert_related_data(cur, entry_id, entry)
             
-            conn.commit()
-            return entry_id
+            if enqueue_analysis:
+                self._insert_analysis_job(cur, entry_id)
             
-        except Exception as e:
-            if 'conn' in locals():
-                conn.rollback()
-            raise e
-        finally:
-            if 'conn' in locals():
-                conn.close()
-    
-    def add_diary_entries_batch(self, entries: list[dict[str, Any]]) -> list[str]:
-        """複数の日記エントリを一括追加（重複しない構造）"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
+            return entry_id
+
+    def add_diary_entries_batch(self, entries: list[dict[str, Any]],
+                                import_progress: Optional[dict[str, Any]] = None) -> list[str]:
+        """複数の日記エントリを一括追加（重複しない構造）
         
+        メインエントリ・関連データともテーブルごとにまとめて書き込むため、
+        発行するSQL文の種類はエントリ数やタグ数によらず一定になる。
+        import_progress（{'source', 'size', 'mtime', 'position'}）を渡すと、
+        エントリと同じトランザクションで取り込みの進捗を記録する。
+        """
         added_ids = []
-        
-        try:
-            for entry in entries:
-                # エントリIDを決定（original_idがあれば使用、なければ生成）
-                entry_id = entry.get('id') or str(uuid.uuid4())
-                
-                # メインエントリをUPSERT（INSERT OR UPDATE）
+        items = []
+        for entry in entries:
+            # エントリIDを決定（original_idがあれば使用、なければ生成）
+            entry_id = entry.get('id') or str(uuid.uuid4())
+            added_ids.append(entry_id)
+            items.append((entry_id, entry))
+
+        with self._pool.transaction() as cur:
+            # メインエントリをUPSERT（INSERT OR UPDATE）
+            cur.executemany(UPSERT_ENTRY_SQL, [self._entry_row(entry_id, entry) for entry_id, entry in items])
+            
+            # 関連データを差分で一括更新
+            self._upsert_related_data_batch(cur, items)
+            
+            if import_progress is not None:
                 cur.execute('''
-                    INSERT OR REPLACE INTO diary_entries (
-                        id, original_id, created_at, date, text, question, user_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO import_progress (source, size, mtime, position, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (source) DO UPDATE SET
+                        size = excluded.size, mtime = excluded.mtime,
+                        position = excluded.position, updated_at = excluded.updated_at
                 ''', (
-                    entry_id,
-                    entry.get('id', ''),
-                    entry.get('created_at', ''),
-                    entry.get('date', ''),
-                    entry.get('text', ''),
-                    entry.get('question', ''),
-                    entry.get('user_id', 'default_user')
+                    import_progress['source'], import_progress['size'], import_progress['mtime'],
+                    import_progress['position'], datetime.datetime.now().isoformat()
                 ))
-                
-                # 関連データを挿入（既存データは削除して再挿入）
-                self._upsert_related_data(cur, entry_id, entry)
-                
-                added_ids.append(entry_id)
-            
-            conn.commit()
+
             return added_ids
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+    
+    def get_import_progress(self, source: str) -> Optional[dict[str, Any]]:
+        """アーカイブの取り込みの進捗（{'source', 'size', 'mtime', 'position'}）を返す（なければNone）"""
+        with self._pool.snapshot() as cur:
+            cur.execute('SELECT source, size, mtime, position FROM import_progress WHERE source = ?', (source,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip(('source', 'size', 'mtime', 'position'), row))
+    
+    def clear_import_progress(self, source: str) -> None:
+        """アーカイブの取り込みの進捗を削除"""
+        with self._pool.transaction() as cur:
+            cur.execute('DELETE FROM import_progress WHERE source = ?', (source,))
+    
+    def _entry_row(self, entry_id: str, entry: dict[str, Any]) -> tuple:
+        """diary_entries に書き込む1行分の値を作成"""
+        return (
+            entry_id,
+            entry.get('id', ''),
+            entry.get('created_at', ''),
+            entry.get('date', ''),
+            entry.get('text', ''),
+            entry.get('question', ''),
+            entry.get('user_id', 'default_user')
+        )
     
     def _upsert_related_data(self, cur: sqlite3.Cursor, diary_id: str, entry: dict[str, Any]) -> None:
         """関連データをUPSERT（既存データを更新または追加）"""
-        
-        # トピックを更新または追加
-        topics = entry.get('topics', [])
-        self._upsert_topics(cur, diary_id, topics)
-        
-        # 感情を更新または追加
-        emotions = entry.get('emotions', [])
-        self._upsert_emotions(cur, diary_id, emotions)
-        
-        # 思考を更新または追加
-        thoughts = entry.get('thoughts', [])
-        self._upsert_thoughts(cur, diary_id, thoughts)
-        
-        # 目標を更新または追加
-        goals = entry.get('goals', [])
-        self._upsert_goals(cur, diary_id, goals)
-        
-        # 追加質問を更新または追加
-        followup_questions = entry.get('followup_questions', [])
-        self._upsert_followup_questions(cur, diary_id, followup_questions)
-        
-        # Q&A履歴を更新または追加
-        qa_chain = entry.get('qa_chain', [])
-        self._upsert_qa_chain(cur, diary_id, qa_chain)
+        self._upsert_related_data_batch(cur, [(diary_id, entry)])
     
-    def _upsert_topics(self, cur: sqlite3.Cursor, diary_id: str, topics: list[str]) -> None:
-        """トピックを更新または追加"""
-        # 既存のトピックを取得
-        cur.execute('SELECT id, topic FROM topics WHERE diary_entry_id = ? ORDER BY topic', (diary_id,))
-        existing_topics = cur.fetchall()
+    def _upsert_related_data_batch(self, cur: sqlite3.Cursor, items: list[tuple[str, dict[str, Any]]], keys: Optional[tuple[str, ...]] = None) -> None:
+        """複数エントリの関連データを差分で一括更新
         
-        # 新しいトピックを処理
-        for i, topic in enumerate(topics):
-            if i < len(existing_topics):
-                # 既存のレコードを更新
-                cur.execute('''
-                    UPDATE topics SET topic = ? WHERE id = ?
-                ''', (topic, existing_topics[i][0]))
-            else:
-                # 新しいレコードを追加
-                topic_id = str(uuid.uuid4())
-                cur.execute('''
-                    INSERT INTO topics (id, diary_entry_id, topic)
-                    VALUES (?, ?, ?)
-                ''', (topic_id, diary_id, topic))
-        
-        # 余分な既存レコードを削除（新しいリストより多い場合）
-        if len(existing_topics) > len(topics):
-            for i in range(len(topics), len(existing_topics)):
-                cur.execute('DELETE FROM topics WHERE id = ?', (existing_topics[i][0],))
-    
-    def _upsert_emotions(self, cur: sqlite3.Cursor, diary_id: str, emotions: list[str]) -> None:
-        """感情を更新または追加"""
-        # 既存の感情を取得
-        cur.execute('SELECT id, emotion FROM emotions WHERE diary_entry_id = ? ORDER BY emotion', (diary_id,))
-        existing_emotions = cur.fetchall()
-        
-        # 新しい感情を処理
-        for i, emotion in enumerate(emotions):
-            if i < len(existing_emotions):
-                # 既存のレコードを更新
-                cur.execute('''
-                    UPDATE emotions SET emotion = ? WHERE id = ?
-                ''', (emotion, existing_emotions[i][0]))
-            else:
-                # 新しいレコードを追加
-                emotion_id = str(uuid.uuid4())
-                cur.execute('''
-                    INSERT INTO emotions (id, diary_entry_id, emotion)
-                    VALUES (?, ?, ?)
-                ''', (emotion_id, diary_id, emotion))
-        
-        # 余分な既存レコードを削除（新しいリストより多い場合）
-        if len(existing_emotions) > len(emotions):
-            for i in range(len(emotions), len(existing_emotions)):
-                cur.execute('DELETE FROM emotions WHERE id = ?', (existing_emotions[i][0],))
-    
-    def _upsert_thoughts(self, cur: sqlite3.Cursor, diary_id: str, thoughts: list[str]) -> None:
-        """思考を更新または追加"""
-        # 既存の思考を取得
-        cur.execute('SELECT id, thought FROM thoughts WHERE diary_entry_id = ? ORDER BY thought', (diary_id,))
-        existing_thoughts = cur.fetchall()
-        
-        # 新しい思考を処理
-        for i, thought in enumerate(thoughts):
-            if i < len(existing_thoughts):
-                # 既存のレコードを更新
-                cur.execute('''
-                    UPDATE thoughts SET thought = ? WHERE id = ?
-                ''', (thought, existing_thoughts[i][0]))
-            else:
-                # 新しいレコードを追加
-                thought_id = str(uuid.uuid4())
-                cur.execute('''
-                    INSERT INTO thoughts (id, diary_entry_id, thought)
-                    VALUES (?, ?, ?)
-                ''', (thought_id, diary_id, thought))
-        
-        # 余分な既存レコードを削除（新しいリストより多い場合）
-        if len(existing_thoughts) > len(thoughts):
-            for i in range(len(thoughts), len(existing_thoughts)):
-                cur.execute('DELETE FROM thoughts WHERE id = ?', (existing_thoughts[i][0],))
-    
-    def _upsert_goals(self, cur: sqlite3.Cursor, diary_id: str, goals: list[str]) -> None:
-        """目標を更新または追加"""
-        # 既存の目標を取得
-        cur.execute('SELECT id, goal FROM goals WHERE diary_entry_id = ? ORDER BY goal', (diary_id,))
-        existing_goals = cur.fetchall()
-        
-        # 新しい目標を処理
-        for i, goal in enumerate(goals):
-            if i < len(existing_goals):
-                # 既存のレコードを更新
-                cur.execute('''
-                    UPDATE goals SET goal = ? WHERE id = ?
-                ''', (goal, existing_goals[i][0]))
-            else:
-                # 新しいレコードを追加
-                goal_id = str(uuid.uuid4())
-                cur.execute('''
-                    INSERT INTO goals (id, diary_entry_id, goal)
-                    VALUES (?, ?, ?)
-                ''', (goal_id, diary_id, goal))
-        
-        # 余分な既存レコードを削除（新しいリストより多い場合）
-        if len(existing_goals) > len(goals):
-            for i in range(len(goals), len(existing_goals)):
-                cur.execute('DELETE FROM goals WHERE id = ?', (existing_goals[i][0],))
-    
-    def _upsert_followup_questions(self, cur: sqlite3.Cursor, diary_id: str, followup_questions: list[str]) -> None:
-        """フォローアップ質問を更新または追加"""
-        # 既存のフォローアップ質問を取得
-        cur.execute('SELECT id, question, order_index FROM followup_questions WHERE diary_entry_id = ? ORDER BY order_index', (diary_id,))
-        existing_questions = cur.fetchall()
-        
-        # 新しいフォローアップ質問を処理
-        for i, question in enumerate(followup_questions):
-            if i < len(existing_questions):
-                # 既存のレコードを更新
-                cur.execute('''
-                    UPDATE followup_questions SET question = ? WHERE id = ?
-                ''', (question, existing_questions[i][0]))
-            else:
-                # 新しいレコードを追加
-                question_id = str(uuid.uuid4())
-                cur.execute('''
-                    INSERT INTO followup_questions (id, diary_entry_id, question, order_index)
-                    VALUES (?, ?, ?, ?)
-                ''', (question_id, diary_id, question, i))
-        
-        # 余分な既存レコードを削除（新しいリストより多い場合）
-        if len(existing_questions) > len(followup_questions):
-            for i in range(len(followup_questions), len(existing_questions)):
-                cur.execute('DELETE FROM followup_questions WHERE id = ?', (existing_questions[i][0],))
-    
-    def _upsert_qa_chain(self, cur: sqlite3.Cursor, diary_id: str, qa_chain: list[dict[str, Any]]) -> None:
-        """Q&A履歴を更新または追加"""
-        # 既存のQ&A履歴を取得
-        cur.execute('''
-            SELECT id, question, answer, created_at, order_index
-            FROM qa_chain 
-            WHERE diary_entry_id = ? 
-            ORDER BY order_index
-        ''', (diary_id,))
-        existing_qa_chain = cur.fetchall()
-        
-        # 新しいQ&A履歴を処理
-        for i, qa in enumerate(qa_chain):
-            if i < len(existing_qa_chain):
-                # 既存のレコードを更新
-                cur.execute('''
-                    UPDATE qa_chain 
-                    SET question = ?, answer = ?, created_at = ?
-                    WHERE id = ?
-                ''', (qa.get('question', ''), qa.get('answer', ''), qa.get('created_at', ''), existing_qa_chain[i][0]))
-            else:
-                # 新しいレコードを追加
-                qa_id = str(uuid.uuid4())
-                cur.execute('''
-                    INSERT INTO qa_chain (id, diary_entry_id, question, answer, created_at, order_index)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (qa_id, diary_id, qa.get('question', ''), qa.get('answer', ''), qa.get('created_at', ''), i))
+        itemsは (diary_id, entry) のリスト。テーブルごとに既存行をまとめて取得し、
+        i番目の既存行とi番目の新しい値を対応付けて、値が変わった行のUPDATE・
+        不足分のINSERT・余った行のDELETEをそれぞれexecutemanyで適用する。
+        keysを指定した場合はそのキーの関連テーブルだけを更新する。
+        """
+        # 同じエントリが複数回含まれる場合は最後の内容を使う（逐次追加と同じ結果）
+        latest = dict(items)
+        if not latest:
+            return
+        diary_ids = list(latest)
         
-        # 余分な既存レコードを削除（新しいリストより多い場合）
-        if len(existing_qa_chain) > len(qa_chain):
-            for i in range(len(qa_chain), len(existing_qa_chain)):
-                cur.execute('DELETE FROM qa_chain WHERE id = ?', (existing_qa_chain[i][0],))
+        for key, table, columns, order_by, has_order_index in RELATED_WRITE_TABLES:
+            if keys is not None and key not in keys:
+                continue
+            
+            # 既存の行をまとめて取得
+            existing = {diary_id: [] for diary_id in diary_ids}
+            for id_sql, id_params in self._id_filters(diary_ids):
+                cur.execute(f'''
+                    SELECT diary_entry_id, id, {', '.join(columns)} FROM {table}
+                    WHERE diary_entry_id IN ({id_sql})
+                    ORDER BY diary_entry_id, {order_by}
+                ''', id_params)
+                for row in cur.fetchall():
+                    existing[row[0]].append((row[1], tuple(row[2:])))
+            
+            # 差分を計算
+            updates, inserts, deletes = [], [], []
+            for diary_id, entry in latest.items():
+                new_values = [
+                    (item,) if len(columns) == 1 else tuple(item.get(column, '') for column in columns)
+                    for item in entry.get(key) or []
+                ]
+                current = existing[diary_id]
+                for i, values in enumerate(new_values):
+                    if i < len(current):
+                        row_id, old_values = current[i]
+                        if old_values != values:
+                            updates.append(values + (row_id,))
+                    else:
+                        row = (str(uuid.uuid4()), diary_id) + values
+                        inserts.append(row + (i,) if has_order_index else row)
+                deletes.extend((row_id,) for row_id, _ in current[len(new_values):])
+            
+            # 差分を適用
+            if updates:
+                assignments = ', '.join(f'{column} = ?' for column in columns)
+                cur.executemany(f'UPDATE {table} SET {assignments} WHERE id = ?', updates)
+            if inserts:
+                insert_columns = ('id', 'diary_entry_id') + columns + (('order_index',) if has_order_index else ())
+                placeholders = ', '.join('?' * len(insert_columns))
+                cur.executemany(
+                    f'INSERT INTO {table} ({", ".join(insert_columns)}) VALUES ({placeholders})',
+                    inserts
+                )
+            if deletes:
+                cur.executemany(f'DELETE FROM {table} WHERE id = ?', deletes)
     
     def add_followup_questions(self, diary_id: str, followup_questions: list[str]) -> bool:
         """既存の日記エントリにフォローアップ質問を追加（UPDATEベース）"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
+        with self._pool.transaction() as cur:
+            uuid_id = self._resolve_entry_id(cur, diary_id)
+            if not uuid_id:
+                return False
+            self._upsert_related_data_batch(
+                cur, [(uuid_id, {'followup_questions': followup_questions})], ('followup_questions',)
+            )
+            cur.execute('UPDATE diary_entries SET version = version + 1 WHERE id = ?', (uuid_id,))
+            return True
+
+    def add_qa_chain(self, diary_id: str, qa_chain: list[dict[str, Any]]) -> bool:
+        """既存の日記エントリのQ&A履歴をqa_chainの内容に置き換え（UPDATEベース）
         
-        try:
-            # 既存のフォローアップ質問を取得
-            cur.execute('SELECT id, question, order_index FROM followup_questions WHERE diary_entry_id = ? ORDER BY order_index', (diary_id,))
-            existing_questions = cur.fetchall()
-            
-            # 新しいフォローアップ質問を処理
-            for i, question in enumerate(followup_questions):
-                if i < len(existing_questions):
-                    # 既存のレコードを更新
-                    cur.execute('''
-                        UPDATE followup_questions SET question = ? WHERE id = ?
-                    ''', (question, existing_questions[i][0]))
-                else:
-                    # 新しいレコードを追加
-                    question_id = str(uuid.uuid4())
-                    cur.execute('''
-                        INSERT INTO followup_questions (id, diary_entry_id, question, order_index)
-                        VALUES (?, ?, ?, ?)
-                    ''', (question_id, diary_id, question, i))
-            
-            # 余分な既存レコードを削除（新しいリストより多い場合）
-            if len(existing_questions) > len(followup_questions):
-                for i in range(len(followup_questions), len(existing_questions)):
-                    cur.execute('DELETE FROM followup_questions WHERE id = ?', (existing_questions[i][0],))
-            
-            conn.commit()
+        qa_chainは履歴全体として扱う。回答を末尾に追加する場合は append_qa を使う。
+        """
+        with self._pool.transaction() as cur:
+            uuid_id = self._resolve_entry_id(cur, diary_id)
+            if not uuid_id:
+                return False
+            self._upsert_related_data_batch(cur, [(uuid_id, {'qa_chain': qa_chain})], ('qa_chain',))
+            cur.execute('UPDATE diary_entries SET version = version + 1 WHERE id = ?', (uuid_id,))
             return True
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
-    def add_qa_chain(self, diary_id: str, qa_chain: list[dict[str, Any]]) -> bool:
-        """既存の日記エントリにQ&A履歴を追加（UPDATEベース）"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
+    def append_qa(self, diary_id: str, question: str, answer: str, created_at: str = '',
+                  user_id: Optional[str] = None) -> bool:
+        """既存の日記エントリのQ&A履歴の末尾に1件追加"""
+        return self.append_qa_batch(
+            diary_id, [{'question': question, 'answer': answer, 'created_at': created_at}], user_id
+        )
+    
+    def append_qa_batch(self, diary_id: str, qa_items: list[dict[str, Any]],
+                        user_id: Optional[str] = None) -> bool:
+        """既存の日記エントリのQ&A履歴の末尾に複数件を順に追加
         
-        try:
-            # 既存のQ&A履歴を取得
-            cur.execute('''
-                SELECT id, question, answer, created_at, order_index
-                FROM qa_chain 
-                WHERE diary_entry_id = ? 
-                ORDER BY order_index
-            ''', (diary_id,))
-            existing_qa_chain = cur.fetchall()
-            
-            # 新しいQ&A履歴を処理
-            for i, qa in enumerate(qa_chain):
-                if i < len(existing_qa_chain):
-                    # 既存のレコードを更新
-                    cur.execute('''
-                        UPDATE qa_chain 
-                        SET question = ?, answer = ?, created_at = ?
-                        WHERE id = ?
-                    ''', (qa.get('question', ''), qa.get('answer', ''), qa.get('created_at', ''), existing_qa_chain[i][0]))
-                else:
-                    # 新しいレコードを追加
-                    qa_id = str(uuid.uuid4())
-                    cur.execute('''
-                        INSERT INTO qa_chain (id, diary_entry_id, question, answer, created_at, order_index)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (qa_id, diary_id, qa.get('question', ''), qa.get('answer', ''), qa.get('created_at', ''), i))
-            
-            # 余分な既存レコードを削除（新しいリストより多い場合）
-            if len(existing_qa_chain) > len(qa_chain):
-                for i in range(len(qa_chain), len(existing_qa_chain)):
-                    cur.execute('DELETE FROM qa_chain WHERE id = ?', (existing_qa_chain[i][0],))
+        既存の履歴は読み込まず、order_indexの最大値+1の位置にINSERT...SELECTで追加するため、
+        履歴の長さによらず1件あたり一定のコストで書き込める。
+        user_idを指定した場合はそのユーザーのエントリにだけ追加する。
+        エントリが見つからなければ何も書き込まずにFalseを返す。
+        """
+        user_filter = ' AND user_id = ?' if user_id is not None else ''
+        user_params = (user_id,) if user_id is not None else ()
+        with self._pool.transaction() as cur:
+            # 行バージョンを進めると同時にエントリの存在を確認
+            cur.execute(f'''
+                UPDATE diary_entries SET version = version + 1
+                WHERE (original_id = ? OR id = ?){user_filter}
+            ''', (diary_id, diary_id, *user_params))
+            if cur.rowcount == 0:
+                return False
             
-            conn.commit()
+            cur.executemany(f'''
+                INSERT INTO qa_chain (id, diary_entry_id, question, answer, created_at, order_index)
+                SELECT ?, e.id, ?, ?, ?, (
+                    SELECT coalesce(max(order_index) + 1, 0) FROM qa_chain WHERE diary_entry_id = e.id
+                )
+                FROM diary_entries e
+                WHERE (e.original_id = ? OR e.id = ?){user_filter}
+            ''', [
+                (
+                    str(uuid.uuid4()), qa.get('question', ''), qa.get('answer', ''), qa.get('created_at', ''),
+                    diary_id, diary_id, *user_params
+                )
+                for qa in qa_items
+            ])
             return True
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
-    def get_all_diary_data(self) -> list[dict[str, Any]]:
+    def _resolve_entry_id(self, cur: sqlite3.Cursor, entry_id: str) -> Optional[str]:
+        """元のID（original_id）またはUUIDからエントリのUUIDを取得（見つからなければNone）"""
+        cur.execute('SELECT id FROM diary_entries WHERE original_id = ? OR id = ?', (entry_id, entry_id))
+        result = cur.fetchone()
+        return result[0] if result else None
+    
+    def get_entry(self, entry_id: str, user_id: Optional[str] = None) -> Optional[DiaryEntry]:
+        """元のIDまたはUUIDで日記エントリを1件取得（見つからなければNone）
+        
+        インデックスで引くため履歴の件数によらず一定の時間で取得できる。
+        user_idを指定した場合はそのユーザーのエントリだけを対象にする。
+        戻り値は get_user_diary_data と同じ形式（idはUUID、original_idを含む）。
+        """
+        entries = self.get_entries([entry_id], user_id)
+        return entries[0] if entries else None
+    
+    def get_entries(self, entry_ids: list[str], user_id: Optional[str] = None) -> list[DiaryEntry]:
+        """元のIDまたはUUIDのリストで日記エントリをまとめて取得
+        
+        指定した順に返し、見つからないIDは飛ばす。
+        各エントリには patch_diary_entry の expected_version に渡す 'version'（行バージョン）を含める。
+        """
+        if not entry_ids:
+            return []
+        user_filter = ' AND user_id = ?' if user_id is not None else ''
+        user_params = (user_id,) if user_id is not None else ()
+        with self._pool.snapshot() as cur:
+            rows = []
+            for placeholders, params in self._id_filters(list(dict.fromkeys(entry_ids))):
+                cur.execute(f'''
+                    SELECT id, original_id, created_at, date, text, question, user_id, version
+                    FROM diary_entries
+                    WHERE (id IN ({placeholders}) OR original_id IN ({placeholders})){user_filter}
+                ''', (*params, *params, *user_params))
+                rows.extend(cur.fetchall())
+            related = self._fetch_related_data(cur, list(dict.fromkeys(row[0] for row in rows)))
+        
+        entries = self._build_entries(rows, related, keep_uuid=True)
+        by_original_id = {entry['original_id']: entry for entry in entries if entry['original_id']}
+        by_id = {entry['id']: entry for entry in entries}
+        return [
+            by_id.get(entry_id) or by_original_id[entry_id]
+            for entry_id in entry_ids
+            if entry_id in by_id or entry_id in by_original_id
+        ]
+
+    def get_all_diary_data(self) -> list[DiaryEntry]:
         """全ての日記データを取得（JSON形式に変換）"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
+        return self._cached_read(None, ('all',), self._load_entries)
+    
+    def _load_entries(self, cur: sqlite3.Cursor, where: str = '', params: tuple = (), keep_uuid: bool = False) -> list[DiaryEntry]:
+        """条件に合うメインエントリと関連データを一括取得して日記データを組み立てる
         
-        # メインエントリを取得
-        cur.execute('''
+        whereは diary_entries に対する WHERE 句（例: 'WHERE user_id = ?'）。
+        keep_uuid=Trueの場合はidにUUIDを使い、original_idも含める（ユーザー別取得の形式）。
+        """
+        cur.execute(f'''
             SELECT id, original_id, created_at, date, text, question, user_id
             FROM diary_entries
-            ORDER BY created_at DESC
-        ''')
-        entries = cur.fetchall()
+            {where}
+            ORDER BY created_at DESC, id DESC
+        ''', params)
+        rows = cur.fetchall()
         
-        result = []
-        for entry in entries:
-            diary_id = entry[0]
-            
-            # 関連データを取得
-            topics = self._get_topics(cur, diary_id)
-            emotions = self._get_emotions(cur, diary_id)
-            thoughts = self._get_thoughts(cur, diary_id)
-            goals = self._get_goals(cur, diary_id)
-            followup_questions = self._get_followup_questions(cur, diary_id)
-            qa_chain = self._get_qa_chain(cur, diary_id)
+        related = self._fetch_related_data(
+            cur, [row[0] for row in rows], (f'SELECT id FROM diary_entries {where}', params)
+        )
+        return self._build_entries(rows, related, keep_uuid)
+    
+    def get_user_diary_page(self, user_id: Optional[str], page_size: int = DEFAULT_PAGE_SIZE,
+                            cursor: Optional[tuple[str, str]] = None, date: Optional[str] = None,
+                            start_date: Optional[str] = None, end_date: Optional[str] = None,
+                            created_from: Optional[str] = None, created_to: Optional[str] = None,
+                            text_contains: Optional[str] = None) -> dict[str, Any]:
+        """日記データを新しい順に1ページ分取得（キーセットページング）
+        
+        cursorには前のページの next_cursor（最後のエントリの (created_at, UUID)）を渡す。
+        OFFSETを使わずカーソル位置からインデックスを読むため、何ページ目でも
+        履歴の総件数によらず同じ時間で取得できる。
+        user_idがNoneの場合は全ユーザーのデータを get_all_diary_data と同じ形式（'version' を加えたもの）で返す。
+        戻り値は {'entries': エントリのリスト, 'next_cursor': 次ページのカーソル（最後のページならNone）}。
+        """
+        conditions = []
+        params: list[Any] = []
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        if date:
+            conditions.append('date = ?')
+            params.append(date)
+        if start_date:
+            conditions.append('date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('date <= ?')
+            params.append(end_date)
+        if created_from:
+            conditions.append('created_at >= ?')
+            params.append(created_from)
+        if created_to:
+            conditions.append('created_at <= ?')
+            params.append(created_to)
+        if text_contains:
+            conditions.append("text LIKE ? ESCAPE '\\'")
+            escaped = text_contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        if cursor:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(cursor)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        
+        def load(cur: sqlite3.Cursor) -> dict[str, Any]:
+            # 次のページがあるか判定するため1件多く取得
+            cur.execute(f'''
+                SELECT id, original_id, created_at, date, text, question, user_id, version
+                FROM diary_entries
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (*params, page_size + 1))
+            rows = cur.fetchall()
             
-            # JSON形式に変換
-            diary_entry = {
-                'id': entry[1] or entry[0],  # original_idがあれば使用、なければUUID
-                'created_at': entry[2],
-                'date': entry[3],
-                'text': entry[4],
-                'question': entry[5],
-                'user_id': entry[6],
-                'topics': topics,
-                'emotions': emotions,
-                'thoughts': thoughts,
-                'goals': goals,
-                'followup_questions': followup_questions,
-                'qa_chain': qa_chain
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            related = self._fetch_related_data(cur, [row[0] for row in rows])
+            return {
+                'entries': self._build_entries(rows, related, keep_uuid=user_id is not None),
+                'next_cursor': (rows[-1][2], rows[-1][0]) if has_more else None
             }
+        
+        key = ('page', page_size, tuple(cursor) if cursor else None, date, start_date, end_date,
+               created_from, created_to, text_contains)
+        return self._cached_read(user_id, key, load)
+    
+    def iter_user_entries(self, user_id: Optional[str], start_date: Optional[str] = None,
+                          end_date: Optional[str] = None,
+                          chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[DiaryEntry]:
+        """日記エントリを新しい順に1件ずつ返すジェネレーター
+        
+        get_user_diary_page と同じキーセットページングでchunk_size件ずつ読み、チャンクごとに関連データを取得する。
+        保持するのは1チャンク分だけなので、履歴の件数によらずメモリ使用量が一定になる。
+        トランザクションはチャンクを読む間だけ開き、yieldの間は接続を返却しておくため、
+        読み進める途中で同じスレッドから書き込んでもその書き込みはすぐにコミットされる。
+        途中で追加・変更されたエントリは、まだ読んでいない位置にあれば結果に含まれる（同じエントリを2回返すことはない）。
+        読み取りキャッシュは使わない。
+        user_idがNoneの場合は全ユーザーのデータを get_all_diary_data と同じ形式で返す。
+        """
+        conditions = []
+        params: list[Any] = []
+        if user_id is not None:
+            conditions.append('user_id = ?')
+            params.append(user_id)
+        if start_date:
+            conditions.append('date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('date <= ?')
+            params.append(end_date)
+        
+        cursor: Optional[tuple[str, str]] = None
+        while True:
+            page_conditions = conditions + ['(created_at, id) < (?, ?)'] if cursor else conditions
+            where = f'WHERE {" AND ".join(page_conditions)}' if page_conditions else ''
+            with self._pool.snapshot() as cur:
+                cur.execute(f'''
+                    SELECT id, original_id, created_at, date, text, question, user_id
+                    FROM diary_entries
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', (*params, *(cursor or ()), chunk_size))
+                rows = cur.fetchall()
+                if not rows:
+                    return
+                related = self._fetch_related_data(cur, [row[0] for row in rows])
             
+            yield from self._build_entries(rows, related, keep_uuid=user_id is not None)
+            if len(rows) < chunk_size:
+                return
+            cursor = (rows[-1][2], rows[-1][0])
+    
+    def search_diary_entries(self, user_id: Optional[str], query: str, limit: int = DEFAULT_SEARCH_LIMIT,
+                             start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             highlight: tuple[str, str] = ('**', '**'), offset: int = 0) -> list[DiaryEntry]:
+        """本文・Q&A・思考・目標を全文検索し、関連度の高い順に offset 件目から limit 件を返す
+        
+        空白区切りの語をすべて含むエントリを返す（AND検索）。
+        3文字以上の語はFTS5のtrigramインデックスで探し、一致したすべてのエントリをbm25の順に並べる。
+        3文字未満の語は索引できないため部分一致で絞り込み、その語しかない場合は新しい順に並べる。
+        各エントリには 'version'（行バージョン）のほか、'snippet'（一致箇所をhighlightで囲んだ抜粋）と
+        'score'（bm25の値、小さいほど関連度が高い。部分一致のみの場合はNone）を追加する。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        long_terms = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+        short_terms = [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+        
+        conditions = []
+        params: list[Any] = []
+        if user_id is not None:
+            conditions.append('e.user_id = ?')
+            params.append(user_id)
+        if start_date:
+            conditions.append('e.date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('e.date <= ?')
+            params.append(end_date)
+        for term in short_terms:
+            conditions.append(f'instr(lower({SEARCH_DOCUMENT_SQL}), ?) > 0')
+            params.append(term.lower())
+        
+        columns = f'e.id, e.original_id, e.created_at, e.date, e.text, e.question, e.user_id, e.version, {SEARCH_DOCUMENT_SQL}'
+        with self._pool.snapshot() as cur:
+            if long_terms:
+                # 各語をフレーズとして引用符で囲み、FTS5の演算子として解釈されないようにする
+                match = ' '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+                where = ''.join(f' AND {condition}' for condition in conditions)
+                cur.execute(f'''
+                    SELECT {columns}, bm25(diary_search)
+                    FROM diary_search s
+                    JOIN diary_entries e ON e.rowid = s.rowid
+                    WHERE diary_search MATCH ?{where}
+                    ORDER BY bm25(diary_search), e.created_at DESC, e.id DESC
+                    LIMIT ? OFFSET ?
+                ''', (match, *params, limit, offset))
+            else:
+                cur.execute(f'''
+                    SELECT {columns}, NULL
+                    FROM diary_entries e
+                    JOIN diary_search s ON s.rowid = e.rowid
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY e.created_at DESC, e.id DESC
+                    LIMIT ? OFFSET ?
+                ''', (*params, limit, offset))
+            rows = cur.fetchall()
+            related = self._fetch_related_data(cur, [row[0] for row in rows])
+        
+        entries = self._build_entries([row[:8] for row in rows], related, keep_uuid=user_id is not None)
+        for entry, row in zip(entries, rows):
+            entry['snippet'] = self._make_snippet(row[8], terms, highlight)
+            entry['score'] = row[9]
+        return entries
+    
+    def _make_snippet(self, document: str, terms: list[str], highlight: tuple[str, str], width: int = 40) -> str:
+        """部分一致した語の前後を切り出して強調した抜粋を作成"""
+        lowered = document.lower()
+        positions = [lowered.find(term.lower()) for term in terms]
+        position = min((p for p in positions if p >= 0), default=0)
+        start = max(0, position - width // 2)
+        excerpt = document[start:start + width]
+        for term in terms:
+            index = excerpt.lower().find(term.lower())
+            if index >= 0:
+                excerpt = (excerpt[:index] + highlight[0] + excerpt[index:index + len(term)]
+                           + highlight[1] + excerpt[index + len(term):])
+        prefix = '…' if start > 0 else ''
+        suffix = '…' if start + width < len(document) else ''
+        return f'{prefix}{excerpt}{suffix}'
+    
+    def _build_entries(self, rows: list[tuple], related: dict[str, dict[str, list]], keep_uuid: bool = False) -> list[DiaryEntry]:
+        """メインエントリの行と関連データから日記データを組み立てる
+        
+        rowsは (id, original_id, created_at, date, text, question, user_id) の形式。
+        8列目に行バージョンがある場合は 'version' に持たせる（表示したエントリをそのまま
+        patch_diary_entry の expected_version に渡せるよう、1件・1ページ単位の取得で読み込む）。
+        関連データは TagTuple にして DiaryEntry に持たせる（空の場合は共有の空タプルになる）。
+        """
+        result = []
+        for row in rows:
+            children = related[row[0]]
+            diary_entry = DiaryEntry(
+                row[0] if keep_uuid else row[1] or row[0],  # original_idがあれば使用、なければUUID
+                row[2], row[3], row[4], row[5], row[6],
+                make_tags(children['topics']),
+                make_tags(children['emotions']),
+                make_tags(children['thoughts']),
+                make_tags(children['goals']),
+                make_tags(children['followup_questions']),
+                make_tags(children['qa_chain'])
+            )
+            if keep_uuid:
+                diary_entry.original_id = row[1]
+            if len(row) > 7:
+                diary_entry.version = row[7]
             result.append(diary_entry)
         
-        conn.close()
         return result
-    
-    def _get_topics(self, cur: sqlite3.Cursor, diary_id: str) -> list[str]:
-        """トピックを取得"""
-        cur.execute('SELECT topic FROM topics WHERE diary_entry_id = ? ORDER BY topic', (diary_id,))
-        return [row[0] for row in cur.fetchall()]
-    
-    def _get_emotions(self, cur: sqlite3.Cursor, diary_id: str) -> list[str]:
-        """感情を取得"""
-        cur.execute('SELECT emotion FROM emotions WHERE diary_entry_id = ? ORDER BY emotion', (diary_id,))
-        return [row[0] for row in cur.fetchall()]
-    
-    def _get_thoughts(self, cur: sqlite3.Cursor, diary_id: str) -> list[str]:
-        """思考を取得"""
-        cur.execute('SELECT thought FROM thoughts WHERE diary_entry_id = ? ORDER BY thought', (diary_id,))
-        return [row[0] for row in cur.fetchall()]
-    
-    def _get_goals(self, cur: sqlite3.Cursor, diary_id: str) -> list[str]:
-        """目標を取得"""
-        cur.execute('SELECT goal FROM goals WHERE diary_entry_id = ? ORDER BY goal', (diary_id,))
-        return [row[0] for row in cur.fetchall()]
-    
-    def _get_followup_questions(self, cur: sqlite3.Cursor, diary_id: str) -> list[str]:
-        """追加質問を取得"""
-        cur.execute('SELECT question FROM followup_questions WHERE diary_entry_id = ? ORDER BY order_index', (diary_id,))
-        return [row[0] for row in cur.fetchall()]
-    
-    def _get_qa_chain(self, cur: sqlite3.Cursor, diary_id: str) -> list[dict[str, Any]]:
-        """Q&A履歴を取得"""
-        cur.execute('''
-            SELECT question, answer, created_at, order_index
-            FROM qa_chain 
-            WHERE diary_entry_id = ? 
-            ORDER BY order_index
-        ''', (diary_id,))
+
+    def _fetch_related_data(self, cur: sqlite3.Cursor, diary_ids: list[str], id_subquery: Optional[tuple[str, tuple]] = None) -> dict[str, dict[str, list]]:
+        """関連データをテーブルごとに一括取得し、エントリ別に振り分ける
         
-        return [
-            {
-                'question': row[0],
-                'answer': row[1],
-                'created_at': row[2]
+        件数が少なければIDをIN句に直接渡し、多い場合はid_subquery（IDを返すSELECT文と
+        パラメータ）をIN句のサブクエリとして使うことで、件数によらずテーブルごとに1クエリで済ませる。
+        タグなど同じ値が繰り返し現れる文字列は1つのオブジェクトを共有させる。
+        """
+        related = {
+            diary_id: {
+                'topics': [], 'emotions': [], 'thoughts': [], 'goals': [],
+                'followup_questions': [], 'qa_chain': []
             }
-            for row in cur.fetchall()
+            for diary_id in diary_ids
+        }
+        if not diary_ids:
+            return related
+        
+        strings: dict[str, str] = {}
+        if id_subquery and len(diary_ids) > IN_CLAUSE_CHUNK_SIZE:
+            id_filters = [id_subquery]
+        else:
+            id_filters = self._id_filters(diary_ids)
+        
+        for id_sql, id_params in id_filters:
+            for key, table, column, order_by in RELATED_LIST_TABLES:
+                cur.execute(f'''
+                    SELECT diary_entry_id, {column} FROM {table}
+                    WHERE diary_entry_id IN ({id_sql})
+                    ORDER BY {order_by}
+                ''', id_params)
+                for diary_id, value in cur.fetchall():
+                    related[diary_id][key].append(strings.setdefault(value, value))
+            
+            cur.execute(f'''
+                SELECT diary_entry_id, question, answer, created_at
+                FROM qa_chain
+                WHERE diary_entry_id IN ({id_sql})
+                ORDER BY order_index
+            ''', id_params)
+            for diary_id, question, answer, created_at in cur.fetchall():
+                related[diary_id]['qa_chain'].append(
+                    QAItem(strings.setdefault(question, question), answer, created_at)
+                )
+        
+        return related
+    
+    def _id_filters(self, diary_ids: list[str]) -> list[tuple[str, tuple]]:
+        """IDのリストをIN句用のプレースホルダとパラメータに分割"""
+        return [
+            (','.join('?' * len(chunk)), tuple(chunk))
+            for chunk in (
+                diary_ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+                for start in range(0, len(diary_ids), IN_CLAUSE_CHUNK_SIZE)
+            )
         ]
     
-    def get_diary_by_date_range(self, start_date: str, end_date: str) -> list[dict[str, Any]]:
+    def get_diary_by_date_range(self, start_date: str, end_date: str) -> list[DiaryEntry]:
         """日付範囲で日記データを取得"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
+        return self._cached_read(
+            None, ('date_range', start_date, end_date),
+            lambda cur: self._load_entries(cur, 'WHERE date BETWEEN ? AND ?', (start_date, end_date))
+        )
+    
+    def _rollup_filter(self, user_id: Optional[str], start_date: Optional[str],
+                       end_date: Optional[str]) -> tuple[str, str, tuple]:
+        """ロールアップテーブルを読む集計単位と、追加の WHERE 条件・パラメータを作成
         
-        cur.execute('''
-            SELECT id, original_id, created_at, date, text, question, user_id
-            FROM diary_entries
-            WHERE date BETWEEN ? AND ?
-            ORDER BY created_at DESC
-        ''', (start_date, end_date))
+        期間の指定がなければ全期間の行を、あれば日次の行を範囲で読む。
+        """
+        conditions = ''
+        params: list[Any] = []
+        if user_id is not None:
+            conditions += ' AND user_id = ?'
+            params.append(user_id)
+        if start_date:
+            conditions += ' AND period_start >= ?'
+            params.append(start_date)
+        if end_date:
+            conditions += ' AND period_start <= ?'
+            params.append(end_date)
+        period = 'day' if start_date or end_date else 'all'
+        return period, conditions, tuple(params)
+    
+    def get_entry_summary(self, user_id: Optional[str], start_date: Optional[str] = None,
+                          end_date: Optional[str] = None) -> dict[str, Any]:
+        """件数・日付範囲・本文の長さを集計（ロールアップテーブルから読み、エントリは読み込まない）
         
-        entries = cur.fetchall()
-        result = []
+        user_idがNoneの場合は全ユーザーを対象にする。
+        戻り値は {'total_entries', 'start_date', 'end_date', 'total_text_length', 'avg_text_length'}。
+        """
+        period, conditions, params = self._rollup_filter(user_id, start_date, end_date)
+        with self._pool.snapshot() as cur:
+            cur.execute(f'''
+                SELECT COALESCE(SUM(entry_count), 0), COALESCE(SUM(text_length), 0)
+                FROM stats_entry_counts
+                WHERE period = ?{conditions}
+            ''', (period, *params))
+            total_entries, total_text_length = cur.fetchone()
+            cur.execute(f'''
+                SELECT MIN(NULLIF(period_start, '')), MAX(NULLIF(period_start, ''))
+                FROM stats_entry_counts
+                WHERE period = 'day' AND entry_count > 0{conditions}
+            ''', params)
+            first_date, last_date = cur.fetchone()
+        return {
+            'total_entries': total_entries,
+            'start_date': first_date,
+            'end_date': last_date,
+            'total_text_length': total_text_length,
+            'avg_text_length': total_text_length // total_entries if total_entries else 0
+        }
+    
+    def get_top_items(self, key: str, user_id: Optional[str], top_n: int = 5,
+                      start_date: Optional[str] = None, end_date: Optional[str] = None) -> list[tuple[str, int]]:
+        """トピック・感情・思考・目標の出現回数上位N件を (値, 回数) のリストで返す
         
-        for entry in entries:
-            diary_id = entry[0]
-            
-            # 関連データを取得
-            topics = self._get_topics(cur, diary_id)
-            emotions = self._get_emotions(cur, diary_id)
-            thoughts = self._get_thoughts(cur, diary_id)
-            goals = self._get_goals(cur, diary_id)
-            followup_questions = self._get_followup_questions(cur, diary_id)
-            qa_chain = self._get_qa_chain(cur, diary_id)
-            
-            diary_entry = {
-                'id': entry[1] or entry[0],
-                'created_at': entry[2],
-                'date': entry[3],
-                'text': entry[4],
-                'question': entry[5],
-                'user_id': entry[6],
-                'topics': topics,
-                'emotions': emotions,
-                'thoughts': thoughts,
-                'goals': goals,
-                'followup_questions': followup_questions,
-                'qa_chain': qa_chain
-            }
+        keyには 'topics'・'emotions'・'thoughts'・'goals' のいずれかを指定する。
+        """
+        if key not in STATISTICS_ITEM_TABLES:
+            raise ValueError(f"集計できない項目です: {key}")
+        if top_n <= 0:
+            return []
+        period, conditions, params = self._rollup_filter(user_id, start_date, end_date)
+        with self._pool.snapshot() as cur:
+            cur.execute(f'''
+                SELECT item, SUM(count) AS total
+                FROM stats_item_counts
+                WHERE period = ? AND kind = ?{conditions}
+                GROUP BY item
+                HAVING total > 0
+                ORDER BY total DESC, item
+                LIMIT ?
+            ''', (period, key, *params, top_n))
+            return [(item, count) for item, count in cur.fetchall()]
+    
+    def _period_entry_counts(self, period: str, user_id: Optional[str], start_date: Optional[str],
+                             end_date: Optional[str]) -> list[tuple[str, int]]:
+        """日次・週次のエントリ数を (期間の開始日, 件数) のリストで返す"""
+        _, conditions, params = self._rollup_filter(user_id, start_date, end_date)
+        with self._pool.snapshot() as cur:
+            cur.execute(f'''
+                SELECT period_start, SUM(entry_count) AS total
+                FROM stats_entry_counts
+                WHERE period = ?{conditions}
+                GROUP BY period_start
+                HAVING total > 0
+                ORDER BY period_start
+            ''', (period, *params))
+            return [(period_start, count) for period_start, count in cur.fetchall()]
+    
+    def get_daily_entry_counts(self, user_id: Optional[str], start_date: Optional[str] = None,
+                               end_date: Optional[str] = None) -> list[tuple[str, int]]:
+        """日付ごとのエントリ数を (日付, 件数) のリストで日付順に返す"""
+        return self._period_entry_counts('day', user_id, start_date, end_date)
+    
+    def get_weekly_entry_counts(self, user_id: Optional[str], start_date: Optional[str] = None,
+                                end_date: Optional[str] = None) -> list[tuple[str, int]]:
+        """週ごとのエントリ数を (週の月曜日, 件数) のリストで返す（期間は週の月曜日で絞り込む）"""
+        return self._period_entry_counts('week', user_id, start_date, end_date)
+    
+    def get_diary_statistics(self, user_id: Optional[str], start_date: Optional[str] = None,
+                             end_date: Optional[str] = None, top_n: int = 5) -> dict[str, Any]:
+        """統計画面用の集計をまとめて取得
+        
+        書き込み時にトリガーで更新されるロールアップテーブルを同じスナップショットから読むため、
+        履歴の件数によらず一定の時間で返る。
+        戻り値は get_entry_summary の値に 'date_range'（データがなければNone）、
+        'entries_per_day'・'entries_per_week' と 'top_topics' などの上位N件を加えたもの。
+        """
+        with self._pool.snapshot():
+            statistics = self.get_entry_summary(user_id, start_date, end_date)
+            statistics['entries_per_day'] = self.get_daily_entry_counts(user_id, start_date, end_date)
+            statistics['entries_per_week'] = self.get_weekly_entry_counts(user_id, start_date, end_date)
+            for key in STATISTICS_ITEM_TABLES:
+                statistics[f'top_{key}'] = self.get_top_items(key, user_id, top_n, start_date, end_date)
+        statistics['date_range'] = (
+            {'start': statistics['start_date'], 'end': statistics['end_date']}
+            if statistics['total_entries'] else None
+        )
+        return statistics
+    
+    def rebuild_statistics(self) -> dict[str, int]:
+        """ロールアップテーブルを元データから作り直し、ずれていた行数を返す
+        
+        通常はトリガーで最新に保たれるため、整合性の確認や復旧に使う。
+        戻り値は {'entry_rows': 件数の行数, 'item_rows': 出現回数の行数, 'mismatched': 作り直しで変わった行数}。
+        """
+        # (クエリ, 主キーの列数)
+        queries = (
+            ('SELECT user_id, period, period_start, entry_count, text_length FROM stats_entry_counts WHERE entry_count != 0', 3),
+            ('SELECT user_id, period, period_start, kind, item, count FROM stats_item_counts WHERE count != 0', 5),
+        )
+        
+        def read_rollups(cur: sqlite3.Cursor) -> list[dict[tuple, tuple]]:
+            return [{row[:key_size]: row[key_size:] for row in cur.execute(query)} for query, key_size in queries]
+        
+        with self._pool.transaction() as cur:
+            before = read_rollups(cur)
+            for statement in STATISTICS_REBUILD_SQL:
+                cur.execute(statement)
+            after = read_rollups(cur)
+        return {
+            'entry_rows': len(after[0]),
+            'item_rows': len(after[1]),
+            'mismatched': sum(
+                sum(old.get(key) != new.get(key) for key in old.keys() | new.keys())
+                for old, new in zip(before, after)
+            )
+        }
+    
+    def _export_sql(self, name: str, columns: tuple[str, ...]) -> str:
+        """列指向エクスポートの表を読むSELECT文（パラメータはuser_id）"""
+        entry_columns = [
+            'coalesce(e.original_id, e.id) AS entry_id' if column == 'entry_id' else f'e.{column}'
+            for column in columns if column in ('entry_id', 'created_at', 'date', 'text', 'question')
+        ]
+        if name == 'entries':
+            return f'''
+                SELECT {', '.join(entry_columns)}
+                FROM diary_entries e
+                WHERE e.user_id = ?
+                ORDER BY e.created_at, e.id
+            '''
+        value = columns[-1]
+        return f'''
+            SELECT {', '.join(entry_columns)}, t.{value}
+            FROM {name} t JOIN diary_entries e ON e.id = t.diary_entry_id
+            WHERE e.user_id = ?
+            ORDER BY e.created_at, e.id, t.{value}
+        '''
+    
+    def iter_user_frames(self, user_id: str,
+                         chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE) -> Iterator[tuple[str, 'pd.DataFrame']]:
+        """ユーザーのエントリ表とタグ表を (表の名前, DataFrame) のチャンクで順に返す
+        
+        pandas.read_sql でchunk_size行ずつ読み込むため、履歴全体を辞書のリストにせずに扱える。
+        すべての表を同じスナップショットから読み、読み終えるまで専用の接続を1つ使う。
+        読み込みの途中で同じスレッドから書き込んでも、その書き込みはすぐにコミットされる（結果には含まれない）。
+        タグの値は category 型（辞書エンコード）、date は datetime64 型にする。
+        カテゴリはチャンクをまたいで追加していくため、前のチャンクのカテゴリは後のチャンクの先頭部分と一致する。
+        表にデータがない場合も、列だけを持つ空のDataFrameを1つ返す。
+        """
+        import pandas as pd
+        
+        with self._pool.dedicated_snapshot() as cur:
+            for name, columns, category_columns in EXPORT_TABLES:
+                categories = {column: {} for column in category_columns}
+                for chunk in pd.read_sql_query(
+                    self._export_sql(name, columns), cur.connection, params=(user_id,), chunksize=chunk_size
+                ):
+                    for column, known in categories.items():
+                        for value in chunk[column].dropna().unique():
+                            known.setdefault(value, None)
+                        chunk[column] = pd.Categorical(chunk[column], categories=list(known))
+                    chunk['date'] = pd.to_datetime(chunk['date'], format='%Y-%m-%d', errors='coerce')
+                    yield name, chunk
+    
+    def get_user_frames(self, user_id: str) -> dict[str, 'pd.DataFrame']:
+        """ユーザーのエントリ表とタグ表を、表の名前をキーにしたDataFrameで返す"""
+        import pandas as pd
+        
+        chunks = {name: [] for name, *_ in EXPORT_TABLES}
+        for name, chunk in self.iter_user_frames(user_id):
+            chunks[name].append(chunk)
+        
+        frames = {}
+        for name, columns, category_columns in EXPORT_TABLES:
+            # チャンクごとにカテゴリが異なるため、連結した後でcategory型に戻す
+            frame = pd.concat(chunks[name], ignore_index=True)
+            frames[name] = frame.astype({column: 'category' for column in category_columns})
+        return frames
+    
+    def export_user_columnar(self, user_id: str, directory: str, file_format: str = 'parquet',
+                             chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE) -> dict[str, dict[str, Any]]:
+        """ユーザーのエントリ表とタグ表を、表ごとのParquetまたはArrow IPCファイルに書き出す
+        
+        iter_user_frames のチャンクを順にファイルへ追記するため、メモリ使用量は履歴の件数によらない。
+        Arrow IPCファイルでは、チャンクごとに増えたカテゴリを辞書の差分として書き込む。
+        タグの列は辞書エンコード（dictionary<int32, string>）、date は date32 型で保存する。
+        pyarrowが必要。戻り値は表の名前ごとの {'path': ファイルパス, 'rows': 行数}。
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"未対応の形式です: {file_format}（{', '.join(EXPORT_FORMATS)} のいずれか）")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrowパッケージがインストールされていません。pip install pyarrow でインストールしてください。")
+        
+        os.makedirs(directory, exist_ok=True)
+        schemas, writers, result = {}, {}, {}
+        try:
+            for name, columns, category_columns in EXPORT_TABLES:
+                schemas[name] = pa.schema([
+                    (column, pa.dictionary(pa.int32(), pa.string()) if column in category_columns
+                     else pa.date32() if column == 'date' else pa.string())
+                    for column in columns
+                ])
+                path = os.path.join(directory, f'{name}.{file_format}')
+                if file_format == 'parquet':
+                    writers[name] = pq.ParquetWriter(path, schemas[name])
+                else:
+                    writers[name] = pa.ipc.new_file(
+                        path, schemas[name], options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                    )
+                result[name] = {'path': path, 'rows': 0}
             
-            result.append(diary_entry)
+            for name, chunk in self.iter_user_frames(user_id, chunk_size):
+                writers[name].write_table(pa.Table.from_pandas(chunk, schema=schemas[name], preserve_index=False))
+                result[name]['rows'] += len(chunk)
+        finally:
+            for writer in writers.values():
+                writer.close()
         
-        conn.close()
         return result
     
     def delete_diary_entry(self, entry_id: str) -> bool:
         """指定IDの日記エントリを削除"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
-        try:
+        with self._pool.transaction() as cur:
             # まずUUIDを取得
-            cur.execute('SELECT id FROM diary_entries WHERE original_id = ? OR id = ?', (entry_id, entry_id))
-            result = cur.fetchone()
-            
-            if not result:
+            uuid_id = self._resolve_entry_id(cur, entry_id)
+            if not uuid_id:
                 return False
             
-            uuid_id = result[0]
-            
             # 関連データを削除（CASCADE制約により自動削除されるはずだが、念のため）
             cur.execute('DELETE FROM topics WHERE diary_entry_id = ?', (uuid_id,))
             cur.execute('DELETE FROM emotions WHERE diary_entry_id = ?', (uuid_id,))
@@ -647,66 +1014,206 @@ class DiaryManagerSQLite:
             cur.execute('DELETE FROM goals WHERE diary_entry_id = ?', (uuid_id,))
             cur.execute('DELETE FROM followup_questions WHERE diary_entry_id = ?', (uuid_id,))
             cur.execute('DELETE FROM qa_chain WHERE diary_entry_id = ?', (uuid_id,))
+            cur.execute('DELETE FROM analysis_jobs WHERE diary_entry_id = ?', (uuid_id,))
             
             # メインエントリを削除
             cur.execute('DELETE FROM diary_entries WHERE id = ?', (uuid_id,))
             
-            conn.commit()
             return True
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
     
     def update_diary_entry(self, entry_id: str, updated_data: dict[str, Any]) -> bool:
-        """日記エントリを更新"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
+        """日記エントリを更新（updated_dataに含まれる項目だけを書き換える）"""
+        changes = {
+            key: value for key, value in updated_data.items()
+            if key in PATCHABLE_COLUMNS or key in RELATED_WRITE_KEYS
+        }
+        return self.patch_diary_entry(entry_id, changes) is not None
+    
+    def patch_diary_entry(self, entry_id: str, changes: dict[str, Any],
+                          expected_version: Optional[int] = None) -> Optional[int]:
+        """指定した項目だけを更新し、更新後の行バージョンを返す（エントリがなければNone）
         
-        try:
-            # UUIDを取得
-            cur.execute('SELECT id FROM diary_entries WHERE original_id = ? OR id = ?', (entry_id, entry_id))
-            result = cur.fetchone()
+        changesのキーは PATCHABLE_COLUMNS のカラムか、関連データのキー（'topics'・'qa_chain' など）。
+        カラムは1文のUPDATEでまとめて書き換え、関連データは指定されたテーブルだけを差分で更新する。
+        expected_versionを指定した場合は、行バージョンが一致するときだけ更新し、
+        別のセッションが先に更新していたら EntryConflictError を送出する。
+        """
+        unknown = [key for key in changes if key not in PATCHABLE_COLUMNS and key not in RELATED_WRITE_KEYS]
+        if unknown:
+            raise ValueError(f"更新できない項目です: {', '.join(unknown)}")
+        
+        columns = [key for key in PATCHABLE_COLUMNS if key in changes]
+        related_keys = tuple(key for key in RELATED_WRITE_KEYS if key in changes)
+        assignments = ''.join(f'{column} = ?, ' for column in columns)
+        version_filter = ' AND version = ?' if expected_version is not None else ''
+        
+        with self._pool.transaction() as cur:
+            uuid_id = self._resolve_entry_id(cur, entry_id)
+            if not uuid_id:
+                return None
             
-            if not result:
-                return False
+            # 行バージョンの確認・更新と、カラムの書き換えを1文で行う
+            params = [changes[column] for column in columns] + [uuid_id]
+            if expected_version is not None:
+                params.append(expected_version)
+            cur.execute(f'''
+                UPDATE diary_entries
+                SET {assignments}version = version + 1
+                WHERE id = ?{version_filter}
+            ''', params)
+            if cur.rowcount == 0:
+                raise EntryConflictError(f"日記エントリ {entry_id} は別のセッションで更新されています")
             
-            uuid_id = result[0]
+            if related_keys:
+                self._upsert_related_data_batch(cur, [(uuid_id, changes)], related_keys)
             
-            # メインデータを更新
+            cur.execute('SELECT version FROM diary_entries WHERE id = ?', (uuid_id,))
+            return cur.fetchone()[0]
+    
+    def patch_diary_entries_batch(self, patches: list[tuple[str, dict[str, Any], Optional[int]]]) -> list[str]:
+        """複数エントリの指定項目を1トランザクションでまとめて更新し、更新できなかったエントリのIDを返す
+        
+        patchesは (entry_id, changes, expected_version) のリスト。changesの扱いは patch_diary_entry と同じで、
+        関連データは同じキーを持つエントリごとにテーブル単位でまとめて差分更新する。
+        エントリが見つからない場合や行バージョンが一致しない場合は、例外を送出せずにそのエントリだけを飛ばす。
+        """
+        for _, changes, _ in patches:
+            unknown = [key for key in changes if key not in PATCHABLE_COLUMNS and key not in RELATED_WRITE_KEYS]
+            if unknown:
+                raise ValueError(f"更新できない項目です: {', '.join(unknown)}")
+        
+        skipped = []
+        related_groups: dict[tuple[str, ...], list[tuple[str, dict[str, Any]]]] = {}
+        with self._pool.transaction() as cur:
+            for entry_id, changes, expected_version in patches:
+                uuid_id = self._resolve_entry_id(cur, entry_id)
+                if not uuid_id:
+                    skipped.append(entry_id)
+                    continue
+                
+                columns = [key for key in PATCHABLE_COLUMNS if key in changes]
+                assignments = ''.join(f'{column} = ?, ' for column in columns)
+                params = [changes[column] for column in columns] + [uuid_id]
+                version_filter = ''
+                if expected_version is not None:
+                    version_filter = ' AND version = ?'
+                    params.append(expected_version)
+                cur.execute(f'''
+                    UPDATE diary_entries
+                    SET {assignments}version = version + 1
+                    WHERE id = ?{version_filter}
+                ''', params)
+                if cur.rowcount == 0:
+                    skipped.append(entry_id)
+                    continue
+                
+                related_keys = tuple(key for key in RELATED_WRITE_KEYS if key in changes)
+                if related_keys:
+                    related_groups.setdefault(related_keys, []).append((uuid_id, changes))
+            
+            for related_keys, items in related_groups.items():
+                self._upsert_related_data_batch(cur, items, related_keys)
+        
+        return skipped
+    
+    # ===== 分析ジョブ =====
+    
+    def _job_timestamp(self, offset_seconds: float = 0) -> str:
+        """分析ジョブに記録する日時（現在からoffset_seconds秒ずらした時刻）"""
+        return (datetime.datetime.now() + datetime.timedelta(seconds=offset_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def _insert_analysis_job(self, cur: sqlite3.Cursor, uuid_id: str) -> int:
+        """未完了のジョブがなければ分析ジョブを登録し、そのエントリの未完了ジョブのIDを返す"""
+        placeholders = ','.join('?' * len(ANALYSIS_ACTIVE_STATUSES))
+        cur.execute(f'''
+            SELECT id FROM analysis_jobs
+            WHERE diary_entry_id = ? AND status IN ({placeholders})
+        ''', (uuid_id, *ANALYSIS_ACTIVE_STATUSES))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        now = self._job_timestamp()
+        cur.execute('''
+            INSERT INTO analysis_jobs (diary_entry_id, status, created_at, updated_at)
+            VALUES (?, 'pending', ?, ?)
+        ''', (uuid_id, now, now))
+        return cur.lastrowid
+    
+    def enqueue_analysis(self, entry_id: str) -> Optional[int]:
+        """元のIDまたはUUIDで指定したエントリの分析ジョブを登録し、ジョブIDを返す（エントリがなければNone）
+        
+        同じエントリの未完了のジョブがあれば新しく登録せず、そのジョブのIDを返す。
+        """
+        with self._pool.transaction() as cur:
+            uuid_id = self._resolve_entry_id(cur, entry_id)
+            if not uuid_id:
+                return None
+            return self._insert_analysis_job(cur, uuid_id)
+    
+    def claim_analysis_job(self, lease_seconds: float = DEFAULT_ANALYSIS_LEASE_SECONDS) -> Optional[dict[str, Any]]:
+        """最も古い待機中のジョブを実行中にして返す（なければNone）
+        
+        実行中のまま lease_seconds を過ぎたジョブ（ワーカーが途中で止まったもの）も引き継ぐ。
+        戻り値は {'id', 'entry_id'（UUID）, 'attempts'（今回を含む実行回数）}。
+        """
+        with self._pool.transaction() as cur:
             cur.execute('''
-                UPDATE diary_entries 
-                SET text = ?, question = ?, created_at = ?, date = ?
+                SELECT id, diary_entry_id, attempts FROM analysis_jobs
+                WHERE status = 'pending' OR (status = 'running' AND updated_at < ?)
+                ORDER BY id
+                LIMIT 1
+            ''', (self._job_timestamp(-lease_seconds),))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            cur.execute('''
+                UPDATE analysis_jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
                 WHERE id = ?
-            ''', (
-                updated_data.get('text', ''),
-                updated_data.get('question', ''),
-                updated_data.get('created_at', ''),
-                updated_data.get('date', ''),
-                uuid_id
-            ))
-            
-            # 関連データを削除して再挿入
-            cur.execute('DELETE FROM topics WHERE diary_entry_id = ?', (uuid_id,))
-            cur.execute('DELETE FROM emotions WHERE diary_entry_id = ?', (uuid_id,))
-            cur.execute('DELETE FROM thoughts WHERE diary_entry_id = ?', (uuid_id,))
-            cur.execute('DELETE FROM goals WHERE diary_entry_id = ?', (uuid_id,))
-            cur.execute('DELETE FROM followup_questions WHERE diary_entry_id = ?', (uuid_id,))
-            cur.execute('DELETE FROM qa_chain WHERE diary_entry_id = ?', (uuid_id,))
-            
-            # 新しい関連データを挿入
-            self._upsert_related_data(cur, uuid_id, updated_data)
-            
-            conn.commit()
-            return True
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            ''', (self._job_timestamp(), row[0]))
+            return {'id': row[0], 'entry_id': row[1], 'attempts': row[2] + 1}
+    
+    def finish_analysis_job(self, job_id: int, error: Optional[str] = None,
+                            max_attempts: int = DEFAULT_ANALYSIS_MAX_ATTEMPTS) -> str:
+        """ジョブの結果を記録し、更新後の状態を返す
+        
+        errorがNoneなら done にする。エラーの場合は実行回数が max_attempts 未満なら
+        pending に戻して再実行させ、上限に達していれば failed にする。
+        """
+        with self._pool.transaction() as cur:
+            cur.execute('SELECT attempts FROM analysis_jobs WHERE id = ?', (job_id,))
+            row = cur.fetchone()
+            if row is None:
+                return 'failed'
+            if error is None:
+                status = 'done'
+            else:
+                status = 'pending' if row[0] < max_attempts else 'failed'
+            cur.execute('''
+                UPDATE analysis_jobs SET status = ?, error = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, error, self._job_timestamp(), job_id))
+            return status
+    
+    def get_analysis_statuses(self, entry_ids: list[str]) -> dict[str, str]:
+        """元のIDまたはUUIDのリストについて、最新の分析ジョブの状態を返す
+        
+        戻り値は指定したIDをキーにした辞書で、ジョブのないエントリは含めない。
+        読み取りキャッシュは使わない（ジョブの状態は別スレッドから更新されるため）。
+        """
+        statuses = {}
+        with self._pool.snapshot() as cur:
+            for placeholders, params in self._id_filters(list(dict.fromkeys(entry_ids))):
+                cur.execute(f'''
+                    SELECT e.id, e.original_id, j.status
+                    FROM analysis_jobs j JOIN diary_entries e ON e.id = j.diary_entry_id
+                    WHERE e.id IN ({placeholders}) OR e.original_id IN ({placeholders})
+                    ORDER BY j.id
+                ''', params + params)
+                for uuid_id, original_id, status in cur.fetchall():
+                    statuses[uuid_id] = status
+                    if original_id:
+                        statuses[original_id] = status
+        return {entry_id: statuses[entry_id] for entry_id in entry_ids if entry_id in statuses}
     
     # ===== ユーザー認証機能 =====
     
@@ -728,132 +1235,91 @@ class DiaryManagerSQLite:
     
     def create_user(self, username: str, password: str) -> bool:
         """新規ユーザーを作成"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
         try:
-            # ユーザー名の重複チェック
-            cur.execute('SELECT id FROM users WHERE username = ?', (username,))
-            if cur.fetchone():
-                return False
-            
-            # パスワードをハッシュ化
-            password_hash = self._hash_password(password)
-            user_id = str(uuid.uuid4())
-            
-            # ユーザーを作成
-            cur.execute('''
-                INSERT INTO users (id, username, password_hash)
-                VALUES (?, ?, ?)
-            ''', (user_id, username, password_hash))
-            
-            conn.commit()
-            return True
+            with self._pool.transaction() as cur:
+                # ユーザー名の重複チェック
+                cur.execute('SELECT id FROM users WHERE username = ?', (username,))
+                if cur.fetchone():
+                    return False
+                
+                # パスワードをハッシュ化
+                password_hash = self._hash_password(password)
+                user_id = str(uuid.uuid4())
+                
+                # ユーザーを作成
+                cur.execute('''
+                    INSERT INTO users (id, username, password_hash)
+                    VALUES (?, ?, ?)
+                ''', (user_id, username, password_hash))
+                
+                return True
             
         except Exception as e:
-            conn.rollback()
             print(f"ユーザー作成エラー: {e}")
             return False
-        finally:
-            conn.close()
     
     def authenticate_user(self, username: str, password: str) -> Optional[str]:
         """ユーザー認証"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
         try:
-            # ユーザー情報を取得
-            cur.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
-            result = cur.fetchone()
-            
-            if not result:
+            with self._pool.connection() as conn:
+                cur = conn.cursor()
+                # ユーザー情報を取得
+                cur.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
+                result = cur.fetchone()
+                
+                if not result:
+                    return None
+                
+                user_id, password_hash = result
+                
+                # パスワードを検証
+                if self._verify_password(password, password_hash):
+                    # 最終ログイン時刻を更新
+                    cur.execute('''
+                        UPDATE users SET last_login = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (user_id,))
+                    return user_id
+                
                 return None
             
-            user_id, password_hash = result
-            
-            # パスワードを検証
-            if self._verify_password(password, password_hash):
-                # 最終ログイン時刻を更新
-                cur.execute('''
-                    UPDATE users SET last_login = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (user_id,))
-                conn.commit()
-                return user_id
-            
-            return None
-            
         except Exception as e:
             print(f"認証エラー: {e}")
             return None
-        finally:
-            conn.close()
     
     def get_user_by_id(self, user_id: str) -> Optional[dict]:
         """ユーザーIDからユーザー情報を取得"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
         try:
-            cur.execute('''
-                SELECT id, username, created_at, last_login
-                FROM users WHERE id = ?
-            ''', (user_id,))
-            
-            result = cur.fetchone()
-            if result:
-                return {
-                    'id': result[0],
-                    'username': result[1],
-                    'created_at': result[2],
-                    'last_login': result[3]
-                }
-            return None
+            with self._pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute('''
+                    SELECT id, username, created_at, last_login
+                    FROM users WHERE id = ?
+                ''', (user_id,))
+                
+                result = cur.fetchone()
+                if result:
+                    return {
+                        'id': result[0],
+                        'username': result[1],
+                        'created_at': result[2],
+                        'last_login': result[3]
+                    }
+                return None
             
         except Exception as e:
             print(f"ユーザー取得エラー: {e}")
             return None
-        finally:
-            conn.close()
     
-    def get_user_diary_data(self, user_id: str) -> list[dict[str, Any]]:
+    def get_user_diary_data(self, user_id: str) -> list[DiaryEntry]:
         """特定ユーザーの日記データを取得"""
-        conn = sqlite3.connect(self.db_path)
-        cur = conn.cursor()
-        
         try:
-            # ユーザーの日記エントリを取得
-            cur.execute('''
-                SELECT id, original_id, created_at, date, text, question
-                FROM diary_entries 
-                WHERE user_id = ?
-                ORDER BY created_at DESC
-            ''', (user_id,))
-            
-            entries = []
-            for row in cur.fetchall():
-                entry = {
-                    'id': row[0],
-                    'original_id': row[1],
-                    'created_at': row[2],
-                    'date': row[3],
-                    'text': row[4],
-                    'question': row[5],
-                    'user_id': user_id,
-                    'topics': self._get_topics(cur, row[0]),
-                    'emotions': self._get_emotions(cur, row[0]),
-                    'thoughts': self._get_thoughts(cur, row[0]),
-                    'goals': self._get_goals(cur, row[0]),
-                    'followup_questions': self._get_followup_questions(cur, row[0]),
-                    'qa_chain': self._get_qa_chain(cur, row[0])
-                }
-                entries.append(entry)
-            
-            return entries
+            # ユーザーの日記エントリを関連データごと一括取得（キャッシュがあればそれを返す）
+            return self._cached_read(
+                user_id, ('user',),
+                lambda cur: self._load_entries(cur, 'WHERE user_id = ?', (user_id,), keep_uuid=True)
+            )
             
         except Exception as e:
             print(f"ユーザーデータ取得エラー: {e}")
             return []
-        finally:
-            conn.close() 
\ No newline at end of file
@@ -1,41 +1,324 @@
 import datetime
-from typing import Dict, Any, List
+import hashlib
+import itertools
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Iterable, Iterator, Optional, TextIO, Tuple
 import os
 import json
 import streamlit as st
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from utils.prompt_manager import PromptManager
+from utils.llm_cache import LLMResponseCache
+from utils.period_summary_cache import PeriodSummaryCache
+from constants import DEFAULT_PERIOD_TOKEN_BUDGET, DEFAULT_PERIOD_CONCURRENCY
+
+# 中間要約のプロンプトのバージョン（プロンプトを変更したら上げる。キャッシュキーに含まれる）
+PERIOD_CHUNK_PROMPT_VERSION = "period_chunk:1"
+
+
+def estimate_tokens(text: str) -> int:
+    """テキストのトークン数を見積もる（日本語は1文字1トークン前後のため、多めに文字数とする）"""
+    return len(text)
+
 
 class PeriodAnalyzer:
     """期間分析機能クラス"""
     
-    def __init__(self, ai_analyzer=None):
+    def __init__(self, ai_analyzer=None, token_budget: int = DEFAULT_PERIOD_TOKEN_BUDGET,
+                 concurrency: int = DEFAULT_PERIOD_CONCURRENCY,
+                 summary_cache: Optional[PeriodSummaryCache] = None):
         self.ai_analyzer = ai_analyzer
         self.use_gemini = False
         self.model = None
+        self.model_name = ""
+        self.response_cache: Optional[LLMResponseCache] = None
         self.prompt_manager = PromptManager()
+        self.token_budget = token_budget
+        self.concurrency = max(1, concurrency)
+        self.summary_cache = summary_cache
         
         # AIアナライザーからGemini設定を取得
         if ai_analyzer:
             self.use_gemini = ai_analyzer.use_gemini
             self.model = ai_analyzer.model
+            # 中間要約はAIアナライザーと同じ応答キャッシュに保存する
+            self.model_name = getattr(ai_analyzer, 'model_name', '')
+            self.response_cache = getattr(ai_analyzer, 'response_cache', None)
     
-    def analyze_period_summary(self, period_data: List[Dict[str, Any]], start_date: str, end_date: str, mode: str = "default", custom_prompt: str = "") -> Dict[str, Any]:
-        """指定期間の日記データを構造化してまとめる"""
-        if not period_data:
+    def analyze_period_summary(self, period_data: Iterable[Dict[str, Any]], start_date: str, end_date: str, mode: str = "default", custom_prompt: str = "", user_id: Optional[str] = None) -> Dict[str, Any]:
+        """指定期間の日記データを構造化してまとめる
+
+        period_dataはリストのほか、iter_user_entries のようなジェネレーターも受け付ける（1回だけ読む）。
+        日記のテキストは token_budget に収まる間だけ保持し、超えた時点から残りは読み進めながら
+        週（入りきらなければ日）ごとの中間要約に回すため、期間全体のテキストをメモリに載せない。
+        中間要約は token_budget に収まるまで段階的にまとめてから、最後にモードごとの形式でまとめる。
+        summary_cache があり user_id を指定した場合は、token_budget を超える期間の中間要約に
+        保存済みの日・週ごとの要約を再利用し、日記が追加・変更された日とその週だけを要約し直す。
+        中間要約に失敗した期間はまとめに含めず、結果の 'unsummarized_ranges' にその期間の表記を並べる。
+        """
+        # 上限に収まる間だけ期間データのテキストを保持する（件数も同時に数える）
+        entries = iter(period_data)
+        entry_count = 0
+        parts = []
+        size = 0
+        for entry in entries:
+            entry_count += 1
+            text = self._format_period_entry(entry)
+            parts.append((entry['date'], text))
+            size += estimate_tokens(text)
+            if size > self.token_budget:
+                break
+        if not entry_count:
             return self._create_empty_summary(start_date, end_date, mode)
         
-        # 期間データをテキストにまとめる
-        combined_text = self._combine_period_data(period_data)
+        if not (self.use_gemini and self.model):
+            entry_count += sum(1 for _ in entries)
+            return self._mock_period_analysis(entry_count, start_date, end_date, mode)
         
-        # LLMで構造化分析
-        prompt = self._create_period_analysis_prompt(combined_text, start_date, end_date, mode, custom_prompt)
+        unsummarized: List[Tuple[str, str]] = []
+        if size <= self.token_budget:
+            combined_text = "".join(text for _, text in parts)
+        else:
+            # 残りのエントリは読み進めながら週ごとの中間要約に回す
+            rest = ((entry['date'], self._format_period_entry(entry)) for entry in entries)
+            combined_text, unsummarized = self._summarize_in_chunks(
+                itertools.chain(parts, rest), start_date, end_date, user_id, mode
+            )
         
-        if self.use_gemini and self.model:
-            return self._analyze_period_with_gemini(prompt, start_date, end_date, mode)
+        if combined_text:
+            # LLMで構造化分析
+            prompt = self._create_period_analysis_prompt(combined_text, start_date, end_date, mode, custom_prompt)
+            result = self._analyze_period_with_gemini(prompt, start_date, end_date, mode)
         else:
-            return self._mock_period_analysis(period_data, start_date, end_date, mode)
+            print(f"Period analysis error: {start_date} 〜 {end_date} の中間要約をすべて作成できませんでした")
+            result = self._mock_period_analysis(0, start_date, end_date, mode)
+        if unsummarized:
+            result['unsummarized_ranges'] = [self._format_range(date_range) for date_range in sorted(unsummarized)]
+        return result
+    
+    def _summarize_in_chunks(self, parts: Iterable[Tuple[str, str]], start_date: str, end_date: str,
+                             user_id: Optional[str] = None, mode: str = "default") -> Tuple[str, List[Tuple[str, str]]]:
+        """日付ごとの日記テキストを週ごとに要約し、token_budget に収まるまでまとめた要約を返す
+        
+        週はテキストの日付が別の週に移った時点で要約に回し、要約待ちの週は同時実行数の2倍までにするため、
+        保持するのは読み込み中の週のテキストと要約だけになる。テキストは日付順（昇順・降順のどちらでもよい）に
+        並んでいる前提で、並んでいない場合は同じ週が複数の中間要約に分かれる。
+        summary_cache があり user_id を指定した場合は、保存済みの日・週ごとの要約を使う。
+        戻り値は (要約, 要約できずに除いた (開始日, 終了日) のリスト)。
+        """
+        if self.summary_cache is not None and user_id is not None:
+            prompt_version = self._summary_prompt_version()
+            
+            def summarize_week(week_start: str, week_parts: List[Tuple[str, str]]) -> List[Tuple[Tuple[str, str], Optional[str]]]:
+                return self._summarize_week_cached(week_start, week_parts, start_date, end_date, user_id, mode, prompt_version)
+        else:
+            def summarize_week(week_start: str, week_parts: List[Tuple[str, str]]) -> List[Tuple[Tuple[str, str], Optional[str]]]:
+                return [self._summarize_chunk(chunk) for chunk in self._week_chunks(week_parts)]
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='period-summary') as executor:
+            futures = []
+            for week_start, week_parts in self._iter_weeks(parts):
+                pending = [future for future in futures if not future.done()]
+                if len(pending) >= self.concurrency * 2:
+                    wait(pending, return_when=FIRST_COMPLETED)
+                futures.append(executor.submit(summarize_week, week_start, week_parts))
+            
+            summaries = sorted(
+                (summary for future in futures for summary in future.result()),
+                key=lambda summary: summary[0]
+            )
+            unsummarized = [date_range for date_range, summary in summaries if summary is None]
+            summaries = [(date_range, summary) for date_range, summary in summaries if summary is not None]
+            return self._reduce_summaries(executor, summaries, unsummarized), unsummarized
+    
+    def _iter_weeks(self, parts: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, List[Tuple[str, str]]]]:
+        """日付順の日記テキストを、週が変わるごとに (週の月曜日, [(日付, テキスト)]) にまとめて返す"""
+        week_start = None
+        week_parts: List[Tuple[str, str]] = []
+        for date, text in parts:
+            start = self._week_start(date)
+            if week_parts and start != week_start:
+                yield week_start, week_parts
+                week_parts = []
+            week_start = start
+            week_parts.append((date, text))
+        if week_parts:
+            yield week_start, week_parts
+    
+    def _summary_prompt_version(self) -> str:
+        """保存済みの要約を使えるか判定するバージョン（モデルか中間要約のプロンプトが変わると変わる）"""
+        template = self.prompt_manager.load_prompt_template("period_chunk_summary_prompt.txt")
+        template_hash = hashlib.sha256(template.encode('utf-8')).hexdigest()[:16]
+        return f"{PERIOD_CHUNK_PROMPT_VERSION}:{self.model_name}:{template_hash}"
+    
+    def _summarize_week_cached(self, week_start: str, week_parts: List[Tuple[str, str]], start_date: str, end_date: str,
+                               user_id: str, mode: str, prompt_version: str) -> List[Tuple[Tuple[str, str], Optional[str]]]:
+        """1週間分の日記の中間要約を、保存済みの要約を使って作る
+        
+        期間に収まる週は、日ごとの要約をまとめた週の要約1つを返す（週の要約も保存する）。
+        期間の端の週は日ごとの要約を返す。日ごとの要約は常に保存するため、期間がずれて
+        期間に収まっていた週が端になっても、その週の日ごとの要約は要約し直さずに済む。
+        要約できなかった日は要約をNoneにして返す（保存しない）。
+        """
+        days: Dict[str, List[str]] = {}
+        for date, text in sorted(week_parts, key=lambda part: part[0]):
+            days.setdefault(date, []).append(text)
+        day_hashes = {date: PeriodSummaryCache.content_hash("".join(texts)) for date, texts in days.items()}
+        
+        week_end = (datetime.datetime.strptime(week_start, '%Y-%m-%d') + datetime.timedelta(days=6)).strftime('%Y-%m-%d')
+        week_range = (week_start, week_end)
+        full_week = start_date <= week_start and week_end <= end_date
+        week_hash = PeriodSummaryCache.content_hash("".join(day_hashes.values()))
+        if full_week:
+            cached = self.summary_cache.get_many(user_id, mode, prompt_version, [(week_range, week_hash)])
+            if week_range in cached:
+                return [(week_range, cached[week_range])]
+        
+        cached = self.summary_cache.get_many(
+            user_id, mode, prompt_version, [((date, date), content_hash) for date, content_hash in day_hashes.items()]
+        )
+        day_summaries = []
+        computed = []
+        for date, texts in days.items():
+            day_range = (date, date)
+            summary = cached.get(day_range)
+            if summary is None:
+                summary = self._summarize_bucket((day_range, texts))
+                if summary:
+                    computed.append((day_range, day_hashes[date], summary))
+            day_summaries.append((day_range, summary))
+        self.summary_cache.put_many(user_id, mode, prompt_version, computed)
+        
+        if full_week and all(summary for _, summary in day_summaries):
+            if len(day_summaries) == 1:
+                week_summary = day_summaries[0][1]
+            else:
+                week_summary = self._summarize_bucket(
+                    (week_range, [self._join_chunks([(day_range, summary)]) for day_range, summary in day_summaries])
+                )
+            if week_summary:
+                self.summary_cache.put_many(user_id, mode, prompt_version, [(week_range, week_hash, week_summary)])
+                return [(week_range, week_summary)]
+        return [(day_range, summary or None) for day_range, summary in day_summaries]
+    
+    def _summarize_bucket(self, bucket: Tuple[Tuple[str, str], List[str]]) -> Optional[str]:
+        """1つのバケットの日記を1つの要約にする（上限を超える場合は分けて要約してからまとめる。失敗したらNone）"""
+        date_range, texts = bucket
+        pieces = self._pack([(date_range, text[:self.token_budget]) for text in texts], min_group_size=1)
+        summaries = []
+        for group in pieces:
+            summary = self._generate_summary(date_range, "".join(text for _, text in group))
+            if summary is None:
+                return None
+            summaries.append((date_range, summary))
+        
+        while len(summaries) > 1:
+            merged = []
+            for group in self._pack(summaries):
+                summary = group[0][1] if len(group) == 1 else self._generate_summary(date_range, self._join_chunks(group))
+                if summary is None:
+                    return None
+                merged.append((date_range, summary))
+            summaries = merged
+        return summaries[0][1]
+    
+    def _reduce_summaries(self, executor: ThreadPoolExecutor, summaries: List[Tuple[Tuple[str, str], str]],
+                          unsummarized: List[Tuple[str, str]]) -> str:
+        """要約の合計が上限を超える間は隣り合う要約をまとめて1段上の要約にし、1つのテキストにして返す
+        
+        まとめられなかった要約は除き、その期間を unsummarized に加える。
+        """
+        while len(summaries) > 1 and estimate_tokens(self._join_chunks(summaries)) > self.token_budget:
+            merged = list(executor.map(self._merge_summaries, self._pack(summaries)))
+            unsummarized.extend(date_range for date_range, summary in merged if summary is None)
+            summaries = [(date_range, summary) for date_range, summary in merged if summary is not None]
+        return self._join_chunks(summaries)
+    
+    def _merge_summaries(self, group: List[Tuple[Tuple[str, str], str]]) -> Tuple[Tuple[str, str], Optional[str]]:
+        """隣り合う要約を1つの要約にまとめる（1つだけならそのまま返す。失敗したら要約をNoneにする）"""
+        if len(group) == 1:
+            return group[0]
+        return self._summarize_chunk(((group[0][0][0], group[-1][0][1]), self._join_chunks(group)))
+    
+    def _week_chunks(self, week_parts: List[Tuple[str, str]]) -> List[Tuple[Tuple[str, str], str]]:
+        """1週間分の日記テキストを、週（上限を超える場合は日）ごとの ((開始日, 終了日), テキスト) に分ける"""
+        week_parts = sorted(week_parts, key=lambda part: part[0])
+        week_text = "".join(text for _, text in week_parts)
+        if estimate_tokens(week_text) <= self.token_budget:
+            return [((week_parts[0][0], week_parts[-1][0]), week_text)]
+        
+        chunks = []
+        days: Dict[str, List[Tuple[Tuple[str, str], str]]] = {}
+        for date, text in week_parts:
+            days.setdefault(date, []).append(((date, date), text[:self.token_budget]))
+        for day_parts in days.values():
+            # 1日分も上限を超える場合は、上限に収まるよう日記を分けて要約する
+            for group in self._pack(day_parts, min_group_size=1):
+                chunks.append((group[0][0], "".join(text for _, text in group)))
+        return chunks
+    
+    def _pack(self, chunks: List[Tuple[Tuple[str, str], str]], min_group_size: int = 2) -> List[List[Tuple[Tuple[str, str], str]]]:
+        """隣り合うチャンクを、合計が token_budget を超えないようにグループに分ける
+
+        min_group_size 個に満たないグループは上限を超えても次のチャンクを加える（段階ごとに数を必ず減らすため）。
+        """
+        groups: List[List[Tuple[Tuple[str, str], str]]] = []
+        size = 0
+        for chunk in chunks:
+            tokens = estimate_tokens(chunk[1])
+            if groups and len(groups[-1]) < min_group_size:
+                groups[-1].append(chunk)
+                size += tokens
+            elif groups and size + tokens <= self.token_budget:
+                groups[-1].append(chunk)
+                size += tokens
+            else:
+                groups.append([chunk])
+                size = tokens
+        return groups
+    
+    @staticmethod
+    def _week_start(date: str) -> str:
+        """日付を含む週の月曜日"""
+        day = datetime.datetime.strptime(date, '%Y-%m-%d')
+        return (day - datetime.timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+    
+    @staticmethod
+    def _format_range(date_range: Tuple[str, str]) -> str:
+        start, end = date_range
+        return start if start == end else f"{start} 〜 {end}"
+    
+    def _join_chunks(self, chunks: List[Tuple[Tuple[str, str], str]]) -> str:
+        """要約を期間の見出し付きで1つのテキストにする"""
+        return "".join(f"\n=== {self._format_range(date_range)} ===\n{text.strip()}\n" for date_range, text in chunks)
+    
+    def _summarize_chunk(self, chunk: Tuple[Tuple[str, str], str]) -> Tuple[Tuple[str, str], Optional[str]]:
+        """1つのチャンクの中間要約を作成（要約できなかったチャンクは要約をNoneにする）"""
+        date_range, text = chunk
+        return date_range, self._generate_summary(date_range, text) or None
+    
+    def _generate_summary(self, date_range: Tuple[str, str], text: str) -> Optional[str]:
+        """中間要約をLLMで作成（応答キャッシュがあれば同じ内容の要約を再利用する。失敗したらNone）"""
+        prompt = self.prompt_manager.get_period_chunk_prompt(
+            label=self._format_range(date_range), combined_text=text[:self.token_budget]
+        )
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = LLMResponseCache.make_key(self.model_name, PERIOD_CHUNK_PROMPT_VERSION, prompt)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            summary = self.model.generate_content(prompt).text.strip()
+        except Exception as e:
+            print(f"中間要約のエラー ({self._format_range(date_range)}): {e}")
+            return None
+        if cache_key is not None and summary:
+            self.response_cache.put(cache_key, summary, self.model_name)
+        return summary
     
     def _create_empty_summary(self, start_date: str, end_date: str, mode: str = "default") -> Dict[str, Any]:
         """空の期間まとめを作成"""
@@ -50,29 +333,30 @@ class PeriodAnalyzer:
             "recommendations": []
         }
     
-    def _combine_period_data(self, period_data: List[Dict[str, Any]]) -> str:
+    def _combine_period_data(self, period_data: Iterable[Dict[str, Any]]) -> str:
         """期間データをテキストにまとめる"""
-        combined_text = ""
-        for entry in period_data:
-            combined_text += f"\n=== {entry['date']} ===\n"
-            combined_text += f"日記: {entry['text']}\n"
-            
-            # QAチェーンを追加
-            qa_chain = entry.get('qa_chain', [])
-            if qa_chain:
-                combined_text += "質問と回答:\n"
-                for i, qa in enumerate(qa_chain):
-                    combined_text += f"Q{i+1}: {qa['question']}\n"
-                    combined_text += f"A{i+1}: {qa['answer']}\n"
-            
-            # 分析結果も追加
-            combined_text += f"トピック: {', '.join(entry.get('topics', []))}\n"
-            combined_text += f"感情: {', '.join(entry.get('emotions', []))}\n"
-            combined_text += f"思考: {', '.join(entry.get('thoughts', []))}\n"
-            combined_text += f"目標: {', '.join(entry.get('goals', []))}\n"
-            combined_text += "\n"
-        
-        return combined_text
+        return "".join(self._format_period_entry(entry) for entry in period_data)
+    
+    def _format_period_entry(self, entry: Dict[str, Any]) -> str:
+        """1件分の日記をまとめ用のテキストにする"""
+        text = f"\n=== {entry['date']} ===\n"
+        text += f"日記: {entry['text']}\n"
+        
+        # QAチェーンを追加
+        qa_chain = entry.get('qa_chain', [])
+        if qa_chain:
+            text += "質問と回答:\n"
+            for i, qa in enumerate(qa_chain):
+                text += f"Q{i+1}: {qa['question']}\n"
+                text += f"A{i+1}: {qa['answer']}\n"
+        
+        # 分析結果も追加
+        text += f"トピック: {', '.join(entry.get('topics', []))}\n"
+        text += f"感情: {', '.join(entry.get('emotions', []))}\n"
+        text += f"思考: {', '.join(entry.get('thoughts', []))}\n"
+        text += f"目標: {', '.join(entry.get('goals', []))}\n"
+        text += "\n"
+        return text
     
     def _create_period_analysis_prompt(self, combined_text: str, start_date: str, end_date: str, mode: str = "default", custom_prompt: str = "") -> str:
         """期間分析用のプロンプトを作成"""
@@ -125,15 +409,15 @@ class PeriodAnalyzer:
             print('Period analysis error:', e)
         
         # エラー時はモックデータを返す
-        return self._mock_period_analysis([], start_date, end_date, mode)
+        return self._mock_period_analysis(0, start_date, end_date, mode)
     
-    def _mock_period_analysis(self, period_data: List[Dict[str, Any]], start_date: str, end_date: str, mode: str = "default") -> Dict[str, Any]:
+    def _mock_period_analysis(self, entry_count: int, start_date: str, end_date: str, mode: str = "default") -> Dict[str, Any]:
         """モック期間分析データ"""
         if mode == "kpt":
             return {
                 "period": f"{start_date} 〜 {end_date}",
                 "mode": "kpt",
-                "summary": f"この期間のKPT分析を行いました。{len(period_data)}件のエントリを基に分析しました。",
+                "summary": f"この期間のKPT分析を行いました。{entry_count}件のエントリを基に分析しました。",
                 "kpt_analysis": {
                     "keep": [
                         {
@@ -168,7 +452,7 @@ class PeriodAnalyzer:
             return {
                 "period": f"{start_date} 〜 {end_date}",
                 "mode": "ywt",
-                "summary": f"この期間のYWT分析を行いました。{len(period_data)}件のエントリを基に分析しました。",
+                "summary": f"この期間のYWT分析を行いました。{entry_count}件のエントリを基に分析しました。",
                 "ywt_analysis": {
                     "yatta": [
                         {
@@ -203,7 +487,7 @@ class PeriodAnalyzer:
             return {
                 "period": f"{start_date} 〜 {end_date}",
                 "mode": "default",
-                "summary": f"この期間は{len(period_data)}件の日記があり、様々な出来事や感情の変化が記録されました。",
+                "summary": f"この期間は{entry_count}件の日記があり、様々な出来事や感情の変化が記録されました。",
                 "key_themes": ["自己成長", "人間関係", "目標設定"],
                 "emotional_journey": [
                     {"date": start_date, "emotion": "期待", "context": "新しい期間の開始"},
@@ -317,147 +601,165 @@ class PeriodAnalyzer:
     
     def _get_top_items(self, items: List[str], top_n: int) -> List[tuple]:
         """アイテムの出現回数を集計して上位N個を返す"""
-        item_counts = {}
-        for item in items:
-            item_counts[item] = item_counts.get(item, 0) + 1
-        
-        return sorted(item_counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
+        return Counter(items).most_common(top_n)
     
-    def create_export_text(self, summary_result: Dict[str, Any], period_data: List[Dict[str, Any]]) -> str:
+    def create_export_text(self, summary_result: Dict[str, Any], period_data: Iterable[Dict[str, Any]], entry_count: Optional[int] = None) -> str:
         """エクスポート用のテキストを作成"""
+        export_text = "".join(self.iter_export_text(summary_result, period_data, entry_count))
+        
+        # デバッグ情報
+        print(f"Export text length: {len(export_text)} characters")
+        
+        return export_text
+    
+    def write_export_text(self, summary_result: Dict[str, Any], period_data: Iterable[Dict[str, Any]], file: TextIO, entry_count: Optional[int] = None) -> int:
+        """エクスポート用のテキストをファイルへ順に書き出し、書き出した文字数を返す"""
+        written = 0
+        for part in self.iter_export_text(summary_result, period_data, entry_count):
+            written += file.write(part)
+        return written
+    
+    def iter_export_text(self, summary_result: Dict[str, Any], period_data: Iterable[Dict[str, Any]], entry_count: Optional[int] = None) -> Iterator[str]:
+        """エクスポート用のテキストを断片ごとに返すジェネレーター
+
+        元データは1件ずつ書式化するため、iter_user_entries を渡せば全件をメモリに載せずに済む。
+        entry_countを省略した場合は len(period_data) を使う（ジェネレーターの場合はリストに読み込む）。
+        """
         mode = summary_result.get('mode', 'default')
+        if entry_count is None:
+            if not hasattr(period_data, '__len__'):
+                period_data = list(period_data)
+            entry_count = len(period_data)
         
         # デバッグ情報
         print(f"create_export_text called with mode: {mode}")
         print(f"summary_result keys: {list(summary_result.keys())}")
-        print(f"period_data length: {len(period_data)}")
+        print(f"period_data length: {entry_count}")
         
-        export_text = f"""
+        yield f"""
 # 日記期間まとめ
 {summary_result.get('period', '')}
 分析モード: {mode}
 
 """
+        unsummarized_ranges = summary_result.get('unsummarized_ranges')
+        if unsummarized_ranges:
+            yield f"※ 次の期間は要約できなかったため、まとめに含まれていません: {'、'.join(unsummarized_ranges)}\n\n"
         
         if mode == 'custom':
             # カスタム分析結果
-            export_text += f"## 🎨 カスタム分析結果\n"
+            yield f"## 🎨 カスタム分析結果\n"
             custom_result = summary_result.get('custom_result', '')
             if custom_result:
-                export_text += f"{custom_result}\n"
+                yield f"{custom_result}\n"
             else:
-                export_text += "カスタム分析の結果がありません。\n"
+                yield "カスタム分析の結果がありません。\n"
         elif mode == 'kpt':
             # KPT分析結果
-            export_text += f"## 🎯 KPT分析結果\n"
-            export_text += f"### 概要\n"
-            export_text += f"{summary_result.get('summary', '')}\n"
+            yield f"## 🎯 KPT分析結果\n"
+            yield f"### 概要\n"
+            yield f"{summary_result.get('summary', '')}\n"
             
             kpt_analysis = summary_result.get('kpt_analysis', {})
             if kpt_analysis:
-                export_text += f"\n### ✅ Keep（継続すべきこと）\n"
+                yield f"\n### ✅ Keep（継続すべきこと）\n"
                 for i, keep in enumerate(kpt_analysis.get('keep', []), 1):
-                    export_text += f"{i}. トピック: {keep.get('topic', '')}\n"
-                    export_text += f"   項目: {', '.join(keep.get('items', []))}\n"
-                    export_text += f"   理由: {keep.get('reason', '')}\n\n"
+                    yield f"{i}. トピック: {keep.get('topic', '')}\n"
+                    yield f"   項目: {', '.join(keep.get('items', []))}\n"
+                    yield f"   理由: {keep.get('reason', '')}\n\n"
                 
-                export_text += f"### ⚠️ Problem（改善すべき問題）\n"
+                yield f"### ⚠️ Problem（改善すべき問題）\n"
                 for i, problem in enumerate(kpt_analysis.get('problem', []), 1):
-                    export_text += f"{i}. トピック: {problem.get('topic', '')}\n"
-                    export_text += f"   項目: {', '.join(problem.get('items', []))}\n"
-                    export_text += f"   影響: {problem.get('impact', '')}\n\n"
+                    yield f"{i}. トピック: {problem.get('topic', '')}\n"
+                    yield f"   項目: {', '.join(problem.get('items', []))}\n"
+                    yield f"   影響: {problem.get('impact', '')}\n\n"
                 
-                export_text += f"### 🚀 Try（試してみたいこと）\n"
+                yield f"### 🚀 Try（試してみたいこと）\n"
                 for i, try_item in enumerate(kpt_analysis.get('try', []), 1):
-                    export_text += f"{i}. トピック: {try_item.get('topic', '')}\n"
-                    export_text += f"   項目: {', '.join(try_item.get('items', []))}\n"
-                    export_text += f"   期待効果: {try_item.get('expected_effect', '')}\n\n"
+                    yield f"{i}. トピック: {try_item.get('topic', '')}\n"
+                    yield f"   項目: {', '.join(try_item.get('items', []))}\n"
+                    yield f"   期待効果: {try_item.get('expected_effect', '')}\n\n"
             
-            export_text += f"\n### 主要テーマ\n"
+            yield f"\n### 主要テーマ\n"
             for i, theme in enumerate(summary_result.get('key_themes', []), 1):
-                export_text += f"{i}. {theme}\n"
+                yield f"{i}. {theme}\n"
             
-            export_text += f"\n### 推奨事項\n"
+            yield f"\n### 推奨事項\n"
             for i, rec in enumerate(summary_result.get('recommendations', []), 1):
-                export_text += f"{i}. {rec}\n"
+                yield f"{i}. {rec}\n"
         elif mode == 'ywt':
             # YWT分析結果
-            export_text += f"## 📝 YWT分析結果\n"
-            export_text += f"### 概要\n"
-            export_text += f"{summary_result.get('summary', '')}\n"
+            yield f"## 📝 YWT分析結果\n"
+            yield f"### 概要\n"
+            yield f"{summary_result.get('summary', '')}\n"
             
             ywt_analysis = summary_result.get('ywt_analysis', {})
             if ywt_analysis:
-                export_text += f"\n### ✅ Yatta（やったこと）\n"
+                yield f"\n### ✅ Yatta（やったこと）\n"
                 for i, yatta in enumerate(ywt_analysis.get('yatta', []), 1):
-                    export_text += f"{i}. トピック: {yatta.get('topic', '')}\n"
-                    export_text += f"   項目: {', '.join(yatta.get('items', []))}\n"
-                    export_text += f"   背景: {yatta.get('context', '')}\n\n"
+                    yield f"{i}. トピック: {yatta.get('topic', '')}\n"
+                    yield f"   項目: {', '.join(yatta.get('items', []))}\n"
+                    yield f"   背景: {yatta.get('context', '')}\n\n"
                 
-                export_text += f"### 💡 Wakatta（わかったこと）\n"
+                yield f"### 💡 Wakatta（わかったこと）\n"
                 for i, wakatta in enumerate(ywt_analysis.get('wakatta', []), 1):
-                    export_text += f"{i}. トピック: {wakatta.get('topic', '')}\n"
-                    export_text += f"   項目: {', '.join(wakatta.get('items', []))}\n"
-                    export_text += f"   発見: {wakatta.get('insight', '')}\n\n"
+                    yield f"{i}. トピック: {wakatta.get('topic', '')}\n"
+                    yield f"   項目: {', '.join(wakatta.get('items', []))}\n"
+                    yield f"   発見: {wakatta.get('insight', '')}\n\n"
                 
-                export_text += f"### 🚀 Tsugi（次やること）\n"
+                yield f"### 🚀 Tsugi（次やること）\n"
                 for i, tsugi in enumerate(ywt_analysis.get('tsugi', []), 1):
-                    export_text += f"{i}. トピック: {tsugi.get('topic', '')}\n"
-                    export_text += f"   項目: {', '.join(tsugi.get('items', []))}\n"
-                    export_text += f"   理由: {tsugi.get('reason', '')}\n\n"
+                    yield f"{i}. トピック: {tsugi.get('topic', '')}\n"
+                    yield f"   項目: {', '.join(tsugi.get('items', []))}\n"
+                    yield f"   理由: {tsugi.get('reason', '')}\n\n"
             
-            export_text += f"\n### 主要テーマ\n"
+            yield f"\n### 主要テーマ\n"
             for i, theme in enumerate(summary_result.get('key_themes', []), 1):
-                export_text += f"{i}. {theme}\n"
+                yield f"{i}. {theme}\n"
             
-            export_text += f"\n### 推奨事項\n"
+            yield f"\n### 推奨事項\n"
             for i, rec in enumerate(summary_result.get('recommendations', []), 1):
-                export_text += f"{i}. {rec}\n"
+                yield f"{i}. {rec}\n"
         else:
             # デフォルト分析結果
-            export_text += f"## 📊 デフォルト分析結果\n"
-            export_text += f"### 概要\n"
-            export_text += f"{summary_result.get('summary', '')}\n"
+            yield f"## 📊 デフォルト分析結果\n"
+            yield f"### 概要\n"
+            yield f"{summary_result.get('summary', '')}\n"
             
-            export_text += f"\n### 主要テーマ\n"
+            yield f"\n### 主要テーマ\n"
             for i, theme in enumerate(summary_result.get('key_themes', []), 1):
-                export_text += f"{i}. {theme}\n"
+                yield f"{i}. {theme}\n"
             
-            export_text += f"\n### 感情の軌跡\n"
+            yield f"\n### 感情の軌跡\n"
             for journey in summary_result.get('emotional_journey', []):
-                export_text += f"- {journey.get('date', '')}: {journey.get('emotion', '')} - {journey.get('context', '')}\n"
+                yield f"- {journey.get('date', '')}: {journey.get('emotion', '')} - {journey.get('context', '')}\n"
             
-            export_text += f"\n### 洞察\n"
+            yield f"\n### 洞察\n"
             for i, insight in enumerate(summary_result.get('insights', []), 1):
-                export_text += f"{i}. {insight}\n"
+                yield f"{i}. {insight}\n"
             
-            export_text += f"\n### 成長領域\n"
+            yield f"\n### 成長領域\n"
             for i, area in enumerate(summary_result.get('growth_areas', []), 1):
-                export_text += f"{i}. {area}\n"
+                yield f"{i}. {area}\n"
             
-            export_text += f"\n### 推奨事項\n"
+            yield f"\n### 推奨事項\n"
             for i, rec in enumerate(summary_result.get('recommendations', []), 1):
-                export_text += f"{i}. {rec}\n"
+                yield f"{i}. {rec}\n"
         
         # 元データ
-        export_text += f"\n## 📊 元データ ({len(period_data)}件)\n"
-        if period_data:
+        yield f"\n## 📊 元データ ({entry_count}件)\n"
+        if entry_count:
             for entry in period_data:
-                export_text += f"\n### {entry.get('date', 'Unknown Date')}\n"
-                export_text += f"内容: {entry.get('text', 'No content')}\n"
-                export_text += f"トピック: {', '.join(entry.get('topics', []))}\n"
-                export_text += f"感情: {', '.join(entry.get('emotions', []))}\n"
+                yield f"\n### {entry.get('date', 'Unknown Date')}\n"
+                yield f"内容: {entry.get('text', 'No content')}\n"
+                yield f"トピック: {', '.join(entry.get('topics', []))}\n"
+                yield f"感情: {', '.join(entry.get('emotions', []))}\n"
                 
                 qa_chain = entry.get('qa_chain', [])
                 if qa_chain:
-                    export_text += "質問と回答:\n"
+                    yield "質問と回答:\n"
                     for i, qa in enumerate(qa_chain):
-                        export_text += f"Q{i+1}: {qa.get('question', '')}\n"
-                        export_text += f"A{i+1}: {qa.get('answer', '')}\n"
+                        yield f"Q{i+1}: {qa.get('question', '')}\n"
+                        yield f"A{i+1}: {qa.get('answer', '')}\n"
         else:
-            export_text += "元データがありません。\n"
-        
-        # デバッグ情報
-        print(f"Export text length: {len(export_text)} characters")
-        
-        return export_text 
\ No newline at end of file
+            yield "元データがありません。\n" 
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+日記のAI分析をバックグラウンドで実行するジョブキュー
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from diary_manager_sqlite import DiaryManagerSQLite
+from ai_analyzer import AIAnalyzer
+from constants import (
+    DEFAULT_ANALYSIS_WORKERS, DEFAULT_ANALYSIS_POLL_INTERVAL,
+    DEFAULT_ANALYSIS_MAX_ATTEMPTS, DEFAULT_ANALYSIS_LEASE_SECONDS
+)
+
+# 分析結果のうちエントリに書き戻す項目
+ANALYSIS_RESULT_KEYS = ('topics', 'emotions', 'thoughts', 'goals', 'question', 'followup_questions')
+
+
+class AnalysisQueue:
+    """日記の分析ジョブをワーカースレッドで実行するクラス
+
+    ジョブはデータベースの analysis_jobs テーブルに保存するため、
+    プロセスが再起動しても未完了のジョブは失われず、複数のプロセスで分担して実行できる。
+    投稿時は submit_entry でエントリの保存とジョブの登録だけを行い、
+    分析結果はワーカーがエントリに書き戻す。進み具合は
+    DiaryManagerSQLite.get_analysis_statuses で確認できる。
+    """
+
+    def __init__(self, diary_manager: DiaryManagerSQLite, ai_analyzer: AIAnalyzer,
+                 workers: int = DEFAULT_ANALYSIS_WORKERS,
+                 poll_interval: float = DEFAULT_ANALYSIS_POLL_INTERVAL,
+                 max_attempts: int = DEFAULT_ANALYSIS_MAX_ATTEMPTS,
+                 lease_seconds: float = DEFAULT_ANALYSIS_LEASE_SECONDS):
+        self.diary_manager = diary_manager
+        self.ai_analyzer = ai_analyzer
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """ワーカースレッドを起動（起動済みなら何もしない）"""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'analysis-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """ワーカースレッドを止める（実行中のジョブは終わるまで待つ）"""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit_entry(self, text: str, date: str, user_id: Optional[str] = None) -> str:
+        """分析結果なしで日記エントリを保存して分析ジョブを登録し、エントリのIDを返す"""
+        entry = self.ai_analyzer.new_diary_entry(text)
+        entry['date'] = date
+        if user_id:
+            entry['user_id'] = user_id
+        entry_id = self.diary_manager.add_diary_entry(entry, enqueue_analysis=True)
+        self._wake.set()
+        return entry_id
+
+    def enqueue(self, entry_id: str) -> Optional[int]:
+        """保存済みのエントリの分析ジョブを登録（エントリがなければNone）"""
+        job_id = self.diary_manager.enqueue_analysis(entry_id)
+        if job_id is not None:
+            self._wake.set()
+        return job_id
+
+    def run_pending(self, limit: Optional[int] = None) -> int:
+        """待機中のジョブを呼び出し元のスレッドで実行し、実行したジョブ数を返す"""
+        processed = 0
+        while limit is None or processed < limit:
+            job = self.diary_manager.claim_analysis_job(self.lease_seconds)
+            if job is None:
+                break
+            self._process(job)
+            processed += 1
+        return processed
+
+    def _process(self, job: Dict[str, Any]) -> str:
+        """1件のジョブを実行し、分析結果をエントリに書き戻す"""
+        try:
+            entry = self.diary_manager.get_entry(job['entry_id'])
+            if entry is None:
+                # 分析前にエントリが削除された
+                return self.diary_manager.finish_analysis_job(job['id'])
+            # 応答を解釈できなかった場合はモックを書き戻さず、ジョブの失敗として再実行する
+            analysis = self.ai_analyzer.analyze_diary(entry['text'], fallback=False)
+            changes = {key: analysis[key] for key in ANALYSIS_RESULT_KEYS if key in analysis}
+            # 分析中にエントリが更新されていたら書き戻さずに再実行する
+            self.diary_manager.patch_diary_entry(job['entry_id'], changes, expected_version=entry['version'])
+        except Exception as e:
+            print(f"分析ジョブ {job['id']} のエラー: {e}")
+            return self.diary_manager.finish_analysis_job(job['id'], str(e) or type(e).__name__, self.max_attempts)
+        return self.diary_manager.finish_analysis_job(job['id'])
+
+    def _worker(self) -> None:
+        """ジョブがなくなるまで実行し、新しいジョブの登録か poll_interval 秒の経過を待つ"""
+        while not self._stopping.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"分析ワーカーのエラー: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+# データベースファイルごとに共有するキュー
+_queues: Dict[str, AnalysisQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_analysis_queue(diary_manager: DiaryManagerSQLite, ai_analyzer: AIAnalyzer,
+                       workers: int = DEFAULT_ANALYSIS_WORKERS) -> AnalysisQueue:
+    """データベースファイルに対応する共有キューを取得（なければ作成してワーカーを起動）
+
+    Streamlitのセッションごとにワーカースレッドが増えないよう、同じファイルを使うセッションで共有する。
+    """
+    key = os.path.abspath(diary_manager.db_path)
+    with _queues_lock:
+        analysis_queue = _queues.get(key)
+        if analysis_queue is None:
+            analysis_queue = AnalysisQueue(diary_manager, ai_analyzer, workers)
+            analysis_queue.start()
+            _queues[key] = analysis_queue
+        return analysis_queue
+
+
+def close_analysis_queue(db_path: str) -> None:
+    """データベースファイルに対応する共有キューのワーカーを止める"""
+    key = os.path.abspath(db_path)
+    with _queues_lock:
+        analysis_queue = _queues.pop(key, None)
+    if analysis_queue is not None:
+        analysis_queue.stop()
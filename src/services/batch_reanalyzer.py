@@ -0,0 +1,197 @@
+"""
+保存済みの日記エントリをまとめて再分析するクラス
+"""
+
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from diary_manager_sqlite import DiaryManagerSQLite
+from ai_analyzer import AIAnalyzer, ANALYZE_PROMPT_VERSION
+from services.analysis_queue import ANALYSIS_RESULT_KEYS
+from utils.checkpoint import Checkpoint
+
+# 同時に分析するエントリ数
+DEFAULT_CONCURRENCY = 4
+
+# 1分あたりのAPI呼び出し回数の上限（0で無制限）
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+# 失敗した呼び出しを再試行する回数と、1回目の再試行までの待ち時間（秒、再試行ごとに2倍）
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+# 1回に読み込んで書き込むエントリ数（チェックポイントの間隔）
+DEFAULT_CHUNK_SIZE = 50
+
+
+class TokenBucket:
+    """トークンバケット方式のレート制限（スレッドセーフ）
+
+    1秒あたり rate 個の割合でトークンが補充され、最大 capacity 個まで貯まる。
+    """
+
+    def __init__(self, rate: float, capacity: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """トークンを1個取得できるまで待ち、待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class BatchReanalyzer:
+    """保存済みの日記エントリを並列に再分析し、分析結果の項目を書き戻すクラス
+
+    エントリを新しい順に chunk_size 件ずつ読み込み、チャンク内を concurrency 並列で分析する。
+    API呼び出しはトークンバケットで requests_per_minute 回/分に抑え、失敗した呼び出しは
+    指数バックオフで max_retries 回まで再試行する。チャンクの結果は patch_diary_entries_batch で
+    1トランザクションにまとめて書き込み、チェックポイントを保存するため、
+    途中で中断しても次回は最後に書き込んだチャンクの続きから再開できる。
+    """
+
+    def __init__(self, diary_manager: DiaryManagerSQLite, ai_analyzer: AIAnalyzer,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        if not (ai_analyzer.use_gemini and ai_analyzer.model):
+            raise ValueError("再分析にはGeminiのモデル（オフラインでは StubModel）が必要です")
+        self.diary_manager = diary_manager
+        self.ai_analyzer = ai_analyzer
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self._sleep = sleep
+        # 並列数までは待たずに呼び出せるようにする
+        self._bucket = TokenBucket(
+            requests_per_minute / 60, self.concurrency, sleep=sleep
+        ) if requests_per_minute > 0 else None
+
+    def _signature(self, user_id: Optional[str], start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Any]:
+        """チェックポイントが同じ条件・同じプロンプトの再分析のものか判定するための情報"""
+        prompt_hash = hashlib.sha256(self.ai_analyzer.prompt_template.encode('utf-8')).hexdigest()
+        return {
+            'user_id': user_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'model': self.ai_analyzer.model_name,
+            'prompt': f'{ANALYZE_PROMPT_VERSION}:{prompt_hash}'
+        }
+
+    def _analyze(self, entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """1件を分析し、(書き戻す項目, None) か、再試行しても失敗した場合は (None, エラー) を返す"""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(MAX_BACKOFF_SECONDS, self.backoff_seconds * 2 ** (attempt - 1))
+                # 同時に失敗した呼び出しが同じタイミングで再試行しないよう待ち時間をばらつかせる
+                self._sleep(delay * random.uniform(0.5, 1.0))
+            if self._bucket:
+                self._bucket.acquire()
+            try:
+                analysis = self.ai_analyzer.analyze_diary(entry['text'], fallback=False)
+                return {key: analysis[key] for key in ANALYSIS_RESULT_KEYS if key in analysis}, None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        return None, error
+
+    def reanalyze(self, user_id: Optional[str] = None, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None, checkpoint_path: Optional[str] = None,
+                  resume: bool = True) -> Dict[str, Any]:
+        """条件に合うエントリを再分析し、件数と処理速度を返す
+
+        user_idがNoneの場合は全ユーザーのエントリを対象にする。
+        checkpoint_pathを指定した場合はチャンクごとに進捗を保存し、最後まで完了したら削除する。
+        分析中に別のセッションで更新されたエントリは書き戻さずに conflicts として数える。
+        """
+        checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        signature = self._signature(user_id, start_date, end_date)
+
+        state = checkpoint.load() if checkpoint and resume else None
+        if state and any(state.get(key) != value for key, value in signature.items()):
+            print("チェックポイントが別の条件・プロンプトの再分析のものなので最初から再分析します")
+            state = None
+        cursor = tuple(state['cursor']) if state and state.get('cursor') else None
+        resumed_from = state['processed'] if state else 0
+
+        processed = 0
+        updated = 0
+        conflicts = 0
+        failed: List[Dict[str, str]] = []
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='reanalyze') as executor:
+            while True:
+                page = self.diary_manager.get_user_diary_page(
+                    user_id, self.chunk_size, cursor, start_date=start_date, end_date=end_date
+                )
+                # 書き戻しの競合を検出するため、行バージョン付きで読み直す
+                entries = self.diary_manager.get_entries([entry['id'] for entry in page['entries']])
+
+                patches = []
+                for entry, (changes, error) in zip(entries, executor.map(self._analyze, entries)):
+                    if changes is None:
+                        failed.append({'id': entry['id'], 'error': error})
+                    else:
+                        patches.append((entry['id'], changes, entry['version']))
+                skipped = self.diary_manager.patch_diary_entries_batch(patches) if patches else []
+
+                processed += len(entries)
+                updated += len(patches) - len(skipped)
+                conflicts += len(skipped)
+                cursor = page['next_cursor']
+                if checkpoint and cursor is not None:
+                    checkpoint.save({**signature, 'cursor': list(cursor), 'processed': resumed_from + processed})
+
+                if self.progress_callback:
+                    elapsed = time.perf_counter() - start
+                    self.progress_callback({
+                        'processed': resumed_from + processed,
+                        'updated': updated,
+                        'failed': len(failed),
+                        'conflicts': conflicts,
+                        'entries_per_sec': processed / elapsed if elapsed > 0 else 0.0
+                    })
+                if cursor is None:
+                    break
+
+        elapsed = time.perf_counter() - start
+        if checkpoint:
+            checkpoint.clear()
+
+        return {
+            'processed': processed,
+            'updated': updated,
+            'conflicts': conflicts,
+            'failed': failed,
+            'resumed_from': resumed_from,
+            'elapsed': elapsed,
+            'entries_per_sec': processed / elapsed if elapsed > 0 else 0.0
+        }
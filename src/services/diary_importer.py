@@ -0,0 +1,177 @@
+"""
+日記アーカイブ（JSON / JSONL）を一括で取り込むクラス
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from diary_manager_sqlite import DiaryManagerSQLite
+
+# 1トランザクションで書き込むエントリ数
+DEFAULT_CHUNK_SIZE = 1000
+
+# JSON配列を読み進めるときの読み込み単位（文字数）
+READ_BLOCK_SIZE = 1 << 16
+
+# 1エントリあたりの行数を数える関連データのキー
+RELATED_KEYS = ('topics', 'emotions', 'thoughts', 'goals', 'followup_questions', 'qa_chain')
+
+
+def _iter_json_array(f) -> Iterator[Dict[str, Any]]:
+    """JSON配列の要素を1件ずつ読み出す（ファイル全体をメモリに載せない）"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # 空白と区切り文字を読み飛ばす
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError("JSONアーカイブは日記エントリの配列である必要があります")
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer):
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # 要素の直後まで読めていない場合は数値などが途中で切れている可能性がある
+                if end < len(buffer) or eof:
+                    yield entry
+                    position = end
+                    continue
+
+        if eof:
+            if started:
+                raise ValueError("JSONアーカイブが途中で終わっています")
+            return
+
+        block = f.read(READ_BLOCK_SIZE)
+        if not block:
+            eof = True
+        buffer = buffer[position:] + block
+        position = 0
+
+
+def iter_archive_entries(path: str) -> Iterator[Dict[str, Any]]:
+    """JSON配列またはJSONL形式の日記アーカイブからエントリを順に読み出す"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number} のJSONが不正です: {e}")
+        else:
+            yield from _iter_json_array(f)
+
+
+class DiaryImporter:
+    """日記アーカイブをチャンク単位のトランザクションで取り込むクラス
+
+    チャンクと取り込み位置を同じトランザクションでコミットするため、
+    途中で中断しても次回は最後にコミットしたチャンクの続きから再開でき、
+    IDのないエントリが二重に取り込まれることもない。
+    """
+
+    def __init__(self, diary_manager: DiaryManagerSQLite, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 user_id: Optional[str] = None,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.diary_manager = diary_manager
+        self.chunk_size = chunk_size
+        self.user_id = user_id
+        self.progress_callback = progress_callback
+
+    def _source_signature(self, path: str) -> Dict[str, Any]:
+        """取り込みの進捗が同じファイルのものか判定するための情報"""
+        stat = os.stat(path)
+        return {
+            'source': os.path.abspath(path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime
+        }
+
+    def _prepare(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """取り込み前にエントリを整形"""
+        if self.user_id:
+            entry['user_id'] = self.user_id
+        if not entry.get('date') and entry.get('created_at'):
+            entry['date'] = str(entry['created_at'])[:10]
+        return entry
+
+    def _count_rows(self, entries: List[Dict[str, Any]]) -> int:
+        """メインエントリと関連データを合わせた書き込み行数"""
+        return sum(1 + sum(len(entry.get(key) or []) for key in RELATED_KEYS) for entry in entries)
+
+    def _iter_chunks(self, path: str, skip: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """先頭skip件を読み飛ばし、(チャンク末尾の位置, エントリのリスト) を順に返す"""
+        chunk = []
+        position = 0
+        for entry in iter_archive_entries(path):
+            position += 1
+            if position <= skip:
+                continue
+            chunk.append(self._prepare(entry))
+            if len(chunk) >= self.chunk_size:
+                yield position, chunk
+                chunk = []
+        if chunk:
+            yield position, chunk
+
+    def import_file(self, path: str, resume: bool = True) -> Dict[str, Any]:
+        """アーカイブを取り込み、件数と処理速度を返す
+
+        進捗はデータベースに記録し、取り込みが最後まで完了したら削除する。
+        """
+        signature = self._source_signature(path)
+
+        state = self.diary_manager.get_import_progress(signature['source']) if resume else None
+        if state and any(state.get(key) != value for key, value in signature.items()):
+            print("取り込みの進捗が別の内容のファイルのものなので最初から取り込みます")
+            state = None
+        resumed_from = state['position'] if state else 0
+
+        entries = 0
+        rows = 0
+        start = time.perf_counter()
+
+        for position, chunk in self._iter_chunks(path, resumed_from):
+            self.diary_manager.add_diary_entries_batch(chunk, import_progress={**signature, 'position': position})
+            entries += len(chunk)
+            rows += self._count_rows(chunk)
+
+            if self.progress_callback:
+                elapsed = time.perf_counter() - start
+                self.progress_callback({
+                    'position': position,
+                    'entries': entries,
+                    'rows': rows,
+                    'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0
+                })
+
+        elapsed = time.perf_counter() - start
+        self.diary_manager.clear_import_progress(signature['source'])
+
+        return {
+            'source': path,
+            'entries': entries,
+            'rows': rows,
+            'resumed_from': resumed_from,
+            'elapsed': elapsed,
+            'entries_per_sec': entries / elapsed if elapsed > 0 else 0.0,
+            'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0
+        }
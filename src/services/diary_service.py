@@ -4,7 +4,7 @@
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from diary_manager_sqlite import DiaryManagerSQLite
+from diary_manager_sqlite import DiaryManagerSQLite, EntryConflictError
 from ai_analyzer import AIAnalyzer
 from utils.validators import Validator
 
@@ -59,12 +59,7 @@ class DiaryService:
     def reanalyze_entry(self, entry_id: str, user_id: str) -> Dict[str, Any]:
         """日記エントリを再分析"""
         # 元のエントリを取得
-        all_data = self.get_user_diary_data(user_id)
-        original_entry = None
-        for entry in all_data:
-            if entry.get('id') == entry_id:
-                original_entry = entry
-                break
+        original_entry = self.diary_manager.get_entry(entry_id, user_id)
         
         if not original_entry:
             raise ValueError("日記エントリが見つかりません")
@@ -82,10 +77,13 @@ class DiaryService:
             'followup_questions': analysis_result.get('followup_questions', [])
         }
         
-        # データベースを更新
-        success = self.update_diary_entry(entry_id, updated_data)
-        if not success:
-            raise ValueError("再分析の保存に失敗しました")
+        # 分析中に別のセッションで更新されていなければ、分析結果の項目だけを更新
+        try:
+            self.diary_manager.patch_diary_entry(
+                original_entry['id'], updated_data, expected_version=original_entry['version']
+            )
+        except EntryConflictError:
+            raise ValueError("再分析中に日記が更新されたため保存できませんでした")
         
         return updated_data
     
@@ -96,31 +94,36 @@ class DiaryService:
         if not is_valid:
             raise ValueError(error)
         
-        # Q&Aチェーンを作成
-        qa_entry = {
-            'question': question,
-            'answer': answer,
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        return self.diary_manager.add_qa_chain(entry_id, [qa_entry])
+        # 既存の履歴を読み書きせず、末尾に追加
+        return self.diary_manager.append_qa(
+            entry_id, question, answer, datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
     
-    def update_entry_date(self, entry_id: str, new_date: str) -> bool:
-        """日記エントリの日付を更新"""
+    def update_entry_date(self, entry_id: str, new_date: str, expected_version: Optional[int] = None) -> bool:
+        """日記エントリの日付を更新
+        
+        expected_versionに編集画面で読み込んだエントリの 'version' を渡すと、
+        その後に別のセッションで更新されていた場合は変更せずに ValueError を送出する（Noneなら確認しない）。
+        """
         # 日付形式のバリデーション
         try:
             datetime.strptime(new_date, '%Y-%m-%d')
         except ValueError:
             raise ValueError("日付形式が正しくありません")
         
-        updated_data = {'date': new_date}
-        return self.update_diary_entry(entry_id, updated_data)
+        # 日付のカラムだけを更新（expected_versionがあれば読み込んだ時点から更新されていないか確認する）
+        try:
+            return self.diary_manager.patch_diary_entry(
+                entry_id, {'date': new_date}, expected_version=expected_version
+            ) is not None
+        except EntryConflictError:
+            raise ValueError("日記が別の画面で更新されたため日付を変更できませんでした")
     
     def get_diary_statistics(self, user_id: str) -> Dict[str, Any]:
         """日記統計情報を取得"""
-        diary_data = self.get_user_diary_data(user_id)
+        statistics = self.diary_manager.get_diary_statistics(user_id, top_n=5)
         
-        if not diary_data:
+        if not statistics['total_entries']:
             return {
                 'total_entries': 0,
                 'date_range': None,
@@ -129,28 +132,8 @@ class DiaryService:
                 'average_entries_per_day': 0
             }
         
-        # 統計情報を計算
-        total_entries = len(diary_data)
-        
-        # 日付範囲
-        dates = [entry.get('date', '') for entry in diary_data if entry.get('date')]
-        date_range = {
-            'start': min(dates) if dates else None,
-            'end': max(dates) if dates else None
-        }
-        
-        # トピック・感情の集計
-        topic_counts = {}
-        emotion_counts = {}
-        
-        for entry in diary_data:
-            for topic in entry.get('topics', []):
-                topic_counts[topic] = topic_counts.get(topic, 0) + 1
-            for emotion in entry.get('emotions', []):
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        top_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        total_entries = statistics['total_entries']
+        date_range = statistics['date_range']
         
         # 1日あたりの平均エントリ数
         if date_range['start'] and date_range['end']:
@@ -164,7 +147,7 @@ class DiaryService:
         return {
             'total_entries': total_entries,
             'date_range': date_range,
-            'top_topics': top_topics,
-            'top_emotions': top_emotions,
+            'top_topics': statistics['top_topics'],
+            'top_emotions': statistics['top_emotions'],
             'average_entries_per_day': round(avg_entries_per_day, 2)
-        } 
\ No newline at end of file
+        }
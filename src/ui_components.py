@@ -1,20 +1,26 @@
 import streamlit as st
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Iterator, Optional
 import datetime
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from diary_manager_sqlite import DiaryManagerSQLite
+from diary_manager_sqlite import DiaryManagerSQLite, EntryConflictError, DEFAULT_SEARCH_LIMIT
 from ai_analyzer import AIAnalyzer
 from period_analyzer import PeriodAnalyzer
+from config.app_config import AppConfig
+from services.analysis_queue import AnalysisQueue
 
 class UIComponents:
     """UIコンポーネントクラス"""
     
-    def __init__(self, diary_manager: DiaryManagerSQLite, ai_analyzer: AIAnalyzer, period_analyzer=None):
+    def __init__(self, diary_manager: DiaryManagerSQLite, ai_analyzer: AIAnalyzer, period_analyzer=None,
+                 analysis_queue: Optional[AnalysisQueue] = None):
         self.diary_manager = diary_manager
         self.ai_analyzer = ai_analyzer
         self.period_analyzer = period_analyzer if period_analyzer else PeriodAnalyzer(ai_analyzer)
+        # 投稿時の分析をバックグラウンドで行うキュー（Noneならその場で分析する）
+        self.analysis_queue = analysis_queue
+        self.page_size = AppConfig().get('ui.page_size', 10)
     
     def _get_user_diary_data(self, user_id: str = None):
         """ユーザー別の日記データを取得"""
@@ -23,6 +29,41 @@ class UIComponents:
         else:
             return self.diary_manager.get_all_diary_data()
     
+    def _get_user_diary_page(self, user_id: str = None, **filters) -> Dict[str, Any]:
+        """ユーザー別の日記データを1ページ分取得（未ログイン時は全データから取得）"""
+        filters.setdefault('page_size', self.page_size)
+        return self.diary_manager.get_user_diary_page(user_id or None, **filters)
+    
+    def _iter_user_entries(self, user_id: str = None, **filters):
+        """ユーザー別の日記データを1件ずつ読み込む（未ログイン時は全データから読み込む）"""
+        return self.diary_manager.iter_user_entries(user_id or None, **filters)
+    
+    def _search_user_diary(self, user_id: str, query: str, offset: int = 0, **filters) -> Dict[str, Any]:
+        """日記を全文検索して関連度の高い順に1ページ分取得（未ログイン時は全データから検索）
+        
+        戻り値は _get_user_diary_page と同じ形式で、next_cursor は次のページの先頭の位置。
+        """
+        # 1件多く読み、続きがあるかを判定する
+        entries = self.diary_manager.search_diary_entries(
+            user_id or None, query, limit=DEFAULT_SEARCH_LIMIT + 1, offset=offset, **filters
+        )
+        has_more = len(entries) > DEFAULT_SEARCH_LIMIT
+        return {
+            'entries': entries[:DEFAULT_SEARCH_LIMIT],
+            'next_cursor': offset + DEFAULT_SEARCH_LIMIT if has_more else None
+        }
+    
+    def _get_user_diary_by_date(self, user_id: str, date: str) -> List[Dict[str, Any]]:
+        """指定日の日記データをすべて取得"""
+        entries = []
+        cursor = None
+        while True:
+            page = self._get_user_diary_page(user_id, date=date, cursor=cursor)
+            entries.extend(page['entries'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return entries
+    
     def show_home(self) -> None:
         """ホーム画面を表示"""
         st.title("📝 AI日記アプリ")
@@ -61,9 +102,8 @@ class UIComponents:
         # 最近の日記を表示
         st.markdown("### 📅 最近の日記")
         user_id = st.session_state.get('user_id')
-        diary_data = self._get_user_diary_data(user_id)
-        if diary_data:
-            recent_entries = sorted(diary_data, key=lambda x: x.get('created_at', ''), reverse=True)[:3]
+        recent_entries = self._get_user_diary_page(user_id, page_size=3)['entries']
+        if recent_entries:
             for entry in recent_entries:
                 with st.expander(f"📝 {entry['date']} - {entry['text'][:50]}..."):
                     st.write(f"**内容:** {entry['text']}")
@@ -95,7 +135,17 @@ class UIComponents:
             submit_button = st.form_submit_button("送信して分析する", type="primary")
 
         if submit_button:
-            if diary_input.strip():
+            if diary_input.strip() and self.analysis_queue is not None:
+                # 先に保存し、分析はバックグラウンドのワーカーに任せる
+                try:
+                    self.analysis_queue.submit_entry(
+                        diary_input, selected_date.strftime('%Y-%m-%d'), st.session_state.get('user_id')
+                    )
+                    st.success("✅ 記録を保存しました！AI分析はバックグラウンドで行います。")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"保存エラー: {e}")
+            elif diary_input.strip():
                 # AI分析で日記エントリを作成
                 diary_entry = self.ai_analyzer.create_diary_entry(diary_input)
                 # 選択された日付を設定
@@ -118,17 +168,20 @@ class UIComponents:
         # 選択された日付の日記データを取得（SQLite対応）
         selected_date_str = selected_date.strftime('%Y-%m-%d')
         user_id = st.session_state.get('user_id')
-        all_entries = self._get_user_diary_data(user_id)
-        selected_date_entries = [entry for entry in all_entries if entry.get('date') == selected_date_str]
+        selected_date_entries = self._get_user_diary_by_date(user_id, selected_date_str)
         # チャット履歴を表示
         if selected_date_entries:
             st.markdown(f"### 📅 {selected_date_str} の記録")
+            analysis_statuses = self.diary_manager.get_analysis_statuses([entry['id'] for entry in selected_date_entries])
+            if any(status in ('pending', 'running') for status in analysis_statuses.values()):
+                st.info("🔄 AI分析中の記録があります。しばらくしてから更新してください。")
+                st.button("🔄 分析状況を更新")
             for idx, entry in enumerate(selected_date_entries):
-                self._display_chat_entry_with_followups(entry, idx)
+                self._display_chat_entry_with_followups(entry, idx, analysis_statuses.get(entry['id']))
         else:
             st.info(f"{selected_date_str} の記録はまだありません。新しい記録を追加してみましょう！")
     
-    def _display_chat_entry_with_followups(self, entry: Dict[str, Any], idx: int) -> None:
+    def _display_chat_entry_with_followups(self, entry: Dict[str, Any], idx: int, analysis_status: Optional[str] = None) -> None:
         # ユーザー入力部分
         with st.chat_message("user"):
             st.write(f"**📝 {entry['created_at'][11:16]} {entry['date']} の日記**")
@@ -143,11 +196,15 @@ class UIComponents:
                             "</div>", unsafe_allow_html=True)
         # 分析まとめボックス
         with st.expander("🔍 分析まとめを見る", expanded=True):
+            if analysis_status in ('pending', 'running'):
+                st.info("🔄 AI分析中です...")
+            elif analysis_status == 'failed':
+                st.warning("AI分析に失敗しました。「再分析」を押してやり直してください。")
             st.markdown(self._render_analysis_summary(entry), unsafe_allow_html=True)
             if st.button("再分析", key=f"reanalyze_{entry['id']}_{idx}"):
-                self._reanalyze_entry(entry['id'])
-                st.success("再分析しました！")
-                st.rerun()
+                if self._reanalyze_entry(entry['id']):
+                    st.success("再分析しました！")
+                    st.rerun()
         # 次の質問（未回答）
         next_question = None
         if qa_chain:
@@ -169,9 +226,9 @@ class UIComponents:
                     )
                     if st.form_submit_button("回答を保存", type="secondary"):
                         if followup_input.strip():
-                            self._save_qa_chain(entry['id'], next_question, followup_input)
-                            st.success("回答を保存しました！")
-                            st.rerun()
+                            if self._save_qa_chain(entry['id'], next_question, followup_input):
+                                st.success("回答を保存しました！")
+                                st.rerun()
                         else:
                             st.error("回答を入力してください。")
 
@@ -194,74 +251,84 @@ class UIComponents:
         html += "</div>"
         return html
 
-    def _reanalyze_entry(self, entry_id: str) -> None:
+    def _patch_entry(self, entry: Dict[str, Any], changes: Dict[str, Any]) -> bool:
+        """読み込んだ時点から更新されていなければ指定項目だけを保存"""
+        try:
+            self.diary_manager.patch_diary_entry(entry['id'], changes, expected_version=entry['version'])
+            return True
+        except EntryConflictError:
+            st.warning("この日記は別の画面で更新されました。ページを再読み込みしてからやり直してください。")
+            return False
+
+    def _reanalyze_entry(self, entry_id: str) -> bool:
         # 再分析（LLMで再実行）
         user_id = st.session_state.get('user_id')
-        all_data = self._get_user_diary_data(user_id)
-        for entry in all_data:
-            if entry.get('id') == entry_id:
-                new_analysis = self.ai_analyzer.analyze_diary(entry['text'])
-                # 更新データを準備
-                updated_data = entry.copy()
-                for k in ["topics", "emotions", "thoughts", "goals", "question", "followup_questions"]:
-                    if k in new_analysis:
-                        updated_data[k] = new_analysis[k]
-                # SQLiteで更新
-                self.diary_manager.update_diary_entry(entry_id, updated_data)
-                break
+        entry = self.diary_manager.get_entry(entry_id, user_id or None)
+        if not entry:
+            return False
+        new_analysis = self.ai_analyzer.analyze_diary(entry['text'])
+        # 分析結果の項目だけを更新
+        changes = {
+            k: new_analysis[k]
+            for k in ["topics", "emotions", "thoughts", "goals", "question", "followup_questions"]
+            if k in new_analysis
+        }
+        return self._patch_entry(entry, changes)
 
-    def _save_qa_chain(self, entry_id: str, question: str, answer: str) -> None:
+    def _save_qa_chain(self, entry_id: str, question: str, answer: str) -> bool:
         """追加入力を保存（SQLite対応）"""
         user_id = st.session_state.get('user_id')
-        all_data = self._get_user_diary_data(user_id)
-        for entry in all_data:
-            if entry.get('id') == entry_id:
-                # 新しいQ&Aを追加
-                if 'qa_chain' not in entry:
-                    entry['qa_chain'] = []
-                entry['qa_chain'].append({
-                    'question': question,
-                    'answer': answer,
-                    'created_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-                # SQLiteで更新
-                self.diary_manager.update_diary_entry(entry_id, entry)
-                break
+        # 新しいQ&Aを履歴の末尾に追加（既存の履歴は読み込まない）
+        return self.diary_manager.append_qa(
+            entry_id, question, answer,
+            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            user_id=user_id or None
+        )
     
-    def _update_entry_date(self, entry_id: str, new_date: str) -> None:
-        """日記エントリの日付を更新（SQLite対応）"""
-        all_data = self.diary_manager.get_all_diary_data()
-        for entry in all_data:
-            if entry.get('id') == entry_id:
-                # 日付を更新
-                entry['date'] = new_date
-                # SQLiteで更新
-                self.diary_manager.update_diary_entry(entry_id, entry)
-                break
+    def _update_entry_date(self, entry: Dict[str, Any], new_date: str) -> bool:
+        """表示したエントリの日付を更新（SQLite対応）
+        
+        表示した時点から別の画面で更新されていた場合は保存せずに警告する。
+        """
+        # 日付のカラムだけを更新
+        return self._patch_entry(entry, {'date': new_date})
     
 
     
     def show_history(self) -> None:
         st.title("📚 履歴一覧")
         user_id = st.session_state.get('user_id')
-        diary_data = self._get_user_diary_data(user_id)
-        if diary_data:
-            search_term = st.text_input("🔍 検索（日記の内容で検索）")
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input("開始日", value=None)
-            with col2:
-                end_date = st.date_input("終了日", value=None)
-            filtered_data = diary_data
-            if search_term:
-                filtered_data = [entry for entry in filtered_data if search_term.lower() in entry.get('text', '').lower()]
-            if start_date and end_date:
-                start_str = start_date.strftime("%Y-%m-%d")
-                end_str = end_date.strftime("%Y-%m-%d")
-                filtered_data = [entry for entry in filtered_data if start_str <= entry.get('date', '') <= end_str]
-            st.write(f"**表示件数:** {len(filtered_data)}件")
+        search_term = st.text_input("🔍 検索（日記の内容で検索）")
+        col1, col2 = st.columns(2)
+        with col1:
+            start_date = st.date_input("開始日", value=None)
+        with col2:
+            end_date = st.date_input("終了日", value=None)
+        filters = {}
+        if start_date and end_date:
+            filters['start_date'] = start_date.strftime("%Y-%m-%d")
+            filters['end_date'] = end_date.strftime("%Y-%m-%d")
+        
+        # 検索条件が変わったら1ページ目に戻す（カーソルはページごとに積む）
+        filter_key = (user_id, search_term, tuple(sorted(filters.items())))
+        if st.session_state.get('history_filter_key') != filter_key:
+            st.session_state.history_filter_key = filter_key
+            st.session_state.history_cursors = [None]
+        cursors = st.session_state.history_cursors
+        if search_term.strip():
+            # 検索時は関連度の高い順に表示する（カーソルは結果の位置）
+            page = self._search_user_diary(user_id, search_term, offset=cursors[-1] or 0, **filters)
+        else:
+            page = self._get_user_diary_page(user_id, cursor=cursors[-1], **filters)
+        filtered_data = page['entries']
+        
+        if filtered_data or filters or search_term or len(cursors) > 1:
+            st.write(f"**表示件数:** {len(filtered_data)}件（{len(cursors)}ページ目）")
             for idx, entry in enumerate(filtered_data):
                 with st.expander(f"📅 {entry['date']} - {entry['text'][:50]}..."):
+                    if entry.get('snippet'):
+                        st.markdown(f"🔍 {entry['snippet']}")
+                    
                     # 日記内容と日付編集
                     col1, col2 = st.columns([3, 1])
                     with col1:
@@ -278,9 +345,9 @@ class UIComponents:
                         )
                         if st.button("💾 保存", key=f"save_date_{entry['id']}_{idx}"):
                             if new_date != current_date:
-                                self._update_entry_date(entry['id'], new_date.strftime('%Y-%m-%d'))
-                                st.success("日付を更新しました！")
-                                st.rerun()
+                                if self._update_entry_date(entry, new_date.strftime('%Y-%m-%d')):
+                                    st.success("日付を更新しました！")
+                                    st.rerun()
                     
                     # 分析結果の表示
                     st.markdown("**🔍 分析結果:**")
@@ -330,9 +397,9 @@ class UIComponents:
                             )
                             if st.form_submit_button("回答を保存", type="secondary"):
                                 if followup_input.strip():
-                                    self._save_qa_chain(entry['id'], next_question, followup_input)
-                                    st.success("回答を保存しました！")
-                                    st.rerun()
+                                    if self._save_qa_chain(entry['id'], next_question, followup_input):
+                                        st.success("回答を保存しました！")
+                                        st.rerun()
                                 else:
                                     st.error("回答を入力してください。")
                     
@@ -341,18 +408,30 @@ class UIComponents:
                         if self.diary_manager.delete_diary_entry(entry['id']):
                             st.success("削除しました")
                             st.rerun()
+            
+            # ページ送り
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(cursors) > 1 and st.button("◀ 前のページ"):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                if page['next_cursor'] and st.button("次のページ ▶"):
+                    cursors.append(page['next_cursor'])
+                    st.rerun()
         else:
             st.info("履歴がまだありません。")
     
     def show_stats(self) -> None:
         st.title("📊 統計情報")
         user_id = st.session_state.get('user_id')
-        diary_data = self._get_user_diary_data(user_id)
-        trends = self.ai_analyzer.analyze_trends(diary_data)
-        if trends:
+        # エントリを読み込まずにデータベース側で集計する
+        trends = self.diary_manager.get_diary_statistics(user_id or None, top_n=3)
+        if trends['total_entries']:
             col1, col2 = st.columns(2)
             with col1:
                 st.metric("総日記数", trends['total_entries'])
+                st.metric("平均文字数", trends['avg_text_length'])
                 st.write(f"**期間:** {trends['date_range']['start']} 〜 {trends['date_range']['end']}")
             with col2:
                 st.write("**📈 よく書くトピック**")
@@ -433,27 +512,30 @@ class UIComponents:
                 end_str = end_date.strftime('%Y-%m-%d')
                 
                 user_id = st.session_state.get('user_id')
-                all_data = self._get_user_diary_data(user_id)
-                period_data = [
-                    entry for entry in all_data 
-                    if start_str <= entry.get('date', '') <= end_str
-                ]
+                entry_count = self.diary_manager.get_entry_summary(user_id or None, start_str, end_str)['total_entries']
                 
-                if not period_data:
+                if not entry_count:
                     st.warning(f"{start_str} 〜 {end_str} の期間に日記データがありません。")
                     return
                 
+                # 期間のエントリは全件をリストにせず、必要なたびに読み直す
+                def period_entries():
+                    return self._iter_user_entries(user_id, start_date=start_str, end_date=end_str)
+                
                 # AIで期間分析を実行
                 summary_result = self.period_analyzer.analyze_period_summary(
-                    period_data, start_str, end_str, analysis_mode, custom_prompt
+                    period_entries(), start_str, end_str, analysis_mode, custom_prompt, user_id=user_id or None
                 )
                 
                 # 結果を表示
-                self._display_period_summary(summary_result, period_data)
+                self._display_period_summary(summary_result, period_entries, entry_count)
     
-    def _display_period_summary(self, summary_result: Dict[str, Any], period_data: List[Dict[str, Any]]) -> None:
-        """期間まとめ結果を表示"""
-        st.success(f"✅ {len(period_data)}件の日記データを分析しました！")
+    def _display_period_summary(self, summary_result: Dict[str, Any], period_entries: Callable[[], Iterator[Dict[str, Any]]], entry_count: int) -> None:
+        """期間まとめ結果を表示（period_entriesは期間のエントリを読み込むイテレーターを返す関数）"""
+        st.success(f"✅ {entry_count}件の日記データを分析しました！")
+        unsummarized_ranges = summary_result.get('unsummarized_ranges')
+        if unsummarized_ranges:
+            st.warning(f"次の期間は要約できなかったため、まとめに含まれていません: {'、'.join(unsummarized_ranges)}")
         
         # 分析モードの表示
         mode = summary_result.get('mode', 'default')
@@ -679,9 +761,9 @@ class UIComponents:
         # 元データの表示（折りたたみ）
         with st.expander("📊 元データ詳細", expanded=False):
             st.markdown(f"**期間:** {summary_result.get('period', '')}")
-            st.markdown(f"**分析対象:** {len(period_data)}件の日記")
+            st.markdown(f"**分析対象:** {entry_count}件の日記")
             
-            for entry in period_data:
+            for entry in period_entries():
                 with st.expander(f"📅 {entry['date']} - {entry['text'][:50]}...", expanded=False):
                     st.write(f"**内容:** {entry['text']}")
                     st.write(f"**トピック:** {', '.join(entry.get('topics', []))}")
@@ -700,12 +782,12 @@ class UIComponents:
         
         # デバッグ情報を表示
         st.info(f"分析結果のモード: {summary_result.get('mode', 'unknown')}")
-        st.info(f"期間データ数: {len(period_data)}")
+        st.info(f"期間データ数: {entry_count}")
         
         if st.button("📄 まとめをテキストファイルとしてダウンロード"):
             try:
                 # エクスポートテキストを生成
-                export_text = self.period_analyzer.create_export_text(summary_result, period_data)
+                export_text = self.period_analyzer.create_export_text(summary_result, period_entries(), entry_count)
                 
                 # デバッグ情報
                 st.success(f"エクスポートテキスト生成完了: {len(export_text)} 文字")
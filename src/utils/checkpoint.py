@@ -0,0 +1,51 @@
+"""
+長時間の処理を途中から再開するためのチェックポイントファイル管理
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+
+class Checkpoint:
+    """処理の進捗をJSONファイルに保存するクラス
+
+    書き込みは一時ファイルに出力してから os.replace で置き換えるため、
+    保存中にプロセスが落ちても壊れたチェックポイントが残ることはない。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """保存済みの進捗を読み込む（なければNone）"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"チェックポイント読み込みエラー: {e}")
+            return None
+
+    def save(self, state: Dict[str, Any]) -> None:
+        """進捗をアトミックに保存"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def clear(self) -> None:
+        """チェックポイントを削除"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
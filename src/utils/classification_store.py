@@ -0,0 +1,185 @@
+"""
+感情の分類結果を保存する共有ストア
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+# 分類結果を保存するSQLiteファイル
+DEFAULT_CLASSIFICATION_STORE_PATH = "data/emotion_classification.db"
+
+# 以前のJSON形式のキャッシュ（ストアと同じディレクトリにあれば初回に取り込む）
+LEGACY_CACHE_FILES = ("emotion_cache.json", "emotion_classification_cache.json")
+
+
+class ClassificationStore:
+    """感情ごとの分類カテゴリをSQLiteファイルに保存するストア
+
+    分類結果はカテゴリの一覧から作るバージョンと組にして保存するため、
+    カテゴリを変更すると以前の分類結果は使われなくなる。
+    保存は変更した感情の行だけをトランザクションで書き込むため、
+    複数のセッションやプロセスから同時に使っても更新が失われない。
+    """
+
+    def __init__(self, path: str, categories: List[str]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.categories = list(categories)
+        self.version = self.category_version(categories)
+        self._lock = threading.Lock()
+
+        # Streamlitのセッションは別スレッドから呼ばれるため、接続はロックで保護して共有する
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS emotion_classifications (
+                category_version TEXT NOT NULL,
+                emotion TEXT NOT NULL,
+                category TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (category_version, emotion)
+            )
+        ''')
+
+    @staticmethod
+    def category_version(categories: List[str]) -> str:
+        """カテゴリの一覧からバージョンを作成"""
+        payload = json.dumps(list(categories), ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def get_many(self, emotions: Iterable[str]) -> Dict[str, str]:
+        """保存済みの感情の分類を {感情: カテゴリ} で返す（ないものは含めない）"""
+        emotions = list(dict.fromkeys(emotions))
+        result = {}
+        with self._lock:
+            # SQLiteのパラメータ数の上限を超えないよう分けて読み込む
+            for i in range(0, len(emotions), 500):
+                chunk = emotions[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT emotion, category FROM emotion_classifications '
+                    f'WHERE category_version = ? AND emotion IN ({placeholders})',
+                    [self.version, *chunk]
+                ).fetchall()
+                result.update(rows)
+        return result
+
+    def get_all(self) -> Dict[str, str]:
+        """現在のカテゴリでの分類をすべて返す"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT emotion, category FROM emotion_classifications WHERE category_version = ?',
+                (self.version,)
+            ).fetchall()
+        return dict(rows)
+
+    def count(self) -> int:
+        """現在のカテゴリでの分類の件数"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT count(*) FROM emotion_classifications WHERE category_version = ?', (self.version,)
+            ).fetchone()[0]
+
+    def put_many(self, classifications: Dict[str, str]) -> int:
+        """分類を感情ごとに追加・更新し、書き込んだ件数を返す（カテゴリ外の値は保存しない）"""
+        rows = self._rows(classifications.items())
+        if rows:
+            self._write('''
+                INSERT INTO emotion_classifications (category_version, emotion, category, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (category_version, emotion)
+                DO UPDATE SET category = excluded.category, updated_at = excluded.updated_at
+            ''', rows)
+        return len(rows)
+
+    def _rows(self, items: Iterable[Tuple[str, str]]) -> List[Tuple[str, str, str, float]]:
+        now = time.time()
+        return [
+            (self.version, emotion, category, now)
+            for emotion, category in items
+            if category in self.categories
+        ]
+
+    def _write(self, sql: str, rows: List[Tuple[str, str, str, float]]) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(sql, rows)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def import_json(self, path: str) -> int:
+        """以前のJSON形式のキャッシュを取り込み、取り込んだ件数を返す（保存済みの分類は上書きしない）
+
+        {感情: カテゴリ} と、日付ごとの {日付: {感情: カテゴリ}} のどちらの形式も読み込める。
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        items = []
+        for key, value in data.items():
+            if isinstance(value, dict):
+                items.extend(value.items())
+            else:
+                items.append((key, value))
+        rows = self._rows(items)
+        if rows:
+            self._write('''
+                INSERT OR IGNORE INTO emotion_classifications (category_version, emotion, category, updated_at)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        return len(rows)
+
+    def clear(self) -> None:
+        """現在のカテゴリでの分類をすべて削除"""
+        with self._lock:
+            self._conn.execute('DELETE FROM emotion_classifications WHERE category_version = ?', (self.version,))
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+# ファイルとカテゴリのバージョンごとに共有するストア
+_stores: Dict[Tuple[str, str], ClassificationStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_classification_store(path: str, categories: List[str]) -> ClassificationStore:
+    """ファイルとカテゴリに対応する共有ストアを取得（なければ作成）
+
+    新しく作成したストアが空の場合は、同じディレクトリにある以前のJSON形式のキャッシュを取り込む。
+    """
+    key = (os.path.abspath(path), ClassificationStore.category_version(categories))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ClassificationStore(path, categories)
+            if not store.count():
+                for name in LEGACY_CACHE_FILES:
+                    legacy_path = os.path.join(os.path.dirname(os.path.abspath(path)), name)
+                    if os.path.exists(legacy_path):
+                        try:
+                            store.import_json(legacy_path)
+                        except (OSError, ValueError, AttributeError) as e:
+                            print(f"分類キャッシュの取り込みに失敗しました: {legacy_path} → {e}")
+            _stores[key] = store
+        return store
+
+
+def close_classification_stores() -> None:
+    """共有ストアの接続をすべて閉じる"""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -1,9 +1,12 @@
 import os
+import re
 import json
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 from typing import TYPE_CHECKING
+from .classification_store import DEFAULT_CLASSIFICATION_STORE_PATH, get_classification_store
+from .local_emotion_classifier import LocalEmotionClassifier
 
 if TYPE_CHECKING:
     import sys
@@ -21,17 +24,8 @@ categories = [
     "その他"
 ]
 
-def load_emotion_cache(path="data/emotion_cache.json"):
-    """感情分類キャッシュを読み込み"""
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
-
-def save_emotion_cache(cache, path="data/emotion_cache.json"):
-    """感情分類キャッシュを保存"""
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
+# 1回のLLM呼び出しでまとめて分類する感情の数
+EMOTION_BATCH_SIZE = 50
 
 def extract_emotions_with_date(data_dir):
     """dataディレクトリ内の全jsonからemotionとcreated_atを抽出"""
@@ -60,66 +54,121 @@ def extract_emotions_with_date(data_dir):
                             })
     return emotion_records
 
-def classify_emotions_with_llm(emotion_records, categories, ai_analyzer: 'AIAnalyzer', cache_path="data/emotion_cache.json", use_cache=True):
-    """emotionリストをLLMで7分類に分ける（キャッシュ機能付き）"""
-    # キャッシュ機能の制御
-    if not use_cache:
-        emotion_cache = {}
-    else:
-        emotion_cache = load_emotion_cache(cache_path)
-    
-    result = {}
-    for rec in emotion_records:
-        date = rec['date']
-        emotion = rec['emotion']
-        
-        # キャッシュにあれば再利用
-        if emotion in emotion_cache:
-            category = emotion_cache[emotion]
-        else:
-            # LLMに問い合わせ（1感情ずつ）
-            prompt = f"""
+def _build_batch_prompt(emotions, categories):
+    """複数の感情をまとめて分類するプロンプトを作成（感情は番号で対応付ける）"""
+    numbered = json.dumps({str(i): emotion for i, emotion in enumerate(emotions, 1)}, ensure_ascii=False, indent=2)
+    return f"""
 # 役割
 あなたは感情分類の専門家AIです。
 
 # 入力
-感情: 「{emotion}」
+感情（番号: 感情）:
+{numbered}
 分類カテゴリ: {categories}
 
 # 出力形式
-次の形式で出力してください:
-{{"分類": "カテゴリ名"}}
+次の形式で、入力のすべての番号について出力してください:
+{{"分類": {{"1": "カテゴリ名", "2": "カテゴリ名"}}}}
 
 # 条件
 - 必ずカテゴリのいずれかに分類してください
+- キーには入力の番号をそのまま使ってください
 - 出力はJSON形式で正しく閉じてください
 """
-            try:
-                if ai_analyzer.use_gemini and ai_analyzer.model:
-                    response = ai_analyzer.model.generate_content(prompt)
-                    import re
-                    match = re.search(r'\{[\s\S]*\}', response.text)
-                    if match:
-                        data = json.loads(match.group(0))
-                        category = data.get('分類', categories[-1])
-                    else:
-                        category = categories[-1]
-                else:
-                    # モック分類
-                    category = categories[-1]
-            except Exception as e:
-                print(f"分類失敗: {emotion} → {e}")
-                category = categories[-1]
-            
-            # キャッシュに保存
-            emotion_cache[emotion] = category
-
-        # 結果に追加
-        result.setdefault(date, {})[emotion] = category
-
-    # キャッシュ保存
-    save_emotion_cache(emotion_cache, cache_path)
-    
+
+def _parse_batch_response(text, emotions, categories):
+    """LLMの応答から {感情: カテゴリ} を取り出す（入力にない感情・カテゴリ外の値は除く）"""
+    match = re.search(r'\{[\s\S]*\}', text)
+    if not match:
+        return {}
+    data = json.loads(match.group(0))
+    mapping = data.get('分類', data) if isinstance(data, dict) else {}
+    if not isinstance(mapping, dict):
+        return {}
+
+    result = {}
+    for i, emotion in enumerate(emotions, 1):
+        # 番号の代わりに感情そのものをキーにして返すこともあるため両方を見る
+        category = mapping.get(str(i), mapping.get(emotion))
+        if category in categories:
+            result[emotion] = category
+    return result
+
+def _classify_with_llm(emotions, categories, ai_analyzer: 'AIAnalyzer'):
+    """感情のリストをまとめてLLMに問い合わせ、LLMが分類できた感情だけを {感情: カテゴリ} で返す
+
+    応答から分類できなかった感情は、残りだけで再度問い合わせ、
+    1件も分類できなかった場合は半分に分けて問い合わせ直す。
+    API呼び出し自体が失敗した場合は分けても成功しないため、それ以上問い合わせない。
+    """
+    if not emotions or not (ai_analyzer.use_gemini and ai_analyzer.model):
+        return {}
+
+    try:
+        response = ai_analyzer.model.generate_content(_build_batch_prompt(emotions, categories))
+    except Exception as e:
+        print(f"分類失敗: {len(emotions)}件 → {e}")
+        return {}
+    try:
+        result = _parse_batch_response(response.text, emotions, categories)
+    except Exception as e:
+        print(f"分類結果の解釈に失敗: {len(emotions)}件 → {e}")
+        result = {}
+
+    missing = [emotion for emotion in emotions if emotion not in result]
+    if not missing or len(emotions) == 1:
+        return result
+    if len(missing) < len(emotions):
+        result.update(_classify_with_llm(missing, categories, ai_analyzer))
+    else:
+        half = len(emotions) // 2
+        result.update(_classify_with_llm(emotions[:half], categories, ai_analyzer))
+        result.update(_classify_with_llm(emotions[half:], categories, ai_analyzer))
+    return result
+
+def classify_emotion_batch(emotions, categories, ai_analyzer: 'AIAnalyzer'):
+    """感情のリストを1回のLLM呼び出しでまとめて分類
+
+    分類できなかった感情（モデルがない場合はすべて）は最後のカテゴリ（その他）にする。
+    """
+    result = _classify_with_llm(emotions, categories, ai_analyzer)
+    return {emotion: result.get(emotion, categories[-1]) for emotion in emotions}
+
+def classify_emotions_with_llm(emotion_records, categories, ai_analyzer: 'AIAnalyzer',
+                               cache_path=DEFAULT_CLASSIFICATION_STORE_PATH,
+                               use_cache=True, batch_size=EMOTION_BATCH_SIZE, use_local=True):
+    """emotionリストをLLMで7分類に分ける（キャッシュ機能付き）
+
+    キャッシュにない感情は、use_local=True の場合はまずローカルの分類器で分類し、
+    確信度の低いものだけを重複を除いて batch_size 件ずつまとめてLLMに問い合わせる。
+    LLMの分類結果は cache_path の共有ストアに感情ごとに保存する。
+    LLMが分類できなかった感情は保存せずに最後のカテゴリ（その他）とし、次回また問い合わせる。
+    use_cache=False の場合はすべて分類し直して保存済みの分類を更新する。
+    """
+    store = get_classification_store(cache_path, categories)
+    emotions = list(dict.fromkeys(rec['emotion'] for rec in emotion_records))
+
+    # キャッシュ機能の制御
+    emotion_cache = store.get_many(emotions) if use_cache else {}
+
+    # キャッシュにない感情をまとめてLLMに問い合わせ、分類したものだけ保存
+    uncached = [emotion for emotion in emotions if emotion not in emotion_cache]
+    if use_local and uncached:
+        # 保存済みのLLMの分類結果を既知の感情として使う
+        local_classifier = LocalEmotionClassifier(categories).fit(store.get_all() if use_cache else {})
+        classified, uncached = local_classifier.classify(uncached)
+        emotion_cache.update(classified)
+    for i in range(0, len(uncached), batch_size):
+        classified = _classify_with_llm(uncached[i:i + batch_size], categories, ai_analyzer)
+        store.put_many(classified)
+        emotion_cache.update(classified)
+    for emotion in uncached:
+        emotion_cache.setdefault(emotion, categories[-1])
+
+    result = {}
+    for rec in emotion_records:
+        result.setdefault(rec['date'], {})[rec['emotion']] = emotion_cache[rec['emotion']]
+
     return result
 
 def to_dataframe(classification_result):
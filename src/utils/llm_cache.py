@@ -0,0 +1,157 @@
+"""
+LLMの応答をプロンプトのハッシュで保存するキャッシュ
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class LLMResponseCache:
+    """LLMの応答テキストをSQLiteファイルに保存する内容アドレス型のキャッシュ
+
+    キーはモデル名・プロンプトテンプレートのバージョン・プロンプト本文のSHA-256で、
+    同じ入力に対する2回目以降の呼び出しはAPIを使わずに保存済みの応答を返す。
+    ttl_secondsを過ぎた応答は使わず、件数か合計サイズが上限を超えると
+    最後に使われてから最も時間が経った応答から削除する。
+    ヒット率などの統計は stats() で取得できる。
+    """
+
+    def __init__(self, path: Optional[str], ttl_seconds: Optional[float] = None,
+                 max_entries: int = 0, max_bytes: int = 0,
+                 clock: Callable[[], float] = time.time):
+        """pathがNoneの場合はメモリ上に保存する。max_entries・max_bytesは0で無制限"""
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+        # Streamlitのセッションは別スレッドから呼ばれるため、接続はロックで保護して共有する
+        self._conn = sqlite3.connect(path or ':memory:', check_same_thread=False, isolation_level=None)
+        if path:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)')
+
+    @staticmethod
+    def make_key(model_name: str, prompt_version: str, prompt: str) -> str:
+        """モデル名・プロンプトのバージョン・プロンプト本文からキャッシュキーを作成"""
+        payload = json.dumps([model_name, prompt_version, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """保存済みの応答を返す（ない場合・期限切れの場合はNone）"""
+        with self._lock:
+            now = self._clock()
+            row = self._conn.execute(
+                'SELECT response, created_at FROM llm_responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            if self._is_expired(row[1], now):
+                self._conn.execute('DELETE FROM llm_responses WHERE key = ?', (key,))
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE llm_responses SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?', (now, key)
+            )
+            self._hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, model_name: str = '') -> None:
+        """応答を保存し、上限を超えた分を古い順に削除する"""
+        size = len(response.encode('utf-8'))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            now = self._clock()
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, model_name, response, size, now, now))
+                self._evict(now)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _evict(self, now: float) -> None:
+        """期限切れの応答と、件数・サイズの上限を超えた分の応答を削除"""
+        if self.ttl_seconds:
+            cursor = self._conn.execute(
+                'DELETE FROM llm_responses WHERE created_at < ?', (now - self.ttl_seconds,)
+            )
+            self._expired += cursor.rowcount
+        if not self.max_entries and not self.max_bytes:
+            return
+        # 最近使われた順に件数と累積サイズを数え、上限からはみ出した応答を削除する
+        cursor = self._conn.execute('''
+            DELETE FROM llm_responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key,
+                           row_number() OVER recent AS position,
+                           sum(size) OVER recent AS total_size
+                    FROM llm_responses
+                    WINDOW recent AS (ORDER BY last_access DESC, created_at DESC, key)
+                )
+                WHERE (? > 0 AND position > ?) OR (? > 0 AND total_size > ?)
+            )
+        ''', (self.max_entries, self.max_entries, self.max_bytes, self.max_bytes))
+        self._evictions += cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """このプロセスでのヒット数・ミス数・ヒット率と、保存中の件数・サイズを返す"""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                'SELECT count(*), coalesce(sum(size), 0) FROM llm_responses'
+            ).fetchone()
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'entries': entries,
+                'bytes': total_bytes
+            }
+
+    def clear(self) -> None:
+        """保存済みの応答をすべて削除"""
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_responses')
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,168 @@
+"""
+感情の文字列をローカルで分類する軽量な分類器
+"""
+
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 文字n-gramをハッシュで割り当てる特徴量の次元数（既知の感情1件あたり dim * 4 バイト）
+DEFAULT_FEATURE_DIM = 2048
+
+# 使う文字n-gramの長さ
+DEFAULT_NGRAM_RANGE = (1, 3)
+
+# この値以上の類似度で、かつ2番目のカテゴリとの差が DEFAULT_MIN_MARGIN 以上なら確定とする
+DEFAULT_MIN_SIMILARITY = 0.4
+DEFAULT_MIN_MARGIN = 0.1
+
+# 類似度の行列が大きくなりすぎないよう、一度に分類する感情の数
+PREDICT_CHUNK_SIZE = 256
+
+# LLMの分類結果がなくても使えるよう、カテゴリごとに代表的な感情を持っておく
+SEED_EXAMPLES = {
+    "自己成長・前進感情": [
+        "達成感", "やる気", "充実感", "前向き", "意欲", "成長", "自信", "希望", "挑戦", "誇らしい",
+        "わくわく", "決意", "向上心", "前進", "やりがい"
+    ],
+    "他者・環境との好意的関係": [
+        "感謝", "嬉しい", "楽しい", "親しみ", "愛情", "信頼", "共感", "温かい", "ありがたい", "好意",
+        "一体感", "尊敬", "友情", "幸せ", "喜び"
+    ],
+    "自己受容・内的癒し": [
+        "安心", "穏やか", "リラックス", "落ち着き", "満足", "ほっとした", "癒やし", "平穏", "安らぎ",
+        "心地よい", "自己受容", "納得", "すっきり"
+    ],
+    "自己評価の低下・葛藤": [
+        "後悔", "自己嫌悪", "劣等感", "恥ずかしい", "罪悪感", "情けない", "悔しい", "自責", "葛藤",
+        "イライラ", "怒り", "苛立ち", "不満", "嫉妬"
+    ],
+    "不安・心配・迷い": [
+        "不安", "心配", "焦り", "迷い", "緊張", "戸惑い", "恐れ", "困惑", "モヤモヤ", "憂鬱",
+        "プレッシャー", "怖い", "落ち着かない"
+    ],
+    "喪失・孤独": [
+        "寂しい", "孤独", "悲しい", "喪失感", "虚しい", "切ない", "失望", "絶望", "疎外感", "落胆",
+        "孤立", "心細い"
+    ],
+    "その他": [
+        "平常", "普通", "疲れ", "眠い", "驚き", "無感情", "退屈", "懐かしい", "空腹", "だるい"
+    ],
+}
+
+
+@lru_cache(maxsize=65536)
+def _feature_index(gram: str, dim: int) -> int:
+    """n-gramを特徴量の列に割り当てる（プロセスをまたいで同じ値になるようcrc32を使う）"""
+    return zlib.crc32(gram.encode('utf-8')) % dim
+
+
+class LocalEmotionClassifier:
+    """文字n-gramの特徴量で最も似た既知の感情を探し、そのカテゴリを選ぶ分類器
+
+    SEED_EXAMPLES と、fit に渡したLLMの分類結果を既知の感情として持ち、
+    カテゴリごとに最も近い既知の感情とのコサイン類似度をNumPyの行列演算でまとめて求める。
+    類似度が低いもの・2つのカテゴリで迷うものは未確定とし、
+    未確定の感情だけをLLMに問い合わせれば、多くの分類をAPIを使わずに済ませられる。
+    """
+
+    def __init__(self, categories: List[str], dim: int = DEFAULT_FEATURE_DIM,
+                 ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY,
+                 min_margin: float = DEFAULT_MIN_MARGIN,
+                 seed_examples: Optional[Dict[str, List[str]]] = None):
+        self.categories = list(categories)
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.seed_examples = SEED_EXAMPLES if seed_examples is None else seed_examples
+        self._labels: Dict[str, str] = {}
+        self.fit({})
+
+    def _ngrams(self, text: str) -> Iterable[str]:
+        # 先頭・末尾の文字を区別するため前後に空白を付ける
+        text = f' {text.strip()} '
+        n_min, n_max = self.ngram_range
+        for n in range(n_min, n_max + 1):
+            for i in range(len(text) - n + 1):
+                gram = text[i:i + n]
+                if gram.strip():
+                    yield gram
+
+    def transform(self, emotions: List[str]) -> np.ndarray:
+        """感情のリストを行ごとにL2正規化した特徴量の行列に変換"""
+        rows = []
+        cols = []
+        for row, emotion in enumerate(emotions):
+            for gram in self._ngrams(emotion):
+                rows.append(row)
+                cols.append(_feature_index(gram, self.dim))
+        matrix = np.zeros((len(emotions), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def fit(self, labeled: Dict[str, str]) -> 'LocalEmotionClassifier':
+        """{感情: カテゴリ}（LLMの分類結果）と SEED_EXAMPLES を既知の感情として登録し直す"""
+        examples = {
+            emotion: category
+            for category, emotions in self.seed_examples.items() if category in self.categories
+            for emotion in emotions
+        }
+        # LLMの分類結果を優先する
+        examples.update({emotion: category for emotion, category in labeled.items() if category in self.categories})
+        self._labels = examples
+
+        # カテゴリ順に並べ、各カテゴリの先頭の列位置を覚えておく（reduceatでカテゴリごとの最大値を取るため）
+        index = {category: i for i, category in enumerate(self.categories)}
+        ordered = sorted(examples, key=lambda emotion: index[examples[emotion]])
+        counts = np.bincount([index[examples[emotion]] for emotion in ordered], minlength=len(self.categories))
+        self._present = np.flatnonzero(counts)
+        self._starts = (np.cumsum(counts) - counts)[self._present]
+        self._features = self.transform(ordered)
+        return self
+
+    def _scores(self, emotions: List[str]) -> np.ndarray:
+        """カテゴリごとの、最も近い既知の感情との類似度の行列（既知の感情がないカテゴリは-1）"""
+        scores = np.full((len(emotions), len(self.categories)), -1.0, dtype=np.float32)
+        if not len(self._present):
+            return scores
+        similarities = self.transform(emotions) @ self._features.T
+        scores[:, self._present] = np.maximum.reduceat(similarities, self._starts, axis=1)
+        return scores
+
+    def predict(self, emotions: List[str]) -> List[Tuple[str, float, bool]]:
+        """感情ごとに (カテゴリ, 類似度, 確定したか) を返す"""
+        result = []
+        for start in range(0, len(emotions), PREDICT_CHUNK_SIZE):
+            chunk = emotions[start:start + PREDICT_CHUNK_SIZE]
+            scores = self._scores(chunk)
+            order = np.argsort(scores, axis=1)
+            rows = np.arange(len(chunk))
+            best = order[:, -1]
+            best_scores = scores[rows, best]
+            second_scores = scores[rows, order[:, -2]] if len(self.categories) > 1 else np.zeros(len(chunk))
+            confident = (best_scores >= self.min_similarity) & (best_scores - second_scores >= self.min_margin)
+
+            for i, emotion in enumerate(chunk):
+                category = self._labels.get(emotion)
+                if category is not None:
+                    # 既知の感情はそのまま
+                    result.append((category, 1.0, True))
+                else:
+                    result.append((self.categories[best[i]], float(best_scores[i]), bool(confident[i])))
+        return result
+
+    def classify(self, emotions: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """確定した分類の {感情: カテゴリ} と、LLMに問い合わせるべき未確定の感情のリストを返す"""
+        classified = {}
+        uncertain = []
+        for emotion, (category, _, confident) in zip(emotions, self.predict(emotions)):
+            if confident:
+                classified[emotion] = category
+            else:
+                uncertain.append(emotion)
+        return classified, uncertain
@@ -0,0 +1,141 @@
+"""
+期間まとめの週・日ごとの中間要約を保存するキャッシュ
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class PeriodSummaryCache:
+    """週・日ごとの中間要約をSQLiteファイルに保存するキャッシュ
+
+    キーはユーザー・分析モード・プロンプトのバージョン・バケット（週か日の期間）で、
+    要約を作ったときの日記の内容のハッシュと一緒に保存する。
+    期間まとめは保存済みの要約のうちハッシュが一致するものを使い、
+    日記が追加・変更されたバケットだけを要約し直す。
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        # Streamlitのセッションは別スレッドから呼ばれるため、接続はロックで保護して共有する
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS period_summaries (
+                user_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                bucket_start TEXT NOT NULL,
+                bucket_end TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, mode, prompt_version, bucket_start, bucket_end)
+            )
+        ''')
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """バケットの日記の内容のハッシュを作成"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, user_id: str, mode: str, prompt_version: str,
+                 buckets: List[Tuple[Tuple[str, str], str]]) -> Dict[Tuple[str, str], str]:
+        """[((開始日, 終了日), 内容のハッシュ)] のうち、同じ内容で保存済みの要約を {(開始日, 終了日): 要約} で返す"""
+        if not buckets:
+            return {}
+        wanted = dict(buckets)
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT bucket_start, bucket_end, content_hash, summary FROM period_summaries
+                WHERE user_id = ? AND mode = ? AND prompt_version = ? AND bucket_start BETWEEN ? AND ?
+            ''', (user_id, mode, prompt_version,
+                  min(start for start, _ in wanted), max(start for start, _ in wanted))).fetchall()
+            result = {
+                (start, end): summary
+                for start, end, content_hash, summary in rows
+                if wanted.get((start, end)) == content_hash
+            }
+            self._hits += len(result)
+            self._misses += len(wanted) - len(result)
+        return result
+
+    def put_many(self, user_id: str, mode: str, prompt_version: str,
+                 summaries: List[Tuple[Tuple[str, str], str, str]]) -> None:
+        """[((開始日, 終了日), 内容のハッシュ, 要約)] を保存（同じバケットの以前の要約は置き換える）"""
+        if not summaries:
+            return
+        now = time.time()
+        rows = [
+            (user_id, mode, prompt_version, start, end, content_hash, summary, now)
+            for (start, end), content_hash, summary in summaries
+        ]
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany('''
+                    INSERT OR REPLACE INTO period_summaries
+                    (user_id, mode, prompt_version, bucket_start, bucket_end, content_hash, summary, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def delete_user(self, user_id: str) -> None:
+        """ユーザーの要約をすべて削除"""
+        with self._lock:
+            self._conn.execute('DELETE FROM period_summaries WHERE user_id = ?', (user_id,))
+
+    def stats(self) -> Dict[str, int]:
+        """このプロセスでのヒット数・ミス数と、保存中の件数を返す"""
+        with self._lock:
+            entries = self._conn.execute('SELECT count(*) FROM period_summaries').fetchone()[0]
+            return {'hits': self._hits, 'misses': self._misses, 'entries': entries}
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+# データベースファイルごとに共有するキャッシュ
+_caches: Dict[str, PeriodSummaryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_period_summary_cache(path: Optional[str]) -> Optional[PeriodSummaryCache]:
+    """ファイルに対応する共有キャッシュを取得（pathが空なら使わない。開けない場合もNone）"""
+    if not path:
+        return None
+    key = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            try:
+                cache = PeriodSummaryCache(path)
+            except sqlite3.Error as e:
+                print(f"期間まとめのキャッシュを開けません: {e}")
+                return None
+            _caches[key] = cache
+        return cache
+
+
+def close_period_summary_caches() -> None:
+    """共有キャッシュの接続をすべて閉じる"""
+    with _caches_lock:
+        caches = list(_caches.values())
+        _caches.clear()
+    for cache in caches:
+        cache.close()
@@ -46,4 +46,9 @@ class PromptManager:
         prompt_template = self.load_prompt_template(filename)
         
         # テンプレート変数を置換
-        return prompt_template.format(**kwargs) 
\ No newline at end of file
+        return prompt_template.format(**kwargs) 
+    
+    def get_period_chunk_prompt(self, **kwargs) -> str:
+        """長い期間を分割してまとめる際の、日・週ごとの中間要約用プロンプトを取得"""
+        prompt_template = self.load_prompt_template("period_chunk_summary_prompt.txt")
+        return prompt_template.format(**kwargs)
@@ -5,6 +5,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import List, Dict, TYPE_CHECKING
+from .classification_store import DEFAULT_CLASSIFICATION_STORE_PATH, get_classification_store
+from .local_emotion_classifier import LocalEmotionClassifier
 
 if TYPE_CHECKING:
     import sys
@@ -45,18 +47,31 @@ def classify_emotions_with_llm(emotion_records: List[Dict[str, str]],
                                 categories: List[str],
                                 ai_analyzer: 'AIAnalyzer',
                                 use_cache: bool = True,
-                                cache_path: str = "data/emotion_classification_cache.json") -> Dict[str, Dict[str, str]]:
-    """emotionリストをLLMで7分類に分ける（日付情報も保持）"""
-
-    if use_cache and os.path.exists(cache_path):
-        return load_classification_cache(cache_path)
+                                cache_path: str = DEFAULT_CLASSIFICATION_STORE_PATH,
+                                use_local: bool = True) -> Dict[str, Dict[str, str]]:
+    """emotionリストをLLMで7分類に分ける（日付情報も保持）
+
+    分類結果は emotion_analyzer と共有のストアに感情ごとに保存し、
+    キャッシュにない感情だけを日付ごとにまとめて問い合わせる。
+    use_local=True の場合はローカルの分類器で確信度の高い感情を先に分類する。
+    LLMが分類できなかった感情は保存せずに最後のカテゴリ（その他）とし、次回また問い合わせる。
+    """
+    store = get_classification_store(cache_path, categories)
+    emotion_cache = store.get_many(rec['emotion'] for rec in emotion_records) if use_cache else {}
+
+    uncached = [emo for emo in dict.fromkeys(rec['emotion'] for rec in emotion_records) if emo not in emotion_cache]
+    if use_local and uncached:
+        local_classifier = LocalEmotionClassifier(categories).fit(store.get_all() if use_cache else {})
+        emotion_cache.update(local_classifier.classify(uncached)[0])
 
     date_to_emotions = {}
     for rec in emotion_records:
         date_to_emotions.setdefault(rec['date'], []).append(rec['emotion'])
 
-    result = {}
     for date, emotions in date_to_emotions.items():
+        emotions = [emo for emo in dict.fromkeys(emotions) if emo not in emotion_cache]
+        if not emotions:
+            continue
         prompt = f"""
 # 役割
 あなたは感情分類の専門家AIです。
@@ -79,36 +94,30 @@ def classify_emotions_with_llm(emotion_records: List[Dict[str, str]],
 - 必ず上記のカテゴリのいずれかに分類すること
 - JSON形式は正確に閉じてください
 """
+        classified = {}
         if ai_analyzer.use_gemini and ai_analyzer.model:
             try:
                 response = ai_analyzer.model.generate_content(prompt)
                 match = re.search(r'\{[\s\S]*\}', response.text)
                 if match:
                     data = json.loads(match.group(0))
-                    result[date] = data.get('分類', {})
-                    continue
+                    classified = {
+                        emo: cat for emo, cat in data.get('分類', {}).items()
+                        if emo in emotions and cat in categories
+                    }
             except Exception as e:
                 print(f'[ERROR] LLM解析失敗 ({date}):', e)
 
-        # fallback
-        result[date] = {emo: categories[-1] for emo in emotions}
-
-    if use_cache:
-        save_classification_cache(result, cache_path)
-
-    return result
+        store.put_many(classified)
+        emotion_cache.update(classified)
+        # fallback（保存しない）
+        for emo in emotions:
+            emotion_cache.setdefault(emo, categories[-1])
 
-# -----------------------
-# キャッシュ保存／読み込み
-# -----------------------
-def save_classification_cache(result: Dict, path: str):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
-
-def load_classification_cache(path: str) -> Dict:
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return {
+        date: {emo: emotion_cache[emo] for emo in emotions}
+        for date, emotions in date_to_emotions.items()
+    }
 
 # -----------------------
 # DataFrame変換
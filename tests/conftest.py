@@ -3,6 +3,8 @@ import pytest
 import importlib.util
 import importlib.machinery
 
+from src.diary_manager_sqlite import DiaryManagerSQLite
+
 # srcディレクトリの絶対パス
 SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
 
@@ -12,4 +14,36 @@ def add_src_to_path():
     srcディレクトリをimportパスに追加（sys.pathは使わずimportlibで）
     """
     if SRC_DIR not in os.environ.get('PYTHONPATH', ''):
-        os.environ['PYTHONPATH'] = SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', '') 
\ No newline at end of file
+        os.environ['PYTHONPATH'] = SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', '') 
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """一時ディレクトリのデータベースを使うDiaryManagerSQLite（テストの終わりに閉じる）"""
+    diary_manager = DiaryManagerSQLite(str(tmp_path / 'test.db'))
+    yield diary_manager
+    diary_manager.close()
+
+
+@pytest.fixture
+def entry_factory():
+    """テスト用のエントリのリストを作る関数を返す
+
+    entry_factory(user_id, count, start=0, **fields) は、番号 start から count 件のエントリを
+    2025-01-01から1日1件ずつ作る（IDは '{user_id}_{番号}'、番号28からは1日に戻る）。
+    fields で項目を上書きでき、値が呼び出し可能な場合は番号を渡した結果を使う。
+    """
+    def make_entries(user_id, count, start=0, **fields):
+        entries = []
+        for i in range(start, start + count):
+            date = f'2025-01-{i % 28 + 1:02d}'
+            entry = {
+                'id': f'{user_id}_{i}', 'created_at': f'{date} 10:00:00', 'date': date,
+                'text': f'日記{i}', 'question': '質問', 'user_id': user_id,
+                'topics': ['仕事'], 'emotions': ['嬉しい'],
+                'qa_chain': [{'question': f'Q{i}', 'answer': f'A{i}', 'created_at': ''}]
+            }
+            entry.update({key: value(i) if callable(value) else value for key, value in fields.items()})
+            entries.append(entry)
+        return entries
+    return make_entries
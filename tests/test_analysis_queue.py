@@ -0,0 +1,174 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+from src.ai_analyzer import AIAnalyzer, StubModel
+from src.services.analysis_queue import AnalysisQueue
+
+
+class BrokenModel(StubModel):
+    """解釈できない応答を返すか、例外を送出するスタブモデル"""
+
+    def __init__(self, error=None):
+        super().__init__()
+        self.error = error
+        self.text = '分析できませんでした'
+
+    def generate_content(self, prompt):
+        if self.error:
+            raise self.error
+        return self
+
+
+class FakeAnalyzer:
+    """分析回数を数え、指定した回数だけ失敗するAIAnalyzerの代わり"""
+
+    def __init__(self, failures=0, on_analyze=None):
+        self.failures = failures
+        self.on_analyze = on_analyze
+        self.calls = 0
+
+    def new_diary_entry(self, text):
+        now = datetime.datetime.now()
+        return {
+            'id': f"entry_{now.strftime('%Y%m%d_%H%M%S_%f')}",
+            'created_at': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'date': now.strftime('%Y-%m-%d'),
+            'text': text
+        }
+
+    def analyze_diary(self, text, qa_chain=None, fallback=True):
+        self.calls += 1
+        if self.on_analyze:
+            self.on_analyze()
+        if self.calls <= self.failures:
+            raise RuntimeError('API error')
+        return {'topics': ['仕事'], 'emotions': ['嬉しい'], 'question': f'{text}について', 'text': '無視される'}
+
+
+def test_submit_saves_before_analysis(manager):
+    """投稿時は分析せずに保存し、ジョブの実行で分析結果が書き戻されることをテスト"""
+    analyzer = FakeAnalyzer()
+    analysis_queue = AnalysisQueue(manager, analyzer)
+
+    entry_id = analysis_queue.submit_entry('働いた', '2025-01-01', 'queue_user')
+
+    saved = manager.get_entry(entry_id, 'queue_user')
+    assert saved['text'] == '働いた'
+    assert saved['topics'] == []
+    assert analyzer.calls == 0
+    assert manager.get_analysis_statuses([entry_id, 'missing']) == {entry_id: 'pending'}
+
+    assert analysis_queue.run_pending() == 1
+
+    analyzed = manager.get_entry(entry_id, 'queue_user')
+    assert analyzed['topics'] == ['仕事']
+    assert analyzed['question'] == '働いたについて'
+    assert analyzed['text'] == '働いた'
+    assert manager.get_analysis_statuses([entry_id, analyzed['id']]) == {entry_id: 'done', analyzed['id']: 'done'}
+
+
+def test_failed_jobs_are_retried_then_marked_failed(manager):
+    """失敗したジョブは上限回数まで再実行され、エントリは残ることをテスト"""
+    analysis_queue = AnalysisQueue(manager, FakeAnalyzer(failures=5), max_attempts=3)
+    entry_id = analysis_queue.submit_entry('働いた', '2025-01-01', 'queue_user')
+
+    assert analysis_queue.run_pending() == 3
+    assert manager.get_analysis_statuses([entry_id]) == {entry_id: 'failed'}
+    assert manager.get_entry(entry_id)['text'] == '働いた'
+
+    # 再登録すると新しいジョブとして実行される
+    analysis_queue.ai_analyzer.failures = 0
+    assert analysis_queue.enqueue(entry_id) is not None
+    assert analysis_queue.run_pending() == 1
+    assert manager.get_analysis_statuses([entry_id]) == {entry_id: 'done'}
+
+
+@pytest.mark.parametrize('model', [BrokenModel(), BrokenModel(RuntimeError('API error'))])
+def test_failed_analysis_is_not_written_back(manager, model):
+    """モデルの応答を解釈できないか呼び出しに失敗した場合は、モックの結果を書き戻さずに失敗扱いにすることをテスト"""
+    analysis_queue = AnalysisQueue(manager, AIAnalyzer(model=model), max_attempts=2)
+    entry_id = analysis_queue.submit_entry('働いた', '2025-01-01', 'queue_user')
+
+    assert analysis_queue.run_pending(limit=1) == 1
+    assert manager.get_analysis_statuses([entry_id]) == {entry_id: 'pending'}
+    assert analysis_queue.run_pending() == 1
+    assert manager.get_analysis_statuses([entry_id]) == {entry_id: 'failed'}
+    assert manager.get_entry(entry_id)['topics'] == []
+
+
+def test_enqueue_does_not_duplicate_active_jobs(manager):
+    """未完了のジョブがあるエントリは重複して登録しないことをテスト"""
+    analysis_queue = AnalysisQueue(manager, FakeAnalyzer())
+    entry_id = analysis_queue.submit_entry('働いた', '2025-01-01')
+
+    first = manager.enqueue_analysis(entry_id)
+    assert manager.enqueue_analysis(entry_id) == first
+    assert manager.enqueue_analysis('missing') is None
+    assert analysis_queue.run_pending() == 1
+
+
+def test_entry_updated_during_analysis_is_not_overwritten(manager):
+    """分析中にエントリが更新されたら書き戻さず、再実行で新しい内容を分析することをテスト"""
+    holder = {}
+    analyzer = FakeAnalyzer(on_analyze=lambda: analyzer.calls == 1 and manager.patch_diary_entry(
+        holder['id'], {'text': '書き直した'}
+    ))
+    analysis_queue = AnalysisQueue(manager, analyzer)
+    holder['id'] = analysis_queue.submit_entry('働いた', '2025-01-01')
+
+    assert analysis_queue.run_pending() == 2
+
+    entry = manager.get_entry(holder['id'])
+    assert entry['text'] == '書き直した'
+    assert entry['question'] == '書き直したについて'
+
+
+def test_stale_running_job_is_reclaimed(manager):
+    """実行中のまま期限を過ぎたジョブだけが別のワーカーに引き継がれることをテスト"""
+    analysis_queue = AnalysisQueue(manager, FakeAnalyzer())
+    entry_id = analysis_queue.submit_entry('働いた', '2025-01-01')
+
+    job = manager.claim_analysis_job()
+    assert job['attempts'] == 1
+    assert manager.claim_analysis_job() is None
+
+    reclaimed = manager.claim_analysis_job(lease_seconds=-1)
+    assert (reclaimed['id'], reclaimed['attempts']) == (job['id'], 2)
+    assert manager.finish_analysis_job(reclaimed['id']) == 'done'
+    assert manager.get_analysis_statuses([entry_id]) == {entry_id: 'done'}
+
+
+def test_delete_entry_removes_jobs(manager):
+    """エントリを削除すると未完了のジョブも削除されることをテスト"""
+    analysis_queue = AnalysisQueue(manager, FakeAnalyzer())
+    entry_id = analysis_queue.submit_entry('働いた', '2025-01-01')
+
+    assert manager.delete_diary_entry(entry_id)
+    assert analysis_queue.run_pending() == 0
+
+
+def test_workers_process_jobs_in_background(manager):
+    """ワーカースレッドが登録されたジョブを並行して実行することをテスト"""
+    release = threading.Event()
+    analysis_queue = AnalysisQueue(manager, FakeAnalyzer(on_analyze=lambda: release.wait(5)),
+                                   workers=2, poll_interval=0.05)
+    analysis_queue.start()
+    try:
+        entry_ids = [analysis_queue.submit_entry(f'日記{i}', '2025-01-01') for i in range(4)]
+        # 分析が終わる前でも投稿はすぐに戻る
+        assert all(manager.get_entry(entry_id) for entry_id in entry_ids)
+        release.set()
+
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            statuses = manager.get_analysis_statuses(entry_ids)
+            if all(status == 'done' for status in statuses.values()):
+                break
+            time.sleep(0.05)
+        assert manager.get_analysis_statuses(entry_ids) == {entry_id: 'done' for entry_id in entry_ids}
+        assert analysis_queue.ai_analyzer.calls == 4
+    finally:
+        analysis_queue.stop(timeout=5)
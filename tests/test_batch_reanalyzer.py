@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src.ai_analyzer import AIAnalyzer, StubModel
+from src.services.batch_reanalyzer import BatchReanalyzer, TokenBucket
+
+
+class FlakyModel(StubModel):
+    """最初のfailures回は例外を送出するスタブモデル"""
+
+    def __init__(self, failures=0, on_call=None):
+        super().__init__({'topics': ['再分析'], 'emotions': ['安心'], 'question': '新しい質問'})
+        self.failures = failures
+        self.on_call = on_call
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.on_call:
+            self.on_call(call)
+        if call <= self.failures:
+            raise RuntimeError('429 Resource exhausted')
+        return self
+
+
+@pytest.fixture
+def workspace(tmp_path, manager, entry_factory):
+    """テスト用の一時ディレクトリと、エントリを登録したDiaryManagerSQLite"""
+    manager.add_diary_entries_batch(
+        entry_factory('batch_user', 7, id=lambda i: f'entry_{i}', question='古い質問', topics=['古いトピック'],
+                      qa_chain=[{'question': 'Q', 'answer': 'A', 'created_at': ''}])
+        + entry_factory('other_user', 1, id='other_entry', text='他人の日記', question='', topics=['古いトピック'])
+    )
+    return str(tmp_path), manager
+
+
+def _reanalyzer(manager, model, **kwargs):
+    kwargs.setdefault('requests_per_minute', 0)
+    kwargs.setdefault('sleep', lambda seconds: None)
+    return BatchReanalyzer(manager, AIAnalyzer(model=model), **kwargs)
+
+
+def test_token_bucket_limits_rate():
+    """補充の速さを超えて取得しようとすると待たされることをテスト"""
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0], sleep=sleep)
+
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    now[0] += 10
+    assert bucket.acquire() == 0.0
+    assert waits == [pytest.approx(0.5)]
+
+
+def test_reanalyze_updates_analysis_fields(workspace):
+    """分析結果の項目だけを書き換え、本文・Q&A・他のユーザーのエントリは変えないことをテスト"""
+    _, manager = workspace
+    model = FlakyModel()
+
+    result = _reanalyzer(manager, model, chunk_size=3).reanalyze('batch_user')
+
+    assert (result['processed'], result['updated'], result['conflicts'], result['failed']) == (7, 7, 0, [])
+    assert model.calls == 7
+    for entry in manager.get_user_diary_data('batch_user'):
+        assert entry['topics'] == ['再分析']
+        assert entry['emotions'] == ['安心']
+        assert entry['question'] == '新しい質問'
+        assert entry['qa_chain'][0]['answer'] == 'A'
+        assert entry['text'].startswith('日記')
+    assert manager.get_user_diary_data('other_user')[0]['topics'] == ['古いトピック']
+
+    in_range = _reanalyzer(manager, FlakyModel()).reanalyze('batch_user', '2025-01-02', '2025-01-03')
+    assert in_range['processed'] == 2
+
+
+def test_reanalyze_runs_concurrently(workspace):
+    """チャンク内のエントリを並列に分析することをテスト"""
+    _, manager = workspace
+    barrier = threading.Barrier(2, timeout=5)
+    # 最初の2件が同時に呼び出されなければ BrokenBarrierError で失敗する
+    model = FlakyModel(on_call=lambda call: call <= 2 and barrier.wait())
+
+    result = _reanalyzer(manager, model, concurrency=2, chunk_size=7, max_retries=0).reanalyze('batch_user')
+
+    assert result['updated'] == 7
+
+
+def test_reanalyze_retries_with_backoff(workspace):
+    """失敗した呼び出しを指数バックオフで再試行し、上限を超えたエントリは変えないことをテスト"""
+    _, manager = workspace
+    waits = []
+
+    result = _reanalyzer(manager, FlakyModel(failures=2), concurrency=1, max_retries=3,
+                         backoff_seconds=1.0, sleep=waits.append).reanalyze('batch_user')
+    assert result['updated'] == 7
+    assert len(waits) == 2
+    assert 0.5 <= waits[0] <= 1.0 and 1.0 <= waits[1] <= 2.0
+
+    failing = _reanalyzer(manager, FlakyModel(failures=100), max_retries=1).reanalyze('batch_user')
+    assert failing['updated'] == 0
+    assert len(failing['failed']) == 7
+    assert '429' in failing['failed'][0]['error']
+    assert manager.get_user_diary_data('batch_user')[0]['topics'] == ['再分析']
+
+
+def test_reanalyze_skips_entries_updated_during_analysis(workspace):
+    """分析中に更新されたエントリは上書きせず競合として数えることをテスト"""
+    _, manager = workspace
+    model = FlakyModel(on_call=lambda call: call == 1 and manager.patch_diary_entry('entry_6', {'text': '書き直した'}))
+
+    result = _reanalyzer(manager, model, concurrency=1, chunk_size=10).reanalyze('batch_user')
+
+    assert (result['updated'], result['conflicts']) == (6, 1)
+    entry = manager.get_entry('entry_6')
+    assert entry['text'] == '書き直した'
+    assert entry['topics'] == ['古いトピック']
+
+
+def test_reanalyze_resumes_from_checkpoint(workspace):
+    """中断した再分析を最後に書き込んだチャンクの続きから再開することをテスト"""
+    temp_dir, manager = workspace
+    checkpoint_path = os.path.join(temp_dir, 'reanalyze.checkpoint')
+
+    def interrupt(progress):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        _reanalyzer(manager, FlakyModel(), chunk_size=3, progress_callback=interrupt).reanalyze(
+            'batch_user', checkpoint_path=checkpoint_path
+        )
+    with open(checkpoint_path, encoding='utf-8') as f:
+        assert json.load(f)['processed'] == 3
+
+    model = FlakyModel()
+    result = _reanalyzer(manager, model, chunk_size=3).reanalyze('batch_user', checkpoint_path=checkpoint_path)
+
+    assert result['resumed_from'] == 3
+    assert result['processed'] == 4
+    assert model.calls == 4
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_checkpoint_for_other_prompt_is_ignored(workspace):
+    """プロンプトが変わった場合はチェックポイントを使わずに最初から再分析することをテスト"""
+    temp_dir, manager = workspace
+    checkpoint_path = os.path.join(temp_dir, 'reanalyze.checkpoint')
+
+    def interrupt(progress):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        _reanalyzer(manager, FlakyModel(), chunk_size=3, progress_callback=interrupt).reanalyze(
+            'batch_user', checkpoint_path=checkpoint_path
+        )
+
+    reanalyzer = _reanalyzer(manager, FlakyModel(), chunk_size=3)
+    reanalyzer.ai_analyzer.prompt_template += '\n# 追加の指示'
+    result = reanalyzer.reanalyze('batch_user', checkpoint_path=checkpoint_path)
+
+    assert (result['resumed_from'], result['processed']) == (0, 7)
+
+
+def test_reanalyzer_requires_model(workspace):
+    """モデルがない（モック分析しかできない）場合は再分析しないことをテスト"""
+    _, manager = workspace
+    analyzer = AIAnalyzer(model=StubModel())
+    analyzer.use_gemini = False
+
+    with pytest.raises(ValueError):
+        BatchReanalyzer(manager, analyzer)
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from src.utils.classification_store import ClassificationStore, close_classification_stores, get_classification_store
+
+CATEGORIES = ['前向き', '後ろ向き', 'その他']
+
+
+@pytest.fixture
+def temp_dir():
+    """テスト用の一時ディレクトリ"""
+    path = tempfile.mkdtemp()
+    yield path
+    close_classification_stores()
+    for name in os.listdir(path):
+        os.remove(os.path.join(path, name))
+    os.rmdir(path)
+
+
+def test_upserts_from_separate_connections_are_kept(temp_dir):
+    """別々の接続（プロセス）からの保存が互いに上書きされないことをテスト"""
+    path = os.path.join(temp_dir, 'store.db')
+    first = ClassificationStore(path, CATEGORIES)
+    second = ClassificationStore(path, CATEGORIES)
+
+    assert first.put_many({'嬉しい': '前向き', '悲しい': '後ろ向き'}) == 2
+    assert second.put_many({'退屈': 'その他', '悲しい': 'その他', '不明': 'カテゴリ外'}) == 2
+
+    assert first.get_all() == {'嬉しい': '前向き', '悲しい': 'その他', '退屈': 'その他'}
+    assert first.get_many(['嬉しい', '未分類', '嬉しい']) == {'嬉しい': '前向き'}
+    assert second.count() == 3
+    first.close()
+    second.close()
+
+
+def test_changed_categories_do_not_reuse_classifications(temp_dir):
+    """カテゴリを変更すると以前の分類を使わないことをテスト"""
+    path = os.path.join(temp_dir, 'store.db')
+    get_classification_store(path, CATEGORIES).put_many({'嬉しい': '前向き'})
+
+    changed = get_classification_store(path, CATEGORIES + ['新しいカテゴリ'])
+    assert changed.version != ClassificationStore.category_version(CATEGORIES)
+    assert changed.get_many(['嬉しい']) == {}
+    assert get_classification_store(path, CATEGORIES).get_many(['嬉しい']) == {'嬉しい': '前向き'}
+
+
+def test_legacy_json_caches_are_imported(temp_dir):
+    """同じディレクトリにある以前のJSONキャッシュを、どちらの形式も初回に取り込むことをテスト"""
+    with open(os.path.join(temp_dir, 'emotion_cache.json'), 'w', encoding='utf-8') as f:
+        json.dump({'嬉しい': '前向き', '変な値': 'カテゴリ外'}, f, ensure_ascii=False)
+    with open(os.path.join(temp_dir, 'emotion_classification_cache.json'), 'w', encoding='utf-8') as f:
+        json.dump({'2025-01-01': {'悲しい': '後ろ向き', '嬉しい': 'その他'}}, f, ensure_ascii=False)
+
+    store = get_classification_store(os.path.join(temp_dir, 'store.db'), CATEGORIES)
+
+    assert store.get_all() == {'嬉しい': '前向き', '悲しい': '後ろ向き'}
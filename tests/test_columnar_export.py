@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+
+def _make_entries(entry_factory, user_id, count):
+    """タグの件数がエントリごとに異なるテスト用エントリを作成"""
+    return entry_factory(user_id, count, topics=lambda i: ['仕事', '家族'] if i % 2 else ['散歩'],
+                         goals=lambda i: ['健康'] if i % 3 == 0 else [])
+
+
+def test_get_user_frames_matches_entries(manager, entry_factory):
+    """DataFrameの内容が読み込んだエントリと一致し、タグ列がcategory型であることをテスト"""
+    manager.add_diary_entries_batch(
+        _make_entries(entry_factory, 'frame_user', 30) + _make_entries(entry_factory, 'other_user', 5)
+    )
+
+    frames = manager.get_user_frames('frame_user')
+
+    entries = manager.get_user_diary_data('frame_user')
+    assert len(frames['entries']) == 30
+    assert set(frames['entries']['entry_id']) == {entry['original_id'] for entry in entries}
+    assert len(frames['topics']) == sum(len(entry['topics']) for entry in entries)
+    assert frames['topics']['topic'].dtype == 'category'
+    assert frames['topics']['topic'].value_counts().to_dict() == {'仕事': 15, '家族': 15, '散歩': 15}
+    assert str(frames['emotions']['date'].dtype).startswith('datetime64')
+    assert len(frames['goals']) == 10
+    assert frames['thoughts'].empty
+    assert list(frames['thoughts'].columns) == ['entry_id', 'created_at', 'date', 'thought']
+
+
+def test_iter_user_frames_is_chunked(manager, entry_factory):
+    """指定した行数ずつ読み込むことをテスト"""
+    manager.add_diary_entries_batch(_make_entries(entry_factory, 'frame_user', 25))
+
+    sizes = [len(chunk) for name, chunk in manager.iter_user_frames('frame_user', chunk_size=10) if name == 'entries']
+
+    assert sizes == [10, 10, 5]
+
+
+def test_write_during_frame_iteration_commits_immediately(manager, entry_factory):
+    """読み込み途中に同じスレッドで書き込んでもすぐにコミットされ、読み込み中の結果は変わらないことをテスト"""
+    manager.add_diary_entries_batch(_make_entries(entry_factory, 'frame_user', 25))
+
+    frames = manager.iter_user_frames('frame_user', chunk_size=10)
+    next(frames)
+    manager.add_diary_entries_batch(_make_entries(entry_factory, 'late_user', 1))
+
+    conn = sqlite3.connect(manager.db_path)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM diary_entries WHERE user_id = 'late_user'").fetchone()[0]
+    finally:
+        conn.close()
+    assert count == 1
+
+    sizes = [len(chunk) for name, chunk in frames if name == 'entries']
+    assert sizes == [10, 5]
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_export_user_columnar(tmp_path, manager, entry_factory, file_format):
+    """表ごとのファイルに辞書エンコードされたタグ列で書き出されることをテスト"""
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    manager.add_diary_entries_batch(_make_entries(entry_factory, 'frame_user', 25))
+
+    result = manager.export_user_columnar('frame_user', str(tmp_path / 'out'), file_format, chunk_size=7)
+
+    assert result['entries']['rows'] == 25
+    assert result['thoughts']['rows'] == 0
+    path = result['topics']['path']
+    table = pq.read_table(path) if file_format == 'parquet' else pa.ipc.open_file(path).read_all()
+    assert table.num_rows == result['topics']['rows'] == 37
+    assert pa.types.is_dictionary(table.schema.field('topic').type)
+    assert table.schema.field('date').type == pa.date32()
+
+    with pytest.raises(ValueError):
+        manager.export_user_columnar('frame_user', str(tmp_path), 'csv')
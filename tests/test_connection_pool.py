@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+
+from src.diary_manager_sqlite import DiaryManagerSQLite
+from src.auth.user_manager import UserManager
+
+
+@pytest.fixture
+def db_path():
+    """テスト用の一時データベースパス"""
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "test_pool.db")
+    yield path
+    DiaryManagerSQLite(path).close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rmdir(temp_dir)
+
+
+def test_connection_is_reused(db_path):
+    """呼び出しごとに接続を作り直さず再利用することをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+
+    with manager._pool.connection() as first:
+        pass
+    manager.get_all_diary_data()
+    with manager._pool.connection() as second:
+        pass
+
+    assert first is second
+    assert manager._pool._created == 1
+
+
+def test_managers_share_pool(db_path):
+    """同じファイルを使うDiaryManagerSQLiteとUserManagerがプールを共有することをテスト"""
+    diary_manager = DiaryManagerSQLite(db_path)
+    user_manager = UserManager(db_path)
+
+    assert diary_manager._pool is user_manager._pool
+
+    assert user_manager.create_user('pool_user', 'password123') is True
+    assert user_manager.authenticate_user('pool_user', 'password123') is not None
+
+
+def test_pool_size_is_bounded(db_path):
+    """上限に達したら返却を待ち、待ちきれなければタイムアウトすることをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+    pool = manager._pool
+    pool.max_size = 1
+    pool.timeout = 0.1
+
+    ready = threading.Event()
+    done = threading.Event()
+    errors = []
+
+    def hold_connection():
+        with pool.connection():
+            ready.set()
+            done.wait(5)
+
+    def borrow_connection():
+        try:
+            with pool.connection():
+                pass
+        except TimeoutError as e:
+            errors.append(e)
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    ready.wait(5)
+
+    borrower = threading.Thread(target=borrow_connection)
+    borrower.start()
+    borrower.join()
+
+    done.set()
+    holder.join()
+
+    assert len(errors) == 1
+    assert pool._created == 1
+
+
+def test_transaction_rolls_back_on_error(db_path):
+    """例外時にトランザクションがロールバックされ、接続が再利用可能な状態で戻ることをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+
+    with pytest.raises(sqlite3.Error):
+        with manager._pool.transaction() as cur:
+            cur.execute("INSERT INTO diary_entries (id, user_id) VALUES ('rollback', 'u')")
+            raise sqlite3.Error("SQL error")
+
+    assert manager.get_all_diary_data() == []
+    with manager._pool.connection() as conn:
+        assert conn.in_transaction is False
+
+
+def test_concurrent_writes(db_path):
+    """複数スレッドから同時に書き込んでも全件保存されることをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+
+    def write(worker):
+        for i in range(10):
+            manager.add_diary_entry({
+                'id': f'w{worker}_{i}',
+                'created_at': f'2025-01-01 10:{i:02d}:00',
+                'date': '2025-01-01',
+                'text': f'スレッド{worker}',
+                'user_id': 'thread_user',
+                'topics': ['並行']
+            })
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    entries = manager.get_user_diary_data('thread_user')
+    assert len(entries) == 40
+    assert all(entry['topics'] == ['並行'] for entry in entries)
+
+
+def _pragma(manager, name):
+    """プールの接続で現在のPRAGMA値を取得"""
+    with manager._pool.connection() as conn:
+        return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def test_default_storage_profile_is_applied(db_path):
+    """既定のストレージプロファイルでWAL等が有効になることをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+
+    assert _pragma(manager, 'journal_mode') == 'wal'
+    assert _pragma(manager, 'synchronous') == 1  # NORMAL
+    assert _pragma(manager, 'temp_store') == 2  # MEMORY
+    assert _pragma(manager, 'cache_size') < 0  # KiB指定
+
+
+def test_storage_profile_from_app_config(db_path, monkeypatch):
+    """AppConfigのdatabaseセクションからプロファイルを読み込めることをテスト"""
+    from src.config.app_config import AppConfig
+
+    monkeypatch.setenv('DB_JOURNAL_MODE', 'DELETE')
+    monkeypatch.setenv('DB_CACHE_SIZE_KB', '4096')
+    monkeypatch.setenv('DB_MMAP_SIZE', '0')
+    profile = AppConfig().get_storage_profile()
+
+    assert profile['journal_mode'] == 'DELETE'
+    assert profile['cache_size'] == 4096
+
+    manager = DiaryManagerSQLite(db_path, storage_profile=profile)
+    assert _pragma(manager, 'journal_mode') == 'delete'
+    assert _pragma(manager, 'cache_size') == -4096
+    assert _pragma(manager, 'mmap_size') == 0
+
+
+def test_checkpoint_policy(db_path):
+    """一定回数のコミットでPASSIVE、終了時にTRUNCATEチェックポイントが行われることをテスト"""
+    manager = DiaryManagerSQLite(db_path, storage_profile={'checkpoint_interval': 5, 'wal_autocheckpoint': 0})
+    pool = manager._pool
+    calls = []
+    original_checkpoint = pool.checkpoint
+
+    def checkpoint(mode='PASSIVE', conn=None):
+        calls.append(mode)
+        return original_checkpoint(mode, conn)
+
+    pool.checkpoint = checkpoint
+
+    for i in range(10):
+        manager.add_diary_entry({'id': f'cp_{i}', 'text': 'チェックポイント', 'user_id': 'cp_user'})
+
+    assert calls == ['PASSIVE', 'PASSIVE']
+
+    manager.close()
+    assert calls[-1] == 'TRUNCATE'
+    wal_path = db_path + '-wal'
+    assert not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0
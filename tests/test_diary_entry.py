@@ -0,0 +1,83 @@
+import json
+import pickle
+
+import pytest
+
+from src.database.diary_entry import DiaryEntry, QAItem, make_tags, EMPTY_TAGS
+
+
+def _entry(**kwargs):
+    values = dict(
+        id='entry_1', created_at='2025-01-01 10:00:00', date='2025-01-01', text='日記', question='質問',
+        user_id='entry_user', topics=make_tags(['仕事', '家族']),
+        qa_chain=make_tags([QAItem('Q1', 'A1', '2025-01-01 10:05:00')])
+    )
+    values.update(kwargs)
+    return DiaryEntry(**values)
+
+
+def test_entry_behaves_like_dict():
+    """辞書と同じように参照・比較できることをテスト"""
+    entry = _entry()
+
+    assert entry['text'] == '日記'
+    assert entry.get('goals', ['なし']) == []
+    assert entry.get('missing') is None
+    assert 'original_id' not in entry
+    assert list(entry)[:3] == ['id', 'created_at', 'date']
+    assert len(entry) == 12
+    assert entry['topics'] == ['仕事', '家族']
+    assert entry['qa_chain'] == [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}]
+    assert entry == entry.to_dict()
+    assert ', '.join(entry['topics']) == '仕事, 家族'
+    with pytest.raises(KeyError):
+        entry['original_id']
+
+    entry['snippet'] = '抜粋'
+    assert entry['snippet'] == '抜粋'
+    assert len(entry) == 13
+    assert not hasattr(entry, '__dict__')
+
+
+def test_entry_with_original_id_and_serialization():
+    """元のIDを持つ形式・JSON・pickleへの変換をテスト"""
+    entry = _entry(original_id='original_1')
+    entry['version'] = 3
+
+    assert entry['original_id'] == 'original_1'
+    assert json.loads(json.dumps(entry.to_dict(), ensure_ascii=False)) == entry
+
+    restored = pickle.loads(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+    assert restored == entry
+    assert restored['version'] == 3
+
+    without_original = pickle.loads(pickle.dumps(_entry()))
+    assert 'original_id' not in without_original
+    assert without_original['emotions'] is EMPTY_TAGS
+
+
+def test_loaded_entries_are_compact(manager, entry_factory):
+    """読み込んだエントリがスロットとタプルで保持され、タグの文字列を共有することをテスト"""
+    manager.add_diary_entries_batch(entry_factory('entry_user', 3, topics=['仕事', '家族'], emotions=[]))
+
+    entries = manager.get_user_diary_data('entry_user')
+
+    assert all(not hasattr(entry, '__dict__') for entry in entries)
+    assert all(isinstance(entry['topics'], tuple) for entry in entries)
+    assert entries[0]['topics'][0] is entries[1]['topics'][0]
+    assert entries[0]['emotions'] is entries[1]['emotions']
+    assert entries[0].to_dict()['topics'] == ['仕事', '家族']
+
+
+def test_frozen_entry_and_copy():
+    """freeze() したエントリは変更できず、copy() で変更できるコピーを作れることをテスト"""
+    entry = _entry().freeze()
+
+    with pytest.raises(TypeError):
+        entry['snippet'] = '抜粋'
+
+    copied = entry.copy()
+    copied['snippet'] = '抜粋'
+    assert copied['snippet'] == '抜粋'
+    assert copied['topics'] is entry['topics']
+    assert 'snippet' not in entry
@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from src.services import diary_importer
+from src.services.diary_importer import DiaryImporter, iter_archive_entries
+
+
+def _archive_entries(entry_factory, count):
+    """data/*.json と同じ形式（日付は created_at から決める）のエントリを作成"""
+    return entry_factory('archive', count, created_at=lambda i: f'2024-01-01T10:{i % 60:02d}:00', date=None,
+                         emotions=['嬉しい', '穏やか'], topics=['散歩'])
+
+
+def _write_json(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+
+
+def _write_jsonl(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def test_iter_archive_entries_streams_json_array(tmp_path, entry_factory, monkeypatch):
+    """JSON配列を小さな読み込み単位でも正しく分割できることをテスト"""
+    path = str(tmp_path / 'archive.json')
+    entries = _archive_entries(entry_factory, 25)
+    _write_json(path, entries)
+
+    monkeypatch.setattr(diary_importer, 'READ_BLOCK_SIZE', 7)
+
+    assert list(iter_archive_entries(path)) == entries
+
+
+def test_import_json_and_jsonl(tmp_path, manager, entry_factory):
+    """JSON・JSONLのどちらも取り込めることをテスト"""
+    json_path = str(tmp_path / 'archive.json')
+    jsonl_path = str(tmp_path / 'archive.jsonl')
+    _write_json(json_path, _archive_entries(entry_factory, 30))
+    _write_jsonl(jsonl_path, _archive_entries(entry_factory, 40)[30:])
+
+    importer = DiaryImporter(manager, chunk_size=8, user_id='archive_user')
+    first = importer.import_file(json_path)
+    second = importer.import_file(jsonl_path)
+
+    assert first['entries'] == 30
+    assert first['rows'] == 30 * 5
+    assert second['entries'] == 10
+    assert first['rows_per_sec'] > 0
+
+    saved = manager.get_user_diary_data('archive_user')
+    assert len(saved) == 40
+    assert all(entry['date'] == '2024-01-01' for entry in saved)
+    assert manager.get_import_progress(os.path.abspath(json_path)) is None
+
+
+def test_import_resumes_from_checkpoint(tmp_path, manager, entry_factory):
+    """途中で中断しても最後にコミットしたチャンクの続きから再開できることをテスト"""
+    path = str(tmp_path / 'archive.jsonl')
+    _write_jsonl(path, _archive_entries(entry_factory, 50))
+
+    def crash_after_two_chunks(progress):
+        if progress['position'] >= 20:
+            raise KeyboardInterrupt
+
+    importer = DiaryImporter(manager, chunk_size=10, user_id='resume_user',
+                             progress_callback=crash_after_two_chunks)
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_file(path)
+
+    assert len(manager.get_user_diary_data('resume_user')) == 20
+    assert manager.get_import_progress(os.path.abspath(path))['position'] == 20
+
+    result = DiaryImporter(manager, chunk_size=10, user_id='resume_user').import_file(path)
+
+    assert result['resumed_from'] == 20
+    assert result['entries'] == 30
+    saved = manager.get_user_diary_data('resume_user')
+    assert len(saved) == 50
+    assert all(entry['topics'] == ['散歩'] for entry in saved)
+
+
+def test_resume_does_not_duplicate_entries_without_id(tmp_path, manager, entry_factory):
+    """IDのないエントリも、中断後の再開で二重に取り込まれないことをテスト"""
+    path = str(tmp_path / 'archive.jsonl')
+    entries = _archive_entries(entry_factory, 30)
+    for entry in entries:
+        del entry['id']
+    _write_jsonl(path, entries)
+
+    def crash_after_first_chunk(progress):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        DiaryImporter(manager, chunk_size=10, user_id='no_id_user',
+                      progress_callback=crash_after_first_chunk).import_file(path)
+    result = DiaryImporter(manager, chunk_size=10, user_id='no_id_user').import_file(path)
+
+    assert result['resumed_from'] == 10
+    assert len(manager.get_user_diary_data('no_id_user')) == 30
+
+
+def test_progress_for_changed_file_is_ignored(tmp_path, manager, entry_factory):
+    """アーカイブが変更されていた場合は以前の進捗を使わないことをテスト"""
+    path = str(tmp_path / 'archive.jsonl')
+    _write_jsonl(path, _archive_entries(entry_factory, 10))
+
+    manager.add_diary_entries_batch([], import_progress={
+        'source': os.path.abspath(path), 'size': 1, 'mtime': 0, 'position': 5
+    })
+
+    result = DiaryImporter(manager, user_id='changed_user').import_file(path)
+
+    assert result['resumed_from'] == 0
+    assert result['entries'] == 10
@@ -1,51 +1,20 @@
 import pytest
-import tempfile
 import os
 import sqlite3
+from contextlib import contextmanager
 from unittest.mock import patch, MagicMock
 import json
 
-from src.diary_manager_sqlite import DiaryManagerSQLite
+from src.diary_manager_sqlite import DiaryManagerSQLite, EntryConflictError
 
 
-@pytest.fixture
-def diary_manager():
-    """テスト用のDiaryManagerSQLiteインスタンスを作成"""
-    # 一時的なデータベースファイルを作成
-    temp_dir = tempfile.mkdtemp()
-    test_db_path = os.path.join(temp_dir, "test_diary.db")
-
-    # DiaryManagerSQLiteインスタンスを作成
-    manager = DiaryManagerSQLite(test_db_path)
-
-    yield manager  # テスト実行
-
-    # クリーンアップ
-    try:
-        # データベース接続を確実に閉じる
-        if hasattr(manager, '_conn') and manager._conn:
-            manager._conn.close()
-
-        # 少し待ってからファイルを削除
-        import time
-        time.sleep(0.1)
-
-        if os.path.exists(test_db_path):
-            os.remove(test_db_path)
-        if os.path.exists(temp_dir):
-            os.rmdir(temp_dir)
-    except (PermissionError, OSError):
-        # Windowsでファイルが使用中の場合は無視
-        pass
-
-
-def test_ensure_database_creates_tables(diary_manager):
+def test_ensure_database_creates_tables(manager):
     """データベースとテーブルが正しく作成されることをテスト"""
     # データベースファイルが存在することを確認
-    assert os.path.exists(diary_manager.db_path)
+    assert os.path.exists(manager.db_path)
 
     # テーブルが作成されていることを確認
-    conn = sqlite3.connect(diary_manager.db_path)
+    conn = sqlite3.connect(manager.db_path)
     cur = conn.cursor()
 
     # テーブル一覧を取得
@@ -76,7 +45,7 @@ def test_ensure_database_creates_tables(diary_manager):
     conn.close()
 
 
-def test_add_diary_entry_basic(diary_manager):
+def test_add_diary_entry_basic(manager):
     """基本的な日記エントリの追加をテスト"""
     test_entry = {
         'id': 'test_123',
@@ -88,14 +57,14 @@ def test_add_diary_entry_basic(diary_manager):
     }
     
     # エントリを追加
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # 戻り値がUUID形式であることを確認
     assert isinstance(entry_id, str)
     assert len(entry_id) > 0
     
     # データベースに正しく保存されていることを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     
     saved_entry = all_data[0]
@@ -105,7 +74,7 @@ def test_add_diary_entry_basic(diary_manager):
     assert saved_entry['user_id'] == test_entry['user_id']
 
 
-def test_add_diary_entry_with_related_data(diary_manager):
+def test_add_diary_entry_with_related_data(manager):
     """関連データ（感情、トピック等）を含む日記エントリの追加をテスト"""
     test_entry = {
         'id': 'test_456',
@@ -126,10 +95,10 @@ def test_add_diary_entry_with_related_data(diary_manager):
     }
     
     # エントリを追加
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # データベースから取得して確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     
     saved_entry = all_data[0]
@@ -149,14 +118,14 @@ def test_add_diary_entry_with_related_data(diary_manager):
     assert saved_entry['qa_chain'][1]['question'] == 'Q2'
 
 
-def test_get_all_diary_data_empty(diary_manager):
+def test_get_all_diary_data_empty(manager):
     """空のデータベースからのデータ取得をテスト"""
-    data = diary_manager.get_all_diary_data()
+    data = manager.get_all_diary_data()
     assert len(data) == 0
     assert isinstance(data, list)
 
 
-def test_get_all_diary_data_multiple_entries(diary_manager):
+def test_get_all_diary_data_multiple_entries(manager):
     """複数のエントリがある場合のデータ取得をテスト"""
     # 複数のエントリを追加
     entries = [
@@ -179,10 +148,10 @@ def test_get_all_diary_data_multiple_entries(diary_manager):
     ]
     
     for entry in entries:
-        diary_manager.add_diary_entry(entry)
+        manager.add_diary_entry(entry)
     
     # データを取得して確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 2
     
     # created_atの降順でソートされていることを確認
@@ -190,7 +159,7 @@ def test_get_all_diary_data_multiple_entries(diary_manager):
     assert all_data[1]['text'] == '1番目の日記'  # 古い方が後
 
 
-def test_get_diary_by_date_range(diary_manager):
+def test_get_diary_by_date_range(manager):
     """日付範囲でのデータ取得をテスト"""
     # 異なる日付のエントリを追加
     entries = [
@@ -221,19 +190,19 @@ def test_get_diary_by_date_range(diary_manager):
     ]
     
     for entry in entries:
-        diary_manager.add_diary_entry(entry)
+        manager.add_diary_entry(entry)
     
     # 1月のデータを取得
-    jan_data = diary_manager.get_diary_by_date_range('2025-01-01', '2025-01-31')
+    jan_data = manager.get_diary_by_date_range('2025-01-01', '2025-01-31')
     assert len(jan_data) == 2
     
     # 1月10日から1月20日のデータを取得
-    mid_jan_data = diary_manager.get_diary_by_date_range('2025-01-10', '2025-01-20')
+    mid_jan_data = manager.get_diary_by_date_range('2025-01-10', '2025-01-20')
     assert len(mid_jan_data) == 1
     assert mid_jan_data[0]['text'] == '1月15日の日記'
 
 
-def test_delete_diary_entry(diary_manager):
+def test_delete_diary_entry(manager):
     """日記エントリの削除をテスト"""
     # エントリを追加
     test_entry = {
@@ -245,28 +214,28 @@ def test_delete_diary_entry(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # 削除前の確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     
     # 削除を実行
-    result = diary_manager.delete_diary_entry(entry_id)
+    result = manager.delete_diary_entry(entry_id)
     assert result is True
     
     # 削除後の確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 0
 
 
-def test_delete_nonexistent_entry(diary_manager):
+def test_delete_nonexistent_entry(manager):
     """存在しないエントリの削除をテスト"""
-    result = diary_manager.delete_diary_entry('nonexistent_id')
+    result = manager.delete_diary_entry('nonexistent_id')
     assert result is False
 
 
-def test_update_diary_entry(diary_manager):
+def test_update_diary_entry(manager):
     """日記エントリの更新をテスト"""
     # 元のエントリを追加
     original_entry = {
@@ -278,7 +247,7 @@ def test_update_diary_entry(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id = diary_manager.add_diary_entry(original_entry)
+    entry_id = manager.add_diary_entry(original_entry)
     
     # 更新データ
     update_data = {
@@ -287,11 +256,11 @@ def test_update_diary_entry(diary_manager):
     }
     
     # 更新を実行
-    result = diary_manager.update_diary_entry(entry_id, update_data)
+    result = manager.update_diary_entry(entry_id, update_data)
     assert result is True
     
     # 更新後の確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     updated_entry = all_data[0]
     assert updated_entry['text'] == '更新されたテキスト'
@@ -300,10 +269,10 @@ def test_update_diary_entry(diary_manager):
     assert updated_entry['date'] == '2025-01-01'
 
 
-def test_update_nonexistent_entry(diary_manager):
+def test_update_nonexistent_entry(manager):
     """存在しないエントリの更新をテスト"""
     update_data = {'text': '新しいテキスト'}
-    result = diary_manager.update_diary_entry('nonexistent_id', update_data)
+    result = manager.update_diary_entry('nonexistent_id', update_data)
     assert result is False
 
 
@@ -323,10 +292,10 @@ def test_database_connection_error():
         DiaryManagerSQLite(system_db_path)
 
 
-def test_sql_error_handling(diary_manager):
+def test_sql_error_handling(manager):
     """SQLエラーのハンドリングをテスト"""
     # 無効なSQLを実行しようとする
-            with patch.object(diary_manager, '_upsert_related_data') as mock_insert:
+    with patch.object(manager, '_upsert_related_data') as mock_insert:
         mock_insert.side_effect = sqlite3.Error("SQL error")
         
         test_entry = {
@@ -339,10 +308,10 @@ def test_sql_error_handling(diary_manager):
         }
         
         with pytest.raises(sqlite3.Error):
-            diary_manager.add_diary_entry(test_entry)
+            manager.add_diary_entry(test_entry)
 
 
-def test_empty_related_data(diary_manager):
+def test_empty_related_data(manager):
     """空の関連データの処理をテスト"""
     test_entry = {
         'id': 'empty_test',
@@ -360,11 +329,11 @@ def test_empty_related_data(diary_manager):
     }
     
     # エラーが発生しないことを確認
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     assert isinstance(entry_id, str)
     
     # データが正しく保存されていることを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     saved_entry = all_data[0]
     assert saved_entry['emotions'] == []
@@ -375,7 +344,7 @@ def test_empty_related_data(diary_manager):
     assert saved_entry['qa_chain'] == []
 
 
-def test_upsert_behavior(diary_manager):
+def test_upsert_behavior(manager):
     """UPSERT動作をテスト"""
     # 最初のエントリを追加
     test_entry = {
@@ -387,7 +356,7 @@ def test_upsert_behavior(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id_1 = diary_manager.add_diary_entry(test_entry)
+    entry_id_1 = manager.add_diary_entry(test_entry)
     assert entry_id_1 == 'upsert_test'  # 指定したIDが使用される
     
     # 同じIDで異なる内容を追加（UPDATEされる）
@@ -400,11 +369,11 @@ def test_upsert_behavior(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id_2 = diary_manager.add_diary_entry(updated_entry)
+    entry_id_2 = manager.add_diary_entry(updated_entry)
     assert entry_id_2 == 'upsert_test'  # 同じIDが返される
     
     # データベースに1件しか存在しないことを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     
     # 更新された内容が保存されていることを確認
@@ -413,7 +382,7 @@ def test_upsert_behavior(diary_manager):
     assert saved_entry['question'] == '更新された質問'
 
 
-def test_followup_questions_management(diary_manager):
+def test_followup_questions_management(manager):
     """フォローアップ質問の管理をテスト"""
     # 基本エントリを追加
     test_entry = {
@@ -425,31 +394,31 @@ def test_followup_questions_management(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # フォローアップ質問を追加
     followup_questions = ['追加質問1', '追加質問2', '追加質問3']
-    result = diary_manager.add_followup_questions(entry_id, followup_questions)
+    result = manager.add_followup_questions(entry_id, followup_questions)
     assert result is True
     
     # データを取得して確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     saved_entry = all_data[0]
     assert saved_entry['followup_questions'] == followup_questions
     
     # フォローアップ質問を更新
     new_followup_questions = ['新しい質問1', '新しい質問2']
-    result = diary_manager.add_followup_questions(entry_id, new_followup_questions)
+    result = manager.add_followup_questions(entry_id, new_followup_questions)
     assert result is True
     
     # 更新されたデータを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert saved_entry['followup_questions'] == new_followup_questions
 
 
-def test_qa_chain_management(diary_manager):
+def test_qa_chain_management(manager):
     """Q&A履歴の管理をテスト"""
     # 基本エントリを追加
     test_entry = {
@@ -461,18 +430,18 @@ def test_qa_chain_management(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # Q&A履歴を追加
     qa_chain = [
         {'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'},
         {'question': 'Q2', 'answer': 'A2', 'created_at': '2025-01-01 10:10:00'}
     ]
-    result = diary_manager.add_qa_chain(entry_id, qa_chain)
+    result = manager.add_qa_chain(entry_id, qa_chain)
     assert result is True
     
     # データを取得して確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     saved_entry = all_data[0]
     assert len(saved_entry['qa_chain']) == 2
@@ -483,17 +452,17 @@ def test_qa_chain_management(diary_manager):
     new_qa_chain = [
         {'question': '新しいQ1', 'answer': '新しいA1', 'created_at': '2025-01-01 11:00:00'}
     ]
-    result = diary_manager.add_qa_chain(entry_id, new_qa_chain)
+    result = manager.add_qa_chain(entry_id, new_qa_chain)
     assert result is True
     
     # 更新されたデータを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert len(saved_entry['qa_chain']) == 1
     assert saved_entry['qa_chain'][0]['question'] == '新しいQ1'
 
 
-def test_update_based_upsert_behavior(diary_manager):
+def test_update_based_upsert_behavior(manager):
     """UPDATEベースのUPSERT動作をテスト"""
     # 最初のエントリを追加
     test_entry = {
@@ -511,7 +480,7 @@ def test_update_based_upsert_behavior(diary_manager):
         ]
     }
     
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     assert entry_id == 'update_test'
     
     # 同じIDで異なる内容を追加（UPDATEされる）
@@ -531,11 +500,11 @@ def test_update_based_upsert_behavior(diary_manager):
         ]
     }
     
-    entry_id_2 = diary_manager.add_diary_entry(updated_entry)
+    entry_id_2 = manager.add_diary_entry(updated_entry)
     assert entry_id_2 == 'update_test'
     
     # データベースに1件しか存在しないことを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     assert len(all_data) == 1
     
     # 更新された内容が保存されていることを確認
@@ -550,7 +519,7 @@ def test_update_based_upsert_behavior(diary_manager):
     assert saved_entry['qa_chain'][1]['question'] == '新しいQ2'
 
 
-def test_update_based_followup_questions(diary_manager):
+def test_update_based_followup_questions(manager):
     """UPDATEベースのフォローアップ質問管理をテスト"""
     # 基本エントリを追加
     test_entry = {
@@ -562,40 +531,40 @@ def test_update_based_followup_questions(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # 最初のフォローアップ質問を追加
     followup_questions_1 = ['質問1', '質問2']
-    result = diary_manager.add_followup_questions(entry_id, followup_questions_1)
+    result = manager.add_followup_questions(entry_id, followup_questions_1)
     assert result is True
     
     # データを取得して確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert saved_entry['followup_questions'] == followup_questions_1
     
     # フォローアップ質問を更新（1つ削除、1つ変更、1つ追加）
     followup_questions_2 = ['変更された質問1', '新しい質問3']
-    result = diary_manager.add_followup_questions(entry_id, followup_questions_2)
+    result = manager.add_followup_questions(entry_id, followup_questions_2)
     assert result is True
     
     # 更新されたデータを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert saved_entry['followup_questions'] == followup_questions_2
     
     # フォローアップ質問をさらに更新（全て削除）
     followup_questions_3 = []
-    result = diary_manager.add_followup_questions(entry_id, followup_questions_3)
+    result = manager.add_followup_questions(entry_id, followup_questions_3)
     assert result is True
     
     # 空のデータを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert saved_entry['followup_questions'] == []
 
 
-def test_update_based_qa_chain(diary_manager):
+def test_update_based_qa_chain(manager):
     """UPDATEベースのQ&A履歴管理をテスト"""
     # 基本エントリを追加
     test_entry = {
@@ -607,18 +576,18 @@ def test_update_based_qa_chain(diary_manager):
         'user_id': 'test_user'
     }
     
-    entry_id = diary_manager.add_diary_entry(test_entry)
+    entry_id = manager.add_diary_entry(test_entry)
     
     # 最初のQ&A履歴を追加
     qa_chain_1 = [
         {'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'},
         {'question': 'Q2', 'answer': 'A2', 'created_at': '2025-01-01 10:10:00'}
     ]
-    result = diary_manager.add_qa_chain(entry_id, qa_chain_1)
+    result = manager.add_qa_chain(entry_id, qa_chain_1)
     assert result is True
     
     # データを取得して確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert len(saved_entry['qa_chain']) == 2
     assert saved_entry['qa_chain'][0]['question'] == 'Q1'
@@ -629,11 +598,11 @@ def test_update_based_qa_chain(diary_manager):
         {'question': '変更されたQ1', 'answer': '変更されたA1', 'created_at': '2025-01-01 10:05:00'},
         {'question': '新しいQ3', 'answer': '新しいA3', 'created_at': '2025-01-01 10:15:00'}
     ]
-    result = diary_manager.add_qa_chain(entry_id, qa_chain_2)
+    result = manager.add_qa_chain(entry_id, qa_chain_2)
     assert result is True
     
     # 更新されたデータを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert len(saved_entry['qa_chain']) == 2
     assert saved_entry['qa_chain'][0]['question'] == '変更されたQ1'
@@ -641,10 +610,657 @@ def test_update_based_qa_chain(diary_manager):
     
     # Q&A履歴をさらに更新（全て削除）
     qa_chain_3 = []
-    result = diary_manager.add_qa_chain(entry_id, qa_chain_3)
+    result = manager.add_qa_chain(entry_id, qa_chain_3)
     assert result is True
     
     # 空のデータを確認
-    all_data = diary_manager.get_all_diary_data()
+    all_data = manager.get_all_diary_data()
     saved_entry = all_data[0]
     assert saved_entry['qa_chain'] == []
+
+
+def _trace_statements(manager, func):
+    """関数の実行中にプールの接続で発行されたSQL文を記録する"""
+    statements = []
+    with manager._pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            func()
+        finally:
+            conn.set_trace_callback(None)
+    return statements
+
+
+def _count_queries(manager, func):
+    """関数の実行中にプールの接続で発行されたSQL文の数を数える"""
+    return len(_trace_statements(manager, func))
+
+
+# 関連データをすべて持つエントリの項目（entry_factory に渡す。同じ日の1分ごとに作る）
+FULL_ENTRY = {
+    'created_at': lambda i: f'2025-01-01 10:{i % 60:02d}:00',
+    'date': '2025-01-01',
+    'topics': lambda i: ['仕事', '家族'],
+    'emotions': lambda i: ['嬉しい'],
+    'thoughts': lambda i: ['頑張ろう'],
+    'goals': lambda i: ['健康'],
+    'followup_questions': lambda i: ['質問1', '質問2'],
+    'qa_chain': lambda i: [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}],
+}
+
+
+def test_get_user_diary_data_query_count_is_flat(manager, entry_factory):
+    """エントリ数が増えても取得時のクエリ数が一定であることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('bulk_user', 5, **FULL_ENTRY))
+    small_count = _count_queries(manager, lambda: manager.get_user_diary_data('bulk_user'))
+
+    manager.add_diary_entries_batch(entry_factory('bulk_user', 995, start=5, **FULL_ENTRY))
+    large_count = _count_queries(manager, lambda: manager.get_user_diary_data('bulk_user'))
+
+    assert small_count == large_count
+
+    entries = manager.get_user_diary_data('bulk_user')
+    assert len(entries) == 1000
+    for entry in entries:
+        assert entry['topics'] == ['仕事', '家族']
+        assert entry['followup_questions'] == ['質問1', '質問2']
+        assert entry['qa_chain'] == [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}]
+
+
+def test_bulk_loaders_keep_output_shape(manager, entry_factory):
+    """一括取得でも各取得メソッドの出力形式が変わらないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('shape_user', 2, **FULL_ENTRY))
+
+    user_entry = manager.get_user_diary_data('shape_user')[0]
+    assert list(user_entry.keys()) == [
+        'id', 'original_id', 'created_at', 'date', 'text', 'question', 'user_id',
+        'topics', 'emotions', 'thoughts', 'goals', 'followup_questions', 'qa_chain'
+    ]
+
+    all_entry = manager.get_all_diary_data()[0]
+    range_entry = manager.get_diary_by_date_range('2025-01-01', '2025-01-01')[0]
+    expected_keys = [
+        'id', 'created_at', 'date', 'text', 'question', 'user_id',
+        'topics', 'emotions', 'thoughts', 'goals', 'followup_questions', 'qa_chain'
+    ]
+    assert list(all_entry.keys()) == expected_keys
+    assert list(range_entry.keys()) == expected_keys
+    assert all_entry['id'].startswith('shape_user_')
+
+
+class _CountingCursor:
+    """execute・executemany の呼び出し回数を数えるカーソルのラッパー"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.calls = 0
+
+    def execute(self, *args):
+        self.calls += 1
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        self.calls += 1
+        return self._cursor.executemany(*args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _count_write_calls(manager, func):
+    """関数の実行中に書き込みトランザクションのカーソルで呼ばれた execute・executemany の回数を数える"""
+    cursors = []
+    transaction = manager._pool.transaction
+
+    @contextmanager
+    def counting_transaction():
+        with transaction() as cur:
+            cursors.append(_CountingCursor(cur))
+            yield cursors[-1]
+
+    manager._pool.transaction = counting_transaction
+    try:
+        func()
+    finally:
+        del manager._pool.transaction
+    return sum(cursor.calls for cursor in cursors)
+
+
+def test_batch_write_statements_do_not_grow_with_entries(manager, entry_factory):
+    """一括追加で呼ぶ execute・executemany の回数がエントリ数によらず一定（表の数に比例）であることをテスト"""
+    small = _count_write_calls(
+        manager, lambda: manager.add_diary_entries_batch(entry_factory('small_user', 10, **FULL_ENTRY))
+    )
+    large = _count_write_calls(
+        manager, lambda: manager.add_diary_entries_batch(entry_factory('large_user', 300, **FULL_ENTRY))
+    )
+
+    assert small == large
+    assert 0 < small <= 30
+
+
+def test_batch_write_applies_diff(manager, entry_factory):
+    """一括追加で既存エントリの関連データが差分更新されることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('diff_user', 3, **FULL_ENTRY))
+
+    entries = entry_factory('diff_user', 3, **FULL_ENTRY)
+    entries[0]['topics'] = ['仕事']  # 1つ削除
+    entries[1]['emotions'] = ['嬉しい', '安心']  # 1つ追加
+    entries[2]['qa_chain'] = []  # 全て削除
+    unchanged = _trace_statements(
+        manager, lambda: manager.add_diary_entries_batch(entry_factory('diff_user', 3, **FULL_ENTRY))
+    )
+    manager.add_diary_entries_batch(entries + [dict(entries[0], topics=['家族'])])
+
+    assert not any(statement.startswith(('UPDATE', 'DELETE', 'INSERT INTO topics')) for statement in unchanged)
+
+    saved = {entry['original_id']: entry for entry in manager.get_user_diary_data('diff_user')}
+    assert len(saved) == 3
+    assert saved['diff_user_0']['topics'] == ['家族']
+    assert saved['diff_user_1']['emotions'] == ['嬉しい', '安心']
+    assert saved['diff_user_2']['qa_chain'] == []
+    assert saved['diff_user_2']['followup_questions'] == ['質問1', '質問2']
+
+
+def test_get_user_diary_page_walks_all_entries(manager, entry_factory):
+    """カーソルをたどると全エントリを新しい順に重複なく取得できることをテスト"""
+    # created_atが同じエントリを含める（FULL_ENTRY は60件ごとに同じ時刻になる）
+    manager.add_diary_entries_batch(entry_factory('page_user', 130, **FULL_ENTRY))
+    manager.add_diary_entries_batch(entry_factory('other_user', 5, **FULL_ENTRY))
+
+    seen = []
+    cursor = None
+    while True:
+        page = manager.get_user_diary_page('page_user', page_size=20, cursor=cursor)
+        assert len(page['entries']) <= 20
+        seen.extend(page['entries'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == 130
+    assert len({entry['id'] for entry in seen}) == 130
+    assert [entry['id'] for entry in seen] == [entry['id'] for entry in manager.get_user_diary_data('page_user')]
+    keys = [(entry['created_at'], entry['id']) for entry in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert seen[0]['topics'] == ['仕事', '家族']
+
+
+def test_get_user_diary_page_filters(manager, entry_factory):
+    """日付・作成日時・本文の条件で絞り込めることをテスト"""
+    entries = entry_factory('filter_user', 6, **FULL_ENTRY)
+    for i, entry in enumerate(entries):
+        entry['date'] = f'2025-01-0{i + 1}'
+        entry['created_at'] = f'2025-01-0{i + 1} 09:00:00'
+    entries[2]['text'] = '100%の力で走った'
+    manager.add_diary_entries_batch(entries)
+
+    def texts(**filters):
+        page = manager.get_user_diary_page('filter_user', page_size=10, **filters)
+        return [entry['text'] for entry in page['entries']]
+
+    assert texts(date='2025-01-02') == ['日記1']
+    assert texts(start_date='2025-01-04', end_date='2025-01-05') == ['日記4', '日記3']
+    assert texts(created_from='2025-01-05 00:00:00') == ['日記5', '日記4']
+    assert texts(created_to='2025-01-01 23:59:59') == ['日記0']
+    assert texts(text_contains='100%') == ['100%の力で走った']
+    assert texts(text_contains='%') == ['100%の力で走った']
+
+
+def test_get_user_diary_page_all_users_format(manager, entry_factory):
+    """user_idを指定しない場合はget_all_diary_dataと同じ形式に 'version' を加えて返すことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('a_user', 2, **FULL_ENTRY) + entry_factory('b_user', 2, **FULL_ENTRY))
+
+    page = manager.get_user_diary_page(None, page_size=10)
+
+    assert page['next_cursor'] is None
+    assert all(isinstance(entry['version'], int) for entry in page['entries'])
+    assert [{key: value for key, value in entry.items() if key != 'version'} for entry in page['entries']] == \
+        manager.get_all_diary_data()
+
+
+def test_get_user_diary_page_uses_keyset_index(manager):
+    """カーソル付きの取得がインデックスの範囲検索になることをテスト"""
+    with manager._pool.connection() as conn:
+        plan = ' | '.join(row[3] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT id FROM diary_entries
+            WHERE user_id = ? AND (created_at, id) < (?, ?)
+            ORDER BY created_at DESC, id DESC
+            LIMIT 10
+        ''', ('user', '2025-01-01 10:00:00', 'x')).fetchall())
+
+    assert 'idx_diary_entries_user_created_id' in plan
+    assert '(created_at,id)<(?,?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_get_user_diary_page_query_count_is_flat(manager, entry_factory):
+    """履歴の件数が増えてもページ取得のクエリ数が一定であることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('page_user', 15, **FULL_ENTRY))
+    small_count = _count_queries(manager, lambda: manager.get_user_diary_page('page_user', page_size=10))
+
+    manager.add_diary_entries_batch(entry_factory('page_user', 985, start=15, **FULL_ENTRY))
+    large_count = _count_queries(manager, lambda: manager.get_user_diary_page('page_user', page_size=10))
+
+    assert small_count == large_count
+
+
+def test_iter_user_entries_matches_bulk_load(manager, entry_factory):
+    """チャンクごとに読み込んでも一括読み込みと同じエントリを同じ順に返すことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('stream_user', 130, **FULL_ENTRY))
+    manager.add_diary_entries_batch(entry_factory('other_user', 5, **FULL_ENTRY))
+
+    streamed = list(manager.iter_user_entries('stream_user', chunk_size=20))
+
+    assert streamed == manager.get_user_diary_data('stream_user')
+    assert list(manager.iter_user_entries(None, chunk_size=7)) == manager.get_all_diary_data()
+
+
+def test_iter_user_entries_filters_by_date(manager, entry_factory):
+    """期間で絞り込めることをテスト"""
+    entries = entry_factory('stream_user', 6, **FULL_ENTRY)
+    for i, entry in enumerate(entries):
+        entry['date'] = f'2025-01-0{i + 1}'
+        entry['created_at'] = f'2025-01-0{i + 1} 09:00:00'
+    manager.add_diary_entries_batch(entries)
+
+    streamed = manager.iter_user_entries('stream_user', start_date='2025-01-03', end_date='2025-01-04')
+
+    assert [entry['date'] for entry in streamed] == ['2025-01-04', '2025-01-03']
+
+
+def test_iter_user_entries_skips_entries_added_above_cursor(manager, entry_factory):
+    """読み込み途中に追加された読み終えた位置より新しいエントリは返さず、同じエントリも繰り返さないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('stream_user', 30, **FULL_ENTRY))
+
+    streamed = manager.iter_user_entries('stream_user', chunk_size=10)
+    first = next(streamed)
+    manager.add_diary_entries_batch(entry_factory('stream_user', 10, start=30, **FULL_ENTRY))
+    rest = list(streamed)
+
+    assert len(rest) == 29
+    assert first['id'] not in {entry['id'] for entry in rest}
+
+
+def test_write_during_iteration_commits_immediately(manager, entry_factory):
+    """読み込み途中に同じスレッドで書き込んでも、読み込みの終了を待たずにコミットされることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('stream_user', 30, **FULL_ENTRY))
+
+    streamed = manager.iter_user_entries('stream_user', chunk_size=10)
+    next(streamed)
+    manager.patch_diary_entry('stream_user_5', {'text': '読み込み中に更新'})
+
+    conn = sqlite3.connect(manager.db_path)
+    try:
+        text = conn.execute("SELECT text FROM diary_entries WHERE id = 'stream_user_5'").fetchone()[0]
+    finally:
+        conn.close()
+    assert text == '読み込み中に更新'
+
+    rest = {entry['original_id']: entry for entry in streamed}
+    assert len(rest) == 29
+    assert rest['stream_user_5']['text'] == '読み込み中に更新'
+
+
+def test_iter_user_entries_query_count_per_chunk(manager, entry_factory):
+    """クエリ数が履歴全体ではなくチャンク数に比例することをテスト"""
+    manager.add_diary_entries_batch(entry_factory('stream_user', 100, **FULL_ENTRY))
+
+    def count(chunk_size):
+        return _count_queries(manager, lambda: list(manager.iter_user_entries('stream_user', chunk_size=chunk_size)))
+
+    one_chunk, two_chunks, four_chunks = count(100), count(50), count(25)
+
+    assert two_chunks > one_chunk
+    assert four_chunks - two_chunks == 2 * (two_chunks - one_chunk)
+
+
+def _search_ids(manager, user_id, query, **kwargs):
+    return [entry['id'] for entry in manager.search_diary_entries(user_id, query, **kwargs)]
+
+
+def test_search_diary_entries_follows_writes(manager):
+    """追加・更新・Q&A追記・削除が検索インデックスに反映されることをテスト"""
+    manager.add_diary_entry({
+        'id': 'search_1', 'created_at': '2025-01-01 10:00:00', 'date': '2025-01-01',
+        'text': '図書館で本を借りた', 'question': '', 'user_id': 'search_user',
+        'thoughts': ['もっと読書したい']
+    })
+    assert _search_ids(manager, 'search_user', '図書館') == ['search_1']
+    assert _search_ids(manager, 'search_user', '読書した') == ['search_1']
+
+    manager.update_diary_entry('search_1', {'text': '公園を散歩した'})
+    assert _search_ids(manager, 'search_user', '図書館') == []
+    assert _search_ids(manager, 'search_user', '公園を散歩') == ['search_1']
+
+    manager.add_qa_chain('search_1', [{'question': '誰と？', 'answer': '友人と一緒に', 'created_at': ''}])
+    assert _search_ids(manager, 'search_user', '友人と一緒') == ['search_1']
+
+    # 同じIDで再保存してもインデックスが重複しない
+    manager.add_diary_entry({
+        'id': 'search_1', 'created_at': '2025-01-01 10:00:00', 'date': '2025-01-01',
+        'text': '公園を散歩した', 'question': '', 'user_id': 'search_user'
+    })
+    assert _search_ids(manager, 'search_user', '公園を散歩') == ['search_1']
+    assert _search_ids(manager, 'search_user', '友人と一緒') == []
+
+    manager.delete_diary_entry('search_1')
+    assert _search_ids(manager, 'search_user', '公園を散歩') == []
+
+
+def test_search_diary_entries_ranking_and_snippet(manager, entry_factory):
+    """関連度順の並び・抜粋・ユーザーの分離をテスト"""
+    entries = entry_factory('search_user', 3, **FULL_ENTRY)
+    entries[0]['text'] = '図書館に行った'
+    entries[1]['text'] = '図書館で勉強して、帰りにも図書館に寄った'
+    entries[2]['text'] = '家で過ごした'
+    other = entry_factory('other_user', 1, **FULL_ENTRY)
+    other[0]['text'] = '図書館に行った'
+    manager.add_diary_entries_batch(entries + other)
+
+    results = manager.search_diary_entries('search_user', '図書館')
+
+    assert [entry['id'] for entry in results] == ['search_user_1', 'search_user_0']
+    assert results[0]['score'] <= results[1]['score']
+    assert '**図書館**' in results[0]['snippet']
+    assert results[0]['topics'] == ['仕事', '家族']
+    assert _search_ids(manager, 'search_user', '図書館 勉強') == ['search_user_1']
+    assert _search_ids(manager, 'search_user', '図書館', limit=1) == ['search_user_1']
+
+
+def test_search_diary_entries_short_terms(manager, entry_factory):
+    """trigramで索引できない短い語でも部分一致で検索できることをテスト"""
+    entries = entry_factory('search_user', 3, **FULL_ENTRY)
+    entries[0]['text'] = '犬と散歩'
+    entries[2]['text'] = '猫と散歩'
+    manager.add_diary_entries_batch(entries)
+
+    results = manager.search_diary_entries('search_user', '散歩')
+
+    assert [entry['id'] for entry in results] == ['search_user_2', 'search_user_0']
+    assert results[0]['score'] is None
+    assert _search_ids(manager, 'search_user', '猫') == ['search_user_2']
+    assert _search_ids(manager, 'search_user', '日記1 A1') == ['search_user_1']
+    assert manager.search_diary_entries('search_user', '   ') == []
+
+
+def test_search_diary_entries_ranks_all_matches(manager, entry_factory):
+    """古いエントリも含めて一致したすべてを順位付けし、offsetで続きを取得できることをテスト"""
+    entries = entry_factory('search_user', 600, **FULL_ENTRY)
+    for entry in entries:
+        entry['text'] = '今日も図書館に行った。' + 'とても長い一日の記録。' * 20
+    entries[0]['text'] = '図書館、図書館、図書館'
+    manager.add_diary_entries_batch(entries)
+
+    assert _search_ids(manager, 'search_user', '図書館', limit=1) == ['search_user_0']
+
+    first = _search_ids(manager, 'search_user', '図書館', limit=300)
+    second = _search_ids(manager, 'search_user', '図書館', limit=300, offset=300)
+    assert len(set(first + second)) == 600
+    assert _search_ids(manager, 'search_user', '図書館', offset=600) == []
+
+
+def test_get_diary_statistics_matches_entries(manager, entry_factory):
+    """SQLでの集計結果が読み込んだエントリから数えた値と一致することをテスト"""
+    entries = entry_factory('stats_user', 6, **FULL_ENTRY)
+    for i, entry in enumerate(entries):
+        entry['date'] = f'2025-01-{i % 3 + 1:02d}'
+        entry['emotions'] = ['嬉しい'] if i % 2 else ['嬉しい', '不安']
+    entries[0]['topics'] = ['仕事']
+    manager.add_diary_entries_batch(entries + entry_factory('other_user', 2, **FULL_ENTRY))
+
+    statistics = manager.get_diary_statistics('stats_user', top_n=2)
+
+    assert statistics['total_entries'] == 6
+    assert statistics['date_range'] == {'start': '2025-01-01', 'end': '2025-01-03'}
+    assert statistics['entries_per_day'] == [('2025-01-01', 2), ('2025-01-02', 2), ('2025-01-03', 2)]
+    assert statistics['top_topics'] == [('仕事', 6), ('家族', 5)]
+    assert statistics['top_emotions'] == [('嬉しい', 6), ('不安', 3)]
+    assert statistics['top_thoughts'] == [('頑張ろう', 6)]
+    assert statistics['top_goals'] == [('健康', 6)]
+    total_length = sum(len(entry['text']) for entry in entries)
+    assert statistics['total_text_length'] == total_length
+    assert statistics['avg_text_length'] == total_length // 6
+
+
+def test_get_diary_statistics_period_and_empty(manager, entry_factory):
+    """期間の絞り込みとデータがない場合の集計をテスト"""
+    entries = entry_factory('stats_user', 4, **FULL_ENTRY)
+    for i, entry in enumerate(entries):
+        entry['date'] = f'2025-0{i + 1}-15'
+    manager.add_diary_entries_batch(entries)
+
+    summary = manager.get_entry_summary('stats_user', start_date='2025-02-01', end_date='2025-03-31')
+    assert summary['total_entries'] == 2
+    assert (summary['start_date'], summary['end_date']) == ('2025-02-15', '2025-03-15')
+    assert manager.get_top_items('goals', None, start_date='2025-04-01') == [('健康', 1)]
+
+    empty = manager.get_diary_statistics('nobody')
+    assert empty['total_entries'] == 0
+    assert empty['date_range'] is None
+    assert empty['top_topics'] == []
+
+    with pytest.raises(ValueError):
+        manager.get_top_items('qa_chain', 'stats_user')
+
+
+def test_get_diary_statistics_query_count_is_flat(manager, entry_factory):
+    """履歴の件数が増えても統計のクエリ数が一定であることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('stats_user', 5, **FULL_ENTRY))
+    small_count = _count_queries(manager, lambda: manager.get_diary_statistics('stats_user'))
+
+    manager.add_diary_entries_batch(entry_factory('stats_user', 495, start=5, **FULL_ENTRY))
+    large_count = _count_queries(manager, lambda: manager.get_diary_statistics('stats_user'))
+
+    assert small_count == large_count
+
+
+def test_statistics_rollups_follow_writes(manager, entry_factory):
+    """追加・更新・削除がロールアップに同じトランザクションで反映されることをテスト"""
+    entries = entry_factory('rollup_user', 4, **FULL_ENTRY)
+    for i, entry in enumerate(entries):
+        entry['date'] = ['2025-01-06', '2025-01-08', '2025-01-12', '2025-01-13'][i]
+    manager.add_diary_entries_batch(entries)
+
+    assert manager.get_weekly_entry_counts('rollup_user') == [('2025-01-06', 3), ('2025-01-13', 1)]
+
+    manager.update_diary_entry('rollup_user_0', {'text': '長い日記の本文', 'date': '2025-01-13', 'topics': ['散歩']})
+    manager.delete_diary_entry('rollup_user_1')
+    entries[2]['user_id'] = 'moved_user'
+    manager.add_diary_entry(entries[2])
+
+    statistics = manager.get_diary_statistics('rollup_user')
+    assert statistics['total_entries'] == 2
+    assert statistics['entries_per_day'] == [('2025-01-13', 2)]
+    assert statistics['entries_per_week'] == [('2025-01-13', 2)]
+    assert statistics['top_topics'] == [('仕事', 1), ('家族', 1), ('散歩', 1)]
+    # 部分更新なので指定していない感情はそのまま残る
+    assert statistics['top_emotions'] == [('嬉しい', 2)]
+    assert statistics['total_text_length'] == len('長い日記の本文') + len('日記3')
+    assert manager.get_entry_summary('moved_user')['total_entries'] == 1
+
+    assert manager.rebuild_statistics()['mismatched'] == 0
+
+
+def test_statistics_reads_do_not_scan_entries(manager, entry_factory):
+    """統計の取得でエントリや関連テーブルを読まないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('rollup_user', 20, **FULL_ENTRY))
+
+    statements = _trace_statements(manager, lambda: manager.get_diary_statistics('rollup_user'))
+
+    assert statements
+    assert not [statement for statement in statements if 'diary_entries' in statement or 'FROM topics' in statement]
+
+
+def test_rebuild_statistics_repairs_rollups(manager, entry_factory):
+    """ロールアップがずれていても作り直しで元データと一致することをテスト"""
+    manager.add_diary_entries_batch(entry_factory('rollup_user', 5, **FULL_ENTRY))
+    expected = manager.get_diary_statistics('rollup_user')
+    with manager._pool.transaction() as cur:
+        cur.execute("UPDATE stats_entry_counts SET entry_count = 99 WHERE period = 'all'")
+        cur.execute("DELETE FROM stats_item_counts WHERE kind = 'goals'")
+
+    result = manager.rebuild_statistics()
+
+    # 全期間の件数1行と、目標の日次・週次・全期間の3行
+    assert result['mismatched'] == 1 + 3
+    assert manager.get_diary_statistics('rollup_user') == expected
+
+
+def test_get_entry_by_original_id_and_uuid(manager, entry_factory):
+    """元のIDとUUIDのどちらでも1件取得できることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('entry_user', 3, **FULL_ENTRY))
+    generated_id = manager.add_diary_entry({
+        'created_at': '2025-01-02 10:00:00', 'date': '2025-01-02', 'text': 'IDなし',
+        'question': '', 'user_id': 'entry_user', 'topics': ['散歩']
+    })
+
+    entry = manager.get_entry('entry_user_1')
+    assert entry['id'] == 'entry_user_1'
+    assert entry['text'] == '日記1'
+    assert entry['qa_chain'] == [{'question': 'Q1', 'answer': 'A1', 'created_at': '2025-01-01 10:05:00'}]
+
+    generated = manager.get_entry(generated_id)
+    assert generated['text'] == 'IDなし'
+    assert generated['topics'] == ['散歩']
+
+    assert manager.get_entry('entry_user_1', user_id='other_user') is None
+    assert manager.get_entry('missing') is None
+
+
+def test_get_entries_keeps_order(manager, entry_factory):
+    """指定した順にまとめて取得し、見つからないIDを飛ばすことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('entry_user', 1000, **FULL_ENTRY))
+    ids = [f'entry_user_{i}' for i in range(999, -1, -1)]
+
+    entries = manager.get_entries(ids[:3] + ['missing'] + ids[3:])
+
+    assert [entry['id'] for entry in entries] == ids
+    assert all(entry['topics'] == ['仕事', '家族'] for entry in entries)
+    assert manager.get_entries([]) == []
+
+
+def test_get_entry_query_count_is_flat(manager, entry_factory):
+    """履歴の件数が増えても1件取得のクエリ数が一定であることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('entry_user', 5, **FULL_ENTRY))
+    small_count = _count_queries(manager, lambda: manager.get_entry('entry_user_0'))
+
+    manager.add_diary_entries_batch(entry_factory('entry_user', 995, start=5, **FULL_ENTRY))
+    large_count = _count_queries(manager, lambda: manager.get_entry('entry_user_0'))
+
+    assert small_count == large_count
+
+
+def test_related_writes_to_missing_entry_are_rejected(manager):
+    """存在しないエントリへの関連データの書き込みを行わないことをテスト"""
+    assert manager.add_qa_chain('missing', [{'question': 'Q', 'answer': 'A', 'created_at': ''}]) is False
+    assert manager.add_followup_questions('missing', ['質問']) is False
+
+    with manager._pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM qa_chain').fetchone()[0] == 0
+
+
+def test_patch_diary_entry_changes_only_given_fields(manager, entry_factory):
+    """部分更新で指定した項目だけが変わり、バージョンが進むことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('patch_user', 1, **FULL_ENTRY))
+    before = manager.get_entry('patch_user_0')
+
+    version = manager.patch_diary_entry('patch_user_0', {'date': '2025-02-01'})
+
+    after = manager.get_entry('patch_user_0')
+    assert version == before['version'] + 1
+    assert after['version'] == version
+    assert after['date'] == '2025-02-01'
+    assert {key: value for key, value in after.items() if key not in ('date', 'version')} == \
+        {key: value for key, value in before.items() if key not in ('date', 'version')}
+
+    manager.patch_diary_entry('patch_user_0', {'topics': ['散歩'], 'text': '書き直した'})
+    after = manager.get_entry('patch_user_0')
+    assert (after['topics'], after['text'], after['emotions']) == (['散歩'], '書き直した', before['emotions'])
+    assert manager.patch_diary_entry('missing', {'date': '2025-02-01'}) is None
+
+
+def test_patch_diary_entry_does_not_touch_child_tables(manager, entry_factory):
+    """日付だけの更新で関連テーブルへの書き込みを行わないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('patch_user', 1, **FULL_ENTRY))
+
+    statements = _trace_statements(
+        manager, lambda: manager.patch_diary_entry('patch_user_0', {'date': '2025-02-01'})
+    )
+
+    tables = ('topics', 'emotions', 'thoughts', 'goals', 'qa_chain', 'followup_questions')
+    assert not [
+        statement for statement in statements
+        if statement.startswith(('INSERT', 'DELETE')) and any(f' {table} ' in statement + ' ' for table in tables)
+    ]
+
+
+def test_patch_diary_entry_detects_conflict(manager, entry_factory):
+    """読み込んだ後に別の書き込みがあれば更新せずに競合を通知することをテスト"""
+    manager.add_diary_entries_batch(entry_factory('patch_user', 1, **FULL_ENTRY))
+    version = manager.get_entry('patch_user_0')['version']
+    manager.add_qa_chain('patch_user_0', [{'question': 'Q2', 'answer': 'A2', 'created_at': ''}])
+
+    with pytest.raises(EntryConflictError):
+        manager.patch_diary_entry('patch_user_0', {'text': '古い内容'}, expected_version=version)
+    assert manager.get_entry('patch_user_0')['text'] == '日記0'
+
+    current = manager.get_entry('patch_user_0')['version']
+    assert manager.patch_diary_entry('patch_user_0', {'text': '新しい内容'}, expected_version=current) == current + 1
+
+    with pytest.raises(ValueError):
+        manager.patch_diary_entry('patch_user_0', {'user_id': 'other_user'})
+
+
+def test_append_qa_adds_to_end_of_chain(manager, entry_factory):
+    """既存のQ&A履歴を残したまま末尾に追加されることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('qa_user', 1, **FULL_ENTRY))
+    version = manager.get_entry('qa_user_0')['version']
+
+    assert manager.append_qa('qa_user_0', 'Q2', 'A2', '2025-01-01 11:00:00') is True
+    assert manager.append_qa_batch('qa_user_0', [
+        {'question': 'Q3', 'answer': 'A3', 'created_at': ''},
+        {'question': 'Q4', 'answer': 'A4', 'created_at': ''},
+    ]) is True
+
+    entry = manager.get_entry('qa_user_0')
+    assert [qa['question'] for qa in entry['qa_chain']] == ['Q1', 'Q2', 'Q3', 'Q4']
+    assert entry['qa_chain'][1] == {'question': 'Q2', 'answer': 'A2', 'created_at': '2025-01-01 11:00:00'}
+    assert entry['version'] == version + 2
+    assert _search_ids(manager, 'qa_user', 'A4') == ['qa_user_0']
+
+    # 追加した後も履歴全体の差分更新と整合する
+    manager.add_qa_chain('qa_user_0', entry['qa_chain'][:2])
+    assert [qa['question'] for qa in manager.get_entry('qa_user_0')['qa_chain']] == ['Q1', 'Q2']
+    manager.append_qa('qa_user_0', 'Q3', 'A3')
+    assert [qa['question'] for qa in manager.get_entry('qa_user_0')['qa_chain']] == ['Q1', 'Q2', 'Q3']
+
+
+def test_append_qa_to_missing_or_other_users_entry(manager, entry_factory):
+    """存在しないエントリや別ユーザーのエントリには追加しないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('qa_user', 1, **FULL_ENTRY))
+
+    assert manager.append_qa('missing', 'Q', 'A') is False
+    assert manager.append_qa('qa_user_0', 'Q', 'A', user_id='other_user') is False
+    assert manager.append_qa('qa_user_0', 'Q', 'A', user_id='qa_user') is True
+    assert len(manager.get_entry('qa_user_0')['qa_chain']) == 2
+
+
+def test_append_qa_does_not_rewrite_chain(manager, entry_factory):
+    """回答の追加で既存の履歴を読み込んだり書き換えたりしないことをテスト"""
+    entries = entry_factory('qa_user', 1, **FULL_ENTRY)
+    entries[0]['qa_chain'] = [{'question': f'Q{i}', 'answer': f'A{i}', 'created_at': ''} for i in range(50)]
+    manager.add_diary_entries_batch(entries)
+
+    statements = _trace_statements(manager, lambda: manager.append_qa('qa_user_0', 'Q', 'A'))
+
+    statements = [statement.strip() for statement in statements]
+    assert [statement for statement in statements if statement.startswith('INSERT INTO qa_chain')]
+    assert not [
+        statement for statement in statements
+        if statement.startswith(('UPDATE qa_chain', 'DELETE FROM qa_chain', 'SELECT diary_entry_id'))
+    ]
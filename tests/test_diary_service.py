@@ -0,0 +1,42 @@
+import pytest
+
+from src.ai_analyzer import AIAnalyzer, StubModel
+from src.services import diary_service
+from src.services.diary_service import DiaryService
+
+
+@pytest.fixture
+def service(tmp_path):
+    """エントリを1件登録したDiaryService"""
+    # サービスが捕捉する EntryConflictError と同じモジュールのマネージャーを使う（共有の manager は使えない）
+    manager = diary_service.DiaryManagerSQLite(str(tmp_path / 'test_service.db'))
+    manager.add_diary_entry({
+        'id': 'service_1', 'created_at': '2025-01-01 10:00:00', 'date': '2025-01-01',
+        'text': '日記', 'question': '質問', 'user_id': 'service_user'
+    })
+    yield DiaryService(manager, AIAnalyzer(model=StubModel()))
+    manager.close()
+
+
+def test_update_entry_date_checks_version(service):
+    """読み込んだ後に別のセッションで更新されていたら日付を変更しないことをテスト"""
+    manager = service.diary_manager
+    entry = manager.get_entry('service_1', 'service_user')
+
+    manager.patch_diary_entry('service_1', {'text': '別の画面で編集'})
+    with pytest.raises(ValueError):
+        service.update_entry_date('service_1', '2025-01-02', entry['version'])
+    assert manager.get_entry('service_1')['date'] == '2025-01-01'
+
+    latest = manager.get_entry('service_1', 'service_user')
+    assert service.update_entry_date('service_1', '2025-01-02', latest['version'])
+    assert manager.get_entry('service_1')['date'] == '2025-01-02'
+
+
+def test_update_entry_date_without_version(service):
+    """expected_versionを渡さない場合は確認せずに日付を変更することをテスト"""
+    manager = service.diary_manager
+    manager.patch_diary_entry('service_1', {'text': '別の画面で編集'})
+
+    assert service.update_entry_date('service_1', '2025-01-03')
+    assert manager.get_entry('service_1')['date'] == '2025-01-03'
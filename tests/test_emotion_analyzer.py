@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import tempfile
+
+import pytest
+
+from src.ai_analyzer import AIAnalyzer
+from src.utils.classification_store import close_classification_stores, get_classification_store
+from src.utils.emotion_analyzer import categories, classify_emotion_batch, classify_emotions_with_llm
+from src.utils.tag_analyzer import classify_emotions_with_llm as classify_emotions_tag
+
+
+class FakeClassifierModel:
+    """プロンプトの番号付き感情を読み取り、決まったカテゴリを返すモデル"""
+
+    def __init__(self, mapping, broken=()):
+        self.mapping = mapping
+        self.broken = set(broken)
+        self.batches = []
+
+    def generate_content(self, prompt):
+        numbered = json.loads(re.search(r'感情（番号: 感情）:\n(\{[\s\S]*?\n\})', prompt).group(1))
+        self.batches.append(list(numbered.values()))
+        if len(numbered) > 1 and self.broken & set(numbered.values()):
+            # 壊れた応答（JSONが閉じていない）
+            self.text = '{"分類": {"1": "その他"'
+        else:
+            self.text = json.dumps({'分類': {
+                key: self.mapping.get(emotion, 'カテゴリ外')
+                for key, emotion in numbered.items()
+            }}, ensure_ascii=False)
+        return self
+
+
+@pytest.fixture
+def cache_path():
+    """テスト用の分類ストアのパス"""
+    temp_dir = tempfile.mkdtemp()
+    yield os.path.join(temp_dir, 'emotion_classification.db')
+    close_classification_stores()
+    for name in os.listdir(temp_dir):
+        os.remove(os.path.join(temp_dir, name))
+    os.rmdir(temp_dir)
+
+
+def test_uncached_emotions_are_classified_in_batches(cache_path):
+    """キャッシュにない感情を重複なしでまとめて問い合わせ、結果をキャッシュすることをテスト"""
+    mapping = {f'感情{i}': categories[i % 6] for i in range(5)}
+    model = FakeClassifierModel(mapping)
+    records = [{'date': f'2025-01-0{i % 3 + 1}', 'emotion': f'感情{i % 5}'} for i in range(12)]
+
+    result = classify_emotions_with_llm(records, categories, AIAnalyzer(model=model), cache_path=cache_path,
+                                        batch_size=2, use_local=False)
+
+    assert model.batches == [['感情0', '感情1'], ['感情2', '感情3'], ['感情4']]
+    assert result['2025-01-01']['感情3'] == mapping['感情3']
+    assert get_classification_store(cache_path, categories).get_all() == mapping
+
+    # 2回目はキャッシュだけで分類する
+    model.batches = []
+    records.append({'date': '2025-01-04', 'emotion': '新しい感情'})
+    result = classify_emotions_with_llm(records, categories, AIAnalyzer(model=model), cache_path=cache_path,
+                                        use_local=False)
+    assert model.batches == [['新しい感情']]
+    assert result['2025-01-04'] == {'新しい感情': categories[-1]}
+    # 分類できなかった感情は保存しない
+    assert '新しい感情' not in get_classification_store(cache_path, categories).get_all()
+
+
+def test_failed_batches_are_split_and_retried():
+    """壊れた応答のバッチは分割して、カテゴリ外の分類は残りだけで問い合わせ直すことをテスト"""
+    mapping = {'嬉しい': categories[0], '悲しい': categories[5], '不安': categories[4], '安心': categories[2]}
+    model = FakeClassifierModel(mapping, broken={'悲しい'})
+
+    result = classify_emotion_batch(['嬉しい', '悲しい', '不安', '安心', '謎'], categories, AIAnalyzer(model=model))
+
+    assert result == {**mapping, '謎': categories[-1]}
+    assert model.batches[0] == ['嬉しい', '悲しい', '不安', '安心', '謎']
+    assert model.batches[1:3] == [['嬉しい', '悲しい'], ['嬉しい']]
+    assert ['謎'] in model.batches
+
+
+def test_api_error_is_not_split_or_stored(cache_path):
+    """API呼び出しが失敗したバッチは分割して問い合わせ直さず、その他の分類も保存しないことをテスト"""
+    class FailingModel:
+        calls = 0
+
+        def generate_content(self, prompt):
+            self.calls += 1
+            raise RuntimeError('503 Service unavailable')
+
+    model = FailingModel()
+    emotions = [f'感情{i}' for i in range(8)]
+
+    assert classify_emotion_batch(emotions, categories, AIAnalyzer(model=model)) == \
+        {emotion: categories[-1] for emotion in emotions}
+    assert model.calls == 1
+
+    records = [{'date': '2025-01-01', 'emotion': emotion} for emotion in emotions]
+    for classify in (classify_emotions_with_llm, classify_emotions_tag):
+        result = classify(records, categories, AIAnalyzer(model=model), cache_path=cache_path, use_local=False)
+        assert result == {'2025-01-01': {emotion: categories[-1] for emotion in emotions}}
+    assert model.calls == 3
+    assert get_classification_store(cache_path, categories).get_all() == {}
+
+
+def test_tag_analyzer_shares_classification_store(cache_path):
+    """tag_analyzerも同じストアを使い、分類済みの感情は問い合わせないことをテスト"""
+    mapping = {'嬉しい': categories[0], '悲しい': categories[5]}
+    classify_emotions_with_llm([{'date': '2025-01-01', 'emotion': '嬉しい'}], categories,
+                               AIAnalyzer(model=FakeClassifierModel(mapping)), cache_path=cache_path, use_local=False)
+
+    class TagModel:
+        prompts = []
+
+        def generate_content(self, prompt):
+            self.prompts.append(prompt)
+            self.text = json.dumps({'分類': {'悲しい': categories[5]}}, ensure_ascii=False)
+            return self
+
+    model = TagModel()
+    records = [{'date': '2025-01-01', 'emotion': '嬉しい'}, {'date': '2025-01-02', 'emotion': '悲しい'}]
+    result = classify_emotions_tag(records, categories, AIAnalyzer(model=model), cache_path=cache_path,
+                                   use_local=False)
+
+    assert result == {'2025-01-01': {'嬉しい': categories[0]}, '2025-01-02': {'悲しい': categories[5]}}
+    assert len(model.prompts) == 1 and '嬉しい' not in model.prompts[0]
+    assert get_classification_store(cache_path, categories).get_all() == mapping
+
+
+def test_mock_classification_without_model():
+    """モデルがない場合は問い合わせずに最後のカテゴリにすることをテスト"""
+    analyzer = AIAnalyzer.__new__(AIAnalyzer)
+    analyzer.use_gemini = False
+    analyzer.model = None
+
+    assert classify_emotion_batch(['嬉しい', '悲しい'], categories, analyzer) == {
+        '嬉しい': categories[-1], '悲しい': categories[-1]
+    }
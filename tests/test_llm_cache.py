@@ -0,0 +1,141 @@
+import os
+import tempfile
+
+import pytest
+
+from src.utils.llm_cache import LLMResponseCache
+from src.ai_analyzer import AIAnalyzer
+
+
+class FakeClock:
+    """テスト用に進める時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds=1.0):
+        self.now += seconds
+
+
+@pytest.fixture
+def cache_path():
+    """テスト用のキャッシュファイルのパス"""
+    temp_dir = tempfile.mkdtemp()
+    yield os.path.join(temp_dir, "llm_cache.db")
+    for name in os.listdir(temp_dir):
+        os.remove(os.path.join(temp_dir, name))
+    os.rmdir(temp_dir)
+
+
+def test_cache_hit_miss_and_persistence(cache_path):
+    """保存した応答が別のインスタンスからも読め、ヒット率が数えられることをテスト"""
+    key = LLMResponseCache.make_key('model-a', 'v1', 'プロンプト')
+    cache = LLMResponseCache(cache_path)
+
+    assert cache.get(key) is None
+    cache.put(key, '{"topics": ["仕事"]}', 'model-a')
+    assert cache.get(key) == '{"topics": ["仕事"]}'
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hit_rate'] == 0.5
+    cache.close()
+
+    reopened = LLMResponseCache(cache_path)
+    assert reopened.get(key) == '{"topics": ["仕事"]}'
+    assert reopened.stats()['entries'] == 1
+    reopened.close()
+
+    assert key != LLMResponseCache.make_key('model-b', 'v1', 'プロンプト')
+    assert key != LLMResponseCache.make_key('model-a', 'v2', 'プロンプト')
+
+
+def test_cache_ttl(cache_path):
+    """有効期間を過ぎた応答は使わずに削除されることをテスト"""
+    clock = FakeClock()
+    cache = LLMResponseCache(cache_path, ttl_seconds=60, clock=clock)
+    cache.put('old', '古い応答')
+
+    clock.advance(30)
+    assert cache.get('old') == '古い応答'
+    clock.advance(31)
+    assert cache.get('old') is None
+    assert cache.stats()['expired'] == 1
+    assert cache.stats()['entries'] == 0
+    cache.close()
+
+
+def test_cache_evicts_least_recently_used(cache_path):
+    """件数・サイズの上限を超えると最後に使われてから時間が経った応答から削除されることをテスト"""
+    clock = FakeClock()
+    cache = LLMResponseCache(cache_path, max_entries=3, max_bytes=100, clock=clock)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key * 10)
+        clock.advance()
+    cache.get('a')
+    clock.advance()
+
+    cache.put('d', 'd' * 10)
+    assert cache.get('b') is None
+    assert [cache.get(key) is not None for key in ('a', 'c', 'd')] == [True, True, True]
+
+    clock.advance()
+    cache.put('e', 'e' * 90)
+    stats = cache.stats()
+    assert stats['bytes'] <= 100
+    assert cache.get('e') == 'e' * 90
+    assert stats['evictions'] == 3
+    cache.close()
+
+
+class FakeModel:
+    """呼び出し回数を数えるGeminiモデルの代わり"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return self
+
+
+def _analyzer(model, cache):
+    analyzer = AIAnalyzer.__new__(AIAnalyzer)
+    analyzer.prompt_template = '日記: {{user_input}}'
+    analyzer.use_gemini = True
+    analyzer.model = model
+    analyzer.model_name = 'gemini-1.5-flash'
+    analyzer.response_cache = cache
+    return analyzer
+
+
+def test_analyze_diary_reuses_cached_response(cache_path):
+    """同じ本文とQ&Aの再分析ではAPIを呼ばないことをテスト"""
+    model = FakeModel('結果: {"topics": ["仕事"], "emotions": ["嬉しい"]}')
+    analyzer = _analyzer(model, LLMResponseCache(cache_path))
+    qa_chain = [{'question': 'Q1', 'answer': 'A1'}]
+
+    first = analyzer.analyze_diary('今日は働いた', qa_chain)
+    second = analyzer.analyze_diary('今日は働いた', qa_chain)
+    analyzer.analyze_diary('今日は働いた', qa_chain + [{'question': 'Q2', 'answer': 'A2'}])
+
+    assert first == second == {'topics': ['仕事'], 'emotions': ['嬉しい']}
+    assert model.calls == 2
+    assert analyzer.response_cache.stats()['hits'] == 1
+    analyzer.response_cache.close()
+
+
+def test_analyze_diary_does_not_cache_unparsable_response(cache_path):
+    """解釈できなかった応答は保存しないことをテスト"""
+    model = FakeModel('JSONではない応答')
+    analyzer = _analyzer(model, LLMResponseCache(cache_path))
+
+    analyzer.analyze_diary('今日は働いた')
+    analyzer.analyze_diary('今日は働いた')
+
+    assert model.calls == 2
+    assert analyzer.response_cache.stats()['entries'] == 0
+    analyzer.response_cache.close()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+import pytest
+
+from src.ai_analyzer import AIAnalyzer
+from src.utils.classification_store import close_classification_stores, get_classification_store
+from src.utils.emotion_analyzer import categories, classify_emotions_with_llm
+from src.utils.local_emotion_classifier import LocalEmotionClassifier
+from tests.test_emotion_analyzer import FakeClassifierModel
+
+
+def test_similar_emotions_are_classified_locally():
+    """既知の感情に似た感情は確定し、似ていない感情は未確定にすることをテスト"""
+    classifier = LocalEmotionClassifier(categories)
+
+    classified, uncertain = classifier.classify(['嬉しい', 'とても嬉しい', '不安感', '孤独感', 'ほっとした気持ち', '謎', 'XYZ'])
+
+    assert classified == {
+        '嬉しい': '他者・環境との好意的関係',
+        'とても嬉しい': '他者・環境との好意的関係',
+        '不安感': '不安・心配・迷い',
+        '孤独感': '喪失・孤独',
+        'ほっとした気持ち': '自己受容・内的癒し'
+    }
+    assert uncertain == ['謎', 'XYZ']
+
+
+def test_llm_labels_extend_known_emotions():
+    """LLMの分類結果を既知の感情として使い、似た感情も分類できるようになることをテスト"""
+    classifier = LocalEmotionClassifier(categories, seed_examples={})
+    assert classifier.classify(['推し活']) == ({}, ['推し活'])
+
+    classifier.fit({'推し活': categories[0], '推し': categories[0], 'ゲーム': categories[6], '範囲外': 'カテゴリ外'})
+
+    category, similarity, confident = classifier.predict(['推し活楽しい'])[0]
+    assert (category, confident) == (categories[0], True)
+    assert classifier.predict(['推し活'])[0] == (categories[0], 1.0, True)
+    assert classifier.classify(['範囲外'])[1] == ['範囲外']
+
+
+def test_only_uncertain_emotions_are_sent_to_llm():
+    """ローカルで確定しない感情だけをLLMに問い合わせ、LLMの分類だけを保存することをテスト"""
+    temp_dir = tempfile.mkdtemp()
+    cache_path = os.path.join(temp_dir, 'emotion_classification.db')
+    try:
+        model = FakeClassifierModel({'謎': categories[4]})
+        records = [{'date': '2025-01-01', 'emotion': emotion} for emotion in ['嬉しい', '不安感', '謎']]
+
+        result = classify_emotions_with_llm(records, categories, AIAnalyzer(model=model), cache_path=cache_path)
+
+        assert model.batches == [['謎']]
+        assert result['2025-01-01'] == {'嬉しい': categories[1], '不安感': categories[4], '謎': categories[4]}
+        assert get_classification_store(cache_path, categories).get_all() == {'謎': categories[4]}
+    finally:
+        close_classification_stores()
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
@@ -0,0 +1,217 @@
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from src.diary_manager_sqlite import DiaryManagerSQLite
+from src.database.migrations import LATEST_VERSION, get_schema_version, migrate
+
+
+@pytest.fixture
+def db_path():
+    """テスト用の一時データベースパス"""
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, "test_migrations.db")
+    yield path
+    DiaryManagerSQLite(path).close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rmdir(temp_dir)
+
+
+def _query_plan(manager, sql, params=()):
+    """EXPLAIN QUERY PLAN の detail 列を連結して返す"""
+    with manager._pool.connection() as conn:
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    return ' | '.join(row[3] for row in rows)
+
+
+def test_new_database_is_at_latest_version(db_path):
+    """新規データベースが最新のスキーマバージョンで作成されることをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+
+    with manager._pool.connection() as conn:
+        assert get_schema_version(conn.cursor()) == LATEST_VERSION
+
+
+def test_legacy_database_is_migrated(db_path):
+    """バージョン管理導入前のデータベースがデータを保ったまま移行されることをテスト"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE diary_entries (
+            id TEXT PRIMARY KEY, original_id TEXT, created_at TEXT, date TEXT,
+            text TEXT, question TEXT, user_id TEXT DEFAULT 'default_user'
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO diary_entries (id, original_id, created_at, date, text, question, user_id)
+        VALUES ('legacy', 'legacy', '2025-01-01 10:00:00', '2025-01-01', '旧データ', '', 'legacy_user')
+    ''')
+    conn.commit()
+    conn.close()
+
+    manager = DiaryManagerSQLite(db_path)
+
+    with manager._pool.connection() as pooled:
+        assert get_schema_version(pooled.cursor()) == LATEST_VERSION
+    entries = manager.get_user_diary_data('legacy_user')
+    assert [entry['text'] for entry in entries] == ['旧データ']
+
+
+def test_migrate_is_idempotent(db_path):
+    """適用済みのマイグレーションが再実行されないことをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+
+    with manager._pool.transaction() as cur:
+        assert migrate(cur) == LATEST_VERSION
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+        index_count = cur.fetchone()[0]
+
+    DiaryManagerSQLite(db_path)
+    with manager._pool.connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchone()[0]
+    assert count == index_count
+
+
+def test_newer_schema_version_is_rejected(db_path):
+    """アプリケーションより新しいスキーマバージョンでは起動しないことをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+    with manager._pool.connection() as conn:
+        conn.execute(f'PRAGMA user_version = {LATEST_VERSION + 1}')
+
+    with pytest.raises(RuntimeError):
+        with manager._pool.transaction() as cur:
+            migrate(cur)
+
+    with manager._pool.connection() as conn:
+        conn.execute(f'PRAGMA user_version = {LATEST_VERSION}')
+
+
+def test_user_filter_uses_index(db_path):
+    """ユーザー別の一覧取得がインデックスを使うことをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+    plan = _query_plan(
+        manager,
+        'SELECT id FROM diary_entries WHERE user_id = ? ORDER BY created_at DESC, id DESC',
+        ('user',)
+    )
+
+    assert 'idx_diary_entries_user_created_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_date_range_uses_index(db_path):
+    """日付範囲の絞り込みがインデックスを使うことをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+    plan = _query_plan(
+        manager,
+        'SELECT id FROM diary_entries WHERE date BETWEEN ? AND ?',
+        ('2025-01-01', '2025-01-31')
+    )
+
+    assert 'idx_diary_entries_date' in plan
+
+
+@pytest.mark.parametrize('table, column, index', [
+    ('topics', 'topic', 'idx_topics_entry'),
+    ('emotions', 'emotion', 'idx_emotions_entry'),
+    ('thoughts', 'thought', 'idx_thoughts_entry'),
+    ('goals', 'goal', 'idx_goals_entry'),
+    ('followup_questions', 'order_index', 'idx_followup_questions_entry'),
+    ('qa_chain', 'order_index', 'idx_qa_chain_entry'),
+])
+def test_child_lookup_uses_index(db_path, table, column, index):
+    """関連テーブルのエントリ別参照がインデックスを使うことをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+    plan = _query_plan(
+        manager,
+        f'SELECT id, {column} FROM {table} WHERE diary_entry_id = ? ORDER BY {column}',
+        ('entry',)
+    )
+
+    assert index in plan
+    assert 'SCAN' not in plan
+
+
+def test_legacy_entries_are_added_to_search_index(db_path):
+    """移行前に保存されていたエントリが全文検索の対象になることをテスト"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE diary_entries (
+            id TEXT PRIMARY KEY, original_id TEXT, created_at TEXT, date TEXT,
+            text TEXT, question TEXT, user_id TEXT DEFAULT 'default_user'
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO diary_entries (id, original_id, created_at, date, text, question, user_id)
+        VALUES ('legacy', 'legacy', '2025-01-01 10:00:00', '2025-01-01', '旧データを検索する', '', 'legacy_user')
+    ''')
+    conn.commit()
+    conn.close()
+
+    manager = DiaryManagerSQLite(db_path)
+
+    results = manager.search_diary_entries('legacy_user', '旧データ')
+    assert [entry['id'] for entry in results] == ['legacy']
+
+
+def test_legacy_entries_are_added_to_statistics(db_path):
+    """移行前に保存されていたエントリがロールアップに集計されることをテスト"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE diary_entries (
+            id TEXT PRIMARY KEY, original_id TEXT, created_at TEXT, date TEXT,
+            text TEXT, question TEXT, user_id TEXT DEFAULT 'default_user'
+        )
+    ''')
+    conn.execute('CREATE TABLE topics (id INTEGER PRIMARY KEY AUTOINCREMENT, diary_entry_id TEXT, topic TEXT)')
+    conn.execute('''
+        INSERT INTO diary_entries (id, original_id, created_at, date, text, question, user_id)
+        VALUES ('legacy', 'legacy', '2025-01-01 10:00:00', '2025-01-01', '旧データ', '', 'legacy_user')
+    ''')
+    conn.execute("INSERT INTO topics (diary_entry_id, topic) VALUES ('legacy', '仕事')")
+    conn.commit()
+    conn.close()
+
+    manager = DiaryManagerSQLite(db_path)
+
+    statistics = manager.get_diary_statistics('legacy_user')
+    assert statistics['total_entries'] == 1
+    assert statistics['top_topics'] == [('仕事', 1)]
+    assert manager.rebuild_statistics()['mismatched'] == 0
+
+
+def test_entry_lookup_uses_index(db_path):
+    """元のIDまたはUUIDでの1件取得がインデックスを使うことをテスト"""
+    manager = DiaryManagerSQLite(db_path)
+    plan = _query_plan(
+        manager,
+        'SELECT id FROM diary_entries WHERE original_id = ? OR id = ?',
+        ('entry', 'entry')
+    )
+
+    assert 'idx_diary_entries_original_id' in plan
+    assert 'SCAN diary_entries' not in plan
+
+
+def test_legacy_entries_get_version(db_path):
+    """移行前に保存されていたエントリにバージョンが付き、部分更新できることをテスト"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE diary_entries (
+            id TEXT PRIMARY KEY, original_id TEXT, created_at TEXT, date TEXT,
+            text TEXT, question TEXT, user_id TEXT DEFAULT 'default_user'
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO diary_entries (id, original_id, created_at, date, text, question, user_id)
+        VALUES ('legacy', 'legacy', '2025-01-01 10:00:00', '2025-01-01', '旧データ', '', 'legacy_user')
+    ''')
+    conn.commit()
+    conn.close()
+
+    manager = DiaryManagerSQLite(db_path)
+
+    version = manager.get_entry('legacy')['version']
+    assert manager.patch_diary_entry('legacy', {'date': '2025-01-02'}, expected_version=version) == version + 1
@@ -0,0 +1,138 @@
+import datetime
+import json
+import re
+import threading
+
+from src.ai_analyzer import AIAnalyzer
+from src.period_analyzer import PeriodAnalyzer
+from src.utils.llm_cache import LLMResponseCache
+
+
+class FakePeriodModel:
+    """中間要約には対象の期間入りの要約を、最終のまとめにはJSONを返すモデル"""
+
+    def __init__(self, summary_length=0):
+        self.summary_length = summary_length
+        self.chunk_labels = []
+        self.final_prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        response = FakePeriodModel.__new__(FakePeriodModel)
+        if '中間要約を作成するAI' in prompt:
+            label = re.search(r'# 対象\r?\n(.+)', prompt).group(1).strip()
+            with self._lock:
+                self.chunk_labels.append(label)
+            response.text = f'要約[{label}]' + 'い' * self.summary_length
+        else:
+            with self._lock:
+                self.final_prompts.append(prompt)
+            response.text = json.dumps({'summary': 'まとめ', 'key_themes': []}, ensure_ascii=False)
+        return response
+
+
+def make_entries(start, days, text_length=100):
+    """start から days 日分、1日1件のエントリを作成"""
+    first = datetime.date.fromisoformat(start)
+    return [
+        {'date': (first + datetime.timedelta(days=i)).isoformat(), 'text': 'あ' * text_length,
+         'topics': ['仕事'], 'emotions': ['嬉しい'], 'qa_chain': []}
+        for i in range(days)
+    ]
+
+
+def _analyzer(model, **kwargs):
+    return PeriodAnalyzer(AIAnalyzer(model=model, response_cache=kwargs.pop('response_cache', None)), **kwargs)
+
+
+def test_short_period_uses_single_call():
+    """上限に収まる期間は従来どおり1回の呼び出しでまとめることをテスト"""
+    model = FakePeriodModel()
+
+    result = _analyzer(model).analyze_period_summary(make_entries('2025-01-06', 7), '2025-01-06', '2025-01-12')
+
+    assert result['summary'] == 'まとめ'
+    assert model.chunk_labels == []
+    assert 'あ' * 100 in model.final_prompts[0]
+
+
+def test_long_period_is_summarized_by_week():
+    """上限を超える期間は週ごとの中間要約からまとめることをテスト"""
+    model = FakePeriodModel()
+    entries = make_entries('2025-01-06', 35)
+
+    result = _analyzer(model, token_budget=1500).analyze_period_summary(
+        reversed(entries), '2025-01-06', '2025-02-09'
+    )
+
+    assert result['summary'] == 'まとめ'
+    assert sorted(model.chunk_labels) == [
+        '2025-01-06 〜 2025-01-12', '2025-01-13 〜 2025-01-19', '2025-01-20 〜 2025-01-26',
+        '2025-01-27 〜 2025-02-02', '2025-02-03 〜 2025-02-09'
+    ]
+    final_prompt = model.final_prompts[0]
+    assert 'あ' * 100 not in final_prompt
+    assert final_prompt.index('要約[2025-01-06 〜 2025-01-12]') < final_prompt.index('要約[2025-02-03 〜 2025-02-09]')
+
+
+def test_summaries_are_reduced_until_they_fit():
+    """中間要約の合計が上限を超える場合は隣り合う要約をさらにまとめることをテスト"""
+    model = FakePeriodModel(summary_length=400)
+
+    _analyzer(model, token_budget=1500).analyze_period_summary(make_entries('2025-01-06', 35), '2025-01-06', '2025-02-09')
+
+    assert len(model.chunk_labels) == 7
+    assert sorted(model.chunk_labels[5:]) == ['2025-01-06 〜 2025-01-26', '2025-01-27 〜 2025-02-09']
+    assert model.final_prompts[0].count('要約[') == 2
+
+
+def test_failed_chunk_is_marked_unsummarized():
+    """中間要約に失敗した週は日記の抜粋を渡さず、まとめに含めなかった期間として返すことをテスト"""
+
+    class FailingWeekModel(FakePeriodModel):
+        def generate_content(self, prompt):
+            if '中間要約を作成するAI' in prompt and '2025-01-13 〜 2025-01-19' in prompt:
+                raise RuntimeError('API error')
+            return super().generate_content(prompt)
+
+    model = FailingWeekModel()
+    analyzer = _analyzer(model, token_budget=1500)
+    entries = make_entries('2025-01-06', 21)
+
+    result = analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-26')
+
+    assert result['summary'] == 'まとめ'
+    assert result['unsummarized_ranges'] == ['2025-01-13 〜 2025-01-19']
+    final_prompt = model.final_prompts[0]
+    assert 'あ' * 100 not in final_prompt
+    assert '2025-01-13 〜 2025-01-19' not in final_prompt
+    assert '要約[2025-01-06 〜 2025-01-12]' in final_prompt
+    # エクスポートにも要約が一部であることを残す
+    assert '含まれていません: 2025-01-13 〜 2025-01-19' in analyzer.create_export_text(result, entries)
+
+
+def test_large_week_is_split_into_days():
+    """1週間分が上限を超える場合は日ごとに要約することをテスト"""
+    model = FakePeriodModel()
+    entries = make_entries('2025-01-06', 3, text_length=1000)
+
+    _analyzer(model, token_budget=1500).analyze_period_summary(entries, '2025-01-06', '2025-01-08')
+
+    assert sorted(model.chunk_labels) == ['2025-01-06', '2025-01-07', '2025-01-08']
+
+
+def test_chunk_summaries_are_cached():
+    """同じ内容の週の中間要約は応答キャッシュから再利用することをテスト"""
+    model = FakePeriodModel()
+    cache = LLMResponseCache(None)
+    analyzer = _analyzer(model, token_budget=1500, response_cache=cache)
+    entries = make_entries('2025-01-06', 21)
+
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-26')
+    assert len(model.chunk_labels) == 3
+
+    # 最後の週だけ内容が変わった場合はその週だけ要約し直す
+    entries[-1]['text'] = '書き直した'
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-26')
+    assert model.chunk_labels[3:] == ['2025-01-20 〜 2025-01-26']
+    assert cache.stats()['hits'] == 2
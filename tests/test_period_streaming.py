@@ -0,0 +1,72 @@
+import io
+
+import pytest
+
+from src.ai_analyzer import AIAnalyzer
+from src.period_analyzer import PeriodAnalyzer
+from tests.test_period_mapreduce import FakePeriodModel, make_entries
+
+
+@pytest.fixture
+def diary_manager(manager, entry_factory):
+    """期間データを登録したDiaryManagerSQLiteインスタンス"""
+    manager.add_diary_entries_batch(entry_factory('period_user', 10))
+    return manager
+
+
+def test_analyze_period_summary_accepts_stream(diary_manager):
+    """ジェネレーターを渡してもリストと同じ結果になることをテスト"""
+    analyzer = PeriodAnalyzer()
+    listed = diary_manager.get_user_diary_page('period_user', page_size=10, start_date='2025-01-03')['entries']
+    streamed = diary_manager.iter_user_entries('period_user', start_date='2025-01-03', chunk_size=3)
+
+    assert analyzer.analyze_period_summary(streamed, '2025-01-03', '2025-01-10') == \
+        analyzer.analyze_period_summary(listed, '2025-01-03', '2025-01-10')
+    assert '8件' in analyzer.analyze_period_summary(iter(listed), '2025-01-03', '2025-01-10')['summary']
+    assert analyzer.analyze_period_summary(iter([]), '2025-02-01', '2025-02-02')['summary'] == \
+        'この期間の日記データがありません。'
+
+
+def test_export_text_from_stream(diary_manager):
+    """件数を渡せばジェネレーターから同じエクスポートテキストを作れることをテスト"""
+    analyzer = PeriodAnalyzer()
+    entries = diary_manager.get_user_diary_data('period_user')
+    summary = analyzer.analyze_period_summary(entries, '2025-01-01', '2025-01-10')
+
+    expected = analyzer.create_export_text(summary, entries)
+    assert '## 📊 元データ (10件)' in expected
+    assert analyzer.create_export_text(summary, diary_manager.iter_user_entries('period_user', chunk_size=4), 10) == expected
+    assert analyzer.create_export_text(summary, diary_manager.iter_user_entries('period_user')) == expected
+
+    file = io.StringIO()
+    written = analyzer.write_export_text(summary, diary_manager.iter_user_entries('period_user'), file, 10)
+    assert file.getvalue() == expected
+    assert written == len(expected)
+
+
+def test_long_stream_is_summarized_while_reading():
+    """上限を超える期間は、日記を読み終える前に週ごとの中間要約を始めることをテスト"""
+    model = FakePeriodModel()
+    read_counts = []
+    entries = make_entries('2025-01-06', 70)
+
+    def stream():
+        for count, entry in enumerate(entries, 1):
+            read_counts.append(count)
+            yield entry
+
+    original = model.generate_content
+
+    def generate_content(prompt):
+        if '中間要約を作成するAI' in prompt and len(model.chunk_labels) == 0:
+            model.first_chunk_read = read_counts[-1]
+        return original(prompt)
+
+    model.generate_content = generate_content
+    analyzer = PeriodAnalyzer(AIAnalyzer(model=model), token_budget=1500, concurrency=1)
+    result = analyzer.analyze_period_summary(stream(), '2025-01-06', '2025-03-16')
+
+    assert result['summary'] == 'まとめ'
+    # 同時実行数1では要約待ちは2週までなので、4週目の1件目を読んだところで最初の要約を待つ
+    assert model.first_chunk_read <= 7 * 3 + 1
+    assert len(model.chunk_labels) == 10
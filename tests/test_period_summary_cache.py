@@ -0,0 +1,91 @@
+from src.ai_analyzer import AIAnalyzer
+from src.period_analyzer import PeriodAnalyzer
+from src.utils.period_summary_cache import PeriodSummaryCache
+from tests.test_period_mapreduce import FakePeriodModel, make_entries
+
+
+class FailingPeriodModel(FakePeriodModel):
+    """中間要約の呼び出しだけ失敗するモデル"""
+
+    def generate_content(self, prompt):
+        if '中間要約を作成するAI' in prompt:
+            raise RuntimeError('API error')
+        return super().generate_content(prompt)
+
+
+def _analyzer(model, tmp_path, token_budget=500):
+    cache = PeriodSummaryCache(str(tmp_path / 'period_summaries.db'))
+    return PeriodAnalyzer(AIAnalyzer(model=model), token_budget=token_budget, summary_cache=cache), cache
+
+
+def test_short_period_does_not_use_cache(tmp_path):
+    """上限に収まる期間は要約を保存せず、日記をそのまま1回でまとめることをテスト"""
+    model = FakePeriodModel()
+    analyzer, cache = _analyzer(model, tmp_path, token_budget=8000)
+
+    analyzer.analyze_period_summary(make_entries('2025-01-06', 7), '2025-01-06', '2025-01-12', user_id='u1')
+
+    assert model.chunk_labels == []
+    assert 'あ' * 100 in model.final_prompts[0]
+    assert cache.stats()['entries'] == 0
+
+
+def test_sliding_window_summarizes_only_new_day(tmp_path):
+    """期間をずらしても、期間の端になった週は日ごとの要約を再利用し、新しい日だけを要約することをテスト"""
+    model = FakePeriodModel()
+    analyzer, _ = _analyzer(model, tmp_path)
+    entries = make_entries('2025-01-07', 15)
+
+    # 端の週は日ごと、期間に収まる週（01-13〜01-19）は日ごとの要約をまとめて要約する
+    analyzer.analyze_period_summary(entries[:14], '2025-01-07', '2025-01-20', user_id='u1')
+    assert len(model.chunk_labels) == 15
+    assert '2025-01-13 〜 2025-01-19' in model.chunk_labels
+
+    analyzer.analyze_period_summary(entries[7:], '2025-01-14', '2025-01-21', user_id='u1')
+    assert model.chunk_labels[15:] == ['2025-01-21']
+    final_prompt = model.final_prompts[-1]
+    assert final_prompt.index('要約[2025-01-14]') < final_prompt.index('要約[2025-01-21]')
+
+
+def test_changed_entry_recomputes_only_its_day_and_week(tmp_path):
+    """内容が変わった日と、その日を含む週の要約だけを作り直すことをテスト"""
+    model = FakePeriodModel()
+    analyzer, _ = _analyzer(model, tmp_path)
+    entries = make_entries('2025-01-06', 21)
+
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-26', user_id='u1')
+    assert len(model.chunk_labels) == 21 + 3
+
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-26', user_id='u1')
+    assert len(model.chunk_labels) == 24
+
+    entries[8]['text'] = '書き直した'
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-26', user_id='u1')
+    assert model.chunk_labels[24:] == ['2025-01-14', '2025-01-13 〜 2025-01-19']
+
+
+def test_summaries_are_kept_per_user_and_mode(tmp_path):
+    """ユーザーや分析モードが違う場合は保存済みの要約を使わないことをテスト"""
+    model = FakePeriodModel()
+    analyzer, _ = _analyzer(model, tmp_path)
+    entries = make_entries('2025-01-06', 7)
+
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-12', user_id='u1')
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-12', user_id='u2')
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-12', mode='kpt', user_id='u1')
+    analyzer.analyze_period_summary(entries, '2025-01-06', '2025-01-12', user_id='u1')
+
+    assert len(model.chunk_labels) == 3 * 8
+
+
+def test_failed_summaries_are_not_stored(tmp_path):
+    """要約に失敗した日は保存せず、まとめに含めなかった期間として返すことをテスト"""
+    analyzer, cache = _analyzer(FailingPeriodModel(), tmp_path, token_budget=200)
+
+    result = analyzer.analyze_period_summary(make_entries('2025-01-06', 2), '2025-01-06', '2025-01-07', user_id='u1')
+
+    assert cache.stats()['entries'] == 0
+    assert result['unsummarized_ranges'] == ['2025-01-06', '2025-01-07']
+    # 要約が1つも残らない場合は日記の抜粋でまとめず、エラー時と同じ結果を返す
+    assert analyzer.model.final_prompts == []
+    assert result['summary'] == analyzer._mock_period_analysis(0, '2025-01-06', '2025-01-07')['summary']
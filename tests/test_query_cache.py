@@ -0,0 +1,135 @@
+import sqlite3
+
+import pytest
+
+from src.diary_manager_sqlite import DiaryManagerSQLite
+from src.database.query_cache import QueryCache
+
+
+def test_repeated_reads_hit_cache(manager, entry_factory):
+    """同じ読み取りの2回目以降がキャッシュから返ることをテスト"""
+    manager.add_diary_entries_batch(entry_factory('cache_user', 1))
+
+    first = manager.get_user_diary_data('cache_user')
+    second = manager.get_user_diary_data('cache_user')
+    manager.get_user_diary_page('cache_user', page_size=5)
+    manager.get_user_diary_page('cache_user', page_size=5)
+
+    assert first == second
+    assert manager.cache_stats()['hits'] == 2
+    assert manager.cache_stats()['misses'] == 2
+
+
+def test_cached_value_is_not_shared(manager, entry_factory):
+    """キャッシュしたエントリは変更できず、返したリストを変更してもキャッシュが変わらないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('cache_user', 1))
+
+    entries = manager.get_user_diary_data('cache_user')
+    with pytest.raises(TypeError):
+        entries[0]['topics'] = ['変更']
+    copied = entries[0].copy()
+    copied['snippet'] = '追加'
+    entries.clear()
+
+    cached = manager.get_user_diary_data('cache_user')
+    assert cached[0]['topics'] == ['仕事']
+    assert 'snippet' not in cached[0]
+    assert copied['snippet'] == '追加'
+
+
+def test_cache_hit_does_not_copy_entries(manager, entry_factory):
+    """キャッシュから返すエントリは同じオブジェクトを共有することをテスト"""
+    manager.add_diary_entries_batch(entry_factory('cache_user', 1))
+
+    first = manager.get_user_diary_page('cache_user')
+    second = manager.get_user_diary_page('cache_user')
+
+    assert second['entries'][0] is first['entries'][0]
+    assert second['entries'] is not first['entries']
+    assert manager.cache_stats()['bytes'] > 0
+
+
+@pytest.mark.parametrize('write', [
+    lambda m, new_entry: m.add_diary_entry(new_entry),
+    lambda m, new_entry: m.update_diary_entry('cache_user_0', {'text': '更新', 'date': '2025-01-02'}),
+    lambda m, new_entry: m.delete_diary_entry('cache_user_0'),
+    lambda m, new_entry: m.add_qa_chain('cache_user_0', [{'question': 'Q2', 'answer': 'A2', 'created_at': ''}]),
+    lambda m, new_entry: m.append_qa('cache_user_0', 'Q2', 'A2'),
+    lambda m, new_entry: m.add_followup_questions('cache_user_0', ['次の質問']),
+])
+def test_writes_invalidate_cache(manager, entry_factory, write):
+    """すべての書き込みでキャッシュが無効になることをテスト"""
+    entry, new_entry = entry_factory('cache_user', 2)
+    manager.add_diary_entry(entry)
+    before_user = manager.get_user_diary_data('cache_user')
+    before_all = manager.get_all_diary_data()
+
+    write(manager, new_entry)
+
+    assert manager.get_user_diary_data('cache_user') != before_user
+    assert manager.get_all_diary_data() != before_all
+    assert manager.cache_stats()['hits'] == 0
+
+
+def test_other_users_cache_survives_write(manager, entry_factory):
+    """別のユーザーの書き込みではキャッシュが無効にならないことをテスト"""
+    manager.add_diary_entries_batch(entry_factory('cache_user', 1))
+    manager.get_user_diary_data('cache_user')
+
+    manager.add_diary_entries_batch(entry_factory('other_user', 1))
+    manager.get_user_diary_data('cache_user')
+
+    assert manager.cache_stats()['hits'] == 1
+
+
+def test_write_from_other_connection_invalidates_cache(manager, entry_factory):
+    """別プロセス（別の接続）からの書き込みもバージョンで検出することをテスト"""
+    manager.add_diary_entries_batch(entry_factory('cache_user', 1))
+    manager.get_user_diary_data('cache_user')
+
+    conn = sqlite3.connect(manager.db_path)
+    conn.execute("UPDATE diary_entries SET text = '外部で更新' WHERE id = 'cache_user_0'")
+    conn.commit()
+    conn.close()
+
+    assert manager.get_user_diary_data('cache_user')[0]['text'] == '外部で更新'
+
+
+def test_lru_eviction_and_memory_bound():
+    """件数とメモリ量の上限を超えたら古い値から削除することをテスト"""
+    cache = QueryCache(max_entries=2, max_bytes=10 ** 6)
+    cache.put('a', ('user',), 1, ['a'])
+    cache.put('b', ('user',), 1, ['b'])
+    assert cache.get('a', ('user',), 1) == ['a']
+    cache.put('c', ('user',), 1, ['c'])
+
+    assert cache.get('b', ('user',), 1) is None
+    assert cache.get('a', ('user',), 1) == ['a']
+    assert cache.stats()['evictions'] == 1
+
+    small = QueryCache(max_entries=10, max_bytes=2000)
+    small.put('a', ('user',), 1, ['x' * 500])
+    small.put('b', ('user',), 1, ['y' * 500])
+    small.put('c', ('user',), 1, ['z' * 1000])
+    small.put('d', ('user',), 1, ['w' * 5000])
+    stats = small.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] <= 2000
+    assert small.get('a', ('user',), 1) is None
+    # 上限より大きい値はキャッシュしない
+    assert small.get('d', ('user',), 1) is None
+
+
+def test_cache_can_be_disabled(tmp_path, entry_factory):
+    """上限を0にするとキャッシュしないことをテスト"""
+    manager = DiaryManagerSQLite(str(tmp_path / 'test_cache.db'), cache_max_entries=0)
+    try:
+        manager.add_diary_entries_batch(entry_factory('cache_user', 1))
+
+        manager.get_user_diary_data('cache_user')
+        manager.get_user_diary_data('cache_user')
+
+        assert manager.cache_stats()['hits'] == 0
+        assert manager.cache_stats()['entries'] == 0
+    finally:
+        manager.close()
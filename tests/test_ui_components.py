@@ -0,0 +1,34 @@
+import pytest
+
+from src import ui_components
+from src.ai_analyzer import AIAnalyzer, StubModel
+from src.ui_components import UIComponents
+
+
+@pytest.fixture
+def ui(tmp_path, entry_factory):
+    """エントリを1件登録したUIComponents"""
+    # 画面が捕捉する EntryConflictError と同じモジュールのマネージャーを使う（共有の manager は使えない）
+    manager = ui_components.DiaryManagerSQLite(str(tmp_path / 'test_ui.db'))
+    manager.add_diary_entries_batch(entry_factory('ui_user', 1))
+    yield UIComponents(manager, AIAnalyzer(model=StubModel()))
+    manager.close()
+
+
+def test_update_entry_date_checks_rendered_version(ui, monkeypatch):
+    """表示した後に別の画面で更新されていたら、警告して日付を変更しないことをテスト"""
+    warnings = []
+    monkeypatch.setattr(ui_components.st, 'warning', warnings.append)
+    rendered = ui.diary_manager.get_user_diary_page('ui_user')['entries'][0]
+
+    ui.diary_manager.patch_diary_entry('ui_user_0', {'text': '別の画面で編集'})
+    assert not ui._update_entry_date(rendered, '2025-01-05')
+
+    entry = ui.diary_manager.get_entry('ui_user_0')
+    assert (entry['date'], entry['text']) == ('2025-01-01', '別の画面で編集')
+    assert len(warnings) == 1
+
+    # 検索結果から表示したエントリも同じように保存できる
+    found = ui._search_user_diary('ui_user', '別の画面')['entries'][0]
+    assert ui._update_entry_date(found, '2025-01-05')
+    assert ui.diary_manager.get_entry('ui_user_0')['date'] == '2025-01-05'